@@ -1,4 +1,3 @@
-import pandas as pd
 import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -6,9 +5,11 @@ from ta.momentum import RSIIndicator
 from ta.trend import EMAIndicator
 import os
 
+from services.ohlcv_store import ohlcv_store
+
 
 def train_fib_ai_model(csv_path, model_path="models/fib_ai_model.pkl"):
-    df = pd.read_csv(csv_path)
+    df = ohlcv_store.load_csv(csv_path).frame().astype("float64")
     df.dropna(inplace=True)
 
     # Step 1: Calculate indicators (features)
@@ -0,0 +1,42 @@
+"""add_result_cache_to_backtests
+
+Revision ID: 6e2b1f0c9a47
+Revises: 05dd12f64da0
+Create Date: 2026-10-18 10:12:44.218530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2b1f0c9a47'
+down_revision: Union[str, None] = '05dd12f64da0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('backtests', sa.Column('cache_key', sa.String(length=64), nullable=True))
+    op.add_column('backtests', sa.Column('params_key', sa.String(length=64), nullable=True))
+    op.add_column('backtests', sa.Column('strategy_name', sa.String(), nullable=True))
+    op.add_column('backtests', sa.Column('params', sa.JSON(), nullable=True))
+    op.add_column('backtests', sa.Column('data_version', sa.String(length=64), nullable=True))
+    op.add_column('backtests', sa.Column('metrics', sa.JSON(), nullable=True))
+    op.add_column('backtests', sa.Column('result', sa.LargeBinary(), nullable=True))
+    op.create_index(op.f('ix_backtests_cache_key'), 'backtests', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_backtests_params_key'), 'backtests', ['params_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_backtests_params_key'), table_name='backtests')
+    op.drop_index(op.f('ix_backtests_cache_key'), table_name='backtests')
+    op.drop_column('backtests', 'result')
+    op.drop_column('backtests', 'metrics')
+    op.drop_column('backtests', 'data_version')
+    op.drop_column('backtests', 'params')
+    op.drop_column('backtests', 'strategy_name')
+    op.drop_column('backtests', 'params_key')
+    op.drop_column('backtests', 'cache_key')
@@ -30,9 +30,16 @@ from router.fyers_router import fyers_router
 from router.market_data_router import market_data_router
 from services import stop_loss_router
 from ws_router.upstox_ltp_ws import ws_upstox_router
-from router.market_ws import router as market_ws_router
+from router.market_ws import router as market_ws_router, on_instruments_refreshed
 from router.backtest_router import backtesting_router
+from router.fib_strategy_router import router as fib_strategy_router
 from router.stock_router import router as stock_router
+from services.backtest_jobs import backtest_jobs
+from services.bar_aggregator import bar_aggregator
+from services.instrument_refresh import instrument_refresher
+from services.quote_board import quote_board
+from services.upstox.decode_worker import shutdown_executors
+from services.upstox.feed_hub import feed_hub
 
 # Load environment variables
 load_dotenv()
@@ -53,9 +60,22 @@ async def lifespan(app: FastAPI):
         db = next(get_db())
         logger.info("✅ DB session initialized.")
 
+        # Latest quotes and live OHLCV bars from the shared Upstox feed
+        feed_hub.add_listener(quote_board.on_message)
+        feed_hub.add_listener(bar_aggregator.on_message)
+        bar_clock = asyncio.create_task(bar_aggregator.run_clock())
+
+        # Daily instrument snapshot swap; live subscriptions follow the diff
+        instrument_refresher.on_refresh(on_instruments_refreshed)
+        instrument_refresh = asyncio.create_task(instrument_refresher.run_daily())
+
         # Optional: start any background jobs here
         logger.info("🟢 Background schedulers started.")
         yield
+        bar_clock.cancel()
+        instrument_refresh.cancel()
+        shutdown_executors()
+        backtest_jobs.shutdown()
     except Exception as e:
         logger.exception("🔥 Lifespan startup failed.")
         raise e
@@ -111,6 +131,7 @@ app.include_router(stop_loss_router.router)
 app.include_router(ws_upstox_router)
 app.include_router(market_ws_router)
 app.include_router(backtesting_router, prefix="/api/backtesting")
+app.include_router(fib_strategy_router, prefix="/api/backtesting")
 app.include_router(stock_router)
 
 
@@ -45,3 +45,79 @@ REDIRECT_URI = "your_redirect_uri"
 ACCESS_TOKEN = "your_access_token"  # You need to generate this
 WS_URL = "wss://api.upstox.com/live/market-data"  # Upstox WebSocket URL
 
+
+# Upstox market feed decoding: "compact" reads ticks straight off the
+# protobuf objects, "dict" keeps the MessageToDict path.
+UPSTOX_FEED_DECODE_MODE = os.getenv("UPSTOX_FEED_DECODE_MODE", "compact")
+
+# Where compact decoding runs: "inline" on the event loop, or a shared
+# "thread" / "process" pool of UPSTOX_FEED_DECODE_WORKERS workers.
+UPSTOX_FEED_DECODE_WORKER = os.getenv("UPSTOX_FEED_DECODE_WORKER", "inline")
+UPSTOX_FEED_DECODE_WORKERS = int(os.getenv("UPSTOX_FEED_DECODE_WORKERS", "2"))
+
+# Directory for the raw Upstox feed journal (one sub-directory per day).
+# Recording is off when unset.
+TICK_JOURNAL_DIR = os.getenv("TICK_JOURNAL_DIR")
+
+# Base URL for the Upstox REST API. Point it at a local feed simulator
+# (services/upstox/feed_simulator.py) for load tests.
+UPSTOX_API_BASE_URL = os.getenv("UPSTOX_API_BASE_URL", "https://api.upstox.com")
+UPSTOX_FEED_AUTHORIZE_URL = f"{UPSTOX_API_BASE_URL}/v3/feed/market-data-feed/authorize"
+
+# Seconds a pre-fetched feed redirect URI is trusted before it is fetched again.
+UPSTOX_FEED_URL_TTL = float(os.getenv("UPSTOX_FEED_URL_TTL", "30"))
+
+# Quotes older than this (seconds) are refreshed over REST by the quote board.
+QUOTE_STALE_SECONDS = float(os.getenv("QUOTE_STALE_SECONDS", "5"))
+
+# Upstox instrument dump and its compiled, memory-mapped form
+# (services/instrument_master.py).
+INSTRUMENTS_JSON_PATH = os.getenv("INSTRUMENTS_JSON_PATH", "data/upstox_instruments.json")
+INSTRUMENT_MASTER_DIR = os.getenv("INSTRUMENT_MASTER_DIR", "data/instrument_master")
+
+# Daily instrument refresh (services/instrument_refresh.py): dump URL and
+# local time (HH:MM) the new snapshot is fetched and swapped in.
+UPSTOX_INSTRUMENTS_URL = os.getenv(
+    "UPSTOX_INSTRUMENTS_URL",
+    "https://assets.upstox.com/market-quote/instruments/exchange/complete.json.gz",
+)
+INSTRUMENT_REFRESH_TIME = os.getenv("INSTRUMENT_REFRESH_TIME", "08:00")
+
+# Strikes either side of ATM, per live expiry, that /api/stocks/top lists
+# and subscribes (services/option_chain.py).
+OPTION_CHAIN_ATM_STRIKES = int(os.getenv("OPTION_CHAIN_ATM_STRIKES", "1"))
+
+# Historical price CSVs used by the backtest engine (services/backtest_engine):
+# <dir>/<SYMBOL>_historical.csv and <dir>/processed/<sector>/<SYMBOL>_historical.csv
+BACKTEST_DATA_DIR = os.getenv("BACKTEST_DATA_DIR", "data")
+
+# Columnar OHLCV store (services/ohlcv_store.py): memory-mapped float64/int64
+# columns per <timeframe>/<SYMBOL>@<source>, converted from the CSVs above
+OHLCV_STORE_DIR = os.getenv("OHLCV_STORE_DIR", "data/ohlcv")
+
+# Parameter sweeps (services/backtest_engine/sweep.py): pool size (0 = all
+# cores) and combinations evaluated per task.
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", "0"))
+SWEEP_CHUNK_SIZE = int(os.getenv("SWEEP_CHUNK_SIZE", "16"))
+
+# Portfolio backtests (services/backtest_engine/portfolio.py): open positions
+# allowed overall and per sector, and each entry's share of current equity.
+PORTFOLIO_MAX_POSITIONS = int(os.getenv("PORTFOLIO_MAX_POSITIONS", "10"))
+PORTFOLIO_MAX_PER_SECTOR = int(os.getenv("PORTFOLIO_MAX_PER_SECTOR", "3"))
+PORTFOLIO_POSITION_SIZE = float(os.getenv("PORTFOLIO_POSITION_SIZE", "0.1"))
+
+# Background backtest jobs (services/backtest_jobs.py): worker threads, jobs a
+# user may have queued or running at once, and finished jobs kept for polling.
+BACKTEST_JOB_WORKERS = int(os.getenv("BACKTEST_JOB_WORKERS", "2"))
+BACKTEST_JOBS_PER_USER = int(os.getenv("BACKTEST_JOBS_PER_USER", "2"))
+BACKTEST_JOBS_KEPT = int(os.getenv("BACKTEST_JOBS_KEPT", "200"))
+# Sweeps submitted as jobs: process pool size per sweep (0 = SWEEP_WORKERS),
+# and the most combinations a grid or sample may have.
+BACKTEST_JOB_SWEEP_WORKERS = int(os.getenv("BACKTEST_JOB_SWEEP_WORKERS", "2"))
+BACKTEST_JOB_SWEEP_MAX_COMBINATIONS = int(os.getenv("BACKTEST_JOB_SWEEP_MAX_COMBINATIONS", "5000"))
+
+# AI strategy backtests (services/backtest.py): sliding windows per model call
+AI_BACKTEST_BATCH_SIZE = int(os.getenv("AI_BACKTEST_BATCH_SIZE", "1024"))
+
+# Walk-forward model evaluation (models/walk_forward.py): pool size, 0 = all cores
+WALK_FORWARD_WORKERS = int(os.getenv("WALK_FORWARD_WORKERS", "0"))
@@ -0,0 +1,54 @@
+import time
+
+import msgpack
+
+FORMAT_JSON = "json"
+FORMAT_DELTA = "delta"
+WIRE_FORMATS = (FORMAT_JSON, FORMAT_DELTA)
+
+DELTA_FLUSH_INTERVAL = 0.05  # seconds between coalesced delta frames
+
+
+class DeltaFrameEncoder:
+    """Per-client state for the batched, delta-encoded MessagePack format.
+
+    The first frame carrying an instrument has all of its known fields;
+    after that only fields whose value changed since the last frame sent
+    to this client are included. A field that becomes unknown is sent as
+    nil so the client can clear it.
+    """
+
+    def __init__(self):
+        self.last_sent = {}
+        self.seq = 0
+        self.bytes_sent = 0
+
+    def diff(self, parsed: dict) -> dict:
+        changes = {}
+        for key, fields in parsed.items():
+            previous = self.last_sent.get(key)
+            if previous is None:
+                delta = {name: v for name, v in fields.items() if v is not None}
+            else:
+                delta = {
+                    name: v for name, v in fields.items() if previous.get(name) != v
+                }
+            self.last_sent[key] = fields
+            if delta:
+                changes[key] = delta
+        return changes
+
+    def frame(self, changes: dict, market_open: bool):
+        self.seq += 1
+        return {
+            "type": "live_feed_delta",
+            "seq": self.seq,
+            "ts": int(time.time() * 1000),
+            "market_open": market_open,
+            "data": changes,
+        }
+
+    def pack(self, message: dict) -> bytes:
+        packed = msgpack.packb(message, use_bin_type=True)
+        self.bytes_sent += len(packed)
+        return packed
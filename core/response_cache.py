@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import json
+import threading
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+
+def _accepts(request: Request, coding: str) -> bool:
+    accepted = request.headers.get("accept-encoding", "")
+    for part in accepted.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") != "q=0"
+    return False
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+class CachedBody:
+    """One JSON response serialized once and stored precompressed.
+
+    ``respond`` picks brotli, gzip or identity from ``Accept-Encoding`` and
+    answers a matching ``If-None-Match`` with an empty 304. The ETag is a
+    hash of the uncompressed body, so rebuilding identical content keeps
+    client caches valid.
+    """
+
+    def __init__(self, payload, cache_control="no-cache"):
+        self.body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        self.cache_control = cache_control
+        self.encoded = {"gzip": gzip.compress(self.body, GZIP_LEVEL)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+
+    def respond(self, request: Request) -> Response:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request, self.etag):
+            return Response(status_code=304, headers=headers)
+
+        for coding in ("br", "gzip"):
+            body = self.encoded.get(coding)
+            if body is not None and _accepts(request, coding):
+                headers["Content-Encoding"] = coding
+                return Response(body, media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """``CachedBody`` per name, rebuilt only when its version key changes."""
+
+    def __init__(self):
+        self.entries = {}  # name -> (version, CachedBody)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, name, version, build):
+        """Cached body for ``version``; ``build()`` returns the payload otherwise."""
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, CachedBody(build()))
+                self.entries[name] = entry
+                self.builds += 1
+            else:
+                self.hits += 1
+        return entry[1]
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(name, None)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "builds": self.builds,
+            "bytes": {
+                name: {"identity": len(body.body), **{c: len(b) for c, b in body.encoded.items()}}
+                for name, (_, body) in self.entries.items()
+            },
+        }
+
+
+# Singleton instance
+response_cache = ResponseCache()
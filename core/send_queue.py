@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger("send_queue")
+
+DEFAULT_MAX_KEYS = 5000
+DEFAULT_MAX_CONTROL = 100
+
+
+class ConflatingSendQueue:
+    """Bounded outbound queue for one downstream WebSocket.
+
+    Ticks are conflated per instrument key, so a client that falls behind
+    only ever receives the latest value for each key. Control messages
+    (market status, errors) are queued separately and sent first. A single
+    writer task owns the socket; producers never await a send.
+
+    With ``flush_interval`` set, tick messages go out at most once per
+    interval so bursts coalesce into one frame. ``render`` may return None
+    to skip a send (e.g. nothing changed).
+    """
+
+    def __init__(
+        self,
+        send,
+        render,
+        max_keys=DEFAULT_MAX_KEYS,
+        max_control=DEFAULT_MAX_CONTROL,
+        flush_interval=0,
+    ):
+        self._send = send
+        self._render = render
+        self.max_keys = max_keys
+        self.max_control = max_control
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+        self._ticks = {}
+        self._control = deque()
+        self._oldest = None  # monotonic time of the oldest unsent tick
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.closed = False
+
+        self.enqueued = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.sent_messages = 0
+        self.sent_ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def put_ticks(self, ticks: dict):
+        if self._closing:
+            return
+        pending = self._ticks
+        if not pending:
+            self._oldest = time.monotonic()
+        for key, tick in ticks.items():
+            if key in pending:
+                self.conflated += 1
+            elif len(pending) >= self.max_keys:
+                self.dropped += 1
+                continue
+            pending[key] = tick
+        self.enqueued += len(ticks)
+        self._wakeup.set()
+
+    def put_control(self, message):
+        if self._closing:
+            return
+        if len(self._control) >= self.max_control:
+            self._control.popleft()
+            self.dropped += 1
+        self._control.append(message)
+        self._wakeup.set()
+
+    def depth(self):
+        return len(self._ticks) + len(self._control)
+
+    def lag(self):
+        if not self._ticks:
+            return 0.0
+        return time.monotonic() - self._oldest
+
+    async def aclose(self, timeout=1.0):
+        """Flush what is queued (bounded by ``timeout``) and stop the writer."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self.closed = True
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.closed = True
+
+    async def _run(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                if self.flush_interval and not self._closing:
+                    wait = self._last_flush + self.flush_interval - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                self._wakeup.clear()
+
+                while self._control:
+                    await self._send(self._control.popleft())
+                    self.sent_messages += 1
+
+                if self._ticks:
+                    ticks, self._ticks = self._ticks, {}
+                    oldest = self._oldest
+                    self._last_flush = time.monotonic()
+                    message = self._render(ticks)
+                    if message is not None:
+                        await self._send(message)
+                        self.sent_messages += 1
+                    self.sent_ticks += len(ticks)
+                    self.last_lag = time.monotonic() - oldest
+                    self.max_lag = max(self.max_lag, self.last_lag)
+
+                if self._closing and not self.depth():
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Send queue writer stopped: {e}")
+        finally:
+            self._closing = True
+            self.closed = True
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth(),
+            "lag_ms": round(self.lag() * 1000, 1),
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "enqueued": self.enqueued,
+            "conflated": self.conflated,
+            "dropped": self.dropped,
+            "sent_messages": self.sent_messages,
+            "sent_ticks": self.sent_ticks,
+        }
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, JSON, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, JSON, ForeignKey, Date, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.connection import Base
@@ -243,6 +243,15 @@ class Backtest(Base):
     accuracy = Column(Float, nullable=True)
     created_at = Column(DateTime, default=func.now())
 
+    # Result cache (services/backtest_cache.py)
+    cache_key = Column(String(64), unique=True, index=True, nullable=True)  # strategy + params + data
+    params_key = Column(String(64), index=True, nullable=True)  # strategy + params
+    strategy_name = Column(String, nullable=True)
+    params = Column(JSON, nullable=True)
+    data_version = Column(String(64), nullable=True)
+    metrics = Column(JSON, nullable=True)
+    result = Column(LargeBinary, nullable=True)  # compressed report, equity curve and signals
+
     # Relationships
     user = relationship("User")
     strategy = relationship("Strategy", back_populates="backtests")
@@ -16,6 +16,7 @@ from services.broker_service import UpstoxBroker
 from dotenv import load_dotenv
 
 from models.training_report import TrainingReport
+from models.walk_forward import WalkForward
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +79,25 @@ class ModelTrainer:
             logger.error(f"Training failed: {str(e)}")
             raise
 
+    def walk_forward(self, workers: int = None, **split):
+        """Per-fold out-of-sample metrics of the training setup (see models/walk_forward.py)"""
+        frames = []
+        for symbol in self.training_symbols:
+            data = yf.download(symbol, period="2y", interval="1d")
+            # Features per symbol, so rolling windows never span two symbols
+            X, y = self._prepare_features(data)
+            frames.append(X.assign(Target=y))
+        dataset = pd.concat(frames).sort_index(kind="stable")
+        harness = WalkForward(
+            RandomForestClassifier,
+            dataset[self.features].to_numpy(),
+            dataset['Target'].to_numpy(),
+            dataset.index.to_numpy(),
+            workers=workers,
+        )
+        table, _ = harness.evaluate(params={"n_estimators": 100, "max_depth": 10, "random_state": 42}, **split)
+        return table
+
     def _collect_training_data(self):
         """Collect historical data for training"""
         all_data = []
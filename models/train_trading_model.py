@@ -1,11 +1,13 @@
 import pandas as pd
 import numpy as np
+from functools import partial
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 import joblib
 import yfinance as yf
 import logging
 
+from models.walk_forward import WalkForward, walk_forward_folds
+
 logger = logging.getLogger(__name__)
 
 class TradingModelTrainer:
@@ -15,6 +17,8 @@ class TradingModelTrainer:
             n_estimators=100,
             random_state=42
         )
+        self.features = ['SMA20', 'SMA50', 'RSI', 'Returns',
+                         'Volatility', 'Volume_Ratio']
 
     def prepare_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """Prepare features for model training"""
@@ -46,53 +50,82 @@ class TradingModelTrainer:
         rs = gain / loss
         return 100 - (100 / (1 + rs))
 
-    def train_model(self, symbols: list = None):
-        """Train the trading model"""
+    def build_dataset(self, symbols: list = None) -> pd.DataFrame:
+        """Features of every symbol, computed per symbol and ordered by date"""
         if symbols is None:
             symbols = ["RELIANCE.NS", "TCS.NS", "INFY.NS", "HDFCBANK.NS"]
-        
+
         all_data = []
         for symbol in symbols:
             try:
                 data = yf.download(symbol, period="2y", interval="1d")
                 if not data.empty:
                     prepared_data = self.prepare_features(data)
+                    prepared_data['Symbol'] = symbol
+                    # Next bar's return, the P&L of acting on this bar's prediction
+                    prepared_data['Forward_Return'] = (
+                        prepared_data['Close'].shift(-1) / prepared_data['Close'] - 1
+                    ).fillna(0)
                     all_data.append(prepared_data)
                     logger.info(f"Processed data for {symbol}")
             except Exception as e:
                 logger.error(f"Error processing {symbol}: {str(e)}")
-        
+
         if not all_data:
             raise ValueError("No training data available")
-        
-        # Combine all data
-        full_data = pd.concat(all_data)
-        
-        # Prepare features and target
-        features = ['SMA20', 'SMA50', 'RSI', 'Returns', 
-                   'Volatility', 'Volume_Ratio']
-        X = full_data[features]
+
+        # Stable sort keeps symbols in input order within a date
+        return pd.concat(all_data).sort_index(kind="stable")
+
+    def train_model(self, symbols: list = None, test_fraction: float = 0.2):
+        """Train the trading model on the older bars and score it on the most recent ones"""
+        full_data = self.build_dataset(symbols)
+        X = full_data[self.features]
         y = full_data['Target']
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
+
+        # Chronological split; the bar before the test block is purged since its
+        # target is the first test bar's move
+        n_bars = full_data.index.nunique()
+        (train, test), = walk_forward_folds(
+            full_data.index, n_folds=1, test_size=max(int(n_bars * test_fraction), 1), purge=1
         )
-        
+        X_train, y_train = X.iloc[train], y.iloc[train]
+        X_test, y_test = X.iloc[test], y.iloc[test]
+
         # Train model
         self.model.fit(X_train, y_train)
-        
+
         # Save model
         joblib.dump(self.model, self.model_path)
-        
+
         # Print performance metrics
         train_score = self.model.score(X_train, y_train)
         test_score = self.model.score(X_test, y_test)
         logger.info(f"Train accuracy: {train_score:.2f}")
         logger.info(f"Test accuracy: {test_score:.2f}")
-        
+
         return {
             "train_accuracy": train_score,
             "test_accuracy": test_score,
             "model_path": self.model_path
-        }
\ No newline at end of file
+        }
+
+    def walk_forward(self, symbols: list = None, param_grid: dict = None, workers: int = None, **split):
+        """Per-fold out-of-sample metrics (see models/walk_forward.py for ``split``).
+
+        With ``param_grid`` (e.g. ``{"max_depth": [5, 10, 20]}``) the forest's
+        parameters are walk-forward optimised instead; returns ``(summary, selected)``.
+        """
+        full_data = self.build_dataset(symbols)
+        harness = WalkForward(
+            partial(RandomForestClassifier, n_estimators=100, random_state=42, n_jobs=1),
+            full_data[self.features].to_numpy(),
+            full_data['Target'].to_numpy(),
+            full_data.index.to_numpy(),
+            full_data['Forward_Return'].to_numpy(),
+            workers=workers,
+        )
+        if param_grid:
+            return harness.optimize(param_grid, **split)
+        table, _ = harness.evaluate(**split)
+        return table
@@ -0,0 +1,258 @@
+"""Walk-forward evaluation of the trading classifiers.
+
+Rows may come from several symbols; folds are cut on bar *times*, so a
+date is never on both sides of a split and no fold trains on the future
+of the bars it is scored on:
+
+    expanding   train on every bar before the test block
+    rolling     train on the ``train_size`` bars before the test block
+    purged      k-fold over the whole history, training on both sides of
+                the test block
+
+``purge`` bars are dropped from training just before each test block,
+because their labels look ahead into it (``Target`` is the next bar's
+direction, so the default is 1). ``embargo`` bars are dropped just after
+it, for the ``purged`` mode where training resumes after the test block.
+
+The feature matrix, labels and forward returns are copied once into
+shared memory; pool workers map them read-only and receive only fold
+indices per task, fitting one fold (or one parameter set on one fold)
+each.
+"""
+
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from core.config import WALK_FORWARD_WORKERS
+
+logger = logging.getLogger("walk_forward")
+
+MODES = ("expanding", "rolling", "purged")
+METRICS = ("accuracy", "precision", "recall", "f1", "long_return")
+
+
+def walk_forward_folds(
+    times, n_folds=5, mode="expanding", train_size=None, test_size=None, purge=1, embargo=0
+):
+    """``[(train_rows, test_rows)]`` for rows stamped with ``times``.
+
+    Walk-forward modes end at the last bar with ``n_folds`` test blocks of
+    ``test_size`` bars (default: the history split into ``n_folds + 1``
+    parts, the first one only ever trained on). Folds left without
+    training rows are dropped.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}; choose from {list(MODES)}")
+    if mode == "rolling" and not train_size:
+        raise ValueError("Rolling windows need a train_size")
+    bars, position = np.unique(np.asarray(times), return_inverse=True)
+    n = len(bars)
+
+    if mode == "purged":
+        edges = np.linspace(0, n, n_folds + 1).astype(int)
+        blocks = list(zip(edges[:-1], edges[1:]))
+    else:
+        size = test_size or n // (n_folds + 1)
+        first = n - n_folds * size
+        if size <= 0 or first <= 0:
+            raise ValueError(f"{n} bars are too few for {n_folds} folds of {size}")
+        blocks = [(first + k * size, first + (k + 1) * size) for k in range(n_folds)]
+
+    folds = []
+    for start, end in blocks:
+        train_end = max(start - purge, 0)
+        train_start = max(train_end - train_size, 0) if mode == "rolling" else 0
+        train = (position >= train_start) & (position < train_end)
+        if mode == "purged":
+            train |= position >= end + embargo
+        test = (position >= start) & (position < end)
+        if train.any() and test.any():
+            folds.append((np.flatnonzero(train), np.flatnonzero(test)))
+    return folds
+
+
+def fold_metrics(y_true, y_pred, forward_returns=None):
+    """Classification figures for the ``1`` (price up) class, plus the summed
+    forward return of the bars predicted up when returns are given."""
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    hits = int(np.count_nonzero((y_pred == 1) & (y_true == 1)))
+    predicted = int(np.count_nonzero(y_pred == 1))
+    actual = int(np.count_nonzero(y_true == 1))
+    precision = hits / predicted if predicted else 0.0
+    recall = hits / actual if actual else 0.0
+    return {
+        "accuracy": float(np.mean(y_pred == y_true)) if len(y_true) else float("nan"),
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "base_rate": actual / len(y_true) if len(y_true) else float("nan"),
+        "long_return": (
+            float(np.sum(forward_returns[y_pred == 1])) if forward_returns is not None else float("nan")
+        ),
+    }
+
+
+# --- pool workers -------------------------------------------------------------
+
+_worker = {}
+
+
+def _attach(name, shapes):
+    # Workers share the parent's resource tracker, which unlinks the block once
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"] = shm
+    offset = 0
+    for key, shape in shapes.items():
+        array = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        _worker[key] = array
+        offset += array.nbytes
+
+
+def _fit_fold(model_factory, params, fold, train, test, keep_predictions):
+    X, y, returns = _worker["X"], _worker["y"], _worker["returns"]
+    started = time.perf_counter()
+    model = model_factory(**params)
+    model.fit(X[train], y[train])
+    predicted = np.asarray(model.predict(X[test]))
+    record = {
+        "fold": fold,
+        "params": params,
+        "n_train": len(train),
+        "n_test": len(test),
+        **fold_metrics(y[test], predicted, returns[test] if returns.size else None),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    return record, (predicted if keep_predictions else None)
+
+
+# --- harness ------------------------------------------------------------------
+
+
+class WalkForward:
+    """Fits ``model_factory(**params)`` on every fold of one dataset in a process pool.
+
+    ``model_factory`` must be picklable (a class, a module-level function
+    or a ``functools.partial``) and return an object with ``fit``/``predict``.
+    """
+
+    def __init__(self, model_factory, X, y, times, forward_returns=None, workers=None):
+        self.model_factory = model_factory
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.times = np.asarray(times)
+        self.returns = (
+            np.ascontiguousarray(forward_returns, dtype=np.float64)
+            if forward_returns is not None
+            else np.zeros(0)
+        )
+        if not len(self.X) == len(self.y) == len(self.times):
+            raise ValueError("X, y and times must have one entry per row")
+        self.workers = workers or WALK_FORWARD_WORKERS or os.cpu_count() or 1
+
+    def folds(self, **split):
+        return walk_forward_folds(self.times, **split)
+
+    def _run(self, tasks, keep_predictions=False):
+        arrays = {"X": self.X, "y": self.y, "returns": self.returns}
+        shm = shared_memory.SharedMemory(create=True, size=max(sum(a.nbytes for a in arrays.values()), 1))
+        results = []
+        try:
+            offset = 0
+            for array in arrays.values():
+                np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf, offset=offset)[:] = array
+                offset += array.nbytes
+            shapes = {key: array.shape for key, array in arrays.items()}
+            workers = min(self.workers, len(tasks)) or 1
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach, initargs=(shm.name, shapes)
+            ) as pool:
+                futures = {
+                    pool.submit(_fit_fold, self.model_factory, params, fold, train, test, keep_predictions): test
+                    for params, fold, train, test in tasks
+                }
+                for future in as_completed(futures):
+                    record, predicted = future.result()
+                    results.append((record, futures[future], predicted))
+        finally:
+            shm.close()
+            shm.unlink()
+        results.sort(key=lambda r: (str(sorted(r[0]["params"].items())), r[0]["fold"]))
+        return results
+
+    def evaluate(self, params=None, **split):
+        """Per-fold metrics as a DataFrame and out-of-sample predictions as a Series
+        over the tested rows (``NaN`` elsewhere)."""
+        folds = self.folds(**split)
+        if not folds:
+            raise ValueError("No fold has both training and test rows")
+        started = time.perf_counter()
+        results = self._run(
+            [(params or {}, k, train, test) for k, (train, test) in enumerate(folds)],
+            keep_predictions=True,
+        )
+        predictions = np.full(len(self.y), np.nan)
+        for record, test, predicted in results:
+            predictions[test] = predicted
+            record["test_start"] = self.times[test].min()
+            record["test_end"] = self.times[test].max()
+        table = pd.DataFrame([r[0] for r in results]).drop(columns="params")
+        logger.info(
+            f"🧭 Walk-forward: {len(folds)} folds on {min(self.workers, len(folds))} workers in "
+            f"{time.perf_counter() - started:.1f}s, mean accuracy {table['accuracy'].mean():.3f}"
+        )
+        return table, pd.Series(predictions)
+
+    def optimize(self, param_grid, rank_by="accuracy", **split):
+        """Walk-forward optimisation over ``{name: [values]}``.
+
+        Every parameter set is fitted on every fold in one pool. From the
+        second fold on, the set with the best mean ``rank_by`` over the
+        earlier folds is "deployed" and its score on the fold is recorded,
+        so the ``selected`` table is out-of-sample end to end. Returns
+        ``(summary, selected)``; ``summary`` has the mean of each metric per
+        parameter set over all folds, best first.
+        """
+        if not param_grid:
+            raise ValueError("param_grid needs at least one parameter")
+        folds = self.folds(**split)
+        names = list(param_grid)
+        combinations = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+        tasks = [
+            (params, k, train, test)
+            for params in combinations
+            for k, (train, test) in enumerate(folds)
+        ]
+        started = time.perf_counter()
+        records = [record for record, _, _ in self._run(tasks)]
+        logger.info(
+            f"🧭 Walk-forward optimisation: {len(combinations)} parameter sets x {len(folds)} folds "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        table = pd.DataFrame([{**r["params"], **r} for r in records]).drop(columns="params")
+        summary = (
+            table.groupby(names, sort=False)[list(METRICS)]
+            .mean()
+            .sort_values(rank_by, ascending=False)
+            .reset_index()
+        )
+        # fold x parameter set grid of the ranking metric, sets in grid order
+        scores = table.pivot_table(index="fold", columns=names, values=rank_by, sort=False)
+        selected = []
+        for k in range(1, len(folds)):
+            best = scores.iloc[:k].mean().idxmax()
+            best = best if isinstance(best, tuple) else (best,)
+            mask = table["fold"] == k
+            for name, value in zip(names, best):
+                mask &= table[name] == value
+            selected.append(table[mask].iloc[0])
+        return summary, pd.DataFrame(selected).reset_index(drop=True)
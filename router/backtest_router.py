@@ -1,11 +1,19 @@
 # routers/backtesting_router.py
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+import asyncio
+import io
+import math
+
+from fastapi import APIRouter, Body, Depends, Query, HTTPException, Request, WebSocket, WebSocketDisconnect
 import httpx
+import numpy as np
 from database.connection import get_db
 from sqlalchemy.orm import Session
 from database.models import BrokerConfig
 from services.auth_service import get_current_user
+from services.backtest_cache import backtest_cache
+from services.backtest_jobs import FINISHED, JobLimitError, backtest_jobs
+from services.backtest_engine.data import find_price_csv, load_price_csv
 
 backtesting_router = APIRouter()
 
@@ -36,3 +44,154 @@ async def get_intraday_candles(
 
     data = res.json()
     return data["data"]
+
+
+def _json_safe(value):
+    """Report values as plain JSON: numpy scalars unwrapped, inf/NaN as None."""
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, (np.integer, np.floating)):
+        value = value.item()
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (int, str, bool)) or value is None:
+        return value
+    return str(value)
+
+
+@backtesting_router.post("/fibonacci", tags=["Backtesting"])
+async def run_fibonacci_backtest(
+    request: Request,
+    symbol: str | None = Query(None),
+    sector: str | None = Query(None),
+    lookback: int = Query(20, ge=2),
+    stop_loss_pct: float = Query(0.02, gt=0, lt=1),
+    target_pct: float = Query(0.05, gt=0),
+    initial_capital: float = Query(100000, gt=0),
+    shares_per_trade: int = Query(100, gt=0),
+    broker_fee: float = Query(20, ge=0),
+    legacy: bool = Query(False),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Fibonacci retracement backtest on an uploaded CSV (request body) or stored data.
+
+    Results are cached per data version and parameters (services/backtest_cache.py).
+    """
+    body = await request.body()
+    if body:
+        source = io.BytesIO(body)
+    elif symbol:
+        source = find_price_csv(symbol, sector)
+        if source is None:
+            raise HTTPException(status_code=404, detail=f"No price data for {symbol}")
+    else:
+        raise HTTPException(status_code=400, detail="Send a CSV body or a symbol")
+
+    try:
+        prices = load_price_csv(source)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read price data: {e}")
+    if len(prices) <= lookback:
+        raise HTTPException(status_code=400, detail="Not enough price rows for the lookback")
+
+    params = {
+        "lookback": lookback,
+        "stop_loss_pct": stop_loss_pct,
+        "target_pct": target_pct,
+        "initial_capital": initial_capital,
+        "shares_per_trade": shares_per_trade,
+        "broker_fee": broker_fee,
+        "legacy": legacy,
+    }
+    report = await asyncio.to_thread(
+        backtest_cache.fibonacci, db, prices, params, current_user.id
+    )
+    return _json_safe(report)
+
+
+@backtesting_router.post("/jobs", tags=["Backtesting"])
+async def submit_backtest_job(
+    payload: dict = Body(...),
+    current_user=Depends(get_current_user)
+):
+    """Queue a backtest or sweep: ``{"kind": "fibonacci" | "sweep" | "fib_ai", "params": {...}}``."""
+    try:
+        job = backtest_jobs.submit(current_user.id, payload.get("kind"), payload.get("params") or {})
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+
+@backtesting_router.get("/jobs", tags=["Backtesting"])
+async def list_backtest_jobs(current_user=Depends(get_current_user)):
+    return _json_safe([job.summary() for job in backtest_jobs.jobs_for(current_user.id)])
+
+
+@backtesting_router.get("/jobs/{job_id}", tags=["Backtesting"])
+async def get_backtest_job(job_id: str, current_user=Depends(get_current_user)):
+    job = backtest_jobs.get(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _json_safe(job.snapshot())
+
+
+@backtesting_router.delete("/jobs/{job_id}", tags=["Backtesting"])
+async def cancel_backtest_job(job_id: str, current_user=Depends(get_current_user)):
+    job = backtest_jobs.cancel(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _json_safe(job.summary())
+
+
+@backtesting_router.websocket("/jobs/{job_id}/ws")
+async def backtest_job_websocket(websocket: WebSocket, job_id: str):
+    """Snapshot of the job, then progress/trades/equity/results events until it
+    finishes. Send ``{"action": "cancel"}`` to cancel it."""
+    await websocket.accept()
+    db = next(get_db())
+    try:
+        user = get_current_user(token=websocket.query_params.get("token"), db=db)
+    except Exception:
+        await websocket.send_json({"type": "error", "reason": "token_invalid"})
+        await websocket.close()
+        return
+    finally:
+        db.close()
+
+    job = backtest_jobs.get(job_id, user.id)
+    if job is None:
+        await websocket.send_json({"type": "error", "reason": "job_not_found"})
+        await websocket.close()
+        return
+
+    queue = job.subscribe()
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive_json()
+                if isinstance(message, dict) and message.get("action") == "cancel":
+                    job.cancel()
+        except (WebSocketDisconnect, ValueError):
+            queue.put_nowait(None)
+
+    reader = asyncio.create_task(receive())
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                return  # client went away
+            await websocket.send_json(_json_safe(event))
+            if event["type"] in ("status", "snapshot") and event["status"] in FINISHED:
+                break
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        job.unsubscribe(queue)
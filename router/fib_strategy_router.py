@@ -1,25 +1,23 @@
-from fastapi import APIRouter, Query
-from utils.upstox_data import fetch_historical_candles
-from ai_trading.fibonacci_strategy import detect_fib_trade_with_ai
-from ai_trading.paper_engine import PaperTradingEngine
+from fastapi import APIRouter, Depends, HTTPException, Query
+from services.auth_service import get_current_user
+from services.backtest_jobs import JobLimitError, backtest_jobs
 
 router = APIRouter()
 
 
-@router.post("/fib-trade-run")
-def run_fib_ai_trade(symbol: str = Query(...)):
-    df = fetch_historical_candles(symbol)
-    signals, levels = detect_fib_trade_with_ai(df)
+@router.post("/fib-trade-run", tags=["Backtesting"])
+def run_fib_ai_trade(
+    symbol: str = Query(...),
+    sector: str | None = Query(None),
+    current_user=Depends(get_current_user),
+):
+    """Queue the Fibonacci + AI paper-trading pass over stored data for ``symbol``.
 
-    engine = PaperTradingEngine()
-    for signal in signals:
-        engine.trade(signal)
-
-    return {
-        "symbol": symbol,
-        "fibonacci_levels": levels,
-        "trades": engine.logger.trades,
-        "pnl": engine.logger.get_total_pnl(),
-        "signals": signals,
-        "candles": df.tail(100).to_dict(orient="records"),
-    }
+    Follow it on ``/jobs/{job_id}/ws``; the final result has the levels, P&L
+    and the last 100 candles.
+    """
+    try:
+        job = backtest_jobs.submit(current_user.id, "fib_ai", {"symbol": symbol, "sector": sector})
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
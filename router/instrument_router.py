@@ -1,78 +1,67 @@
 from fastapi import APIRouter, Query
-import pandas as pd
-from utils.instrument_loader import load_instruments_df
+from typing import Optional
+from services.instrument_search import get_search_index
+from services.option_chain import get_option_chain_index
+from services.quote_board import quote_board
 from datetime import datetime
 
 router = APIRouter()
-df = load_instruments_df()
 
 
-@router.get("/api/instruments/search")
-def search_instruments(q: str = Query(...), exchange: str = Query("ALL")):
-    results = df[df["trading_symbol"].str.contains(q.upper(), na=False)]
-    if exchange != "ALL":
-        results = results[results["exchange"] == exchange]
-
-    columns_to_return = [
-        "trading_symbol",
-        "name",
-        "instrument_key",
-        "exchange",
-        "segment",
-        "instrument_type",
-        "underlying_symbol",
-        "expiry",
-        "strike_price",
-    ]
+SEARCH_COLUMNS = [
+    "trading_symbol",
+    "name",
+    "instrument_key",
+    "exchange",
+    "segment",
+    "instrument_type",
+    "underlying_symbol",
+    "expiry",
+    "strike_price",
+]
 
-    # Ensure only available columns are selected
-    results = results[[col for col in columns_to_return if col in results.columns]]
 
-    # Drop rows with invalid float (NaN, inf)
-    results = results.replace([float("inf"), float("-inf")], pd.NA).dropna()
+@router.get("/api/instruments/search")
+def search_instruments(q: str = Query(...), exchange: str = Query("ALL")):
+    index = get_search_index()
+    if index is None:
+        return []
 
-    return results.head(30).to_dict(orient="records")
+    results = []
+    for instr in index.records(q, exchange, limit=30):
+        row = {col: instr.get(col) for col in SEARCH_COLUMNS}
+        if row["expiry"]:
+            row["expiry"] = datetime.fromtimestamp(row["expiry"] / 1000).isoformat()
+        results.append(row)
+    return results
 
 
 @router.get("/api/instruments/chain")
-def get_option_chain(symbol: str, range: int = 20):
-    options = df[
-        (df["symbol"].str.upper() == symbol.upper())
-        & (df["instrument_type"].str.startswith("OPT"))
-    ].copy()
-
-    if options.empty:
+def get_option_chain(symbol: str, range: int = 20, strikes: Optional[int] = None):
+    """Nearest-expiry chain around ATM: within ``range`` points, or ``strikes`` each side."""
+    index = get_option_chain_index()
+    ladder = index.ladder(symbol) if index else None
+    if ladder is None or not len(ladder):
         return {"chain": []}
 
-    options["expiry"] = pd.to_datetime(options["expiry"], errors="coerce")
-    future_expiry = options[options["expiry"] > datetime.now()]
-    nearest_expiry = future_expiry["expiry"].min()
-    current = options[options["expiry"] == nearest_expiry]
-
-    atm = current["strike_price"].median()
-    min_strike = atm - range
-    max_strike = atm + range
-
-    strikes = current[current["strike_price"].between(min_strike, max_strike)]
-
-    chain = []
-    for strike in sorted(strikes["strike_price"].unique()):
-        row = {"strike_price": strike, "ce": None, "pe": None}
-        ce = strikes[
-            (strikes["strike_price"] == strike) & (strikes["option_type"] == "CE")
-        ]
-        pe = strikes[
-            (strikes["strike_price"] == strike) & (strikes["option_type"] == "PE")
-        ]
-        if not ce.empty:
-            row["ce"] = ce.iloc[0].to_dict()
-        if not pe.empty:
-            row["pe"] = pe.iloc[0].to_dict()
-        chain.append(row)
+    spot = _underlying_spot(index.master, ladder)
+    atm = float(ladder.strikes[ladder.atm(spot)])
+    if strikes is not None:
+        chain = index.chain(ladder, spot, n=strikes)
+    else:
+        chain = index.chain(ladder, spot, width=range)
 
     return {
         "symbol": symbol.upper(),
         "atm": atm,
-        "expiry": str(nearest_expiry.date()),
+        "step": ladder.step,
+        "expiry": str(datetime.fromtimestamp(ladder.expiry / 1000).date()),
         "chain": chain,
     }
+
+
+def _underlying_spot(master, ladder):
+    # Live underlying price when the feed has it; otherwise the chain's middle strike.
+    row = int(ladder.ce[ladder.ce >= 0][0] if (ladder.ce >= 0).any() else ladder.pe[0])
+    underlying_key = master.value("underlying_key", row)
+    return quote_board.latest_price(underlying_key) if underlying_key else None
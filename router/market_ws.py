@@ -1,26 +1,35 @@
 import asyncio
-import json
+import hashlib
 import logging
-from datetime import datetime
-from pathlib import Path
-from tempfile import gettempdir
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from jwt.exceptions import ExpiredSignatureError, DecodeError
+from core.frame_encoding import (
+    DELTA_FLUSH_INTERVAL,
+    FORMAT_DELTA,
+    FORMAT_JSON,
+    WIRE_FORMATS,
+    DeltaFrameEncoder,
+)
+from core.send_queue import ConflatingSendQueue
+from router.stock_router import refresh_today_instrument_keys
 from services.auth_service import get_current_user
-from services.upstox.ws_client import UpstoxWebSocketClient
+from services.bar_aggregator import bar_aggregator
+from services.instrument_refresh import instrument_refresher
+from services.quote_board import quote_board
+from services.upstox.feed_auth import feed_authorizer
+from services.upstox.feed_hub import feed_hub
+from services.upstox.tick_decoder import CompactTick, parse_feed_dict
 from database.connection import get_db
-from database.models import BrokerConfig
+from utils.instrument_key_cache import get_cached_instrument_chunks
 
 logger = logging.getLogger("market_ws")
 router = APIRouter()
 
 clients = {}
-ws_clients = {}
+send_queues = {}
 market_status = {}
 received_ltp_flag = {}
-
-MAX_CHUNKS = 2
-CHUNK_SIZE = 1500
+closing = set()
 
 
 @router.websocket("/ws/market")
@@ -34,6 +43,13 @@ async def market_data_websocket(websocket: WebSocket):
 
     logger.info(f"📥 WebSocket request received: {token}")
 
+    wire_format = websocket.query_params.get("format", FORMAT_JSON)
+    if wire_format not in WIRE_FORMATS:
+        await websocket.accept()
+        await websocket.send_json({"type": "error", "reason": "unsupported_format"})
+        await websocket.close()
+        return
+
     try:
         db = next(get_db())
         try:
@@ -48,22 +64,22 @@ async def market_data_websocket(websocket: WebSocket):
             await websocket.close()
             return
 
-        broker = (
-            db.query(BrokerConfig)
-            .filter(
-                BrokerConfig.user_id == user.id,
-                BrokerConfig.broker_name.ilike("upstox"),
-            )
-            .first()
-        )
+        try:
+            access_token = await feed_authorizer.get_access_token(user_id=user.id)
+        except PermissionError:
+            await websocket.accept()
+            await websocket.send_json({"type": "error", "reason": "token_expired"})
+            await websocket.close()
+            return
 
-        if not broker or not broker.access_token:
+        if not access_token:
             await websocket.accept()
             await websocket.send_json({"type": "error", "reason": "upstox_not_linked"})
             await websocket.close()
             return
 
-        instrument_keys = load_today_instrument_keys()
+        chunks = get_cached_instrument_chunks()
+        instrument_keys = [key for chunk in chunks for key in chunk]
         if not instrument_keys:
             await websocket.accept()
             await websocket.send_json({"type": "error", "reason": "no_instruments"})
@@ -76,30 +92,22 @@ async def market_data_websocket(websocket: WebSocket):
         # Cleanup any stale state
         await cleanup_connection(token)
         clients[token] = websocket
-        ws_clients[token] = []
+        queue = build_send_queue(token, websocket, wire_format)
+        send_queues[token] = queue
+        queue.start()
 
         logger.info(f"✅ WebSocket accepted: {token}")
 
-        # Split into two 1500-key chunks max
-        chunks = [
-            instrument_keys[i : i + CHUNK_SIZE]
-            for i in range(
-                0, min(len(instrument_keys), MAX_CHUNKS * CHUNK_SIZE), CHUNK_SIZE
-            )
-        ]
-
-        for chunk in chunks:
-            client = UpstoxWebSocketClient(
-                access_token=broker.access_token,
-                instrument_keys=chunk,
-                callback=lambda data: asyncio.create_task(broadcast(token, data)),
-                stop_callback=lambda: logger.info("🛑 One WS stream stopped."),
-                on_auth_error=lambda: asyncio.create_task(
-                    handle_auth_failure_and_close(token)
-                ),
-            )
-            ws_clients[token].append(client)
-            asyncio.create_task(client.connect_and_stream())
+        await feed_hub.subscribe(
+            token,
+            instrument_keys,
+            callback=lambda data: broadcast(token, data),
+            access_token=access_token,
+            on_auth_error=lambda: asyncio.create_task(
+                handle_auth_failure_and_close(token)
+            ),
+            chunks=chunks,
+        )
 
         # Main receive loop
         while token in clients:
@@ -116,9 +124,11 @@ async def market_data_websocket(websocket: WebSocket):
         await cleanup_connection(token)
 
 
-async def broadcast(token: str, data: dict):
-    ws = clients.get(token)
-    if not ws:
+def broadcast(token: str, data: dict):
+    # Called synchronously by the feed hub: only enqueue here, the
+    # client's writer task does the actual send.
+    queue = send_queues.get(token)
+    if not queue:
         logger.warning(f"⚠️ No WebSocket client to broadcast to {token}")
         return
 
@@ -126,35 +136,80 @@ async def broadcast(token: str, data: dict):
         if data.get("type") == "market_info":
             status = data.get("status", "").lower()
             market_status[token] = status
-            await ws.send_json({"type": "market_info", "marketStatus": status})
+            queue.put_control({"type": "market_info", "marketStatus": status})
 
             if status in ["normal_close", "closing_end"] and received_ltp_flag.get(
                 token
             ):
-                await cleanup_connection(token)
+                schedule_close(token)
 
         elif data.get("type") == "live_feed":
             payload = data["data"]
             if not isinstance(payload, dict):
                 return
-            parsed = parse_live_feed(payload)
             received_ltp_flag[token] = True
-            await ws.send_json(
-                {
-                    "type": "live_feed",
-                    "data": parsed,
-                    "market_open": market_status.get(token) == "open",
-                }
-            )
+            queue.put_ticks(payload)
 
             if market_status.get(token) in ["normal_close", "closing_end"]:
-                await asyncio.sleep(1)
-                await cleanup_connection(token)
+                schedule_close(token, delay=1)
 
     except Exception as e:
         logger.error(f"❌ Broadcast error for {token}: {e}")
 
 
+def build_send_queue(token: str, websocket: WebSocket, wire_format: str):
+    if wire_format != FORMAT_DELTA:
+        return ConflatingSendQueue(
+            send=websocket.send_json,
+            render=lambda ticks: render_live_feed(token, ticks),
+        )
+
+    # Opt-in binary protocol: MessagePack frames, one per flush interval,
+    # carrying only the fields that changed since the previous frame.
+    encoder = DeltaFrameEncoder()
+    queue = ConflatingSendQueue(
+        send=lambda message: websocket.send_bytes(encoder.pack(message)),
+        render=lambda ticks: render_live_feed_delta(token, ticks, encoder),
+        flush_interval=DELTA_FLUSH_INTERVAL,
+    )
+    queue.put_control(
+        {
+            "type": "hello",
+            "format": FORMAT_DELTA,
+            "flush_ms": int(DELTA_FLUSH_INTERVAL * 1000),
+        }
+    )
+    return queue
+
+
+def render_live_feed(token: str, ticks: dict):
+    return {
+        "type": "live_feed",
+        "data": parse_live_feed(ticks),
+        "market_open": market_status.get(token) == "open",
+    }
+
+
+def render_live_feed_delta(token: str, ticks: dict, encoder: DeltaFrameEncoder):
+    changes = encoder.diff(parse_live_feed(ticks))
+    if not changes:
+        return None
+    return encoder.frame(changes, market_status.get(token) == "open")
+
+
+def schedule_close(token: str, delay: float = 0):
+    if token in closing:
+        return
+    closing.add(token)
+
+    async def _close():
+        if delay:
+            await asyncio.sleep(delay)
+        await cleanup_connection(token)
+
+    asyncio.create_task(_close())
+
+
 async def handle_auth_failure_and_close(token: str):
     logger.warning(f"🔐 Auth failed for {token}")
     await notify_token_expired(token)
@@ -162,18 +217,21 @@ async def handle_auth_failure_and_close(token: str):
 
 
 async def notify_token_expired(token: str):
-    ws = clients.get(token)
-    if ws:
-        try:
-            await ws.send_json({"type": "error", "reason": "token_expired"})
-        except Exception:
-            pass
+    queue = send_queues.get(token)
+    if queue:
+        queue.put_control({"type": "error", "reason": "token_expired"})
     await cleanup_connection(token)
 
 
 async def cleanup_connection(token: str):
     logger.info(f"🧹 Cleaning up for {token}")
 
+    await feed_hub.unsubscribe(token)
+
+    queue = send_queues.pop(token, None)
+    if queue:
+        await queue.aclose()
+
     ws = clients.pop(token, None)
     if ws:
         try:
@@ -182,55 +240,56 @@ async def cleanup_connection(token: str):
         except Exception:
             pass
 
-    for client in ws_clients.pop(token, []):
-        if client:
-            client.stop()
-
     market_status.pop(token, None)
     received_ltp_flag.pop(token, None)
+    closing.discard(token)
+
+
+async def on_instruments_refreshed(diff: dict):
+    """Move connected clients onto the refreshed key set; expired contracts drop out."""
+    expired = set(diff["expired"])
+    today = await asyncio.to_thread(refresh_today_instrument_keys)
+    # The published order and chunks, not just the key set
+    chunks = get_cached_instrument_chunks() if today else None
+    if chunks:
+        today = [key for chunk in chunks for key in chunk]
+    for token in list(clients):
+        subscriber = feed_hub.subscribers.get(token)
+        if subscriber is None:
+            continue
+        if today:
+            await feed_hub.set_keys(token, today, chunks=chunks)
+        else:
+            await feed_hub.set_keys(token, subscriber.keys - expired)
+
+
+@router.get("/api/market/ws-stats")
+def market_ws_stats():
+    """Per-client send queue health plus the shared upstream feed hub."""
+    return {
+        "hub": feed_hub.stats(),
+        "quotes": quote_board.stats(),
+        "bars": bar_aggregator.stats(),
+        "instruments": instrument_refresher.stats(),
+        "clients": {
+            client_label(token): queue.stats() for token, queue in send_queues.items()
+        },
+    }
+
+
+def client_label(token: str):
+    # Never echo the JWT itself; a short digest is enough to tell clients apart.
+    return hashlib.sha1(token.encode("utf-8")).hexdigest()[:10]
 
 
 def parse_live_feed(raw_data: dict):
     parsed = {}
     for instrument_key, details in raw_data.items():
         try:
-            feed = details.get("fullFeed", {}).get("marketFF", {})
-            ltpc = feed.get("ltpc", {})
-            parsed[instrument_key] = {
-                "ltp": ltpc.get("ltp"),
-                "ltq": ltpc.get("ltq"),
-                "cp": ltpc.get("cp"),
-                "last_trade_time": ltpc.get("ltt"),
-                "bid_ask": feed.get("marketLevel", {}).get("bidAskQuote", []),
-                "greeks": feed.get("optionGreeks", {}),
-                "ohlc": feed.get("marketOHLC", {}).get("ohlc", []),
-                "atp": feed.get("atp"),
-                "oi": feed.get("oi"),
-                "iv": feed.get("iv"),
-                "tbq": feed.get("tbq"),
-                "tsq": feed.get("tsq"),
-            }
+            if isinstance(details, CompactTick):
+                parsed[instrument_key] = details.as_payload()
+            else:
+                parsed[instrument_key] = parse_feed_dict(details)
         except Exception as e:
             logger.warning(f"⚠️ Failed to parse tick for {instrument_key}: {e}")
     return parsed
-
-
-def load_today_instrument_keys():
-    file_path = Path(gettempdir()) / "today_instrument_keys.json"
-
-    if not file_path.exists():
-        logger.warning("⚠️ Instrument keys file does not exist.")
-        return []
-
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = json.load(f)
-            if isinstance(content, list):
-                return content
-            elif isinstance(content, dict):
-                if content.get("timestamp") == datetime.now().strftime("%Y-%m-%d"):
-                    return content.get("keys", [])
-    except Exception as e:
-        logger.warning(f"❌ Failed to load instrument keys: {e}")
-
-    return []
@@ -2,9 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from database.connection import get_db
 from database.models import BrokerInstrument, Stock  # Ensure the Stock model is defined
+from services.instrument_search import get_search_index
 
 stock_list_router = APIRouter()
 
+SPOT_TYPES = ("EQ", "INDEX")
+STOCK_SEARCH_CANDIDATES = 200
+
 @stock_list_router.get("/search", tags=["Stock Data"])
 async def search_stocks(
     exchange: str = Query("NSE"),
@@ -15,14 +19,29 @@ async def search_stocks(
     """Fetch only the stocks that are added for trading execution."""
     query = db.query(Stock).filter(Stock.exchange == exchange)
 
-    if symbol:
-        query = query.filter(Stock.symbol.ilike(f"%{symbol}%"))  # Case-insensitive search
-    if name:
-        query = query.filter(Stock.name.ilike(f"%{name}%"))  # Case-insensitive search
+    index = get_search_index() if (symbol or name) else None
+    if index is None:
+        if symbol:
+            query = query.filter(Stock.symbol.ilike(f"%{symbol}%"))  # Case-insensitive search
+        if name:
+            query = query.filter(Stock.name.ilike(f"%{name}%"))  # Case-insensitive search
+        return query.all()
+
+    # Candidate symbols from the instrument search index, in rank order; the
+    # table lookup is then an indexed IN on the unique symbol column.
+    symbols = None
+    for text in (symbol, name):
+        if text:
+            hits = index.records(text, exchange, limit=STOCK_SEARCH_CANDIDATES, types=SPOT_TYPES)
+            found = [h.get("trading_symbol") for h in hits]
+            if symbols is not None:
+                found_set = set(found)
+                found = [s for s in symbols if s in found_set]
+            symbols = found
 
-    stocks = query.all()
+    stocks = {s.symbol: s for s in query.filter(Stock.symbol.in_(symbols)).all()}
+    return [stocks[s] for s in dict.fromkeys(symbols) if s in stocks]
 
-    return stocks
 
 @stock_list_router.get("/resolve", tags=["Stock Data"])
 def resolve_full_stock_details(
@@ -1,68 +1,98 @@
 import logging
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, BackgroundTasks, Request
 from pathlib import Path
 import json
-from datetime import datetime
 from collections import defaultdict
+from datetime import date
 
-from utils.instrument_key_cache import save_instrument_keys
+from core.response_cache import response_cache
+
+from services.instrument_master import get_instrument_master, spot_instrument_keys
+from services.option_chain import get_option_chain_index
+from services.quote_board import quote_board
+from utils.instrument_key_cache import KEY_PATH, save_instrument_keys
 
 router = APIRouter()
 logger = logging.getLogger("stock_router")
 
+TOP_STOCKS_PATH = Path("data/top_stocks.json")
+TOP_STOCKS_CACHE = "stocks_top"
+
+
+def load_top_stocks(top_stocks_path=None):
+    with open(top_stocks_path or TOP_STOCKS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f).get("securities", [])
+
 
 @router.get("/api/stocks/top")
-def get_top_stock_details(request: Request):
-    top_stocks_path = Path("data/top_stocks.json")
-    instrument_path = Path("data/upstox_instruments.json")
-    if not top_stocks_path.exists() or not instrument_path.exists():
+def get_top_stock_details(request: Request, background_tasks: BackgroundTasks):
+    master = get_instrument_master()
+    if not TOP_STOCKS_PATH.exists() or master is None:
         logger.error("❌ Missing required JSON files.")
         return {"data": {}, "error": "Missing JSON files."}
 
-    try:
-        with open(top_stocks_path, "r", encoding="utf-8") as f:
-            top_stocks = json.load(f).get("securities", [])
+    def build():
+        grouped, instrument_keys = build_top_stock_details(master, load_top_stocks())
+        # Written after the response is sent, and only when the payload is rebuilt
+        background_tasks.add_task(_save_today_keys, instrument_keys)
+        logger.info(f"✅ Final grouped stock response ready: {len(grouped)} stocks")
+        return {"data": grouped}
 
-        with open(instrument_path, "r", encoding="utf-8") as f:
-            all_instruments = json.load(f)
+    try:
+        cached = response_cache.get(TOP_STOCKS_CACHE, top_stocks_version(master), build)
     except Exception as e:
         logger.error(f"❌ Failed to load or parse files: {e}")
         return {"data": {}, "error": "JSON parsing error."}
+    return cached.respond(request)
 
-    now = datetime.now()
-    instrument_index = defaultdict(list)
 
-    for instr in all_instruments:
-        if not instr.get("instrument_key"):
-            continue
+def top_stocks_version(master):
+    """Cache key of the /api/stocks/top payload.
 
-        expiry = instr.get("expiry")
-        if expiry and datetime.fromtimestamp(expiry / 1000) < now:
-            continue
+    The date is part of it so the dated today-keys file is rewritten once a
+    day even when neither input changes.
+    """
+    stat = TOP_STOCKS_PATH.stat()
+    return (stat.st_mtime_ns, stat.st_size, master.version, date.today().isoformat())
 
-        exchange = instr.get("exchange", "").upper()
-        for field in ("trading_symbol", "asset_symbol", "underlying_symbol"):
-            sym = instr.get(field, "").strip().upper()
-            if sym:
-                instrument_index[(exchange, sym)].append(instr)
 
+def refresh_today_instrument_keys():
+    """Rebuild and save today's key list from the current instrument master."""
+    master = get_instrument_master()
+    if not TOP_STOCKS_PATH.exists() or master is None:
+        return []
+    _, instrument_keys = build_top_stock_details(master, load_top_stocks())
+    _save_today_keys(instrument_keys)
+    return instrument_keys
+
+
+def _save_today_keys(instrument_keys):
+    try:
+        save_instrument_keys(instrument_keys)
+        logger.info(f"💾 Published {len(instrument_keys)} instrument keys to {KEY_PATH}")
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to save instrument keys: {e}")
+
+
+def build_top_stock_details(master, top_stocks):
+    """Spot/futures/near-the-money options per top stock, plus their sorted keys."""
     grouped = {}
     instrument_keys_set = set()
+    chains = get_option_chain_index(master)
 
     for stock in top_stocks:
         symbol = stock.get("symbol", "").strip().upper()
         exchange = stock.get("exchange", "").strip().upper()
         name = stock.get("name", "")
 
-        matches = instrument_index.get((exchange, symbol), [])
-        if not matches:
+        matches = master.active(master.by_symbol(exchange, symbol))
+        if not len(matches):
             logger.warning(f"⚠️ No instruments found for {symbol} on {exchange}")
             continue
 
         instrument_map = defaultdict(list)
-        for instr in matches:
-            itype = (instr.get("instrument_type") or "").upper()
-            instrument_map[itype].append(instr)
+        for row, itype in zip(matches, master.values("instrument_type", matches)):
+            instrument_map[(itype or "").upper()].append(row)
 
         data = {
             "name": name,
@@ -73,58 +103,35 @@ def get_top_stock_details(request: Request):
 
         # Spot instrument (EQ or INDEX)
         for itype in ["EQ", "INDEX"]:
-            for instr in instrument_map.get(itype, []):
-                payload = prepare_stock_payload(stock, instr, name)
+            for row in instrument_map.get(itype, []):
+                payload = prepare_stock_payload(stock, master.row(row), name)
                 data["spot"] = payload
                 instrument_keys_set.add(payload["instrument_key"])
+                quote_board.alias(symbol, payload["instrument_key"], exchange)
                 break
 
         # Futures instruments
-        for instr in instrument_map.get("FUT", []):
-            payload = prepare_stock_payload(stock, instr, name)
+        for row in instrument_map.get("FUT", []):
+            payload = prepare_stock_payload(stock, master.row(row), name)
             data["futures"].append(payload)
             instrument_keys_set.add(payload["instrument_key"])
 
-        # Options (Call & Put)
-        options = instrument_map.get("CE", []) + instrument_map.get("PE", [])
-        spot_ltp = (
-            data["spot"].get("last_price") or data["spot"].get("close_price")
-            if data["spot"]
-            else None
-        )
-
-        if not spot_ltp:
-            strikes = [
-                opt.get("strike_price") for opt in options if opt.get("strike_price")
-            ]
-            if strikes:
-                spot_ltp = sum(strikes) / len(strikes)
-
-        if spot_ltp:
-            for instr in options:
-                strike = instr.get("strike_price")
-                if strike and abs(strike - spot_ltp) <= 20:
+        # Options (Call & Put): ATM±N strikes of each live expiry
+        spot_ltp = quote_board.latest_price(symbol, exchange)
+        if not spot_ltp and data["spot"]:
+            spot_ltp = data["spot"].get("last_price") or data["spot"].get("close_price")
+
+        if chains is not None:
+            calls, puts = chains.near_the_money(symbol, spot_ltp)
+            for side, rows in (("call", calls), ("put", puts)):
+                for instr in master.rows(rows):
                     payload = prepare_stock_payload(stock, instr, name)
-                    if (instr.get("instrument_type") or "").upper() == "CE":
-                        data["options"]["call"].append(payload)
-                    else:
-                        data["options"]["put"].append(payload)
+                    data["options"][side].append(payload)
                     instrument_keys_set.add(payload["instrument_key"])
 
         grouped[symbol] = data
 
-    # ✅ Save instrument keys to file
-    try:
-        instrument_keys_list = sorted(list(instrument_keys_set))
-        save_instrument_keys(instrument_keys_list)
-        logger.info(
-            f"💾 Saved {len(instrument_keys_list)} instrument keys to /tmp/today_instrument_keys.json"
-        )
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to save instrument keys: {e}")
-
-    logger.info(f"✅ Final grouped stock response ready: {len(grouped)} stocks")
-    return {"data": grouped}
+    return grouped, sorted(instrument_keys_set)
 
 
 def prepare_stock_payload(stock, instr, name):
@@ -272,64 +279,19 @@ def prepare_stock_payload(stock, instr, name):
 
 def get_default_instrument_keys():
     top_stocks_path = Path("data/top_stocks.json")
-    instrument_path = Path("data/upstox_instruments.json")
+    master = get_instrument_master()
 
-    if not top_stocks_path.exists() or not instrument_path.exists():
+    if not top_stocks_path.exists() or master is None:
         logger.error("❌ Missing required JSON files for instrument keys.")
         return []
 
     try:
         with open(top_stocks_path, "r", encoding="utf-8") as f:
             top_stocks = json.load(f).get("securities", [])
-
-        with open(instrument_path, "r", encoding="utf-8") as f:
-            all_instruments = json.load(f)
     except Exception as e:
         logger.error(f"❌ Failed to load instrument key files: {e}")
         return []
 
-    instrument_keys = set()
-    now = datetime.now()
-
-    # Index by (exchange, symbol)
-    indexed = defaultdict(list)
-    for instr in all_instruments:
-        if not instr.get("instrument_key"):
-            continue
-
-        expiry = instr.get("expiry")
-        if expiry and datetime.fromtimestamp(expiry / 1000) < now:
-            continue
-
-        exchange = instr.get("exchange", "").upper()
-        for key in ("trading_symbol", "asset_symbol", "underlying_symbol"):
-            symbol = instr.get(key, "").upper()
-            if symbol:
-                indexed[(exchange, symbol)].append(instr)
-
-    def normalize_type(t):
-        return (t or "").strip().upper()
-
-    for stock in top_stocks:
-        symbol = stock.get("symbol", "").strip().upper()
-        exchange = stock.get("exchange", "").strip().upper()
-
-        if not symbol or not exchange:
-            continue
-
-        matches = []
-        for sym in [symbol]:
-            matches.extend(indexed.get((exchange, sym), []))
-
-        found = False
-        for m in matches:
-            t = normalize_type(m.get("instrument_type"))
-            if t in ("EQ", "INDEX"):
-                instrument_keys.add(m["instrument_key"])
-                found = True
-
-        if not found:
-            logger.warning(f"⚠️ No EQ/INDEX instrument found for {symbol} on {exchange}")
-
+    instrument_keys = spot_instrument_keys(master, top_stocks)
     logger.info(f"✅ Spot instrument keys resolved: {len(instrument_keys)}")
-    return list(instrument_keys)
+    return instrument_keys
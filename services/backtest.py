@@ -1,59 +1,68 @@
-import pandas as pd
 import numpy as np
 from sqlalchemy.orm import Session
+from core.config import AI_BACKTEST_BATCH_SIZE
 from database.models import HistoricalData, TradeHistory
-from services.ai_model import train_lstm_model, predict_future_prices
+from services.ai_model import train_lstm_model
+from services.backtest_engine.windows import WINDOW, predict_windows, sliding_windows, window_trades
 
-def backtest_ai_strategy(user_id: int, symbol: str, db: Session):
-    """Run backtesting on historical data before live execution."""
+def backtest_ai_strategy(user_id: int, symbol: str, db: Session, persist: bool = True,
+                         batch_size: int = AI_BACKTEST_BATCH_SIZE):
+    """Run backtesting on historical data before live execution.
+
+    Every bar is predicted from the 60 closes before it, in batches of
+    ``batch_size`` windows. With ``persist=False`` nothing is written to
+    TradeHistory (exploratory runs).
+    """
     
-    # Fetch historical data
-    historical_data = db.query(HistoricalData).filter(HistoricalData.symbol == symbol).all()
+    # Fetch historical data, oldest first
+    historical_data = (
+        db.query(HistoricalData.date, HistoricalData.close)
+        .filter(HistoricalData.symbol == symbol)
+        .order_by(HistoricalData.date)
+        .all()
+    )
     if not historical_data:
         return {"error": "No historical data found."}
 
-    # Convert to DataFrame
-    df = pd.DataFrame([{
-        "date": entry.date, 
-        "close": entry.close
-    } for entry in historical_data])
-
-    df.set_index("date", inplace=True)
+    dates = [entry.date for entry in historical_data]
+    close = np.array([entry.close for entry in historical_data], dtype=np.float64)
 
     # Train AI Model
     model, scaler = train_lstm_model(user_id, symbol, db)
-    
-    trade_results = []
-    for i in range(60, len(df)):
-        recent_data = df.iloc[i-60:i]["close"].values.reshape(-1,1)
-        predicted_price = predict_future_prices(model, scaler, recent_data)
-        actual_price = df.iloc[i]["close"]
 
-        trade_type = "BUY" if predicted_price > recent_data[-1][0] else "SELL"
-        profit_loss = actual_price - recent_data[-1][0] if trade_type == "BUY" else recent_data[-1][0] - actual_price
+    predicted = predict_windows(model, scaler, sliding_windows(close, WINDOW), batch_size)
+    is_buy, entry_price, exit_price, profit_loss = window_trades(close, predicted, WINDOW)
+    trade_types = np.where(is_buy, "BUY", "SELL").tolist()
 
-        trade_results.append({
-            "date": df.index[i],
+    trade_results = [
+        {
+            "date": date,
             "symbol": symbol,
             "trade_type": trade_type,
-            "entry_price": recent_data[-1][0],
-            "exit_price": actual_price,
-            "profit_loss": profit_loss
-        })
-
-        # Save in DB for analysis
-        trade_entry = TradeHistory(
-            user_id=user_id,
-            symbol=symbol,
-            trade_type=trade_type,
-            quantity=1,
-            entry_price=recent_data[-1][0],
-            exit_price=actual_price,
-            profit_loss=profit_loss,
-            status="CLOSED"
+            "entry_price": entry,
+            "exit_price": exit_,
+            "profit_loss": pnl,
+        }
+        for date, trade_type, entry, exit_, pnl in zip(
+            dates[WINDOW:], trade_types, entry_price.tolist(), exit_price.tolist(), profit_loss.tolist()
         )
-        db.add(trade_entry)
+    ]
 
-    db.commit()
+    if persist:
+        # Save in DB for analysis, one bulk insert for the whole run
+        db.bulk_insert_mappings(TradeHistory, [
+            {
+                "user_id": user_id,
+                "symbol": symbol,
+                "trade_type": trade["trade_type"],
+                "quantity": 1,
+                "entry_price": trade["entry_price"],
+                "exit_price": trade["exit_price"],
+                "profit_loss": trade["profit_loss"],
+                "status": "CLOSED",
+            }
+            for trade in trade_results
+        ])
+        db.commit()
     
     return {"message": "✅ Backtesting completed successfully", "trade_results": trade_results}
@@ -0,0 +1,146 @@
+"""Backtest results cached in the ``backtests`` table.
+
+Rows are keyed by ``cache_key`` (strategy + parameters + data version, see
+``services/backtest_engine/result_cache.py``), so repeating a request
+against unchanged data is a single indexed lookup. When the data only
+grew at the end, the longest cached run over a prefix of it is resumed
+instead of recomputed, and the extended run is cached as a new row.
+"""
+
+import logging
+import time
+
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database.models import Backtest
+from services.backtest_engine.fibonacci import fibonacci_signals, resume_bar, run_backtest
+from services.backtest_engine.result_cache import (
+    cache_key,
+    data_version,
+    pack_result,
+    params_key,
+    unpack_result,
+)
+
+logger = logging.getLogger("backtest_cache")
+
+FIBONACCI_DEFAULTS = {
+    "lookback": 20,
+    "stop_loss_pct": 0.02,
+    "target_pct": 0.05,
+    "initial_capital": 100000,
+    "shares_per_trade": 100,
+    "broker_fee": 20,
+    "legacy": False,
+}
+
+# Prefix candidates checked per extension lookup, longest first
+MAX_PREFIX_CANDIDATES = 5
+
+
+def pack_metrics(report):
+    """Scalar figures of a report, JSON-safe (inf/NaN as None)."""
+    metrics = {}
+    for name, value in report.items():
+        if name == "trades":
+            continue
+        value = value.item() if hasattr(value, "item") else value
+        if isinstance(value, float) and (value != value or value in (float("inf"), float("-inf"))):
+            value = None
+        metrics[name] = value
+    return metrics
+
+
+class BacktestCache:
+    def lookup(self, db: Session, strategy, params, prices):
+        """Cached payload (see ``unpack_result``) for exactly this run, or None."""
+        row = db.query(Backtest).filter_by(
+            cache_key=cache_key(strategy, params, data_version(prices))
+        ).first()
+        return unpack_result(row.result) if row is not None else None
+
+    def longest_prefix(self, db: Session, strategy, params, prices):
+        """Payload of the longest cached run over a strict prefix of ``prices``, or None."""
+        index = prices.index
+        candidates = (
+            db.query(Backtest)
+            .filter(
+                Backtest.params_key == params_key(strategy, params),
+                Backtest.start_date == index[0].to_pydatetime(),
+                Backtest.end_date < index[-1].to_pydatetime(),
+            )
+            .order_by(Backtest.end_date.desc())
+            .limit(MAX_PREFIX_CANDIDATES)
+            .all()
+        )
+        for row in candidates:
+            rows = int(index.searchsorted(pd.Timestamp(row.end_date), side="right"))
+            if data_version(prices.iloc[:rows]) == row.data_version:
+                return unpack_result(row.result)
+        return None
+
+    def store(self, db: Session, strategy, params, prices, report, equity, signal, resume, user_id=None):
+        version = data_version(prices)
+        row = Backtest(
+            user_id=user_id,
+            start_date=prices.index[0].to_pydatetime(),
+            end_date=prices.index[-1].to_pydatetime(),
+            total_pnl=float(equity.iloc[-1] - params.get("initial_capital", 0)),
+            accuracy=report.get("win_ratio"),
+            cache_key=cache_key(strategy, params, version),
+            params_key=params_key(strategy, params),
+            strategy_name=strategy,
+            params=params,
+            data_version=version,
+            metrics=pack_metrics(report),
+            result=pack_result(report, equity, signal, resume),
+        )
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # an identical run was stored concurrently
+
+    def fibonacci(self, db: Session, prices, params=None, user_id=None):
+        """Report of ``backtest_fibonacci`` for ``prices``, from the cache when possible."""
+        return self.fibonacci_run(db, prices, params, user_id)[0]
+
+    def fibonacci_run(self, db: Session, prices, params=None, user_id=None):
+        """``(report, equity)`` of ``backtest_fibonacci`` for ``prices``, from the cache when possible."""
+        params = {**FIBONACCI_DEFAULTS, **(params or {})}
+        cached = self.lookup(db, "fibonacci", params, prices)
+        if cached is not None:
+            logger.info(f"♻️ Backtest cache hit: fibonacci on {len(prices)} bars")
+            return cached["report"], cached["equity"]
+
+        started = time.perf_counter()
+        resume = None
+        if not params["legacy"]:
+            earlier = self.longest_prefix(db, "fibonacci", params, prices)
+            if earlier is not None:
+                resume = (earlier["resume"], earlier["signal"])
+        signals = fibonacci_signals(
+            prices, params["lookback"], params["stop_loss_pct"], params["target_pct"], params["legacy"],
+            resume=resume,
+        )
+        portfolio, report = run_backtest(
+            signals, prices.index, params["initial_capital"], params["shares_per_trade"],
+            params["broker_fee"], params["legacy"],
+        )
+        equity = pd.Series(portfolio["total"], index=prices.index)
+        self.store(
+            db, "fibonacci", params, prices, report, equity, signals["signal"],
+            resume_bar(signals["signal"], params["lookback"]), user_id,
+        )
+        logger.info(
+            f"🧮 Backtest cached: fibonacci on {len(prices)} bars "
+            f"({'resumed at bar ' + str(resume[0]) if resume else 'full run'}) "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return report, equity
+
+
+# Singleton instance
+backtest_cache = BacktestCache()
@@ -0,0 +1,59 @@
+import logging
+from pathlib import Path
+
+from core.config import BACKTEST_DATA_DIR
+from services.ohlcv_store import CSV_SUFFIX, ohlcv_store, read_yfinance_csv
+
+logger = logging.getLogger("backtest_data")
+
+
+def load_price_csv(source, store=None):
+    """Close prices from a yfinance-style CSV (path or file-like) as a Series.
+
+    Paths are served from ``store`` (the shared OHLCV store by default),
+    converting the CSV on first use.
+    """
+    if not isinstance(source, (str, Path)):
+        return read_yfinance_csv(source)["Close"]
+    try:
+        bars = (store or ohlcv_store).load_csv(source)
+    except OSError as e:
+        logger.warning(f"⚠️ OHLCV store unavailable for {source}, reading CSV: {e}")
+        bars = None
+    if bars is None:
+        # Also None while another writer is swapping the partition in
+        return read_yfinance_csv(source)["Close"]
+    return bars.close()
+
+
+def sectors(data_dir=BACKTEST_DATA_DIR):
+    processed = Path(data_dir) / "processed"
+    if not processed.is_dir():
+        return []
+    return sorted(p.name for p in processed.iterdir() if p.is_dir())
+
+
+def sector_csvs(sector, data_dir=BACKTEST_DATA_DIR):
+    """``[(symbol, path)]`` of every stored CSV in one sector, by symbol."""
+    if sector not in sectors(data_dir):
+        raise ValueError(f"Unknown sector {sector!r}")
+    folder = Path(data_dir) / "processed" / sector
+    return sorted((p.name[: -len(CSV_SUFFIX)], p) for p in folder.glob(f"*{CSV_SUFFIX}"))
+
+
+def find_price_csv(symbol, sector=None, data_dir=BACKTEST_DATA_DIR):
+    """Stored CSV for ``symbol`` (optionally within ``sector``), or None.
+
+    Only names listed in the data directory are accepted, so request
+    parameters can never point outside it.
+    """
+    data_dir = Path(data_dir)
+    folders = [data_dir / "processed" / s for s in sectors(data_dir) if sector in (None, s)]
+    if sector is None:
+        folders.insert(0, data_dir)
+    wanted = f"{symbol}{CSV_SUFFIX}".upper()
+    for folder in folders:
+        for path in folder.glob(f"*{CSV_SUFFIX}"):
+            if path.name.upper() == wanted:
+                return path
+    return None
@@ -0,0 +1,69 @@
+"""Vectorized EMA crossover backtest.
+
+Same entries and exits as ``strategies/strategy.run_ema_strategy``: buy
+when the short EMA crosses above the long one, sell on the next cross
+below while a position is open. Signals use the layout of
+``fibonacci_signals`` so ``run_backtest`` prices the book and reports.
+"""
+
+import numpy as np
+import pandas as pd
+
+from services.backtest_engine.fibonacci import run_backtest
+
+
+def ema(prices, span):
+    """``Series.ewm(span=span).mean()`` as an array."""
+    return pd.Series(np.asarray(prices, dtype=np.float64)).ewm(span=span).mean().to_numpy()
+
+
+def ema_crossings(short, long):
+    """Bars where the short EMA crosses above (``up``) and below (``down``) the long one."""
+    above = short > long
+    up = np.flatnonzero(above[1:] & (short[:-1] <= long[:-1])) + 1
+    down = np.flatnonzero((short[1:] < long[1:]) & (short[:-1] >= long[:-1])) + 1
+    return up, down
+
+
+def ema_signals(prices, short_period=9, long_period=21, short=None, long=None):
+    """Signals as ``{column: array}``; ``short``/``long`` reuse precomputed EMAs."""
+    price = np.asarray(prices, dtype=np.float64)
+    short = ema(price, short_period) if short is None else short
+    long = ema(price, long_period) if long is None else long
+    n = len(price)
+    signal = np.zeros(n, dtype=np.int64)
+
+    up, down = ema_crossings(short, long)
+    flat_since = -1  # last down-cross bar; the book is flat after it
+    for d in down.tolist():
+        # A sell needs a buy since the previous down-cross
+        first = int(np.searchsorted(up, flat_since, side="right"))
+        if first < len(up) and up[first] < d:
+            signal[up[first]:d] = 1
+            signal[d] = -1
+        flat_since = d
+    first = int(np.searchsorted(up, flat_since, side="right"))
+    if first < len(up):
+        signal[up[first]:] = 1
+
+    positions = np.full(n, np.nan)
+    positions[1:] = np.diff(signal)
+    return {
+        "price": price,
+        "ema_short": short,
+        "ema_long": long,
+        "signal": signal,
+        "stop_loss": np.full(n, np.nan),
+        "target": np.full(n, np.nan),
+        "positions": positions,
+    }
+
+
+def backtest_ema(
+    prices, short_period=9, long_period=21, initial_capital=100000, shares_per_trade=100, broker_fee=20
+):
+    """Signals + backtest for a price Series; returns ``(signals, portfolio, report)``."""
+    signals = ema_signals(prices, short_period, long_period)
+    index = prices.index if isinstance(prices, pd.Series) else None
+    portfolio, report = run_backtest(signals, index, initial_capital, shares_per_trade, broker_fee)
+    return signals, portfolio, report
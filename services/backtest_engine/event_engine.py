@@ -0,0 +1,518 @@
+"""Event-driven backtests on the live bar interface.
+
+Strategies are bar listeners with the signature ``BarAggregator`` calls
+live, ``on_bar(instrument_key, timeframe, bar)``, with ``bar`` laid out
+as ``BAR_FIELDS``. They trade through a broker with ``buy``/``sell``/
+``position``. ``EventEngine`` replays recorded bars of many instruments
+in time order into such a strategy, and ``attach_live`` wires the same
+object to ``bar_aggregator`` with a ``PaperBroker`` over the quote board.
+
+Fills are simulated by one ``FillModel`` in both cases. A market order
+walks the bid/ask depth (recorded levels when the feed has them,
+otherwise a synthetic book around the close), then slippage and
+brokerage are applied. In a backtest an order placed on a bar fills
+against the first bar of that instrument that closes at or after
+``latency_ms`` later, or on the same bar with no latency.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.backtest_engine.fibonacci import TRADING_DAYS, calculate_metrics
+from services.bar_aggregator import BAR_FIELDS, CLOSE, TIMEFRAMES, bar_aggregator
+from services.quote_board import quote_board
+
+logger = logging.getLogger("event_engine")
+
+BUY, SELL = 1, -1
+
+# NSE cash session, 09:15-15:30
+SESSION_SECONDS = 22_500
+
+# Synthetic book when a feed has no recorded depth
+DEFAULT_SPREAD_BPS = 5.0
+DEFAULT_DEPTH_LEVELS = 5
+DEFAULT_DEPTH_QTY = 500
+
+# Bars handed to the hot loop per ``tolist()`` batch
+REPLAY_CHUNK = 1 << 16
+
+
+class FillModel:
+    """Prices market orders against depth; shared by backtests and paper trading.
+
+    Brokerage is ``brokerage_flat`` per order, or ``brokerage_pct`` of the
+    notional when that is lower (the usual discount-broker schedule).
+    """
+
+    def __init__(
+        self,
+        latency_ms=0,
+        slippage_bps=0.0,
+        brokerage_flat=20.0,
+        brokerage_pct=0.0005,
+        spread_bps=DEFAULT_SPREAD_BPS,
+        depth_levels=DEFAULT_DEPTH_LEVELS,
+        depth_qty=DEFAULT_DEPTH_QTY,
+    ):
+        self.latency = latency_ms / 1000
+        self.slippage_bps = slippage_bps
+        self.brokerage_flat = brokerage_flat
+        self.brokerage_pct = brokerage_pct
+        self.spread_bps = spread_bps
+        self.depth_levels = depth_levels
+        self.depth_qty = depth_qty
+
+    def synthetic_book(self, side, price, bid=0.0, ask=0.0):
+        """``[(price, qty)]`` on the side an order of ``side`` takes from."""
+        step = price * self.spread_bps / 1e4
+        best = (ask or price + step / 2) if side == BUY else (bid or price - step / 2)
+        return [(best + side * k * step, self.depth_qty) for k in range(self.depth_levels)]
+
+    def fill(self, side, qty, levels):
+        """Average price for ``qty`` walked through ``levels``, after slippage.
+
+        Size beyond the visible depth fills at the worst level.
+        """
+        remaining, cost = qty, 0.0
+        for price, size in levels:
+            take = remaining if remaining < size else size
+            cost += take * price
+            remaining -= take
+            if not remaining:
+                break
+        if remaining:
+            cost += remaining * levels[-1][0]
+        return cost / qty * (1 + side * self.slippage_bps / 1e4)
+
+    def fee(self, notional):
+        if self.brokerage_pct:
+            return min(self.brokerage_flat, notional * self.brokerage_pct)
+        return self.brokerage_flat
+
+
+class SimBroker:
+    """Cash, long positions and a fill log; subclasses say when and at what quote orders fill.
+
+    Sells are capped at the open position and buys that cash cannot cover
+    are rejected. Average cost includes the buy brokerage, so each sell's
+    ``pnl`` is net of fees on both legs.
+    """
+
+    def __init__(self, fill_model=None, initial_capital=1_000_000):
+        self.fill_model = fill_model or FillModel()
+        self.initial_capital = initial_capital
+        self.cash = float(initial_capital)
+        self.positions = {}  # instrument key -> qty
+        self.avg_cost = {}
+        self.fills = []
+        self.rejected = 0
+        self.listener = None  # strategy.on_fill, if it has one
+        self.reject_listener = None  # strategy.on_reject, if it has one
+
+    def position(self, instrument_key):
+        return self.positions.get(instrument_key, 0)
+
+    def buy(self, instrument_key, qty, limit=None, tag=None):
+        return self._submit(instrument_key, BUY, qty, limit, tag)
+
+    def sell(self, instrument_key, qty=None, limit=None, tag=None):
+        """Sell ``qty`` (the whole position by default)."""
+        return self._submit(instrument_key, SELL, qty or self.position(instrument_key), limit, tag)
+
+    def _submit(self, instrument_key, side, qty, limit, tag):
+        raise NotImplementedError
+
+    def _reject(self, instrument_key, side, qty, tag):
+        self.rejected += 1
+        if self.reject_listener is not None:
+            self.reject_listener(instrument_key, "BUY" if side == BUY else "SELL", qty, tag)
+        return None
+
+    def _execute(self, instrument_key, side, qty, levels, limit, tag, ts):
+        held = self.positions.get(instrument_key, 0)
+        if side == SELL:
+            qty = min(qty, held)
+        if qty <= 0:
+            return None
+        model = self.fill_model
+        price = model.fill(side, qty, levels)
+        if limit is not None and (price > limit if side == BUY else price < limit):
+            return self._reject(instrument_key, side, qty, tag)
+        notional = price * qty
+        fee = model.fee(notional)
+
+        if side == BUY:
+            if notional + fee > self.cash:
+                return self._reject(instrument_key, side, qty, tag)
+            self.cash -= notional + fee
+            self.avg_cost[instrument_key] = (
+                self.avg_cost.get(instrument_key, 0.0) * held + notional + fee
+            ) / (held + qty)
+            pnl = None
+        else:
+            self.cash += notional - fee
+            pnl = (price - self.avg_cost[instrument_key]) * qty - fee
+        held += side * qty
+        self.positions[instrument_key] = held
+        if not held:
+            self.avg_cost.pop(instrument_key, None)
+
+        fill = {
+            "ts": ts,
+            "instrument_key": instrument_key,
+            "side": "BUY" if side == BUY else "SELL",
+            "qty": qty,
+            "price": price,
+            "fee": fee,
+            "pnl": pnl,
+            "tag": tag,
+        }
+        self.fills.append(fill)
+        if self.listener is not None:
+            self.listener(fill)
+        return fill
+
+
+class BacktestBroker(SimBroker):
+    """Broker of an ``EventEngine`` run: quotes come from the replayed bars."""
+
+    def __init__(self, engine, fill_model=None, initial_capital=1_000_000):
+        super().__init__(fill_model, initial_capital)
+        self.engine = engine
+        self.now = 0.0  # close time of the bar being processed
+        self._seq = itertools.count()
+
+    def _submit(self, instrument_key, side, qty, limit, tag):
+        engine = self.engine
+        j = engine.slots[instrument_key]
+        if not self.fill_model.latency:
+            return self._execute(instrument_key, side, qty, engine.book(j, side), limit, tag, self.now)
+        due = self.now + self.fill_model.latency
+        heapq.heappush(engine.pending[j], (due, next(self._seq), side, qty, limit, tag))
+        engine.waiting[j] = True
+        engine.n_pending += 1
+        return None
+
+
+class PaperBroker(SimBroker):
+    """Live paper trading: fills immediately at the quote board's bid/ask."""
+
+    def __init__(self, fill_model=None, initial_capital=1_000_000, board=quote_board):
+        super().__init__(fill_model, initial_capital)
+        self.board = board
+
+    def _submit(self, instrument_key, side, qty, limit, tag):
+        slot = self.board.resolve(instrument_key)
+        if slot is None or not self.board.ltp[slot]:
+            logger.warning(f"⚠️ Paper order for {instrument_key} skipped: no quote")
+            return self._reject(instrument_key, side, qty, tag)
+        levels = self.fill_model.synthetic_book(
+            side, self.board.ltp[slot], self.board.bid[slot], self.board.ask[slot]
+        )
+        return self._execute(instrument_key, side, qty, levels, limit, tag, time.time())
+
+
+class EventEngine:
+    """Replays bars of many instruments, in time order, into one strategy.
+
+    ``feeds`` maps instrument key -> ``{"ts", "open", "high", "low", "close",
+    "volume"}`` arrays (``ts`` = bar start, epoch seconds). Optional
+    ``"bid"``/``"ask"`` with ``"bid_qty"``/``"ask_qty"`` hold recorded
+    depth per bar, shaped ``(bars,)`` or ``(bars, levels)``.
+    """
+
+    def __init__(self, feeds, timeframe="1s", fill_model=None, initial_capital=1_000_000):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        self.timeframe = timeframe
+        self.interval = TIMEFRAMES[timeframe]
+        self.keys = list(feeds)
+        self.slots = {key: j for j, key in enumerate(self.keys)}
+        self.feeds = [
+            {name: np.asarray(values) for name, values in feeds[key].items()} for key in self.keys
+        ]
+        self.fill_model = fill_model or FillModel()
+        self.initial_capital = initial_capital
+
+        # Every bar of every instrument in replay order: time, then instrument
+        lengths = [len(f["ts"]) for f in self.feeds]
+        ts = np.concatenate([f["ts"] for f in self.feeds]).astype(np.float64)
+        slot = np.repeat(np.arange(len(self.keys)), lengths)
+        row = np.concatenate([np.arange(n) for n in lengths]) if lengths else np.zeros(0, dtype=int)
+        order = np.lexsort((slot, ts))
+        self.bars = np.column_stack(
+            [ts[order]]
+            + [np.concatenate([f[field] for f in self.feeds]).astype(np.float64)[order] for field in BAR_FIELDS[1:]]
+        )
+        self.slot = slot[order]
+        self.row = row[order]
+        self._reset()
+
+    def _reset(self):
+        m = len(self.keys)
+        self.cursor = [0] * m  # row of each instrument's latest bar
+        self.pending = [[] for _ in range(m)]  # heap of (due, seq, side, qty, limit, tag)
+        self.waiting = [False] * m
+        self.n_pending = 0
+
+    def book(self, j, side):
+        feed, r = self.feeds[j], self.cursor[j]
+        name = "ask" if side == BUY else "bid"
+        if name in feed:
+            prices, sizes = np.atleast_1d(feed[name][r]), np.atleast_1d(feed[f"{name}_qty"][r])
+            levels = [(p, q) for p, q in zip(prices.tolist(), sizes.tolist()) if q > 0]
+            if levels:
+                return levels
+        return self.fill_model.synthetic_book(side, float(feed["close"][r]))
+
+    def _fill_due(self, j, close_time):
+        heap = self.pending[j]
+        key = self.keys[j]
+        while heap and heap[0][0] <= close_time:
+            _, _, side, qty, limit, tag = heapq.heappop(heap)
+            self.n_pending -= 1
+            self.broker._execute(key, side, qty, self.book(j, side), limit, tag, close_time)
+        self.waiting[j] = bool(heap)
+
+    def run(self, strategy):
+        """Replay every bar into ``strategy``; returns the report dict.
+
+        A strategy with ``on_bars(timeframe, slots, bars)`` gets every bar
+        of one timestamp as a block (``slots`` index ``instrument_keys``
+        from ``on_start``), which lets it update its state with numpy.
+        Otherwise ``on_bar`` is called bar by bar, as ``BarAggregator``
+        does live.
+        """
+        self._reset()
+        self.broker = broker = BacktestBroker(self, self.fill_model, self.initial_capital)
+        broker.listener = getattr(strategy, "on_fill", None)
+        broker.reject_listener = getattr(strategy, "on_reject", None)
+        if hasattr(strategy, "on_start"):
+            strategy.on_start(broker, list(self.keys))
+
+        started = time.perf_counter()
+        if hasattr(strategy, "on_bars"):
+            self._replay_blocks(strategy.on_bars)
+        else:
+            self._replay_bars(strategy.on_bar)
+        elapsed = time.perf_counter() - started
+
+        report = self.report(broker)
+        report["elapsed_s"] = elapsed
+        logger.info(
+            f"⏱️ Event backtest: {len(self.bars)} bars, {len(broker.fills)} fills in {elapsed:.2f}s"
+        )
+        return report
+
+    def _replay_bars(self, on_bar):
+        broker, keys, timeframe = self.broker, self.keys, self.timeframe
+        cursor, waiting, interval = self.cursor, self.waiting, self.interval
+        fill_due = self._fill_due
+        for start in range(0, len(self.bars), REPLAY_CHUNK):
+            end = start + REPLAY_CHUNK
+            rows = zip(self.slot[start:end].tolist(), self.row[start:end].tolist(), self.bars[start:end].tolist())
+            for j, r, bar in rows:
+                cursor[j] = r
+                close_time = bar[0] + interval
+                if waiting[j]:
+                    fill_due(j, close_time)
+                broker.now = close_time
+                on_bar(keys[j], timeframe, bar)
+
+    def _replay_blocks(self, on_bars):
+        broker, timeframe, interval = self.broker, self.timeframe, self.interval
+        self.cursor = cursor = np.zeros(len(self.keys), dtype=np.int64)
+        waiting, fill_due = self.waiting, self._fill_due
+        ts = self.bars[:, 0]
+        starts = np.flatnonzero(np.diff(ts, prepend=np.nan) != 0)
+        ends = np.append(starts[1:], len(ts))
+        for a, b, t in zip(starts.tolist(), ends.tolist(), ts[starts].tolist()):
+            slots = self.slot[a:b]
+            cursor[slots] = self.row[a:b]
+            close_time = t + interval
+            if self.n_pending:
+                for j in slots.tolist():
+                    if waiting[j]:
+                        fill_due(j, close_time)
+            broker.now = close_time
+            on_bars(timeframe, slots, self.bars[a:b])
+
+    def report(self, broker):
+        """Equity curve (marked at each bar close) and metrics of one run."""
+        grid = np.unique(self.bars[:, 0])
+        m = len(self.keys)
+        close = np.full((len(grid), m), np.nan)
+        for j, feed in enumerate(self.feeds):
+            close[np.searchsorted(grid, feed["ts"]), j] = feed["close"]
+        close = pd.DataFrame(close).ffill().fillna(0.0).to_numpy()
+
+        held = np.zeros((len(grid), m))
+        cash = np.zeros(len(grid))
+        for fill in broker.fills:
+            # A fill at a bar's close counts from that bar on
+            i = np.searchsorted(grid, fill["ts"] - self.interval)
+            side = 1 if fill["side"] == "BUY" else -1
+            held[i, self.slots[fill["instrument_key"]]] += side * fill["qty"]
+            cash[i] -= side * fill["qty"] * fill["price"] + fill["fee"]
+        equity = self.initial_capital + np.cumsum(cash) + (np.cumsum(held, axis=0) * close).sum(axis=1)
+
+        returns = np.full(len(equity), np.nan)
+        returns[1:] = equity[1:] / equity[:-1] - 1
+        trades = [{"profit": f["pnl"]} for f in broker.fills if f["pnl"] is not None]
+        periods = TRADING_DAYS * SESSION_SECONDS / self.interval
+        final = float(equity[-1]) if len(equity) else float(self.initial_capital)
+        return {
+            "final_equity": final,
+            "total_return": (final - self.initial_capital) / self.initial_capital * 100,
+            "bars": len(self.bars),
+            "fills": len(broker.fills),
+            "rejected": broker.rejected,
+            "open_positions": {k: q for k, q in broker.positions.items() if q},
+            **calculate_metrics(equity, returns, trades, periods),
+            "equity": pd.Series(equity, index=pd.to_datetime(grid + self.interval, unit="s")),
+            "fill_log": broker.fills,
+        }
+
+
+class AutoTraderStrategy:
+    """The ``AutoTrader.analyze_and_trade`` rules as a bar strategy.
+
+    ``analyze(instrument_key, closes)`` plays the part of
+    ``StrategyService.analyze_stock`` and returns ``{"signal", "confidence"}``
+    from the recent closes. A position opens on a BUY at ``min_confidence``
+    or above, sized to ``position_size`` rupees. It closes on its stop
+    (trailed by ``trailing_stop_pct``), on its target, or on a SELL with
+    confidence 0.8 or above. Positions are long-only.
+
+    A position is tracked from its entry fill, not the order: with
+    latency an entry or exit is in flight for some bars, and no other
+    order is placed for that instrument until it fills or is rejected.
+    """
+
+    def __init__(
+        self,
+        analyze,
+        timeframe="1m",
+        min_confidence=0.7,
+        max_positions=5,
+        position_size=100000,
+        stop_loss_pct=0.02,
+        target_pct=0.03,
+        trailing_stop_pct=0.01,
+        history=200,
+        evaluate_every=1,
+    ):
+        self.analyze = analyze
+        self.timeframe = timeframe
+        self.min_confidence = min_confidence
+        self.max_positions = max_positions
+        self.position_size = position_size
+        self.stop_loss_pct = stop_loss_pct
+        self.target_pct = target_pct
+        self.trailing_stop_pct = trailing_stop_pct
+        self.history = history
+        self.evaluate_every = evaluate_every
+        self.broker = None
+        self.closes = {}
+        self.open = {}  # instrument key -> {"stop_loss", "target"}, from the entry fill
+        self.entering = {}  # instrument key -> levels of an entry not filled yet
+        self.exiting = set()  # instrument keys with an exit not filled yet
+
+    def on_start(self, broker, instrument_keys=()):
+        self.broker = broker
+        self.closes = {}
+        self.open = {}
+        self.entering = {}
+        self.exiting = set()
+
+    def on_fill(self, fill):
+        key = fill["instrument_key"]
+        if fill["side"] == "BUY":
+            levels = self.entering.pop(key, None)
+            if levels is not None:
+                self.open[key] = levels
+        elif not self.broker.position(key):
+            self.open.pop(key, None)
+            self.exiting.discard(key)
+
+    def on_reject(self, instrument_key, side, qty, tag):
+        if side == "BUY":
+            self.entering.pop(instrument_key, None)
+        else:
+            self.exiting.discard(instrument_key)
+
+    def on_bar(self, instrument_key, timeframe, bar):
+        if timeframe != self.timeframe:
+            return
+        price = bar[CLOSE]
+        closes = self.closes.setdefault(instrument_key, [])
+        closes.append(price)
+        if len(closes) > 2 * self.history:
+            del closes[: -self.history]
+        if instrument_key in self.entering or instrument_key in self.exiting:
+            return  # an order for it is still in flight
+        if len(closes) % self.evaluate_every:
+            analysis = None
+        else:
+            analysis = self.analyze(instrument_key, closes[-self.history :])
+
+        position = self.open.get(instrument_key)
+        if position is not None:
+            stop = price * (1 - self.trailing_stop_pct)
+            if stop > position["stop_loss"]:
+                position["stop_loss"] = stop
+            if (
+                price <= position["stop_loss"]
+                or price >= position["target"]
+                or (analysis and analysis["signal"] == "SELL" and analysis["confidence"] >= 0.8)
+            ):
+                # Marked first: without latency the fill arrives inside sell()
+                self.exiting.add(instrument_key)
+                self.broker.sell(instrument_key, tag="exit")
+        elif (
+            analysis
+            and analysis["signal"] == "BUY"
+            and analysis["confidence"] >= self.min_confidence
+            and len(self.open) + len(self.entering) < self.max_positions
+        ):
+            qty = int(self.position_size / price)
+            if qty > 0:
+                self.entering[instrument_key] = {
+                    "stop_loss": price * (1 - self.stop_loss_pct),
+                    "target": price * (1 + self.target_pct),
+                }
+                self.broker.buy(instrument_key, qty, tag="entry")
+
+
+def attach_live(strategy, broker=None, aggregator=bar_aggregator, instrument_keys=()):
+    """Drive ``strategy`` from live bars, paper trading by default.
+
+    An ``on_bars`` strategy gets each live bar as a one-row block; bars of
+    keys outside ``instrument_keys`` are ignored for it.
+    """
+    keys = list(instrument_keys)
+    broker = broker or PaperBroker()
+    broker.listener = getattr(strategy, "on_fill", None)
+    broker.reject_listener = getattr(strategy, "on_reject", None)
+    if hasattr(strategy, "on_start"):
+        strategy.on_start(broker, keys)
+
+    if hasattr(strategy, "on_bars"):
+        slots = {key: j for j, key in enumerate(keys)}
+
+        def on_bar(instrument_key, timeframe, bar):
+            j = slots.get(instrument_key)
+            if j is not None:
+                block = np.asarray(bar, dtype=np.float64).reshape(1, -1)
+                strategy.on_bars(timeframe, np.array([j]), block)
+
+        aggregator.on_bar_close(on_bar)
+    else:
+        aggregator.on_bar_close(strategy.on_bar)
+    return broker
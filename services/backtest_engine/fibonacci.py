@@ -0,0 +1,284 @@
+"""Vectorized Fibonacci-retracement backtest.
+
+Port of ``fibonacci_strategy`` / ``backtest`` / ``calculate_metrics`` from
+``tests/backtest2.py`` onto numpy arrays. The trade state machine walks
+from event to event (entry -> stop/target hit -> next entry) with
+array searches instead of visiting every row.
+
+The script sets the stop and target only on the entry bar, so from the
+second bar of a trade they are NaN and the position is never closed, and
+its portfolio goes short for the bar after an exit signal. By default
+the stop and target are held until one is hit and the book is long-only;
+``legacy=True`` reproduces the script exactly.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+FIB_RATIOS = {"fib_382": 0.382, "fib_50": 0.5, "fib_618": 0.618}
+SIGNAL_COLUMNS = (
+    "price", "high", "low", "fib_382", "fib_50", "fib_618",
+    "signal", "stop_loss", "target", "positions",
+)
+TRADING_DAYS = 252
+
+# Exits are searched in windows of this many bars, doubling while no level is hit
+EXIT_SEARCH_WINDOW = 64
+
+
+def _rolling(values, lookback, fn):
+    return getattr(pd.Series(values).rolling(window=lookback), fn)().to_numpy()
+
+
+def fibonacci_levels(prices, lookback=20):
+    """Rolling high/low and retracement levels as ``{name: array}``."""
+    price = np.asarray(prices, dtype=np.float64)
+    high = _rolling(price, lookback, "max")
+    low = _rolling(price, lookback, "min")
+    levels = {"price": price, "high": high, "low": low}
+    for name, ratio in FIB_RATIOS.items():
+        levels[name] = low + (high - low) * ratio
+    return levels
+
+
+def _first_exit(price, start, stop, target):
+    """First bar at or after ``start`` where ``stop`` or ``target`` is touched."""
+    n = len(price)
+    window = EXIT_SEARCH_WINDOW
+    while start < n:
+        end = min(start + window, n)
+        chunk = price[start:end]
+        hit = np.flatnonzero((chunk <= stop) | (chunk >= target))
+        if len(hit):
+            return start + int(hit[0])
+        start, window = end, window * 2
+    return None
+
+
+def resume_bar(signal, lookback=20):
+    """Bar from which ``fibonacci_signals`` can continue ``signal`` on a longer series.
+
+    That is where the run was last flat and looking for an entry: two bars
+    after the last exit, or the entry of a trade still open at the end.
+    """
+    signal = np.asarray(signal)
+    if len(signal) and signal[-1] == 1:
+        outside = np.flatnonzero(signal != 1)
+        return int(outside[-1]) + 1 if len(outside) else 0
+    exits = np.flatnonzero(signal == -1)
+    return int(exits[-1]) + 2 if len(exits) else lookback
+
+
+def fibonacci_signals(
+    prices, lookback=20, stop_loss_pct=0.02, target_pct=0.05, legacy=False, levels=None, resume=None
+):
+    """Signals as ``{column: array}`` with the columns of the script's DataFrame.
+
+    ``signal`` is 1 while in a trade (from the entry bar), -1 on the exit
+    bar and 0 when flat; a new entry needs the bar before it to be flat.
+    ``levels`` reuses a ``fibonacci_levels`` result for the same lookback.
+    ``resume=(bar, signal)`` continues an earlier run over a prefix of
+    ``prices``: its signals before ``bar`` (from ``resume_bar``) are kept
+    and only the bars after it are walked.
+    """
+    out = dict(levels if levels is not None else fibonacci_levels(prices, lookback))
+    price = out["price"]
+    n = len(price)
+    signal = np.zeros(n, dtype=np.int64)
+    stop_loss = np.full(n, np.nan)
+    target = np.full(n, np.nan)
+
+    i = lookback  # first bar an entry may happen
+    if resume is not None:
+        if legacy:
+            raise ValueError("Legacy runs cannot be resumed")
+        i, earlier = resume
+        kept = min(i, len(earlier), n)
+        signal[:kept] = earlier[:kept]
+        # Stops and targets of the kept trades, from each trade's entry price
+        held = signal[:kept] == 1
+        starts = held & ~np.r_[False, held[:-1]]
+        entry = np.maximum.accumulate(np.where(starts, np.arange(kept), 0))
+        stop_loss[:kept][held] = price[entry[held]] * (1 - stop_loss_pct)
+        target[:kept][held] = price[entry[held]] * (1 + target_pct)
+
+    # Bars where the price is above the previous bar's 50% level
+    above = np.zeros(n, dtype=bool)
+    if n > lookback:
+        above[lookback:] = price[lookback:] > out["fib_50"][lookback - 1 : -1]
+    entries = np.flatnonzero(above)
+
+    while True:
+        k = np.searchsorted(entries, i)
+        if k == len(entries):
+            break
+        entry = int(entries[k])
+        stop = price[entry] * (1 - stop_loss_pct)
+        goal = price[entry] * (1 + target_pct)
+        stop_loss[entry], target[entry] = stop, goal
+
+        if legacy:
+            # The next bar compares with the entry levels; after that they are NaN
+            if entry + 1 < n and (price[entry + 1] <= stop or price[entry + 1] >= goal):
+                exit_bar = entry + 1
+            else:
+                signal[entry:] = 1
+                break
+        else:
+            exit_bar = _first_exit(price, entry + 1, stop, goal)
+            if exit_bar is None:
+                signal[entry:] = 1
+                stop_loss[entry:], target[entry:] = stop, goal
+                break
+            stop_loss[entry:exit_bar], target[entry:exit_bar] = stop, goal
+
+        signal[entry:exit_bar] = 1
+        signal[exit_bar] = -1
+        i = exit_bar + 2  # the bar after an exit is always flat
+
+    out["signal"] = signal
+    out["stop_loss"] = stop_loss
+    out["target"] = target
+    positions = np.full(n, np.nan)
+    positions[1:] = np.diff(signal)
+    out["positions"] = positions
+    return out
+
+
+def signals_frame(signals, index=None):
+    return pd.DataFrame({c: signals[c] for c in SIGNAL_COLUMNS}, index=index)
+
+
+def _portfolio(price, signal, initial_capital, shares_per_trade, broker_fee, legacy):
+    held = np.zeros(len(price))
+    held[1:] = signal[:-1] if legacy else signal[:-1] == 1
+    stock = shares_per_trade * held
+    change = np.zeros(len(price))
+    change[1:] = np.diff(stock)
+    change[0] = np.nan  # DataFrame.diff leaves the first row empty
+
+    cash = initial_capital - np.nancumsum(change * price)
+    cash[0] = np.nan
+    cash -= np.abs(change) * broker_fee / shares_per_trade
+    total = cash + stock * price
+    returns = np.full(len(price), np.nan)
+    returns[1:] = total[1:] / total[:-1] - 1
+    return {"price": price, "holdings": stock * price, "cash": cash, "total": total, "returns": returns}
+
+
+def _trades(signals, index, shares_per_trade, broker_fee, legacy):
+    price, signal = signals["price"], signals["signal"]
+    positions = signals["positions"]
+    previous = np.zeros(len(signal), dtype=np.int64)
+    previous[1:] = signal[:-1]
+
+    if legacy:
+        entries = np.flatnonzero(positions == 1)
+        exits = np.flatnonzero((positions == -1) & (previous == 1))
+    else:
+        entries = np.flatnonzero((signal == 1) & (previous != 1))
+        exits = np.flatnonzero(signal == -1)
+
+    opened = np.searchsorted(entries, exits) - 1
+    trades = []
+    for exit_bar, k in zip(exits.tolist(), opened.tolist()):
+        if k >= 0:
+            entry = int(entries[k])
+            entry_price = float(price[entry])
+            stop, goal = float(signals["stop_loss"][entry]), float(signals["target"][entry])
+        else:
+            entry, entry_price, stop, goal = None, 0.0, math.nan, math.nan
+        exit_price = float(price[exit_bar])
+        outcome = (
+            "Target Hit" if exit_price >= goal
+            else "Stop-Loss Hit" if exit_price <= stop
+            else "Manual Exit"
+        )
+        entry_bar = exit_bar - 1 if legacy or entry is None else entry
+        trades.append({
+            "entry_date": index[entry_bar],
+            "exit_date": index[exit_bar],
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "stop_loss": stop,
+            "target": goal,
+            "profit": (exit_price - entry_price) * shares_per_trade - 2 * broker_fee,
+            "outcome": outcome,
+        })
+    return trades, entries
+
+
+def calculate_metrics(total, returns, trades, periods_per_year=TRADING_DAYS):
+    """Same figures as ``calculate_metrics`` in ``tests/backtest2.py``.
+
+    ``periods_per_year`` annualizes the Sharpe ratio (daily bars by default).
+    """
+    returns = returns[~np.isnan(returns)]
+    profits = np.array([t["profit"] for t in trades], dtype=np.float64)
+    total_trades = len(trades)
+    wins = int(np.count_nonzero(profits > 0))
+
+    std = returns.std(ddof=1) if len(returns) > 1 else math.nan
+    sharpe_ratio = np.sqrt(periods_per_year) * returns.mean() / std if std != 0 else 0
+
+    valid = ~np.isnan(total)
+    rolling_max = np.fmax.accumulate(np.where(valid, total, -np.inf))
+    drawdown = (total[valid] - rolling_max[valid]) / rolling_max[valid]
+    gross_profit = profits[profits > 0].sum()
+    gross_loss = abs(profits[profits < 0].sum())
+
+    return {
+        "total_trades": total_trades,
+        "wins": wins,
+        "losses": total_trades - wins,
+        "win_ratio": wins / total_trades if total_trades > 0 else 0,
+        "sharpe_ratio": sharpe_ratio,
+        "max_drawdown": drawdown.min() if len(drawdown) else math.nan,
+        "profit_factor": gross_profit / gross_loss if gross_loss != 0 else np.inf,
+    }
+
+
+def run_backtest(
+    signals, index=None, initial_capital=100000, shares_per_trade=100, broker_fee=20, legacy=False
+):
+    """Portfolio arrays and the report dict of the script's ``backtest()``."""
+    price, signal = signals["price"], signals["signal"]
+    index = index if index is not None else pd.RangeIndex(len(price))
+    portfolio = _portfolio(price, signal, initial_capital, shares_per_trade, broker_fee, legacy)
+    trades, entries = _trades(signals, index, shares_per_trade, broker_fee, legacy)
+
+    balance_used = initial_capital
+    if len(entries):
+        balance_used = max(balance_used, float(price[entries].max()) * shares_per_trade + broker_fee)
+
+    final = portfolio["total"][-1]
+    report = {
+        "final_balance": final,
+        "total_return": (final - initial_capital) / initial_capital * 100,
+        "max_balance_used": balance_used,
+        "timeframe": f"{index[0]} to {index[-1]}",
+        "trades": trades,
+        **calculate_metrics(portfolio["total"], portfolio["returns"], trades),
+    }
+    return portfolio, report
+
+
+def backtest_fibonacci(
+    prices,
+    lookback=20,
+    stop_loss_pct=0.02,
+    target_pct=0.05,
+    initial_capital=100000,
+    shares_per_trade=100,
+    broker_fee=20,
+    legacy=False,
+):
+    """Signals + backtest for a price Series; returns ``(signals, portfolio, report)``."""
+    signals = fibonacci_signals(prices, lookback, stop_loss_pct, target_pct, legacy)
+    index = prices.index if isinstance(prices, pd.Series) else None
+    portfolio, report = run_backtest(
+        signals, index, initial_capital, shares_per_trade, broker_fee, legacy
+    )
+    return signals, portfolio, report
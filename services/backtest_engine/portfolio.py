@@ -0,0 +1,334 @@
+"""Multi-symbol portfolio backtests over ``data/processed/<sector>/*.csv``.
+
+Signals are generated per symbol in a process pool, with symbols sharded
+across workers. Each shard loads its CSVs, runs the strategy and returns
+dates, closes and trade intents (entry/exit bars), plus the symbol's
+standalone metrics. The parent then replays every intent in date order
+against one cash balance. Exits settle before entries on the same day.
+An entry is skipped when the book is at ``max_positions``, its sector at
+``max_per_sector``, or cash cannot buy a single share. Positions are
+sized to ``position_size`` of current equity. Orders fill at the signal
+bar's close, as in the trade list of ``run_backtest``.
+
+A symbol listed in several sectors (banks are in NIFTY Bank, Private
+Bank and Financial Services) is simulated once, under the first of the
+selected sectors that lists it, so it is never held twice.
+
+Usage:
+    python -m services.backtest_engine.portfolio fibonacci "NIFTY IT" "NIFTY Bank"
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.config import (
+    BACKTEST_DATA_DIR,
+    PORTFOLIO_MAX_PER_SECTOR,
+    PORTFOLIO_MAX_POSITIONS,
+    PORTFOLIO_POSITION_SIZE,
+    SWEEP_WORKERS,
+)
+from services.backtest_engine.data import load_price_csv, sector_csvs, sectors
+from services.backtest_engine.fibonacci import TRADING_DAYS, calculate_metrics, run_backtest
+from services.backtest_engine.sweep import METRICS, STRATEGIES, plain_value
+
+logger = logging.getLogger("portfolio_backtest")
+
+
+def trade_bars(signal):
+    """Entry and exit bars of each trade; exit is -1 for a trade still open at the end."""
+    previous = np.zeros(len(signal), dtype=signal.dtype)
+    previous[1:] = signal[:-1]
+    entries = np.flatnonzero((signal == 1) & (previous != 1))
+    exits = np.flatnonzero(signal == -1)
+    closing = np.full(len(entries), -1, dtype=np.int64)
+    # Each exit closes the latest entry before it
+    opened = np.searchsorted(entries, exits) - 1
+    valid = opened >= 0
+    closing[opened[valid]] = exits[valid]
+    return entries, closing
+
+
+def _run_symbol(strategy, params, sector, symbol, path):
+    prices = load_price_csv(path)
+    price = prices.to_numpy(dtype=np.float64)
+    signals, _ = STRATEGIES[strategy](price, params, {}, {})
+    _, report = run_backtest(signals, prices.index)
+    entries, exits = trade_bars(signals["signal"])
+    return {
+        "sector": sector,
+        "symbol": symbol,
+        "dates": prices.index.to_numpy(dtype="datetime64[ns]"),
+        "close": price,
+        "entries": entries,
+        "exits": exits,
+        "standalone": {m: plain_value(report[m]) for m in METRICS},
+    }
+
+
+def _run_shard(strategy, params, shard):
+    out = []
+    for sector, symbol, path in shard:
+        try:
+            out.append(_run_symbol(strategy, params, sector, symbol, path))
+        except Exception as e:
+            logger.error(f"⚠️ {sector}/{symbol}: {e}")
+    return out
+
+
+def generate_signals(strategy, universe, params=None, workers=None):
+    """Per-symbol results for ``[(sector, symbol, path)]``, sharded across processes."""
+    params = params or {}
+    workers = min(workers or SWEEP_WORKERS or os.cpu_count() or 1, len(universe)) or 1
+    if workers == 1:
+        return _run_shard(strategy, params, universe)
+    # A few shards per worker keeps the pool busy when some histories are longer
+    shards = [universe[i :: workers * 2] for i in range(workers * 2)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_shard, strategy, params, shard) for shard in shards if shard]
+        results = [r for f in futures for r in f.result()]
+    return sorted(results, key=lambda r: (r["sector"], r["symbol"]))
+
+
+def simulate_portfolio(
+    results,
+    initial_capital=1_000_000,
+    max_positions=PORTFOLIO_MAX_POSITIONS,
+    max_per_sector=PORTFOLIO_MAX_PER_SECTOR,
+    position_size=PORTFOLIO_POSITION_SIZE,
+    broker_fee=20,
+):
+    """Replay every symbol's trades against one capital-constrained book.
+
+    Returns ``(dates, equity, trades, skipped, pnl)`` where ``pnl`` holds
+    each symbol's mark-to-market P&L per day (at its last close).
+    """
+    dates = np.unique(np.concatenate([r["dates"] for r in results]))
+    n, m = len(dates), len(results)
+    close = np.full((n, m), np.nan)
+    for j, r in enumerate(results):
+        close[np.searchsorted(dates, r["dates"]), j] = r["close"]
+    close = pd.DataFrame(close).ffill().fillna(0.0).to_numpy()
+
+    # (date row, 0 = exit / 1 = entry, symbol, intent) - exits settle first
+    events = []
+    for j, r in enumerate(results):
+        rows = np.searchsorted(dates, r["dates"])
+        for k, (entry, exit_bar) in enumerate(zip(r["entries"].tolist(), r["exits"].tolist())):
+            events.append((int(rows[entry]), 1, j, k))
+            if exit_bar >= 0:
+                events.append((int(rows[exit_bar]), 0, j, k))
+    events.sort()
+
+    cash = float(initial_capital)
+    shares = np.zeros(m)
+    delta = np.zeros((n, m))  # share changes per day
+    cash_flow = np.zeros((n, m))
+    open_trades, per_sector = {}, {}
+    trades, skipped = [], 0
+
+    for row, kind, j, k in events:
+        sector = results[j]["sector"]
+        price = close[row, j]
+        if kind == 0:
+            trade = open_trades.pop((j, k), None)
+            if trade is None:
+                continue  # its entry was skipped
+            qty = trade["shares"]
+            cash += qty * price - broker_fee
+            cash_flow[row, j] += qty * price - broker_fee
+            shares[j] -= qty
+            delta[row, j] -= qty
+            per_sector[sector] -= 1
+            trade.update(
+                exit_date=dates[row],
+                exit_price=price,
+                profit=(price - trade["entry_price"]) * qty - 2 * broker_fee,
+            )
+            trades.append(trade)
+            continue
+
+        if len(open_trades) >= max_positions or per_sector.get(sector, 0) >= max_per_sector:
+            skipped += 1
+            continue
+        equity = cash + float(shares @ close[row])
+        qty = np.floor(min(equity * position_size, cash - broker_fee) / price) if price > 0 else 0
+        if qty < 1:
+            skipped += 1
+            continue
+        cash -= qty * price + broker_fee
+        cash_flow[row, j] -= qty * price + broker_fee
+        shares[j] += qty
+        delta[row, j] += qty
+        per_sector[sector] = per_sector.get(sector, 0) + 1
+        open_trades[(j, k)] = {
+            "sector": sector,
+            "symbol": results[j]["symbol"],
+            "entry_date": dates[row],
+            "entry_price": price,
+            "shares": qty,
+        }
+
+    # Still-open positions are reported at the last close, without an exit fee
+    for (j, _), trade in open_trades.items():
+        price = close[-1, j]
+        trade.update(
+            exit_date=None,
+            exit_price=price,
+            profit=(price - trade["entry_price"]) * trade["shares"] - broker_fee,
+        )
+        trades.append(trade)
+
+    pnl = np.cumsum(cash_flow, axis=0) + np.cumsum(delta, axis=0) * close
+    equity = initial_capital + pnl.sum(axis=1)
+    return dates, equity, trades, skipped, pnl
+
+
+def _curve_metrics(equity, trades):
+    returns = np.full(len(equity), np.nan)
+    returns[1:] = equity[1:] / equity[:-1] - 1
+    return {k: plain_value(v) for k, v in calculate_metrics(equity, returns, trades).items()}
+
+
+def _group_metrics(trades, initial_capital, pnl=None):
+    profits = np.array([t["profit"] for t in trades], dtype=np.float64)
+    wins = int(np.count_nonzero(profits > 0))
+    gross_loss = abs(profits[profits < 0].sum())
+    out = {
+        "trades": len(trades),
+        "wins": wins,
+        "win_ratio": wins / len(trades) if trades else 0,
+        "pnl": float(profits.sum()),
+        "return_pct": float(profits.sum()) / initial_capital * 100,
+        "profit_factor": plain_value(profits[profits > 0].sum() / gross_loss) if gross_loss else np.inf,
+    }
+    if pnl is not None and len(pnl) > 1:
+        # Daily P&L over the starting capital, annualized like calculate_metrics
+        daily = np.diff(pnl) / initial_capital
+        std = daily.std(ddof=1)
+        out["sharpe_ratio"] = plain_value(np.sqrt(TRADING_DAYS) * daily.mean() / std) if std else 0
+    return out
+
+
+def portfolio_report(results, dates, equity, trades, skipped, pnl, initial_capital):
+    """Aggregate, per-sector and per-symbol figures of one simulated portfolio."""
+    by_symbol, by_sector = {}, {}
+    for t in trades:
+        by_symbol.setdefault(t["symbol"], []).append(t)
+        by_sector.setdefault(t["sector"], []).append(t)
+
+    symbols = {}
+    for j, r in enumerate(results):
+        symbols[r["symbol"]] = {
+            "sector": r["sector"],
+            "signals": len(r["entries"]),
+            **_group_metrics(by_symbol.get(r["symbol"], []), initial_capital, pnl[:, j]),
+            "standalone": r["standalone"],
+        }
+    sector_names = sorted({r["sector"] for r in results})
+    sector_pnl = {
+        s: pnl[:, [j for j, r in enumerate(results) if r["sector"] == s]].sum(axis=1) for s in sector_names
+    }
+    final = float(equity[-1])
+    return {
+        "aggregate": {
+            "initial_capital": initial_capital,
+            "final_equity": final,
+            "total_return": (final - initial_capital) / initial_capital * 100,
+            "symbols": len(results),
+            "signals": sum(len(r["entries"]) for r in results),
+            "skipped": skipped,
+            "timeframe": f"{pd.Timestamp(dates[0]).date()} to {pd.Timestamp(dates[-1]).date()}",
+            **_curve_metrics(equity, trades),
+        },
+        "sectors": {
+            s: _group_metrics(by_sector.get(s, []), initial_capital, sector_pnl[s]) for s in sector_names
+        },
+        "symbols": symbols,
+        "equity": pd.Series(equity, index=pd.DatetimeIndex(dates), name="equity"),
+        "trades": trades,
+    }
+
+
+def universe_for(sector_names, data_dir=BACKTEST_DATA_DIR):
+    """``[(sector, symbol, path)]`` with each symbol once, in its first listed sector."""
+    universe, seen = [], set()
+    for sector in sector_names:
+        for symbol, path in sector_csvs(sector, data_dir):
+            if symbol not in seen:
+                seen.add(symbol)
+                universe.append((sector, symbol, path))
+    return universe
+
+
+def run_portfolio_backtest(
+    strategy="fibonacci",
+    sector_names=None,
+    params=None,
+    initial_capital=1_000_000,
+    max_positions=PORTFOLIO_MAX_POSITIONS,
+    max_per_sector=PORTFOLIO_MAX_PER_SECTOR,
+    position_size=PORTFOLIO_POSITION_SIZE,
+    broker_fee=20,
+    workers=None,
+    data_dir=BACKTEST_DATA_DIR,
+):
+    """Backtest ``strategy`` over every symbol of ``sector_names`` (all sectors by default)."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}; choose from {sorted(STRATEGIES)}")
+    started = time.perf_counter()
+    universe = universe_for(sector_names or sectors(data_dir), data_dir)
+    results = generate_signals(strategy, universe, params, workers)
+    if not results:
+        raise ValueError("No price data for the selected sectors")
+    signals_s = time.perf_counter() - started
+
+    simulated = simulate_portfolio(
+        results, initial_capital, max_positions, max_per_sector, position_size, broker_fee
+    )
+    report = portfolio_report(results, *simulated, initial_capital)
+    logger.info(
+        f"📊 Portfolio {strategy}: {len(results)} symbols, {len(report['trades'])} trades "
+        f"({simulated[3]} skipped); signals {signals_s:.2f}s, total {time.perf_counter() - started:.2f}s"
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sector portfolio backtest")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("sectors", nargs="*", help="sector folders under data/processed (all by default)")
+    parser.add_argument("--capital", type=float, default=1_000_000)
+    parser.add_argument("--max-positions", type=int, default=PORTFOLIO_MAX_POSITIONS)
+    parser.add_argument("--max-per-sector", type=int, default=PORTFOLIO_MAX_PER_SECTOR)
+    parser.add_argument("--position-size", type=float, default=PORTFOLIO_POSITION_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    report = run_portfolio_backtest(
+        args.strategy,
+        args.sectors or None,
+        initial_capital=args.capital,
+        max_positions=args.max_positions,
+        max_per_sector=args.max_per_sector,
+        position_size=args.position_size,
+        workers=args.workers,
+    )
+    for name, value in report["aggregate"].items():
+        print(f"{name:>16}: {value}")
+    print()
+    print(pd.DataFrame(report["sectors"]).T.to_string())
+    print()
+    symbols = pd.DataFrame(report["symbols"]).T.drop(columns="standalone")
+    print(symbols.sort_values("pnl", ascending=False).to_string())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,68 @@
+"""Content-addressed keys and compact payloads for cached backtest results.
+
+A result is identified by the strategy, its parameters and a hash of the
+price series it ran on (values and dates), so the same request against
+the same data always maps to the same key whatever file or upload it
+came from. ``params_key`` leaves the data out; runs sharing it and a
+first bar are candidates for reuse when the same series is extended.
+
+The payload is one ``np.savez_compressed`` blob holding the report
+(metrics and trades, as JSON), the equity curve and the signal array a
+later run resumes from.
+"""
+
+import hashlib
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def data_version(prices):
+    """Hash of a price Series' values and dates."""
+    digest = hashlib.sha256(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+    if isinstance(prices, pd.Series):
+        digest.update(np.asarray(prices.index, dtype="datetime64[ns]").view(np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def params_key(strategy, params):
+    # 100000 and 100000.0 are the same setting whichever caller sent it
+    params = {
+        k: float(v) if isinstance(v, (int, float, np.number)) and not isinstance(v, bool) else v
+        for k, v in params.items()
+    }
+    raw = json.dumps({"strategy": strategy, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_key(strategy, params, version):
+    return hashlib.sha256(f"{params_key(strategy, params)}:{version}".encode("utf-8")).hexdigest()
+
+
+def pack_result(report, equity, signal, resume):
+    """Compressed payload of one run; ``equity`` is the portfolio total as a Series."""
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        report=np.frombuffer(json.dumps(report, default=str).encode("utf-8"), dtype=np.uint8),
+        ts=np.asarray(equity.index, dtype="datetime64[ns]").view(np.int64),
+        equity=np.asarray(equity, dtype=np.float64),
+        signal=np.asarray(signal, dtype=np.int8),
+        resume=np.array([resume], dtype=np.int64),
+    )
+    return buffer.getvalue()
+
+
+def unpack_result(blob):
+    """``{"report", "equity", "signal", "resume"}`` from ``pack_result`` bytes."""
+    with np.load(io.BytesIO(blob)) as data:
+        return {
+            "report": json.loads(data["report"].tobytes().decode("utf-8")),
+            "equity": pd.Series(
+                data["equity"], index=pd.DatetimeIndex(data["ts"].view("datetime64[ns]"), name="Date")
+            ),
+            "signal": data["signal"].astype(np.int64),
+            "resume": int(data["resume"][0]),
+        }
@@ -0,0 +1,339 @@
+"""Parallel parameter sweeps over the backtest engine.
+
+The price array is copied once into shared memory; pool workers map it
+instead of receiving a pickled copy per task, and cache indicator
+arrays (rolling levels, EMAs) per period across the combinations they
+evaluate. Every result is appended to a JSONL file as soon as its chunk
+finishes, keyed by strategy, dataset hash, settings and parameters, so
+an interrupted sweep resumes where it stopped and combinations that
+were already evaluated are never run twice.
+
+Usage:
+    python -m services.backtest_engine.sweep fibonacci data/TCS.NS_historical.csv \\
+        --grid lookback=10,20,30 --grid target_pct=0.03,0.05
+    python -m services.backtest_engine.sweep ema data/TCS.NS_historical.csv \\
+        --range short_period=3:20 --range long_period=20:80 --method lhs --samples 200
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.config import BACKTEST_DATA_DIR, SWEEP_CHUNK_SIZE, SWEEP_WORKERS
+from services.backtest_engine.data import load_price_csv
+from services.backtest_engine.ema import ema, ema_signals
+from services.backtest_engine.fibonacci import fibonacci_levels, fibonacci_signals, run_backtest
+
+logger = logging.getLogger("backtest_sweep")
+
+METRICS = ("sharpe_ratio", "max_drawdown", "profit_factor", "total_return", "total_trades", "win_ratio")
+# Ranking: best Sharpe, then shallowest drawdown, then profit factor
+RANK_BY = ("sharpe_ratio", "max_drawdown", "profit_factor")
+
+# Sampled floats are rounded so near-identical draws deduplicate
+FLOAT_DIGITS = 4
+
+DEFAULT_SETTINGS = {"initial_capital": 100000, "shares_per_trade": 100, "broker_fee": 20}
+
+
+def _fibonacci(price, params, settings, cache):
+    lookback = int(params.get("lookback", 20))
+    if ("fib", lookback) not in cache:
+        cache[("fib", lookback)] = fibonacci_levels(price, lookback)
+    signals = fibonacci_signals(
+        price,
+        lookback,
+        params.get("stop_loss_pct", 0.02),
+        params.get("target_pct", 0.05),
+        settings.get("legacy", False),
+        levels=cache[("fib", lookback)],
+    )
+    return signals, settings.get("legacy", False)
+
+
+def _ema(price, params, settings, cache):
+    spans = int(params.get("short_period", 9)), int(params.get("long_period", 21))
+    for span in spans:
+        if ("ema", span) not in cache:
+            cache[("ema", span)] = ema(price, span)
+    signals = ema_signals(price, *spans, short=cache[("ema", spans[0])], long=cache[("ema", spans[1])])
+    return signals, False
+
+
+# Strategy name -> fn(price, params, settings, cache) -> (signals, legacy)
+STRATEGIES = {"fibonacci": _fibonacci, "ema": _ema}
+
+
+def evaluate(strategy, price, params, settings=None, cache=None):
+    """Metrics of one parameter combination (trade list dropped)."""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    signals, legacy = STRATEGIES[strategy](price, params, settings, {} if cache is None else cache)
+    _, report = run_backtest(
+        signals,
+        None,
+        settings["initial_capital"],
+        settings["shares_per_trade"],
+        settings["broker_fee"],
+        legacy,
+    )
+    return {m: plain_value(report[m]) for m in METRICS}
+
+
+def plain_value(value):
+    value = value.item() if isinstance(value, np.generic) else value
+    if isinstance(value, float) and not np.isfinite(value):
+        return None if np.isnan(value) else value
+    return value
+
+
+# --- parameter spaces -------------------------------------------------------
+
+
+def grid_combinations(grid):
+    """Every combination of ``{name: [values]}``."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def _scale(spec, u):
+    """Map unit samples onto ``(low, high)`` (ints if both bounds are) or a list of choices."""
+    if isinstance(spec, tuple):
+        low, high = spec
+        if isinstance(low, int) and isinstance(high, int):
+            return np.minimum(low + np.floor(u * (high - low + 1)), high).astype(np.int64).tolist()
+        return np.round(low + u * (high - low), FLOAT_DIGITS).tolist()
+    choices = list(spec)
+    return [choices[i] for i in np.minimum((u * len(choices)).astype(np.int64), len(choices) - 1)]
+
+
+def random_combinations(space, samples, seed=None):
+    """``samples`` uniform draws from ``{name: (low, high) | [choices]}``."""
+    rng = np.random.default_rng(seed)
+    columns = {name: _scale(spec, rng.random(samples)) for name, spec in space.items()}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def latin_hypercube(space, samples, seed=None):
+    """Latin-hypercube draws: each parameter's range is cut into ``samples`` strata
+    and every stratum is sampled exactly once."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, spec in space.items():
+        u = (rng.permutation(samples) + rng.random(samples)) / samples
+        columns[name] = _scale(spec, u)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+# --- pool workers -----------------------------------------------------------
+
+_worker = {}
+
+
+def _attach(name, length):
+    # Workers share the parent's resource tracker, which unlinks the block once
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"] = shm
+    _worker["price"] = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+    _worker["cache"] = {}
+
+
+def _evaluate_chunk(strategy, settings, chunk):
+    price, cache = _worker["price"], _worker["cache"]
+    out = []
+    for key, params in chunk:
+        started = time.perf_counter()
+        try:
+            metrics = evaluate(strategy, price, params, settings, cache)
+            error = None
+        except Exception as e:
+            metrics, error = {}, str(e)
+        out.append((key, params, metrics, error, (time.perf_counter() - started) * 1000))
+    return out
+
+
+# --- sweep ------------------------------------------------------------------
+
+
+def dataset_hash(price):
+    return hashlib.sha1(np.ascontiguousarray(price, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+
+class ParameterSweep:
+    """Evaluates parameter combinations of one strategy on one price series.
+
+    Results stream into ``results_path`` (JSONL); records already in the
+    file are loaded on start and skipped by ``run``.
+    """
+
+    def __init__(self, strategy, prices, results_path=None, settings=None, workers=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}; choose from {sorted(STRATEGIES)}")
+        self.strategy = strategy
+        self.price = np.ascontiguousarray(prices, dtype=np.float64)
+        self.dataset = dataset_hash(self.price)
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.workers = workers or SWEEP_WORKERS or os.cpu_count() or 1
+        self.results_path = Path(
+            results_path
+            or Path(BACKTEST_DATA_DIR) / "sweeps" / f"{strategy}_{self.dataset}.jsonl"
+        )
+        self.results = {}  # key -> record
+        self._load()
+
+    def key(self, params):
+        raw = json.dumps(
+            {"strategy": self.strategy, "dataset": self.dataset, "settings": self.settings, "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if not self.results_path.exists():
+            return
+        with open(self.results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by an interrupted run
+                self.results[record["key"]] = record
+        logger.info(f"♻️ Resuming sweep: {len(self.results)} results in {self.results_path}")
+
+    def _ends_with_newline(self):
+        with open(self.results_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def pending(self, combinations):
+        """``[(key, params)]`` not evaluated yet, duplicates removed."""
+        todo = {}
+        for params in combinations:
+            key = self.key(params)
+            if key not in self.results and key not in todo:
+                todo[key] = params
+        return list(todo.items())
+
+    def run(self, combinations, chunk_size=SWEEP_CHUNK_SIZE, on_result=None, cancel=None):
+        """Evaluate the pending combinations across the pool; returns the ranked table.
+
+        Setting ``cancel`` (a ``threading.Event``) stops after the chunks in
+        flight; what finished is on disk, so a later run resumes from there.
+        """
+        todo = self.pending(combinations)
+        if not todo:
+            logger.info("✅ Sweep: nothing left to evaluate")
+            return self.ranked()
+
+        started = time.perf_counter()
+        chunks = [todo[i : i + chunk_size] for i in range(0, len(todo), chunk_size)]
+        workers = min(self.workers, len(chunks))
+        shm = shared_memory.SharedMemory(create=True, size=max(self.price.nbytes, 1))
+        try:
+            np.ndarray(self.price.shape, dtype=np.float64, buffer=shm.buf)[:] = self.price
+            self.results_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.results_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach, initargs=(shm.name, len(self.price))
+            ) as pool:
+                if out.tell() and not self._ends_with_newline():
+                    out.write("\n")  # close off a line cut short by an interrupted run
+                futures = [
+                    pool.submit(_evaluate_chunk, self.strategy, self.settings, chunk) for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    if cancel is not None and cancel.is_set():
+                        for pending in futures:
+                            pending.cancel()
+                    if future.cancelled():
+                        continue
+                    for key, params, metrics, error, elapsed_ms in future.result():
+                        record = {
+                            "key": key,
+                            "strategy": self.strategy,
+                            "dataset": self.dataset,
+                            "params": params,
+                            **metrics,
+                            "error": error,
+                            "elapsed_ms": round(elapsed_ms, 3),
+                        }
+                        out.write(json.dumps(record) + "\n")
+                        self.results[key] = record
+                        if on_result:
+                            on_result(record)
+                    out.flush()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        logger.info(
+            f"🧪 Sweep {self.strategy}: {len(todo)} combinations on {workers} workers in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+        return self.ranked()
+
+    def ranked(self):
+        """Results as a DataFrame, one column per parameter, best first."""
+        records = [r for r in self.results.values() if not r.get("error")]
+        if not records:
+            return pd.DataFrame(columns=["key", *METRICS])
+        table = pd.DataFrame(
+            [{**r["params"], **{m: r.get(m) for m in METRICS}, "key": r["key"]} for r in records]
+        )
+        table[list(METRICS)] = table[list(METRICS)].astype(float)
+        return table.sort_values(list(RANK_BY), ascending=False, na_position="last", ignore_index=True)
+
+
+def _parse_values(text):
+    values = []
+    for part in text.split(","):
+        try:
+            values.append(int(part))
+        except ValueError:
+            values.append(float(part))
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel backtest parameter sweep")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("csv", help="yfinance-style price CSV")
+    parser.add_argument("--grid", action="append", default=[], help="name=v1,v2,...")
+    parser.add_argument("--range", action="append", default=[], help="name=low:high (ints if both are)")
+    parser.add_argument("--method", choices=("random", "lhs"), default="lhs")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="results JSONL (resumed if it exists)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    combinations = []
+    if args.grid:
+        grid = dict(item.split("=", 1) for item in args.grid)
+        combinations += grid_combinations({name: _parse_values(v) for name, v in grid.items()})
+    if args.range:
+        space = {}
+        for item in args.range:
+            name, bounds = item.split("=", 1)
+            space[name] = tuple(_parse_values(bounds.replace(":", ",")))
+        sample = latin_hypercube if args.method == "lhs" else random_combinations
+        combinations += sample(space, args.samples, args.seed)
+
+    sweep = ParameterSweep(args.strategy, load_price_csv(args.csv), args.out, workers=args.workers)
+    table = sweep.run(combinations)
+    print(table.drop(columns="key").head(args.top).to_string(index=False))
+    print(f"\n{len(table)} results in {sweep.results_path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
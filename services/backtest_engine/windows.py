@@ -0,0 +1,51 @@
+"""Batched sliding-window inference for next-bar price models.
+
+``services/backtest.backtest_ai_strategy`` scores every bar from the
+``window`` closes before it. Here all those histories are one strided
+view of the close array (no copies), the scaler and model each see
+``batch_size`` windows per call instead of one, and the resulting trades
+are computed as arrays.
+"""
+
+import numpy as np
+
+from core.config import AI_BACKTEST_BATCH_SIZE
+
+WINDOW = 60
+
+
+def sliding_windows(close, window=WINDOW):
+    """Read-only ``(n - window, window)`` view; row ``k`` is the history of bar ``window + k``."""
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    if len(close) <= window:
+        return np.empty((0, window))
+    return np.lib.stride_tricks.sliding_window_view(close, window)[:-1]
+
+
+def predict_windows(model, scaler, windows, batch_size=AI_BACKTEST_BATCH_SIZE):
+    """Predicted next price for every window: the windows are scaled, fed to
+    ``model.predict`` as ``(batch, window, 1)`` and inverse-scaled, as
+    ``predict_future_prices`` does for a single window."""
+    n, window = windows.shape
+    predicted = np.empty(n)
+    for start in range(0, n, batch_size):
+        batch = windows[start : start + batch_size]
+        # The scaler is per value, so scaling the flattened batch equals scaling each window
+        scaled = scaler.transform(batch.reshape(-1, 1)).reshape(len(batch), window, 1)
+        output = np.asarray(model.predict(scaled)).reshape(-1, 1)
+        predicted[start : start + len(batch)] = scaler.inverse_transform(output).ravel()
+    return predicted
+
+
+def window_trades(close, predicted, window=WINDOW):
+    """One-bar trades from the predictions: BUY when the prediction is above the
+    last close of the window, SELL otherwise, closed on the next bar.
+
+    Returns ``(is_buy, entry_price, exit_price, profit_loss)`` arrays.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    entry = close[window - 1 : -1]
+    exit_price = close[window:]
+    is_buy = predicted > entry
+    profit_loss = np.where(is_buy, exit_price - entry, entry - exit_price)
+    return is_buy, entry, exit_price, profit_loss
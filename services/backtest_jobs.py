@@ -0,0 +1,381 @@
+"""Background backtest and sweep jobs.
+
+``submit`` queues a job on a bounded thread pool and returns at once with
+its id; each user may have at most ``BACKTEST_JOBS_PER_USER`` jobs queued
+or running. Job functions report as they go with ``job.update(progress,
+**streams)``: stream items (trades, equity points, sweep results) are
+kept on the job and pushed to every subscriber, so a WebSocket that
+attaches late first gets a snapshot of everything so far and then the
+live events. Cancelling a queued job drops it; a running job stops at
+its next ``job.check()`` (sweeps after the chunks in flight).
+
+Sweeps still fan out over their own process pool, but one of at most
+``BACKTEST_JOB_SWEEP_WORKERS`` processes, and ``submit`` rejects grids
+or samples larger than ``BACKTEST_JOB_SWEEP_MAX_COMBINATIONS`` before
+anything is queued.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import (
+    BACKTEST_JOB_SWEEP_MAX_COMBINATIONS,
+    BACKTEST_JOB_SWEEP_WORKERS,
+    BACKTEST_JOB_WORKERS,
+    BACKTEST_JOBS_KEPT,
+    BACKTEST_JOBS_PER_USER,
+)
+from ai_trading.paper_engine import PaperTradingEngine
+from database.connection import SessionLocal
+from services.backtest_cache import backtest_cache
+from services.backtest_engine.data import find_price_csv, load_price_csv
+from services.backtest_engine.sweep import (
+    ParameterSweep,
+    grid_combinations,
+    latin_hypercube,
+    random_combinations,
+)
+from services.ohlcv_store import ohlcv_store
+
+logger = logging.getLogger("backtest_jobs")
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Rows of candles scored per model call in a Fibonacci + AI run
+FIB_AI_CHUNK = 250
+# Sweep results returned in a job's final result
+SWEEP_TOP = 20
+
+
+class JobLimitError(Exception):
+    """The user already has the maximum number of active jobs."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BacktestJob:
+    def __init__(self, job_id, user_id, kind, params):
+        self.id = job_id
+        self.user_id = user_id
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0
+        self.streams = {}  # name -> items so far (trades, equity, results, ...)
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._subscribers = {}  # queue -> loop
+
+    @property
+    def active(self):
+        return self.status not in FINISHED
+
+    @property
+    def cancel_event(self):
+        return self._cancel
+
+    def _publish(self, event):
+        # Caller holds self._lock
+        for queue, loop in list(self._subscribers.items()):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                self._subscribers.pop(queue, None)  # its event loop is gone
+
+    def update(self, progress=None, **streams):
+        """Record progress and new stream items, and push them to subscribers."""
+        with self._lock:
+            if progress is not None:
+                self.progress = progress
+                self._publish({"type": "progress", "progress": round(progress, 4)})
+            for name, items in streams.items():
+                if items:
+                    self.streams.setdefault(name, []).extend(items)
+                    self._publish({"type": name, name: list(items)})
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.finish(CANCELLED)  # never started
+
+    def start(self):
+        with self._lock:
+            if self._cancel.is_set() or not self.active:
+                return False
+            self.status = RUNNING
+            self.started_at = time.time()
+            self._publish({"type": "status", "status": RUNNING})
+            return True
+
+    def finish(self, status, result=None, error=None):
+        with self._lock:
+            if not self.active:
+                return
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            if status == DONE:
+                self.progress = 1.0
+            self._publish({"type": "status", "status": status, "result": result, "error": error})
+
+    def summary(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def snapshot(self):
+        """Everything reported so far, as one ``snapshot`` event."""
+        return {"type": "snapshot", **self.summary(), "result": self.result, "streams": self.streams}
+
+    def subscribe(self, loop=None):
+        """Queue of events for this job, starting with a snapshot; call from the event loop."""
+        queue = asyncio.Queue()
+        with self._lock:
+            queue.put_nowait(self.snapshot())
+            if self.active:
+                self._subscribers[queue] = loop or asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+
+# --- job kinds ------------------------------------------------------------------
+
+
+def _price_csv(params):
+    symbol = params.get("symbol")
+    if not symbol:
+        raise ValueError("A symbol is required")
+    path = find_price_csv(symbol, params.get("sector"))
+    if path is None:
+        raise ValueError(f"No price data for {symbol}")
+    return path
+
+
+FIBONACCI_PARAMS = (
+    "lookback", "stop_loss_pct", "target_pct", "initial_capital", "shares_per_trade", "broker_fee", "legacy",
+)
+
+
+def fibonacci_job(job, params):
+    prices = load_price_csv(_price_csv(params))
+    settings = {k: params[k] for k in FIBONACCI_PARAMS if k in params}
+    # Through the results cache, like POST /fibonacci, so repeated jobs are lookups
+    db = SessionLocal()
+    try:
+        report, equity = backtest_cache.fibonacci_run(db, prices, settings, job.user_id)
+    finally:
+        db.close()
+    report = dict(report)
+    trades = report.pop("trades")
+    equity = [[str(ts), value] for ts, value in zip(equity.index, equity.tolist())]
+    job.update(progress=1.0, trades=trades, equity=equity)
+    return report
+
+
+def check_sweep(params):
+    """Reject a sweep whose grid or sample is too large, before it is queued."""
+    method = params.get("method", "grid")
+    if method == "grid":
+        grid = params.get("grid")
+        if not isinstance(grid, dict) or not all(isinstance(v, list) for v in grid.values()):
+            raise ValueError("grid must map each parameter to a list of values")
+        size = math.prod(len(values) for values in grid.values())
+    else:
+        size = int(params.get("samples", 100))
+    if size > BACKTEST_JOB_SWEEP_MAX_COMBINATIONS:
+        raise ValueError(
+            f"Sweep of {size} combinations exceeds the limit of {BACKTEST_JOB_SWEEP_MAX_COMBINATIONS}"
+        )
+
+
+def sweep_job(job, params):
+    prices = load_price_csv(_price_csv(params))
+    method = params.get("method", "grid")
+    if method == "grid":
+        combinations = grid_combinations(params["grid"])
+    else:
+        sample = latin_hypercube if method == "lhs" else random_combinations
+        combinations = sample(params["space"], int(params.get("samples", 100)), params.get("seed"))
+
+    sweep = ParameterSweep(
+        params["strategy"], prices, settings=params.get("settings"), workers=BACKTEST_JOB_SWEEP_WORKERS
+    )
+    total = max(len(sweep.pending(combinations)), 1)
+    done = 0
+
+    def on_result(record):
+        nonlocal done
+        done += 1
+        job.update(progress=done / total, results=[record])
+
+    table = sweep.run(combinations, on_result=on_result, cancel=job.cancel_event)
+    job.check()
+    return {"evaluated": done, "ranked": table.head(SWEEP_TOP).to_dict(orient="records")}
+
+
+def fib_ai_job(job, params):
+    # Imported here: the module loads the trained model on import
+    from services.stratigy.fibonacci_strategy import fib_ai_signals, fib_features, fib_levels
+
+    frame = ohlcv_store.load_csv(_price_csv(params)).frame().astype("float64")
+    df = frame.reset_index(names="timestamp")
+    df["timestamp"] = df["timestamp"].astype(str)
+    levels = fib_levels(df)
+    fib_features(df)
+
+    engine = PaperTradingEngine()
+    signal_count = 0
+    for start in range(0, len(df), FIB_AI_CHUNK):
+        job.check()
+        signals = fib_ai_signals(df.iloc[start : start + FIB_AI_CHUNK], levels)
+        signal_count += len(signals)
+        first = len(engine.logger.trades)
+        equity = []  # realized P&L after each closing trade
+        for signal in signals:
+            logged = len(engine.logger.trades)
+            engine.trade(signal)
+            if len(engine.logger.trades) > logged and engine.logger.trades[-1]["action"] == "SELL":
+                equity.append([signal["timestamp"], engine.logger.get_total_pnl()])
+        job.update(
+            progress=min(start + FIB_AI_CHUNK, len(df)) / max(len(df), 1),
+            signals=signals,
+            trades=engine.logger.trades[first:],
+            equity=equity,
+        )
+
+    return {
+        "symbol": params["symbol"],
+        "fibonacci_levels": levels,
+        "pnl": engine.logger.get_total_pnl(),
+        "trades": len(engine.logger.trades),
+        "signals": signal_count,
+        "candles": frame.tail(100).reset_index().astype({"Date": str}).to_dict(orient="records"),
+    }
+
+
+JOB_KINDS = {
+    "fibonacci": fibonacci_job,
+    "sweep": sweep_job,
+    "fib_ai": fib_ai_job,
+}
+
+# Parameter checks run by ``submit``; a ValueError rejects the job
+JOB_CHECKS = {
+    "sweep": check_sweep,
+}
+
+
+# --- manager --------------------------------------------------------------------
+
+
+class BacktestJobs:
+    def __init__(self, workers=BACKTEST_JOB_WORKERS, per_user=BACKTEST_JOBS_PER_USER, kept=BACKTEST_JOBS_KEPT):
+        self.workers = workers
+        self.per_user = per_user
+        self.kept = kept
+        self._jobs = OrderedDict()  # job id -> job, oldest first
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backtest-job")
+        return self._executor
+
+    def submit(self, user_id, kind, params=None, run=None):
+        """Queue a job; ``run(job, params)`` overrides the function for ``kind``."""
+        run = run or JOB_KINDS.get(kind)
+        if run is None:
+            raise ValueError(f"Unknown job kind {kind!r}; choose from {sorted(JOB_KINDS)}")
+        if kind in JOB_CHECKS:
+            JOB_CHECKS[kind](params or {})
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.user_id == user_id and job.active)
+            if active >= self.per_user:
+                raise JobLimitError(f"{active} jobs already queued or running (limit {self.per_user})")
+            job = BacktestJob(uuid.uuid4().hex, user_id, kind, params or {})
+            self._jobs[job.id] = job
+            self._prune()
+            job.future = self._pool().submit(self._run, job, run)
+        logger.info(f"📥 Backtest job {job.id} ({kind}) queued for user {user_id}")
+        return job
+
+    def _prune(self):
+        # Caller holds self._lock; forget the oldest finished jobs beyond the limit
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[: max(len(finished) - self.kept, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, run):
+        if not job.start():
+            job.finish(CANCELLED)
+            return
+        started = time.perf_counter()
+        try:
+            job.finish(DONE, result=run(job, job.params))
+        except JobCancelled:
+            job.finish(CANCELLED)
+        except Exception as e:
+            logger.error(f"❌ Backtest job {job.id} ({job.kind}) failed: {e}")
+            job.finish(FAILED, error=str(e))
+        logger.info(
+            f"🏁 Backtest job {job.id} ({job.kind}) {job.status} in {time.perf_counter() - started:.1f}s"
+        )
+
+    def get(self, job_id, user_id=None):
+        job = self._jobs.get(job_id)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+
+    def jobs_for(self, user_id):
+        return [job for job in list(self._jobs.values()) if job.user_id == user_id]
+
+    def cancel(self, job_id, user_id=None):
+        job = self.get(job_id, user_id)
+        if job is None:
+            return None
+        job.cancel()
+        return job
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Singleton instance
+backtest_jobs = BacktestJobs()
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.instrument_master import get_instrument_master, ticker_instrument_key
+from services.upstox.tick_decoder import CompactTick
+
+logger = logging.getLogger("bar_aggregator")
+
+# Timeframe -> bar length in seconds
+TIMEFRAMES = {"1s": 1, "1m": 60, "5m": 300, "15m": 900}
+
+# Closed bars kept per instrument: 5 minutes of 1s bars, about one
+# session of 1m and 5 sessions of 5m/15m.
+BAR_CAPACITY = {"1s": 300, "1m": 375, "5m": 375, "15m": 125}
+INITIAL_ROWS = 32
+
+# Columns of a bar row
+TS, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+BAR_FIELDS = ("ts", "open", "high", "low", "close", "volume")
+
+# A bar is closed by the clock this long after its end, so a tick that
+# traded just before the boundary but arrived after it still lands.
+CLOSE_GRACE = 2
+
+
+class BarRing:
+    """Closed OHLCV bars for one instrument and timeframe.
+
+    Rows live in a numpy ring buffer (grown by doubling up to
+    ``capacity``, then overwritten oldest-first). The bar being formed is
+    a plain list and only copied into the ring when it closes.
+    """
+
+    __slots__ = ("interval", "capacity", "data", "head", "count", "bar", "last_closed")
+
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.capacity = capacity
+        self.data = np.empty((min(INITIAL_ROWS, capacity), len(BAR_FIELDS)))
+        self.head = 0  # next row to write
+        self.count = 0  # closed bars held
+        self.bar = None  # forming bar: [start, open, high, low, close, volume]
+        self.last_closed = float("-inf")  # start of the newest closed bar
+
+    def update(self, ts, price, volume):
+        """Apply one trade; returns the bar it closed, if any.
+
+        Returns False for a tick older than the forming bar, or for one
+        whose interval was already closed (e.g. by the clock).
+        """
+        start = ts - ts % self.interval
+        bar = self.bar
+        if bar is not None:
+            if start == bar[TS]:
+                if price > bar[HIGH]:
+                    bar[HIGH] = price
+                elif price < bar[LOW]:
+                    bar[LOW] = price
+                bar[CLOSE] = price
+                bar[VOLUME] += volume
+                return None
+            if start < bar[TS]:
+                return False
+        elif start <= self.last_closed:
+            return False
+        closed = self.close()
+        self.bar = [start, price, price, price, price, volume]
+        return closed
+
+    def close(self):
+        bar = self.bar
+        if bar is None:
+            return None
+        rows = len(self.data)
+        if self.head == rows and rows < self.capacity:
+            grown = np.empty((min(rows * 2, self.capacity), len(BAR_FIELDS)))
+            grown[:rows] = self.data
+            self.data = grown
+            rows = len(grown)
+        if self.head == rows:
+            self.head = 0
+        self.data[self.head] = bar
+        self.head += 1
+        self.count = min(self.count + 1, self.capacity)
+        self.last_closed = bar[TS]
+        self.bar = None
+        return bar
+
+    def last(self, n, include_partial=False):
+        n = min(n, self.count)
+        rows = len(self.data)
+        start = self.head - n
+        if start >= 0:
+            out = self.data[start : self.head]
+        else:
+            out = np.concatenate((self.data[start + rows :], self.data[: self.head]))
+        if include_partial and self.bar is not None:
+            out = np.vstack((out, self.bar))
+        else:
+            out = out.copy()
+        return out
+
+
+class BarAggregator:
+    """Incremental multi-timeframe OHLCV bars built from the live tick stream.
+
+    Register ``on_message`` as a feed hub listener. Each tick updates one
+    ``BarRing`` per timeframe in O(1). Closed bars are announced to
+    ``on_bar_close`` listeners as ``(instrument_key, timeframe, bar)`` with
+    ``bar`` laid out as ``BAR_FIELDS``. Listeners are called from the
+    receive loop and must not block.
+
+    Volume comes from the cumulative day volume (``vtt``) on each tick, so
+    the first tick seen for an instrument contributes none.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES, capacity=BAR_CAPACITY):
+        self.timeframes = dict(timeframes)
+        self.capacity = dict(capacity)
+        self.series = {}  # instrument key -> [BarRing per timeframe]
+        self.tickers = {}  # yfinance ticker -> (master version, instrument key or None)
+        self.day_volume = {}
+        self.listeners = []
+        self.ticks = 0
+        self.late_ticks = 0
+        self.bars_closed = 0
+
+    def on_bar_close(self, callback):
+        self.listeners.append(callback)
+
+    def on_message(self, message):
+        if message.get("type") != "live_feed":
+            return
+        for key, tick in message["data"].items():
+            price, ltt, vtt = _tick_fields(tick)
+            if price:
+                self.update(key, ltt / 1000 if ltt else time.time(), price, vtt)
+
+    def update(self, instrument_key, ts, price, day_volume=0):
+        rings = self.series.get(instrument_key)
+        if rings is None:
+            rings = [
+                BarRing(interval, self.capacity.get(name, 300))
+                for name, interval in self.timeframes.items()
+            ]
+            self.series[instrument_key] = rings
+
+        volume = 0
+        if day_volume:
+            previous = self.day_volume.get(instrument_key)
+            if previous is not None and day_volume > previous:
+                volume = day_volume - previous
+            self.day_volume[instrument_key] = day_volume
+
+        self.ticks += 1
+        ts = int(ts)
+        for name, ring in zip(self.timeframes, rings):
+            closed = ring.update(ts, price, volume)
+            if closed:
+                self._emit(instrument_key, name, closed)
+            elif closed is False:
+                self.late_ticks += 1
+
+    def close_due(self, now=None):
+        """Close bars whose interval has ended, for instruments that went quiet."""
+        now = time.time() if now is None else now
+        for key, rings in self.series.items():
+            for name, ring in zip(self.timeframes, rings):
+                bar = ring.bar
+                if bar is not None and bar[TS] + ring.interval + CLOSE_GRACE <= now:
+                    self._emit(key, name, ring.close())
+
+    async def run_clock(self, interval=1.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.close_due()
+            except Exception as e:
+                logger.warning(f"⚠️ Bar clock error: {e}")
+
+    def _emit(self, instrument_key, timeframe, bar):
+        self.bars_closed += 1
+        for listener in self.listeners:
+            try:
+                listener(instrument_key, timeframe, bar)
+            except Exception as e:
+                logger.warning(f"⚠️ Bar listener failed: {e}")
+
+    def has(self, instrument_key):
+        return instrument_key in self.series
+
+    def resolve(self, symbol):
+        """Instrument key that ``symbol`` (a key or a yfinance ticker) is streamed under, or None."""
+        if "|" in symbol:
+            return symbol
+        master = get_instrument_master()
+        if master is None:
+            return None
+        cached = self.tickers.get(symbol)
+        if cached is None or cached[0] != master.version:
+            cached = (master.version, ticker_instrument_key(master, symbol))
+            self.tickers[symbol] = cached
+        return cached[1]
+
+    def last(self, instrument_key, timeframe, n, include_partial=False):
+        """Last ``n`` bars as ``{field: array}`` (oldest first)."""
+        rows = self._ring(instrument_key, timeframe).last(n, include_partial)
+        return {field: rows[:, i] for i, field in enumerate(BAR_FIELDS)}
+
+    def frame(self, instrument_key, timeframe, n, include_partial=True):
+        """Last ``n`` bars in the ``yf.download`` layout."""
+        rows = self._ring(instrument_key, timeframe).last(n, include_partial)
+        index = pd.to_datetime(rows[:, TS], unit="s", utc=True).tz_convert(
+            "Asia/Kolkata"
+        )
+        return pd.DataFrame(
+            {
+                "Open": rows[:, OPEN],
+                "High": rows[:, HIGH],
+                "Low": rows[:, LOW],
+                "Close": rows[:, CLOSE],
+                "Volume": rows[:, VOLUME],
+            },
+            index=index,
+        )
+
+    def _ring(self, instrument_key, timeframe):
+        if timeframe not in self.timeframes:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        rings = self.series.get(instrument_key)
+        if rings is None:
+            return BarRing(self.timeframes[timeframe], 1)
+        return rings[list(self.timeframes).index(timeframe)]
+
+    def stats(self):
+        return {
+            "instruments": len(self.series),
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "bars_closed": self.bars_closed,
+        }
+
+
+def _tick_fields(tick):
+    if isinstance(tick, CompactTick):
+        return tick.ltp, tick.ltt, tick.vtt
+
+    # MessageToDict feed entry
+    full = tick.get("fullFeed", {})
+    feed = full.get("marketFF") or full.get("indexFF") or tick.get(
+        "firstLevelWithGreeks", {}
+    )
+    ltpc = feed.get("ltpc") or tick.get("ltpc", {})
+    return ltpc.get("ltp"), int(ltpc.get("ltt", 0)), int(feed.get("vtt", 0))
+
+
+# Singleton instance
+bar_aggregator = BarAggregator()
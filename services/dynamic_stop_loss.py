@@ -2,16 +2,25 @@ import numpy as np
 from sqlalchemy.orm import Session
 from database.models import TradePerformance
 from services.dhan_client import get_dhan_client
+from services.bar_aggregator import bar_aggregator
+from services.quote_board import quote_board
 
 def calculate_dynamic_stop_loss(user_id: int, symbol: str, db: Session):
     """Dynamically adjust stop-loss based on market volatility."""
 
-    # Fetch last 10-minute price movements
-    client = get_dhan_client(user_id, db)
-    historical_prices = client.get_historical_data(symbol, exchange="NSE", from_date="2023-01-01", to_date="2023-01-02")["data"]
+    # Fetch last 10-minute price movements (live 1m bars when the symbol is
+    # on the feed, REST history otherwise)
+    closes = []
+    quote = quote_board.get(symbol)
+    if quote:
+        closes = bar_aggregator.last(quote["instrument_key"], "1m", 10, include_partial=True)["close"]
+    if len(closes) < 3:
+        client = get_dhan_client(user_id, db)
+        historical_prices = client.get_historical_data(symbol, exchange="NSE", from_date="2023-01-01", to_date="2023-01-02")["data"]
+        closes = [data["close"] for data in historical_prices]
 
     # Calculate volatility (standard deviation of price changes)
-    price_changes = np.diff([data["close"] for data in historical_prices])
+    price_changes = np.diff(closes)
     volatility = np.std(price_changes)
 
     # Fetch open trade
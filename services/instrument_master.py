@@ -0,0 +1,512 @@
+"""Compiled, memory-mapped Upstox instrument master.
+
+``compile_instruments`` turns the ``upstox_instruments.json`` dump into a
+directory of column files plus prebuilt indexes; ``get_instrument_master``
+loads it once per process (compiling first when the JSON is newer) and
+every instrument lookup in the app goes through it.
+
+    python -m services.instrument_master [instruments.json] [out_dir]
+
+Each build goes into its own ``build-*`` subdirectory and ``CURRENT``
+names the live one, so swapping in a new build never touches files an
+older snapshot still has mapped. Layout of a build:
+
+- ``meta.json``: row count, column kinds, source size/mtime, index keys
+- numeric columns: ``<col>.npy`` (int64 or float64)
+- string columns: ``<col>.blob`` (utf-8, concatenated) + ``<col>.offsets.npy``
+- ``<col>.nulls.npy`` for columns with missing values
+- key indexes (CSR): ``idx_<name>.offsets.npy`` + ``idx_<name>.rows.npy``,
+  keys listed in ``meta.json`` in the same order
+- ``order_expiry.npy`` / ``order_strike.npy``: row ids sorted by value
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.config import INSTRUMENT_MASTER_DIR, INSTRUMENTS_JSON_PATH
+
+logger = logging.getLogger("instrument_master")
+
+FORMAT_VERSION = 1
+
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_BOOL = "bool"
+KIND_STR = "str"
+KIND_JSON = "json"
+
+SYMBOL_FIELDS = ("trading_symbol", "asset_symbol", "underlying_symbol")
+
+# Index name -> function(record) returning the keys a row is filed under
+KEY_INDEXES = {
+    "symbol": lambda r: {
+        f"{(r.get('exchange') or '').upper()}:{(r.get(f) or '').strip().upper()}"
+        for f in SYMBOL_FIELDS
+        if (r.get(f) or "").strip()
+    },
+    "underlying": lambda r: {
+        (r.get(f) or "").strip().upper()
+        for f in ("underlying_symbol", "asset_symbol")
+        if (r.get(f) or "").strip()
+    },
+    "type": lambda r: {(r.get("instrument_type") or "").upper()},
+    "expiry": lambda r: {str(int(r["expiry"]))} if r.get("expiry") else set(),
+    "instrument_key": lambda r: {r["instrument_key"]} if r.get("instrument_key") else set(),
+}
+
+
+def _column_kind(values):
+    kinds = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            kinds.add(KIND_BOOL)
+        elif isinstance(value, int):
+            kinds.add(KIND_INT)
+        elif isinstance(value, float):
+            kinds.add(KIND_FLOAT)
+        elif isinstance(value, str):
+            kinds.add(KIND_STR)
+        else:
+            kinds.add(KIND_JSON)
+    if not kinds or kinds == {KIND_STR}:
+        return KIND_STR
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds <= {KIND_INT, KIND_FLOAT}:
+        return KIND_FLOAT
+    return KIND_JSON
+
+
+def _write_strings(out, name, values):
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in encoded], out=offsets[1:])
+    (out / f"{name}.blob").write_bytes(b"".join(encoded))
+    np.save(out / f"{name}.offsets.npy", offsets)
+
+
+def compile_instruments(source=INSTRUMENTS_JSON_PATH, out_dir=INSTRUMENT_MASTER_DIR):
+    """Compile the instrument JSON dump into a new build under ``out_dir``.
+
+    The build is written completely before ``CURRENT`` is switched to it
+    (write + rename); returns the row count.
+    """
+    started = time.perf_counter()
+    source = Path(source)
+    out_dir = Path(out_dir)
+    with open(source, "r", encoding="utf-8") as f:
+        records = [r for r in json.load(f) if r.get("instrument_key")]
+
+    build = f"build-{time.time_ns()}-{os.getpid()}"
+    tmp = out_dir / build
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    names = []
+    for record in records:
+        for name in record:
+            if name not in names:
+                names.append(name)
+
+    columns = {}
+    for name in names:
+        values = [r.get(name) for r in records]
+        kind = _column_kind(values)
+        columns[name] = kind
+        nulls = np.array([v is None for v in values], dtype=bool)
+        if nulls.any():
+            np.save(tmp / f"{name}.nulls.npy", nulls)
+
+        if kind == KIND_STR:
+            _write_strings(tmp, name, [v or "" for v in values])
+        elif kind == KIND_JSON:
+            _write_strings(tmp, name, [json.dumps(v) if v is not None else "" for v in values])
+        elif kind == KIND_FLOAT:
+            array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            np.save(tmp / f"{name}.npy", array)
+        else:
+            array = np.array([0 if v is None else v for v in values], dtype=np.int64)
+            np.save(tmp / f"{name}.npy", array)
+
+    indexes = {}
+    for index_name, keys_of in KEY_INDEXES.items():
+        filed = defaultdict(list)
+        for row, record in enumerate(records):
+            for key in keys_of(record):
+                filed[key].append(row)
+        keys = sorted(filed)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(filed[k]) for k in keys], out=offsets[1:])
+        rows = np.fromiter(
+            (row for k in keys for row in filed[k]), dtype=np.int64, count=int(offsets[-1])
+        )
+        np.save(tmp / f"idx_{index_name}.offsets.npy", offsets)
+        np.save(tmp / f"idx_{index_name}.rows.npy", rows)
+        indexes[index_name] = keys
+
+    for name in ("expiry", "strike_price"):
+        values = np.array(
+            [r.get(name) if r.get(name) is not None else np.nan for r in records],
+            dtype=np.float64,
+        )
+        order = np.argsort(values, kind="stable")
+        order = order[~np.isnan(values[order])]  # rows without a value are left out
+        np.save(tmp / f"order_{name.split('_')[0]}.npy", order.astype(np.int64))
+
+    stat = source.stat()
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": len(records),
+        "columns": columns,
+        "indexes": indexes,
+        "source": str(source),
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "built_at": time.time(),
+    }
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    _publish_build(out_dir, build)
+    logger.info(
+        f"🗜️ Compiled {len(records)} instruments into {out_dir} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return len(records)
+
+
+def _publish_build(out_dir, build):
+    pointer = out_dir / "CURRENT.tmp"
+    pointer.write_text(build, encoding="utf-8")
+    previous = current_build(out_dir)
+    os.replace(pointer, out_dir / "CURRENT")
+
+    # Keep the build just replaced for readers still holding it; older
+    # ones go (a failure here, e.g. a file still mapped on Windows, is
+    # retried on the next build).
+    keep = {build, previous and previous.name}
+    for path in out_dir.glob("build-*"):
+        if path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def current_build(directory):
+    """Directory of the live build (``directory`` itself for a bare build)."""
+    directory = Path(directory)
+    pointer = directory / "CURRENT"
+    if pointer.exists():
+        return directory / pointer.read_text(encoding="utf-8").strip()
+    if (directory / "meta.json").exists():
+        return directory
+    return None
+
+
+def _mapped(path):
+    # Plain ndarray view of the mapping: same pages, without the np.memmap
+    # subclass overhead on every scalar read.
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+class InstrumentMaster:
+    """Read-only view over a compiled instrument directory.
+
+    Columns are memory-mapped, so opening is cheap and the OS shares the
+    pages between worker processes. Lookups return numpy arrays of row
+    ids (ascending, i.e. in source-file order); ``rows()`` materializes
+    them as the same dicts the JSON dump holds.
+    """
+
+    def __init__(self, directory=INSTRUMENT_MASTER_DIR):
+        self.directory = current_build(directory)
+        if self.directory is None:
+            raise FileNotFoundError(f"No compiled instrument master in {directory}")
+        with open(self.directory / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported instrument master version in {directory}")
+
+        self.size = self.meta["rows"]
+        self.columns = self.meta["columns"]
+        self._arrays = {}
+        self._nulls = {}
+        for name, kind in self.columns.items():
+            path = self.directory / f"{name}.nulls.npy"
+            if path.exists():
+                self._nulls[name] = _mapped(path)
+            if kind in (KIND_STR, KIND_JSON):
+                blob = self.directory / f"{name}.blob"
+                data = (
+                    np.asarray(np.memmap(blob, dtype=np.uint8, mode="r"))
+                    if blob.stat().st_size
+                    else np.zeros(0, dtype=np.uint8)
+                )
+                offsets = _mapped(self.directory / f"{name}.offsets.npy")
+                self._arrays[name] = (data, offsets)
+            else:
+                self._arrays[name] = _mapped(self.directory / f"{name}.npy")
+
+        self._indexes = {}
+        for index_name, keys in self.meta["indexes"].items():
+            slots = {key: i for i, key in enumerate(keys)}
+            offsets = _mapped(self.directory / f"idx_{index_name}.offsets.npy")
+            rows = _mapped(self.directory / f"idx_{index_name}.rows.npy")
+            self._indexes[index_name] = (slots, offsets, rows)
+
+        self._orders = {
+            name: _mapped(self.directory / f"order_{name}.npy")
+            for name in ("expiry", "strike")
+        }
+        self._frame = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def version(self):
+        return self.directory.name
+
+    # -- lookups -------------------------------------------------------
+
+    def lookup(self, index_name, key):
+        slots, offsets, rows = self._indexes[index_name]
+        slot = slots.get(key)
+        if slot is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(rows[offsets[slot] : offsets[slot + 1]])
+
+    def by_symbol(self, exchange, symbol):
+        return self.lookup("symbol", f"{exchange.upper()}:{symbol.strip().upper()}")
+
+    def by_underlying(self, symbol):
+        return self.lookup("underlying", symbol.strip().upper())
+
+    def by_type(self, instrument_type):
+        return self.lookup("type", instrument_type.upper())
+
+    def by_expiry(self, expiry_ms):
+        return self.lookup("expiry", str(int(expiry_ms)))
+
+    def find_key(self, instrument_key):
+        rows = self.lookup("instrument_key", instrument_key)
+        return int(rows[0]) if len(rows) else None
+
+    def index_keys(self, index_name):
+        return self.meta["indexes"][index_name]
+
+    def key_rows(self):
+        """First row id of each instrument key, aligned with ``index_keys("instrument_key")``."""
+        _, offsets, rows = self._indexes["instrument_key"]
+        return np.asarray(rows[offsets[:-1]])
+
+    def expiring_between(self, start_ms, end_ms):
+        """Row ids with ``start_ms <= expiry < end_ms`` (sorted by expiry)."""
+        order = self._orders["expiry"]
+        values = self.column("expiry")[order]
+        lo, hi = np.searchsorted(values, [start_ms, end_ms])
+        return np.asarray(order[lo:hi])
+
+    def strikes_between(self, low, high):
+        """Row ids with ``low <= strike_price <= high`` (sorted by strike)."""
+        order = self._orders["strike"]
+        values = self.column("strike_price")[order]
+        lo = np.searchsorted(values, low, side="left")
+        hi = np.searchsorted(values, high, side="right")
+        return np.asarray(order[lo:hi])
+
+    def active(self, ids, now=None):
+        """Drop rows whose expiry is in the past (rows without one are kept)."""
+        if "expiry" not in self.columns or not len(ids):
+            return ids
+        now_ms = int((time.time() if now is None else now) * 1000)
+        expiry = self.column("expiry")[ids]
+        keep = (expiry == 0) | (expiry >= now_ms)
+        if "expiry" in self._nulls:
+            keep |= self._nulls["expiry"][ids]
+        return ids[keep]
+
+    # -- values --------------------------------------------------------
+
+    def column(self, name):
+        """Numeric column as a (memory-mapped) numpy array."""
+        return self._arrays[name]
+
+    def value(self, name, row):
+        return self.values(name, [row])[0]
+
+    def values(self, name, ids):
+        """Python values of one column for ``ids`` (None where missing)."""
+        kind = self.columns.get(name)
+        ids = np.asarray(ids, dtype=np.int64)
+        if kind is None:
+            return [None] * len(ids)
+
+        if kind in (KIND_STR, KIND_JSON):
+            data, offsets = self._arrays[name]
+            view = memoryview(data)
+            values = [
+                str(view[start:end], "utf-8")
+                for start, end in zip(offsets[ids].tolist(), offsets[ids + 1].tolist())
+            ]
+            if kind == KIND_JSON:
+                values = [json.loads(v) if v else None for v in values]
+        else:
+            column = self._arrays[name][ids]
+            values = (column.astype(bool) if kind == KIND_BOOL else column).tolist()
+
+        nulls = self._nulls.get(name)
+        if nulls is not None:
+            for i in np.flatnonzero(nulls[ids]).tolist():
+                values[i] = None
+        return values
+
+    def row(self, row):
+        return self.rows([row])[0]
+
+    def rows(self, ids):
+        """Rows as dicts shaped like the JSON dump (missing fields left out)."""
+        records = [{} for _ in range(len(ids))]
+        for name in self.columns:
+            for record, value in zip(records, self.values(name, ids)):
+                if value is not None:
+                    record[name] = value
+        return records
+
+    def get(self, instrument_key):
+        row = self.find_key(instrument_key)
+        return self.row(row) if row is not None else None
+
+    def dataframe(self):
+        """All rows as a DataFrame (built once, for pandas-based callers)."""
+        if self._frame is None:
+            data = {}
+            for name, kind in self.columns.items():
+                if kind in (KIND_STR, KIND_JSON):
+                    data[name] = self.values(name, np.arange(self.size))
+                else:
+                    data[name] = np.asarray(self._arrays[name])
+                    nulls = self._nulls.get(name)
+                    if nulls is not None and kind != KIND_FLOAT:
+                        dtype = "boolean" if kind == KIND_BOOL else "Int64"
+                        data[name] = pd.array(data[name], dtype=dtype)
+                        data[name][np.asarray(nulls)] = pd.NA
+            self._frame = pd.DataFrame(data)
+        return self._frame
+
+
+def spot_instrument_keys(master, securities):
+    """Instrument keys of the EQ/INDEX listing for each ``{"symbol", "exchange"}``."""
+    instrument_keys = set()
+    for stock in securities:
+        symbol = stock.get("symbol", "").strip().upper()
+        exchange = stock.get("exchange", "").strip().upper()
+        if not symbol or not exchange:
+            continue
+
+        found = False
+        ids = master.active(master.by_symbol(exchange, symbol))
+        for row, itype in zip(ids, master.values("instrument_type", ids)):
+            if (itype or "").strip().upper() in ("EQ", "INDEX"):
+                instrument_keys.add(master.value("instrument_key", int(row)))
+                found = True
+
+        if not found:
+            logger.warning(f"⚠️ No EQ/INDEX instrument found for {symbol} on {exchange}")
+    return list(instrument_keys)
+
+
+# yfinance ticker suffix -> exchange
+YFINANCE_EXCHANGES = {".NS": "NSE", ".BO": "BSE"}
+
+
+def ticker_instrument_key(master, ticker):
+    """Instrument key of the EQ listing behind a yfinance ticker (``RELIANCE.NS``), or None.
+
+    Instrument keys (``NSE_EQ|...``) are returned unchanged.
+    """
+    if "|" in ticker:
+        return ticker
+    for suffix, exchange in YFINANCE_EXCHANGES.items():
+        if ticker.upper().endswith(suffix):
+            symbol = ticker[: -len(suffix)]
+            break
+    else:
+        return None
+    ids = master.active(master.by_symbol(exchange, symbol))
+    for row, itype in zip(ids, master.values("instrument_type", ids)):
+        if (itype or "").strip().upper() == "EQ":
+            return master.value("instrument_key", int(row))
+    return None
+
+
+_master = None
+_master_lock = threading.Lock()
+
+
+def _is_stale(directory, source):
+    build = current_build(directory)
+    if build is None:
+        return True
+    if not Path(source).exists():
+        return False
+    with open(build / "meta.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    stat = Path(source).stat()
+    return (
+        meta.get("version") != FORMAT_VERSION
+        or meta.get("source_size") != stat.st_size
+        or meta.get("source_mtime") != stat.st_mtime
+    )
+
+
+def get_instrument_master(source=INSTRUMENTS_JSON_PATH, directory=INSTRUMENT_MASTER_DIR):
+    """Shared instrument master; compiles the JSON dump first if it changed.
+
+    Returns None when neither a compiled master nor the JSON dump exists.
+    """
+    global _master
+    if _master is not None:
+        return _master
+    with _master_lock:
+        if _master is None:
+            if _is_stale(directory, source):
+                if not Path(source).exists():
+                    logger.error(f"❌ Instrument dump not found: {source}")
+                    return None
+                compile_instruments(source, directory)
+            _master = InstrumentMaster(directory)
+            logger.info(f"📚 Instrument master loaded: {len(_master)} rows")
+    return _master
+
+
+def swap_instrument_master(master):
+    """Make ``master`` the shared snapshot; returns the one it replaced.
+
+    Readers that already hold the old snapshot keep using it; the next
+    ``get_instrument_master()`` call sees the new one.
+    """
+    global _master
+    with _master_lock:
+        previous, _master = _master, master
+    return previous
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else INSTRUMENTS_JSON_PATH
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else INSTRUMENT_MASTER_DIR
+    count = compile_instruments(source, out_dir)
+    print(f"{count} instruments compiled into {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
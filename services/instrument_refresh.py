@@ -0,0 +1,208 @@
+import asyncio
+import gzip
+import inspect
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from core.config import (
+    INSTRUMENT_MASTER_DIR,
+    INSTRUMENT_REFRESH_TIME,
+    INSTRUMENTS_JSON_PATH,
+    UPSTOX_INSTRUMENTS_URL,
+)
+from services.instrument_master import (
+    InstrumentMaster,
+    compile_instruments,
+    get_instrument_master,
+    swap_instrument_master,
+)
+
+logger = logging.getLogger("instrument_refresh")
+
+# Fields whose change on a live contract is worth telling subscribers about
+CHANGE_FIELDS = (
+    "trading_symbol",
+    "instrument_type",
+    "lot_size",
+    "tick_size",
+    "freeze_quantity",
+    "expiry",
+    "strike_price",
+)
+
+
+def _keys_and_rows(master, now):
+    keys = np.array(master.index_keys("instrument_key"))
+    rows = master.key_rows()
+    return keys, rows, np.isin(rows, master.active(rows, now))
+
+
+def diff_instruments(old, new, now=None):
+    """Compare two snapshots by instrument key.
+
+    - ``added``: live in ``new`` and not listed in ``old``
+    - ``expired``: listed in ``old`` but not live in ``new`` (dropped from
+      the dump or past expiry)
+    - ``changed``: live in both with a different ``CHANGE_FIELDS`` value
+    """
+    new_keys, new_rows, new_live = _keys_and_rows(new, now)
+    live_keys, live_rows = new_keys[new_live], new_rows[new_live]
+
+    if old is None:
+        return {
+            "added": live_keys.tolist(),
+            "expired": [],
+            "changed": [],
+            "from_version": None,
+            "to_version": new.version,
+        }
+
+    old_keys, old_rows, _ = _keys_and_rows(old, now)
+    common, old_at, new_at = np.intersect1d(
+        old_keys, live_keys, assume_unique=True, return_indices=True
+    )
+    added = np.setdiff1d(live_keys, old_keys, assume_unique=True)
+    expired = np.setdiff1d(old_keys, live_keys, assume_unique=True)
+
+    changed = np.zeros(len(common), dtype=bool)
+    for field in CHANGE_FIELDS:
+        if field not in old.columns and field not in new.columns:
+            continue
+        before = old.values(field, old_rows[old_at])
+        after = new.values(field, live_rows[new_at])
+        changed |= np.array([a != b for a, b in zip(before, after)], dtype=bool)
+
+    return {
+        "added": added.tolist(),
+        "expired": expired.tolist(),
+        "changed": common[changed].tolist(),
+        "from_version": old.version,
+        "to_version": new.version,
+    }
+
+
+def _seconds_until(hhmm, now=None):
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+
+class InstrumentRefresher:
+    """Daily instrument-master refresh with a published diff.
+
+    ``refresh()`` downloads the Upstox instrument dump, compiles and opens
+    the new snapshot in a worker thread, diffs it against the live one,
+    swaps it in for every reader and then hands the diff to each
+    ``on_refresh`` listener (sync or async). A failed download or build
+    leaves the current snapshot in place.
+    """
+
+    def __init__(
+        self,
+        url=UPSTOX_INSTRUMENTS_URL,
+        source=INSTRUMENTS_JSON_PATH,
+        directory=INSTRUMENT_MASTER_DIR,
+        refresh_time=INSTRUMENT_REFRESH_TIME,
+    ):
+        self.url = url
+        self.source = Path(source)
+        self.directory = directory
+        self.refresh_time = refresh_time
+        self.listeners = []
+        self.last_diff = None
+        self.last_refresh = None
+        self._lock = asyncio.Lock()
+
+    def on_refresh(self, callback):
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    async def download(self):
+        async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        await asyncio.to_thread(self._write_dump, response.content)
+        logger.info(f"⬇️ Instrument dump downloaded ({len(response.content)} bytes)")
+
+    def _write_dump(self, content):
+        if content[:2] == b"\x1f\x8b":
+            content = gzip.decompress(content)
+        self.source.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.source.with_name(f"{self.source.name}.tmp-{os.getpid()}")
+        tmp.write_bytes(content)
+        os.replace(tmp, self.source)
+
+    def _build(self):
+        compile_instruments(self.source, self.directory)
+        return InstrumentMaster(self.directory)
+
+    async def refresh(self, download=True):
+        async with self._lock:
+            started = time.perf_counter()
+            old = await asyncio.to_thread(get_instrument_master, self.source, self.directory)
+            if download and self.url:
+                await self.download()
+
+            new = await asyncio.to_thread(self._build)
+            diff = await asyncio.to_thread(diff_instruments, old, new)
+            swap_instrument_master(new)
+
+            self.last_diff = diff
+            self.last_refresh = datetime.now()
+            logger.info(
+                f"🔄 Instrument master {diff['to_version']}: "
+                f"{len(diff['added'])} added, {len(diff['expired'])} expired, "
+                f"{len(diff['changed'])} changed in {time.perf_counter() - started:.1f}s"
+            )
+
+        for listener in list(self.listeners):
+            try:
+                result = listener(diff)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"⚠️ Instrument refresh listener failed: {e}")
+        return diff
+
+    async def run_daily(self):
+        while True:
+            await asyncio.sleep(_seconds_until(self.refresh_time))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Instrument refresh failed, keeping current snapshot: {e}")
+
+    def stats(self):
+        diff = self.last_diff or {}
+        return {
+            "version": diff.get("to_version"),
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "added": len(diff.get("added", [])),
+            "expired": len(diff.get("expired", [])),
+            "changed": len(diff.get("changed", [])),
+        }
+
+
+# Singleton instance
+instrument_refresher = InstrumentRefresher()
+
+
+def main():
+    diff = asyncio.run(instrument_refresher.refresh())
+    print(
+        f"{diff['to_version']}: {len(diff['added'])} added, "
+        f"{len(diff['expired'])} expired, {len(diff['changed'])} changed"
+    )
+
+
+if __name__ == "__main__":
+    main()
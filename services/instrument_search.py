@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from services.instrument_master import get_instrument_master
+from services.quote_board import quote_board
+
+logger = logging.getLogger("instrument_search")
+
+# Result tiers, best first
+TIER_EXACT, TIER_PREFIX, TIER_SUBSTRING = range(3)
+
+# Lower sorts first; anything unlisted ranks after these
+TYPE_RANK = {"EQ": 0, "INDEX": 0, "FUT": 1, "CE": 2, "PE": 2}
+OTHER_TYPE_RANK = 3
+
+SEARCH_LIMIT = 30
+
+
+def _trigram_postings(texts):
+    """CSR trigram index: sorted trigram codes, offsets, and row ids per code.
+
+    Strings are packed into a fixed-width byte matrix so every trigram of
+    every row is computed in one numpy pass; non-ASCII characters are dropped.
+    """
+    encoded = np.array([t.encode("ascii", "ignore") for t in texts], dtype=bytes)
+    width = encoded.dtype.itemsize
+    if width < 3 or not len(encoded):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty.astype(np.uint32), np.zeros(1, dtype=np.int64), empty
+
+    chars = encoded.view(np.uint8).reshape(len(encoded), width).astype(np.uint32)
+    codes = (chars[:, :-2] << 16) | (chars[:, 1:-1] << 8) | chars[:, 2:]
+    valid = (chars[:, :-2] > 0) & (chars[:, 1:-1] > 0) & (chars[:, 2:] > 0)
+    rows = np.broadcast_to(np.arange(len(encoded))[:, None], codes.shape)
+
+    pairs = np.unique((codes[valid].astype(np.int64) << 32) | rows[valid])
+    codes, rows = (pairs >> 32).astype(np.uint32), pairs & 0xFFFFFFFF
+    keys, starts = np.unique(codes, return_index=True)
+    offsets = np.append(starts, len(codes)).astype(np.int64)
+    return keys, offsets, rows
+
+
+def _encode(values):
+    """Upper-cased labels -> ``({label: code}, code per row)``."""
+    codes = {}
+    column = [codes.setdefault((v or "").upper(), len(codes)) for v in values]
+    return codes, np.array(column, dtype=np.int64)
+
+
+def _trigrams(text):
+    raw = text.encode("ascii", "ignore")
+    return {(raw[i] << 16) | (raw[i + 1] << 8) | raw[i + 2] for i in range(len(raw) - 2)}
+
+
+class InstrumentSearchIndex:
+    """Autocomplete over trading symbol and name of one instrument master.
+
+    Exact symbols come from a dict, prefixes from sorted symbol/name
+    arrays (two bisects), substrings from a trigram index whose posting
+    lists are intersected and then verified. Within a tier rows are
+    ordered by instrument type (equity/index, futures, options), live
+    volume from the quote board, nearest expiry and symbol length.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        started = time.perf_counter()
+        ids = np.arange(len(master))
+        self.symbols = [(s or "").upper() for s in master.values("trading_symbol", ids)]
+        self.names = [(s or "").upper() for s in master.values("name", ids)]
+
+        self.exact = {}
+        for row, symbol in enumerate(self.symbols):
+            self.exact.setdefault(symbol, []).append(row)
+
+        self._sorted = {}
+        for field, texts in (("symbol", self.symbols), ("name", self.names)):
+            values = np.array(texts, dtype=str)
+            order = np.argsort(values, kind="stable")
+            self._sorted[field] = (values[order], order)
+
+        self._postings = _trigram_postings(
+            [f"{s}\x00{n}" for s, n in zip(self.symbols, self.names)]
+        )
+
+        types = master.values("instrument_type", ids)
+        exchanges = master.values("exchange", ids)
+        self.type_codes, self.type_code = _encode(types)
+        self.exchange_codes, self.exchange = _encode(exchanges)
+        self.type_rank = np.array(
+            [TYPE_RANK.get(t, OTHER_TYPE_RANK) for t in self.type_codes], dtype=np.int64
+        )[self.type_code]
+        self._masks = {}
+        self.expiry = expiry = (
+            np.asarray(master.column("expiry"), dtype=np.int64)
+            if "expiry" in master.columns
+            else np.zeros(len(master), dtype=np.int64)
+        )
+        lengths = np.array([len(s) for s in self.symbols], dtype=np.int64)
+        # Static order: type, then expiry (none first), then shorter symbols
+        self.rank = np.empty(len(master), dtype=np.int64)
+        self.rank[np.lexsort((lengths, expiry, self.type_rank))] = ids
+        logger.info(
+            f"🔎 Search index: {len(master)} rows, {len(self._postings[0])} trigrams in "
+            f"{(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    def _prefix(self, field, query):
+        values, order = self._sorted[field]
+        lo = np.searchsorted(values, query, side="left")
+        hi = np.searchsorted(values, query + "\uffff", side="left")
+        return order[lo:hi]
+
+    def _substring(self, query):
+        grams = _trigrams(query)
+        keys, offsets, rows = self._postings
+        if not grams:
+            return np.zeros(0, dtype=np.int64)
+        lists = []
+        for gram in grams:
+            i = np.searchsorted(keys, gram)
+            if i == len(keys) or keys[i] != gram:
+                return np.zeros(0, dtype=np.int64)
+            lists.append(rows[offsets[i] : offsets[i + 1]])
+        lists.sort(key=len)
+        found = lists[0]
+        for other in lists[1:]:
+            found = np.intersect1d(found, other, assume_unique=True)
+            if not len(found):
+                break
+        return found
+
+    def _allowed(self, exchange, types):
+        """Row mask for an exchange/type filter (None: everything, False: nothing)."""
+        exchange = (exchange or "ALL").upper()
+        types = tuple(sorted(t.upper() for t in types)) if types else ()
+        key = (exchange, types)
+        if key not in self._masks:
+            mask = None
+            if exchange != "ALL":
+                code = self.exchange_codes.get(exchange)
+                mask = False if code is None else self.exchange == code
+            if types and mask is not False:
+                codes = [self.type_codes[t] for t in types if t in self.type_codes]
+                wanted = np.isin(self.type_code, codes)
+                mask = wanted if mask is None else mask & wanted
+            self._masks[key] = mask
+        return self._masks[key]
+
+    def _best(self, ids, allowed, limit, now_ms=None):
+        """Filtered ``ids``: the ``limit`` best in rank order, or all unsorted if None."""
+        ids = ids[allowed[ids]] if allowed is not None else ids
+        if now_ms is not None:
+            expiry = self.expiry[ids]
+            ids = ids[(expiry == 0) | (expiry >= now_ms)]
+        if limit is None:
+            return ids
+        if len(ids) > limit:
+            ids = ids[np.argpartition(self.rank[ids], limit - 1)[:limit]]
+        return ids[np.argsort(self.rank[ids])]
+
+    def search(self, query, exchange=None, limit=SEARCH_LIMIT, types=None, now=None):
+        """Live row ids best-first, with their match tier: ``[(row, tier), ...]``."""
+        query = (query or "").strip().upper()
+        if not query:
+            return []
+        now_ms = int((time.time() if now is None else now) * 1000)
+
+        allowed = self._allowed(exchange, types)
+        if allowed is False:
+            return []
+
+        results, seen = [], set()
+
+        def take(ids, tier):
+            for row in ids.tolist():
+                if row not in seen and len(results) < limit:
+                    seen.add(row)
+                    results.append((row, tier))
+
+        exact = np.array(self.exact.get(query, []), dtype=np.int64)
+        take(self._best(exact, allowed, limit, now_ms), TIER_EXACT)
+        if len(results) < limit:
+            # A row can match on both symbol and name, hence twice the page
+            prefix = np.concatenate((self._prefix("symbol", query), self._prefix("name", query)))
+            take(self._best(prefix, allowed, 2 * limit + len(results), now_ms), TIER_PREFIX)
+        if len(results) < limit and len(query) >= 3:
+            candidates = self._best(self._substring(query), allowed, None, now_ms)
+            # Trigram hits can be false positives: verify the best few first,
+            # the rest only if that does not fill the page.
+            head = self._best(candidates, None, 4 * limit)
+            self._verify(query, head, results, seen, limit)
+            if len(results) < limit and len(head) < len(candidates):
+                rest = np.setdiff1d(candidates, head, assume_unique=True)
+                self._verify(query, self._best(rest, None, len(rest)), results, seen, limit)
+
+        return self._by_liquidity(results)
+
+    def _verify(self, query, ids, results, seen, limit):
+        for row in ids.tolist():
+            if len(results) >= limit:
+                return
+            if row not in seen and (query in self.symbols[row] or query in self.names[row]):
+                seen.add(row)
+                results.append((row, TIER_SUBSTRING))
+
+    def _by_liquidity(self, results):
+        if not results:
+            return results
+        rows = np.array([row for row, _ in results], dtype=np.int64)
+        keys = self.master.values("instrument_key", rows)
+        volume = quote_board.snapshot(keys)["volume"]
+        tiers = np.array([tier for _, tier in results])
+        order = np.lexsort((self.rank[rows], -volume, self.type_rank[rows], tiers))
+        return [results[i] for i in order.tolist()]
+
+    def records(self, query, exchange=None, limit=SEARCH_LIMIT, types=None, now=None):
+        hits = self.search(query, exchange, limit, types, now)
+        return self.master.rows([row for row, _ in hits])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index(master=None):
+    """Search index for ``master`` or the current one (rebuilt after a swap)."""
+    global _index
+    master = master or get_instrument_master()
+    if master is None:
+        return None
+    index = _index
+    if index is not None and index.master is master:
+        return index
+    with _index_lock:
+        if _index is None or _index.master is not master:
+            _index = InstrumentSearchIndex(master)
+        return _index
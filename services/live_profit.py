@@ -4,6 +4,7 @@ import json
 from sqlalchemy.orm import Session
 from database.models import TradePerformance
 from services.dhan_client import get_dhan_client
+from services.quote_board import quote_board
 
 async def send_profit_updates(user_id: int, db: Session):
     """Send real-time profit/loss updates over WebSockets."""
@@ -15,7 +16,10 @@ async def send_profit_updates(user_id: int, db: Session):
 
             profit_updates = []
             for trade in trades:
-                live_price = get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"]
+                live_price = quote_board.latest_price(
+                    trade.symbol,
+                    fallback=lambda: get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"],
+                )
                 profit_loss = (live_price - trade.entry_price) if trade.trade_type == "BUY" else (trade.entry_price - live_price)
                 
                 profit_updates.append({
@@ -5,6 +5,7 @@ import json
 from sqlalchemy.orm import Session
 from database.models import TradePerformance
 from services.dhan_client import get_dhan_client
+from services.quote_board import quote_board
 
 async def send_live_trade_updates(user_id: int):
     """Send live trade updates over WebSockets."""
@@ -16,7 +17,10 @@ async def send_live_trade_updates(user_id: int):
 
             trade_updates = []
             for trade in trades:
-                live_price = get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"]
+                live_price = quote_board.latest_price(
+                    trade.symbol,
+                    fallback=lambda: get_dhan_client(user_id, db).get_market_data(trade.symbol, exchange="NSE")["ltp"],
+                )
                 trade_updates.append({
                     "symbol": trade.symbol,
                     "trade_type": trade.trade_type,
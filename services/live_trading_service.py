@@ -8,9 +8,13 @@ import logging
 from typing import Dict, List
 from database.connection import get_db
 from database.models import Position, Trade
+from services.bar_aggregator import bar_aggregator
 
 logger = logging.getLogger(__name__)
 
+LIVE_BARS = 375  # ~5 sessions of 5m bars, like period="5d"
+MIN_LIVE_BARS = 60  # SMA50 plus dropna needs at least this many
+
 class LiveTradingService:
     def __init__(self):
         self.model = self._load_model()
@@ -56,6 +60,15 @@ class LiveTradingService:
                 
     def _get_live_data(self, symbol: str) -> pd.DataFrame:
         """Fetch real-time market data"""
+        # Instruments streamed over the Upstox feed (by instrument key or
+        # yfinance ticker) are served from the live bar aggregator; anything
+        # else still goes to yfinance.
+        key = bar_aggregator.resolve(symbol)
+        if key is not None and bar_aggregator.has(key):
+            data = bar_aggregator.frame(key, "5m", LIVE_BARS)
+            if len(data) >= MIN_LIVE_BARS:
+                return data
+
         try:
             # Get intraday data (5-minute intervals)
             data = yf.download(
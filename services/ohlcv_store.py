@@ -0,0 +1,338 @@
+"""Columnar, memory-mapped store of historical OHLCV bars.
+
+yfinance CSV exports (``data/*_historical.csv`` and
+``data/processed/<sector>/*_historical.csv``, with the three-row
+Price/Ticker/Date header or a plain one) are converted once into one
+partition per source file and timeframe:
+
+    <OHLCV_STORE_DIR>/<timeframe>/<SYMBOL>@<source hash>/
+        meta.json   symbol, rows, first/last timestamp, source CSV path/size/mtime, sector
+        ts.bin      int64 epoch ns, ascending
+        open.bin high.bin low.bin close.bin   float64
+        volume.bin  int64
+
+The same symbol is exported under several sectors (and sometimes at the
+top level with different content), so a partition is named after the
+CSV it came from, not just the symbol. Bars written directly with
+``write``/``append`` use the symbol as the partition name.
+
+Columns are raw little-endian arrays mapped with ``np.memmap``; ``rows``
+in ``meta.json`` says how much of each file is valid. A date range is
+two bisects on the mapped ``ts`` column, so slicing only touches the
+pages it returns. ``append`` writes new bars past the end of each
+column and then replaces ``meta.json``, so readers never see half an
+append.
+
+    python -m services.ohlcv_store [data_dir]
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.config import BACKTEST_DATA_DIR, OHLCV_STORE_DIR
+
+logger = logging.getLogger("ohlcv_store")
+
+FORMAT_VERSION = 2
+
+CSV_SUFFIX = "_historical.csv"
+
+# Column -> on-disk dtype; prices keep the CSV's float64 values exactly
+COLUMNS = {
+    "ts": "<i8",
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<i8",
+}
+# Store column -> yfinance frame column
+FRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+
+def read_yfinance_csv(source):
+    """OHLCV frame (``Open`` .. ``Volume``, ``DatetimeIndex``) from a yfinance CSV.
+
+    Header rows that are not dates (``Ticker``, ``Date``) are dropped, and
+    lower-case headers are accepted. Tz-aware timestamps become naive UTC.
+    """
+    df = pd.read_csv(source)
+    df.columns = [str(c).strip() for c in df.columns]
+    dates = pd.to_datetime(df[df.columns[0]], errors="coerce", format="ISO8601")
+    keep = dates.notna().to_numpy()
+    index = pd.DatetimeIndex(dates[keep], name="Date")
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+
+    by_name = {c.lower(): c for c in df.columns[1:]}
+    frame = pd.DataFrame(index=index)
+    for column, label in FRAME_COLUMNS.items():
+        if column in by_name:
+            frame[label] = pd.to_numeric(df[by_name[column]][keep], errors="coerce").to_numpy()
+        else:
+            frame[label] = np.nan
+    frame = frame.dropna(subset=["Close"])
+    frame["Volume"] = frame["Volume"].fillna(0)
+    return frame[~frame.index.duplicated(keep="last")].sort_index()
+
+
+def symbol_from_path(path):
+    name = Path(path).name
+    return name[: -len(CSV_SUFFIX)] if name.endswith(CSV_SUFFIX) else Path(path).stem
+
+
+def csv_partition(path, symbol=None):
+    """Partition name for a CSV: its symbol plus a hash of its resolved path."""
+    source = str(Path(path).resolve())
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return f"{symbol or symbol_from_path(path)}@{digest}"
+
+
+def _columns_from_frame(frame):
+    columns = {"ts": frame.index.to_numpy(dtype="datetime64[ns]").view(np.int64)}
+    for column, label in FRAME_COLUMNS.items():
+        columns[column] = frame[label].to_numpy()
+    return {name: np.ascontiguousarray(values, dtype=COLUMNS[name]) for name, values in columns.items()}
+
+
+def _to_ns(value):
+    return None if value is None else pd.Timestamp(value).value
+
+
+class Bars:
+    """Bars of one partition as column arrays (memory-mapped unless sliced by copy)."""
+
+    __slots__ = ("symbol", "timeframe", "columns")
+
+    def __init__(self, symbol, timeframe, columns):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def between(self, start=None, end=None):
+        """Bars with ``start <= time <= end`` (either side open), as views."""
+        ts = self.columns["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, _to_ns(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _to_ns(end), side="right"))
+        return Bars(self.symbol, self.timeframe, {n: c[lo:hi] for n, c in self.columns.items()})
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.columns["ts"].view("datetime64[ns]"), name="Date")
+
+    def frame(self):
+        """The bars in the yfinance layout."""
+        return pd.DataFrame(
+            {label: self.columns[column] for column, label in FRAME_COLUMNS.items()},
+            index=self.index,
+        )
+
+    def close(self):
+        """Close prices as a float64 Series (what the backtest engine consumes)."""
+        return pd.Series(self.columns["close"], index=self.index, name="Close")
+
+
+class OHLCVStore:
+    """Partitions under ``root``; mapped columns are cached until ``meta.json`` changes."""
+
+    def __init__(self, root=OHLCV_STORE_DIR):
+        self.root = Path(root)
+        self._open = {}  # partition directory -> (meta mtime_ns, Bars)
+        self._lock = threading.Lock()
+
+    def _dir(self, name, timeframe):
+        for part in (name, timeframe):
+            if not part or part in (".", "..") or "/" in part or "\\" in part:
+                raise ValueError(f"Invalid partition name: {part!r}")
+        return self.root / timeframe / name
+
+    def meta(self, name, timeframe="1d"):
+        path = self._dir(name, timeframe) / "meta.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def partitions(self, timeframe="1d"):
+        folder = self.root / timeframe
+        if not folder.is_dir():
+            return []
+        return sorted(p.name for p in folder.iterdir() if (p / "meta.json").exists())
+
+    def symbols(self, timeframe="1d"):
+        """Distinct symbols stored, whichever sources they came from."""
+        return sorted({self.meta(name, timeframe)["symbol"] for name in self.partitions(timeframe)})
+
+    def _write_meta(self, directory, meta):
+        tmp = directory / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, directory / "meta.json")
+
+    def write(self, name, timeframe, frame, symbol=None, **extra):
+        """Replace partition ``name`` with ``frame`` (yfinance layout); returns its row count."""
+        directory = self._dir(name, timeframe)
+        staging = directory.with_name(f".{name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        columns = _columns_from_frame(frame)
+        for column, values in columns.items():
+            values.tofile(staging / f"{column}.bin")
+        ts = columns["ts"]
+        meta = {
+            "version": FORMAT_VERSION,
+            "symbol": symbol or name,
+            "timeframe": timeframe,
+            "rows": len(ts),
+            "first": int(ts[0]) if len(ts) else None,
+            "last": int(ts[-1]) if len(ts) else None,
+            **extra,
+        }
+        self._write_meta(staging, meta)
+
+        # Swap directories; readers holding the old mapping keep valid pages
+        retired = directory.with_name(f".{name}.old-{os.getpid()}-{threading.get_ident()}")
+        try:
+            if directory.exists():
+                os.replace(directory, retired)
+            os.replace(staging, directory)
+        except OSError:
+            # Another process swapped in the same partition first
+            shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(retired, ignore_errors=True)
+        return len(ts)
+
+    def append(self, name, timeframe, frame):
+        """Add bars newer than the partition's last one; returns how many were added."""
+        meta = self.meta(name, timeframe)
+        if meta is None:
+            return self.write(name, timeframe, frame)
+        if meta["last"] is not None:
+            frame = frame[frame.index.to_numpy(dtype="datetime64[ns]").view(np.int64) > meta["last"]]
+        if not len(frame):
+            return 0
+
+        directory = self._dir(name, timeframe)
+        columns = _columns_from_frame(frame)
+        for column, values in columns.items():
+            path = directory / f"{column}.bin"
+            with open(path, "r+b") as f:
+                # Bytes past ``rows`` are from an append that never got its meta
+                f.truncate(meta["rows"] * np.dtype(COLUMNS[column]).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+        ts = columns["ts"]
+        meta["rows"] += len(ts)
+        meta["last"] = int(ts[-1])
+        if meta["first"] is None:
+            meta["first"] = int(ts[0])
+        self._write_meta(directory, meta)
+        return len(ts)
+
+    def load(self, name, timeframe="1d", start=None, end=None):
+        """Mapped bars of one partition (sliced to ``start``/``end``), or None."""
+        directory = self._dir(name, timeframe)
+        try:
+            stamp = (directory / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._open.get(directory)
+        if cached is None or cached[0] != stamp:
+            with self._lock:
+                cached = self._open.get(directory)
+                if cached is None or cached[0] != stamp:
+                    cached = (stamp, self._map(directory, name, timeframe))
+                    self._open[directory] = cached
+        bars = cached[1]
+        return bars if start is None and end is None else bars.between(start, end)
+
+    def _map(self, directory, name, timeframe):
+        meta = self.meta(name, timeframe)
+        rows = meta["rows"]
+        columns = {}
+        for column, dtype in COLUMNS.items():
+            if rows:
+                # Plain ndarray view of the mapping, without np.memmap's per-read overhead
+                columns[column] = np.asarray(
+                    np.memmap(directory / f"{column}.bin", dtype=dtype, mode="r", shape=(rows,))
+                )
+            else:
+                columns[column] = np.zeros(0, dtype=dtype)
+        return Bars(meta.get("symbol", name), timeframe, columns)
+
+    # --- CSV sources -----------------------------------------------------
+
+    def is_stale(self, path, symbol=None, timeframe="1d"):
+        meta = self.meta(csv_partition(path, symbol), timeframe)
+        if meta is None:
+            return True
+        stat = Path(path).stat()
+        return (
+            meta.get("version") != FORMAT_VERSION
+            or meta.get("source") != str(Path(path).resolve())
+            or meta.get("source_size") != stat.st_size
+            or meta.get("source_mtime") != stat.st_mtime_ns
+        )
+
+    def import_csv(self, path, symbol=None, timeframe="1d", force=False):
+        """Convert one yfinance CSV unless its partition is up to date; returns rows written."""
+        path = Path(path)
+        symbol = symbol or symbol_from_path(path)
+        if not force and not self.is_stale(path, symbol, timeframe):
+            return 0
+        stat = path.stat()
+        extra = {"source": str(path.resolve()), "source_size": stat.st_size, "source_mtime": stat.st_mtime_ns}
+        if path.parent.parent.name == "processed":
+            extra["sector"] = path.parent.name
+        return self.write(csv_partition(path, symbol), timeframe, read_yfinance_csv(path), symbol, **extra)
+
+    def load_csv(self, path, symbol=None, timeframe="1d", start=None, end=None):
+        """Bars for a CSV, converting it first when it is new or has changed."""
+        symbol = symbol or symbol_from_path(path)
+        self.import_csv(path, symbol, timeframe)
+        return self.load(csv_partition(path, symbol), timeframe, start, end)
+
+    def import_data_dir(self, data_dir=BACKTEST_DATA_DIR, timeframe="1d"):
+        """Convert ``data_dir/*_historical.csv`` and ``data_dir/processed/*/*_historical.csv``."""
+        data_dir = Path(data_dir)
+        paths = sorted(data_dir.glob(f"*{CSV_SUFFIX}")) + sorted(
+            data_dir.glob(f"processed/*/*{CSV_SUFFIX}")
+        )
+        converted = 0
+        for path in paths:
+            try:
+                if self.import_csv(path, timeframe=timeframe):
+                    converted += 1
+            except Exception as e:
+                logger.error(f"⚠️ Could not convert {path}: {e}")
+        logger.info(f"🗄️ OHLCV store: {converted} of {len(paths)} CSVs converted into {self.root}")
+        return converted
+
+
+# Singleton instance
+ohlcv_store = OHLCVStore()
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else BACKTEST_DATA_DIR
+    converted = ohlcv_store.import_data_dir(data_dir)
+    print(f"{converted} CSVs converted; {len(ohlcv_store.partitions())} daily partitions in {ohlcv_store.root}")
+
+
+if __name__ == "__main__":
+    main()
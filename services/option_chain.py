@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from core.config import OPTION_CHAIN_ATM_STRIKES
+from services.instrument_master import get_instrument_master
+
+logger = logging.getLogger("option_chain")
+
+
+class StrikeLadder:
+    """Options of one underlying and expiry, one slot per listed strike.
+
+    ``strikes`` is sorted ascending; ``ce``/``pe`` hold the master row id
+    of the call/put at each strike, or -1 where that side is not listed.
+    """
+
+    __slots__ = ("underlying", "expiry", "strikes", "ce", "pe")
+
+    def __init__(self, underlying, expiry, strikes, ce, pe):
+        self.underlying = underlying
+        self.expiry = expiry
+        self.strikes = strikes
+        self.ce = ce
+        self.pe = pe
+
+    def __len__(self):
+        return len(self.strikes)
+
+    @property
+    def step(self):
+        """Most common gap between listed strikes."""
+        if len(self.strikes) < 2:
+            return 0.0
+        gaps, counts = np.unique(np.diff(self.strikes), return_counts=True)
+        return float(gaps[np.argmax(counts)])
+
+    def atm(self, spot=None):
+        """Slot of the strike closest to ``spot`` (the middle strike without one)."""
+        if spot is None:
+            return len(self.strikes) // 2
+        strikes = self.strikes
+        i = int(np.searchsorted(strikes, spot))
+        if i == len(strikes) or (i > 0 and spot - strikes[i - 1] <= strikes[i] - spot):
+            i -= 1
+        return i
+
+    def window(self, spot=None, n=None, width=None):
+        """Slice of slots around ATM: ``n`` strikes each side, or within ``width`` of it."""
+        if not len(self.strikes):
+            return slice(0, 0)
+        i = self.atm(spot)
+        if width is not None:
+            centre = self.strikes[i]
+            lo = int(np.searchsorted(self.strikes, centre - width, side="left"))
+            hi = int(np.searchsorted(self.strikes, centre + width, side="right"))
+            return slice(lo, hi)
+        if n is None:
+            return slice(0, len(self.strikes))
+        return slice(max(i - n, 0), i + n + 1)
+
+    def rows(self, part=slice(None)):
+        """Listed call and put row ids in ``part``, calls first."""
+        ce, pe = self.ce[part], self.pe[part]
+        return ce[ce >= 0], pe[pe >= 0]
+
+
+class OptionChainIndex:
+    """Per-underlying, per-expiry strike ladders over one instrument master.
+
+    Built once per snapshot from the master's underlying/type indexes and
+    its numeric columns, so picking ATM±N is a bisect and a chain is a
+    gather of row ids.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.ladders = {}  # underlying -> {expiry ms: StrikeLadder}, expiries ascending
+        started = time.perf_counter()
+        self._build()
+        logger.info(
+            f"⛓️ Option chain index: {len(self.ladders)} underlyings, "
+            f"{sum(len(e) for e in self.ladders.values())} expiries in "
+            f"{(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    def _build(self):
+        master = self.master
+        if "strike_price" not in master.columns or "expiry" not in master.columns:
+            return
+        kind = np.zeros(len(master), dtype=np.int8)  # 1 = call, 2 = put
+        kind[master.by_type("CE")] = 1
+        kind[master.by_type("PE")] = 2
+        strike = master.column("strike_price")
+        expiry = master.column("expiry")
+
+        for underlying in master.index_keys("underlying"):
+            ids = master.lookup("underlying", underlying)
+            ids = ids[kind[ids] > 0]
+            ids = ids[~np.isnan(strike[ids]) & (expiry[ids] > 0)]
+            if not len(ids):
+                continue
+
+            ids = ids[np.lexsort((strike[ids], expiry[ids]))]
+            expiries = expiry[ids]
+            bounds = np.flatnonzero(np.diff(expiries)) + 1
+            ladders = {}
+            for group in np.split(ids, bounds):
+                strikes, slot = np.unique(strike[group], return_inverse=True)
+                ce = np.full(len(strikes), -1, dtype=np.int64)
+                pe = np.full(len(strikes), -1, dtype=np.int64)
+                calls = kind[group] == 1
+                ce[slot[calls]] = group[calls]
+                pe[slot[~calls]] = group[~calls]
+                exp = int(expiry[group[0]])
+                ladders[exp] = StrikeLadder(underlying, exp, strikes, ce, pe)
+            self.ladders[underlying] = ladders
+
+    def expiries(self, underlying, now=None):
+        """Listed expiries (epoch ms, ascending) that have not passed yet."""
+        now_ms = int((time.time() if now is None else now) * 1000)
+        return [e for e in self.ladders.get(underlying.strip().upper(), {}) if e >= now_ms]
+
+    def ladder(self, underlying, expiry=None, now=None):
+        """Ladder for ``expiry``, or the nearest live one; None if nothing is listed."""
+        underlying = underlying.strip().upper()
+        if expiry is None:
+            live = self.expiries(underlying, now)
+            if not live:
+                return None
+            expiry = live[0]
+        return self.ladders.get(underlying, {}).get(int(expiry))
+
+    def chain(self, ladder, spot=None, n=None, width=None):
+        """``[{"strike_price", "ce", "pe"}]`` around ATM with full instrument rows."""
+        part = ladder.window(spot, n, width)
+        ce, pe = ladder.ce[part], ladder.pe[part]
+        listed = np.concatenate((ce[ce >= 0], pe[pe >= 0]))
+        records = dict(zip(listed.tolist(), self.master.rows(listed)))
+        return [
+            {"strike_price": strike, "ce": records.get(c), "pe": records.get(p)}
+            for strike, c, p in zip(ladder.strikes[part].tolist(), ce.tolist(), pe.tolist())
+        ]
+
+    def near_the_money(self, underlying, spot=None, n=OPTION_CHAIN_ATM_STRIKES, now=None):
+        """Call and put row ids at ATM±``n`` strikes for every live expiry."""
+        calls, puts = [], []
+        for expiry in self.expiries(underlying, now):
+            ladder = self.ladders[underlying.strip().upper()][expiry]
+            ce, pe = ladder.rows(ladder.window(spot, n))
+            calls.append(ce)
+            puts.append(pe)
+        if not calls:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(calls), np.concatenate(puts)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_option_chain_index(master=None):
+    """Option chain index for ``master`` or the current one (rebuilt after a swap)."""
+    global _index
+    master = master or get_instrument_master()
+    if master is None:
+        return None
+    index = _index
+    if index is not None and index.master is master:
+        return index
+    with _index_lock:
+        if _index is None or _index.master is not master:
+            _index = OptionChainIndex(master)
+        return _index
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from core.config import QUOTE_STALE_SECONDS
+from services.upstox.tick_decoder import CompactTick
+
+logger = logging.getLogger("quote_board")
+
+QUOTE_FIELDS = ("ltp", "atp", "volume", "oi", "bid", "ask", "ts")
+INITIAL_SLOTS = 1024
+
+
+class QuoteBoard:
+    """Process-wide latest quote per instrument, in parallel numpy arrays.
+
+    Every instrument key gets a dense slot; ``ltp``/``atp``/``volume``/
+    ``oi``/``bid``/``ask``/``ts`` are arrays indexed by slot, so a read is
+    a dict lookup plus an array index. ``ts`` is the local receive time
+    (epoch seconds) and drives the staleness check.
+
+    Broker symbols (``"NSE", "RELIANCE"``) can be aliased to a feed key.
+    Register ``on_message`` as a feed hub listener.
+    """
+
+    def __init__(self, capacity=INITIAL_SLOTS):
+        self.slots = {}  # instrument key -> slot
+        self.keys = []  # slot -> instrument key
+        self.aliases = {}  # "EXCHANGE:SYMBOL" -> instrument key
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+        self.updates = 0
+        self.fallbacks = 0
+
+    def _allocate(self, capacity):
+        old = getattr(self, "ltp", None)
+        for field in QUOTE_FIELDS:
+            grown = np.zeros(capacity)
+            if old is not None:
+                current = getattr(self, field)
+                grown[: len(current)] = current
+            setattr(self, field, grown)
+
+    def slot(self, instrument_key):
+        slot = self.slots.get(instrument_key)
+        if slot is not None:
+            return slot
+        with self._lock:
+            slot = self.slots.get(instrument_key)
+            if slot is None:
+                slot = len(self.keys)
+                if slot == len(self.ltp):
+                    self._allocate(slot * 2)
+                self.keys.append(instrument_key)
+                self.slots[instrument_key] = slot
+        return slot
+
+    def alias(self, symbol, instrument_key, exchange="NSE"):
+        self.aliases[f"{exchange.upper()}:{symbol.upper()}"] = instrument_key
+
+    def resolve(self, symbol, exchange="NSE"):
+        """Slot for an instrument key or an aliased broker symbol, else None."""
+        slot = self.slots.get(symbol)
+        if slot is None:
+            key = self.aliases.get(f"{exchange.upper()}:{symbol.upper()}")
+            if key is not None:
+                slot = self.slots.get(key)
+        return slot
+
+    def on_message(self, message):
+        if message.get("type") != "live_feed":
+            return
+        now = time.time()
+        for key, tick in message["data"].items():
+            if isinstance(tick, CompactTick):
+                self.update(
+                    key,
+                    tick.ltp,
+                    tick.atp,
+                    tick.vtt,
+                    tick.oi,
+                    tick.best_bid() or 0.0,
+                    tick.best_ask() or 0.0,
+                    now,
+                )
+            else:
+                self._update_dict(key, tick, now)
+
+    def update(self, instrument_key, ltp, atp=0.0, volume=0, oi=0.0, bid=0.0, ask=0.0, ts=None):
+        i = self.slot(instrument_key)
+        if ltp:
+            self.ltp[i] = ltp
+        self.atp[i] = atp
+        self.volume[i] = volume
+        self.oi[i] = oi
+        self.bid[i] = bid
+        self.ask[i] = ask
+        self.ts[i] = time.time() if ts is None else ts
+        self.updates += 1
+
+    def _update_dict(self, key, details, now):
+        full = details.get("fullFeed", {})
+        feed = full.get("marketFF") or full.get("indexFF") or details.get(
+            "firstLevelWithGreeks", {}
+        )
+        ltpc = feed.get("ltpc") or details.get("ltpc", {})
+        depth = feed.get("marketLevel", {}).get("bidAskQuote") or [{}]
+        self.update(
+            key,
+            ltpc.get("ltp", 0.0),
+            feed.get("atp", 0.0),
+            int(feed.get("vtt", 0)),
+            feed.get("oi", 0.0),
+            depth[0].get("bidP", 0.0),
+            depth[0].get("askP", 0.0),
+            now,
+        )
+
+    def get(self, symbol, exchange="NSE"):
+        slot = self.resolve(symbol, exchange)
+        if slot is None:
+            return None
+        quote = {field: float(getattr(self, field)[slot]) for field in QUOTE_FIELDS}
+        quote["instrument_key"] = self.keys[slot]
+        return quote
+
+    def is_fresh(self, slot, max_age=QUOTE_STALE_SECONDS):
+        return bool(self.ltp[slot]) and time.time() - self.ts[slot] <= max_age
+
+    def latest_price(self, symbol, exchange="NSE", fallback=None, max_age=QUOTE_STALE_SECONDS):
+        """LTP from the board; ``fallback()`` (a REST call) only if stale.
+
+        A fallback price is written back to the board, so other services
+        asking within ``max_age`` reuse it instead of calling REST again.
+        """
+        slot = self.resolve(symbol, exchange)
+        if slot is not None and self.is_fresh(slot, max_age):
+            return float(self.ltp[slot])
+        if fallback is None:
+            return None
+
+        self.fallbacks += 1
+        price = fallback()
+        if not price:
+            return price
+        if slot is None:
+            # Unstreamed symbol: park the price under an alias that resolve() finds
+            key = f"{exchange.upper()}:{symbol.upper()}"
+            self.alias(symbol, key, exchange)
+            slot = self.slot(key)
+        # Only the price is known; the streamed atp/volume/depth stay as they were
+        self.ltp[slot] = price
+        self.ts[slot] = time.time()
+        return price
+
+    def snapshot(self, instrument_keys):
+        """Quotes for many keys at once as ``{field: array}``; unknown keys read 0."""
+        index = np.array([self.slots.get(k, -1) for k in instrument_keys], dtype=np.int64)
+        known = index >= 0
+        out = {}
+        for field in QUOTE_FIELDS:
+            values = np.zeros(len(index))
+            values[known] = getattr(self, field)[index[known]]
+            out[field] = values
+        return out
+
+    def stats(self):
+        stale = 0
+        if self.keys:
+            n = len(self.keys)
+            stale = int(np.count_nonzero(time.time() - self.ts[:n] > QUOTE_STALE_SECONDS))
+        return {
+            "instruments": len(self.keys),
+            "stale": stale,
+            "updates": self.updates,
+            "fallbacks": self.fallbacks,
+        }
+
+
+# Singleton instance
+quote_board = QuoteBoard()
@@ -1,14 +1,14 @@
 import json
 import pandas as pd
 from datetime import datetime
+from utils.instrument_loader import load_instruments_df
 
 with open("data/top_stocks.json") as f:
     top_stocks = json.load(f)
 
-instrument_df = pd.read_json("data/upstox_instruments.json")
-
 
 def get_top_stocks_with_chain():
+    instrument_df = load_instruments_df()
     results = []
     for stock in top_stocks:
         symbol = stock["symbol"]
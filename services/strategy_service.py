@@ -6,9 +6,13 @@ import numpy as np
 import yfinance as yf
 import joblib
 from sklearn.ensemble import RandomForestClassifier
+from services.bar_aggregator import TIMEFRAMES, bar_aggregator
 
 logger = logging.getLogger(__name__)
 
+LIVE_BARS = 375
+MIN_LIVE_BARS = 60
+
 class StrategyService:
     def __init__(self, db: Session):
         self.db = db
@@ -27,7 +31,7 @@ class StrategyService:
         """Analyze stock using both technical and AI predictions"""
         try:
             # Fetch and prepare data
-            data = yf.download(symbol, period='1y', interval=timeframe)
+            data = self._get_data(symbol, timeframe)
             prepared_data = self._prepare_features(data)
             
             # Get AI prediction
@@ -61,6 +65,16 @@ class StrategyService:
             logger.error(f"Error analyzing stock {symbol}: {str(e)}")
             raise
 
+    def _get_data(self, symbol: str, timeframe: str) -> pd.DataFrame:
+        """Live bars for streamed instruments (by key or yfinance ticker), yfinance history otherwise"""
+        if timeframe in TIMEFRAMES:
+            key = bar_aggregator.resolve(symbol)
+            if key is not None and bar_aggregator.has(key):
+                data = bar_aggregator.frame(key, timeframe, LIVE_BARS)
+                if len(data) >= MIN_LIVE_BARS:
+                    return data
+        return yf.download(symbol, period='1y', interval=timeframe)
+
     def _calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """Calculate RSI technical indicator"""
         delta = prices.diff()
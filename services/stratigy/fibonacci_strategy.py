@@ -3,13 +3,15 @@ import pandas as pd
 
 model = joblib.load("models/fib_ai_model.pkl")
 
+FEATURES = ["Close", "ema_20", "rsi_14", "volatility"]
 
-def detect_fib_trade_with_ai(df):
+
+def fib_levels(df):
     high = df["High"].max()
     low = df["Low"].min()
     diff = high - low
 
-    levels = {
+    return {
         "0.0": high,
         "0.236": high - 0.236 * diff,
         "0.382": high - 0.382 * diff,
@@ -18,28 +20,38 @@ def detect_fib_trade_with_ai(df):
         "1.0": low,
     }
 
+
+def fib_features(df):
+    """Adds the model's feature columns to ``df`` (in place) and drops warm-up rows."""
     df["ema_20"] = df["Close"].ewm(span=20).mean()
     df["rsi_14"] = (
-        df["Close"].rolling(14).apply(lambda x: (x[-1] - x.mean()) / x.std() * 100)
+        df["Close"].rolling(14).apply(lambda x: (x.iloc[-1] - x.mean()) / x.std() * 100)
     )
     df["volatility"] = df["Close"].rolling(10).std()
     df.dropna(inplace=True)
+    return df
+
+
+def fib_ai_signals(df, levels):
+    """BUY signals for rows of ``df`` (with features) in the breakout zone that the model approves."""
+    candidates = df[df["Close"] > levels["0.382"]]  # In breakout zone
+    if candidates.empty:
+        return []
+    # One predict call for the whole batch instead of one per row
+    predictions = model.predict(candidates[FEATURES].to_numpy())
+    return [
+        {
+            "timestamp": timestamp,
+            "price": close,
+            "type": "BUY",
+            "signal": "FIB_AI_BUY",  # what PaperTradingEngine opens a position on
+        }
+        for timestamp, close, prediction in zip(candidates["timestamp"], candidates["Close"], predictions)
+        if prediction == 1
+    ]
 
-    signals = []
-
-    for _, row in df.iterrows():
-        close = row["Close"]
-        if close > levels["0.382"]:  # In breakout zone
-            features = [[row["Close"], row["ema_20"], row["rsi_14"], row["volatility"]]]
-            prediction = model.predict(features)
-            if prediction[0] == 1:
-                signals.append(
-                    {
-                        "timestamp": row["timestamp"],
-                        "price": close,
-                        "type": "BUY",
-                        "signal": "FIB_AI_APPROVED",
-                    }
-                )
-
-    return signals, levels
+
+def detect_fib_trade_with_ai(df):
+    levels = fib_levels(df)
+    fib_features(df)
+    return fib_ai_signals(df, levels), levels
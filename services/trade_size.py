@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from database.models import UserCapital
 from services.dhan_client import get_dhan_client
+from services.quote_board import quote_board
 
 def calculate_trade_size(user_id: int, symbol: str, db: Session):
     """AI determines trade size based on user capital & risk level."""
@@ -11,7 +12,10 @@ def calculate_trade_size(user_id: int, symbol: str, db: Session):
         return {"error": "User capital not found"}
 
     # Get live stock price
-    live_price = get_dhan_client(user_id, db).get_market_data(symbol, exchange="NSE")["ltp"]
+    live_price = quote_board.latest_price(
+        symbol,
+        fallback=lambda: get_dhan_client(user_id, db).get_market_data(symbol, exchange="NSE")["ltp"],
+    )
 
     # Calculate trade size
     risk_per_trade = (user_capital.total_capital * user_capital.risk_percentage) / 100
@@ -2,12 +2,15 @@ import numpy as np
 from sqlalchemy.orm import Session
 from database.models import TradePerformance
 from services.dhan_client import get_dhan_client
+from services.quote_board import quote_board
 
 def update_trailing_stop_loss(user_id: int, symbol: str, db: Session):
     """AI dynamically adjusts trailing stop-loss based on price movement."""
 
-    client = get_dhan_client(user_id, db)
-    live_price = client.get_market_data(symbol, exchange="NSE")["ltp"]
+    live_price = quote_board.latest_price(
+        symbol,
+        fallback=lambda: get_dhan_client(user_id, db).get_market_data(symbol, exchange="NSE")["ltp"],
+    )
 
     # Fetch open trade
     trade = db.query(TradePerformance).filter(
@@ -1,10 +1,12 @@
 import requests
 
+from core.config import UPSTOX_FEED_AUTHORIZE_URL
+
 
 def get_feed_auth_url(access_token: str) -> str:
     headers = {"Authorization": f"Bearer {access_token}", "Accept": "*/*"}
 
-    url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
+    url = UPSTOX_FEED_AUTHORIZE_URL
     response = requests.get(url, headers=headers)
 
     # Debug log to inspect actual response
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from core.config import UPSTOX_FEED_DECODE_WORKERS
+from services.upstox.tick_decoder import (
+    MARKET_INFO,
+    decode_frame,
+    decode_market_status,
+    decode_ticks,
+)
+
+logger = logging.getLogger("decode_worker")
+
+WORKER_INLINE = "inline"
+WORKER_THREAD = "thread"
+WORKER_PROCESS = "process"
+WORKER_MODES = (WORKER_INLINE, WORKER_THREAD, WORKER_PROCESS)
+
+# Kinds of decoded frame returned by decode_compact
+DECODED_STATUS = "status"
+DECODED_FEEDS = "feeds"
+DECODED_UNKNOWN = "unknown"
+
+MAX_PENDING_FRAMES = 64
+
+_executors = {}
+
+
+def decode_compact(raw):
+    """Raw feed bytes -> ``(kind, value)``; top-level so a process pool can run it."""
+    msg = decode_frame(raw)
+    if msg.type == MARKET_INFO:
+        return DECODED_STATUS, decode_market_status(msg)
+    if msg.feeds:
+        return DECODED_FEEDS, decode_ticks(msg)
+    return DECODED_UNKNOWN, msg.type
+
+
+def get_executor(mode):
+    executor = _executors.get(mode)
+    if executor is None:
+        if mode == WORKER_THREAD:
+            executor = ThreadPoolExecutor(
+                max_workers=UPSTOX_FEED_DECODE_WORKERS, thread_name_prefix="feed-decode"
+            )
+        elif mode == WORKER_PROCESS:
+            executor = ProcessPoolExecutor(max_workers=UPSTOX_FEED_DECODE_WORKERS)
+        else:
+            raise ValueError(f"Unknown decode worker mode: {mode}")
+        _executors[mode] = executor
+    return executor
+
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+
+class OrderedDecoder:
+    """Decode one upstream connection's frames, delivering them in receive order.
+
+    ``inline`` decodes on the event loop. ``thread``/``process`` hand the
+    raw bytes to a shared pool; a drain task awaits the results strictly
+    in submission order and passes each ``(kind, value)`` to ``handle``.
+    At most ``max_pending`` frames are in flight, so ``submit`` applies
+    backpressure to the receive loop when the workers fall behind.
+    """
+
+    def __init__(self, mode, handle, max_pending=MAX_PENDING_FRAMES):
+        if mode not in WORKER_MODES:
+            raise ValueError(f"Unknown decode worker mode: {mode}")
+        self.mode = mode
+        self.handle = handle
+        self._pending = asyncio.Queue(max_pending)
+        self._task = None
+        self.frames = 0
+        self.errors = 0
+
+    async def submit(self, raw):
+        self.frames += 1
+        if self.mode == WORKER_INLINE:
+            await self.handle(decode_compact(raw))
+            return
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain())
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(get_executor(self.mode), decode_compact, raw)
+        await self._pending.put(future)
+
+    async def _drain(self):
+        while True:
+            future = await self._pending.get()
+            try:
+                result = await future
+                await self.handle(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"⚠️ Frame decode failed: {e}")
+            finally:
+                self._pending.task_done()
+
+    async def aclose(self, flush=True):
+        """Wait for frames already submitted (if ``flush``) and stop the drain task."""
+        if self._task is None:
+            return
+        if flush:
+            await self._pending.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+import httpx
+
+from core.config import UPSTOX_FEED_AUTHORIZE_URL, UPSTOX_FEED_URL_TTL
+
+logger = logging.getLogger("feed_auth")
+
+TOKEN_CACHE_TTL = 300  # seconds before a cached broker token is re-read
+HTTP_TIMEOUT = 10.0
+
+
+def load_upstox_token(user_id=None, email=None):
+    """Return ``(access_token, expiry)`` for a user's Upstox broker config."""
+    from database.connection import SessionLocal
+    from database.models import BrokerConfig, User
+
+    db = SessionLocal()
+    try:
+        query = db.query(BrokerConfig).filter(BrokerConfig.broker_name.ilike("upstox"))
+        if user_id is not None:
+            query = query.filter(BrokerConfig.user_id == user_id)
+        else:
+            query = query.join(User).filter(User.email == email)
+        broker = query.first()
+        if not broker or not broker.access_token:
+            return None, None
+        return broker.access_token, broker.access_token_expiry
+    finally:
+        db.close()
+
+
+class UpstoxFeedAuthorizer:
+    """Non-blocking feed authorization shared by every feed client.
+
+    - one pooled ``httpx.AsyncClient`` for the authorize endpoint
+    - per-user access tokens (and expiry) cached in memory
+    - concurrent authorize calls and token loads for the same user are
+      collapsed into one request
+    - a spare authorized redirect URI is kept per token so a reconnect
+      does not wait on the REST round trip; ``hold`` keeps it fresh while
+      a connection using that token is alive
+
+    Redirect URIs are handed out once each.
+    """
+
+    def __init__(
+        self,
+        authorize_url=UPSTOX_FEED_AUTHORIZE_URL,
+        url_ttl=UPSTOX_FEED_URL_TTL,
+        token_loader=load_upstox_token,
+        transport=None,
+    ):
+        self.authorize_url = authorize_url
+        self.url_ttl = url_ttl
+        self.token_loader = token_loader
+        self.transport = transport
+        self._http = None
+        self._loop = None
+        self._tokens = {}  # user key -> (access_token, expiry, loaded_at)
+        self._urls = {}  # access_token -> (redirect uri, fetched_at)
+        self._inflight = {}
+        self._holds = {}  # access_token -> [refcount, refresher task]
+        self.authorize_calls = 0
+
+    def _client(self):
+        # A pooled client is tied to the loop it was created on.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._http = None
+            self._loop = loop
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._http
+
+    async def aclose(self):
+        for _, task in self._holds.values():
+            task.cancel()
+        self._holds.clear()
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def _once(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def get_access_token(self, user_id=None, email=None):
+        """Cached Upstox access token; None if the user has not linked Upstox.
+
+        Raises PermissionError once the stored token has expired.
+        """
+        key = user_id if user_id is not None else email
+        cached = self._tokens.get(key)
+        if not cached or time.monotonic() - cached[2] > TOKEN_CACHE_TTL:
+            access_token, expiry = await self._once(
+                ("token", key),
+                lambda: asyncio.to_thread(self.token_loader, user_id, email),
+            )
+            cached = (access_token, expiry, time.monotonic())
+            self._tokens[key] = cached
+
+        access_token, expiry, _ = cached
+        if access_token and expiry and expiry < datetime.now():
+            raise PermissionError("Upstox access token expired")
+        return access_token
+
+    def forget_token(self, access_token):
+        """Drop everything cached for a token the feed rejected."""
+        for key, cached in list(self._tokens.items()):
+            if cached[0] == access_token:
+                del self._tokens[key]
+        self._urls.pop(access_token, None)
+
+    async def get_feed_url(self, access_token):
+        while True:
+            url = self._take_url(access_token)
+            if url:
+                break
+            await self._once(("url", access_token), lambda: self._fill(access_token))
+        self.prefetch(access_token)
+        return url
+
+    def prefetch(self, access_token):
+        if access_token in self._urls or ("url", access_token) in self._inflight:
+            return
+        task = asyncio.ensure_future(
+            self._once(("url", access_token), lambda: self._fill(access_token))
+        )
+        task.add_done_callback(_ignore_failure)
+
+    def hold(self, access_token):
+        entry = self._holds.get(access_token)
+        if entry:
+            entry[0] += 1
+            return
+        task = asyncio.ensure_future(self._keep_warm(access_token))
+        self._holds[access_token] = [1, task]
+
+    def release(self, access_token):
+        entry = self._holds.get(access_token)
+        if not entry:
+            return
+        entry[0] -= 1
+        if entry[0] <= 0:
+            entry[1].cancel()
+            del self._holds[access_token]
+
+    def _take_url(self, access_token):
+        cached = self._urls.pop(access_token, None)
+        if cached and time.monotonic() - cached[1] < self.url_ttl:
+            return cached[0]
+        return None
+
+    async def _keep_warm(self, access_token):
+        while True:
+            await asyncio.sleep(self.url_ttl * 0.8)
+            self._urls.pop(access_token, None)
+            try:
+                await self._once(("url", access_token), lambda: self._fill(access_token))
+            except Exception as e:
+                logger.warning(f"⚠️ Feed URL refresh failed: {e}")
+
+    async def _fill(self, access_token):
+        self.authorize_calls += 1
+        response = await self._client().get(
+            self.authorize_url,
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Accept": "application/json",
+            },
+        )
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+        if result.get("status") != "success":
+            logger.info(f"🔐 Feed Auth Response: {response.status_code} {result}")
+            self.forget_token(access_token)
+            raise PermissionError("Access token expired")
+
+        url = result["data"]["authorized_redirect_uri"]
+        self._urls[access_token] = (url, time.monotonic())
+        return url
+
+
+def _ignore_failure(task):
+    if not task.cancelled():
+        task.exception()
+
+
+# Singleton instance
+feed_authorizer = UpstoxFeedAuthorizer()
@@ -0,0 +1,344 @@
+import asyncio
+import logging
+from datetime import date
+from pathlib import Path
+
+from core.config import (
+    TICK_JOURNAL_DIR,
+    UPSTOX_FEED_DECODE_MODE,
+    UPSTOX_FEED_DECODE_WORKER,
+)
+from services.upstox.tick_journal import TickJournalWriter
+from services.upstox.ws_client import KEYS_PER_CONNECTION, UpstoxWebSocketClient
+
+logger = logging.getLogger("feed_hub")
+
+MAX_CONNECTIONS = 2
+
+
+class _Subscriber:
+    __slots__ = ("id", "keys", "callback", "on_auth_error", "access_token")
+
+    def __init__(self, subscriber_id, keys, callback, on_auth_error, access_token):
+        self.id = subscriber_id
+        self.keys = keys
+        self.callback = callback
+        self.on_auth_error = on_auth_error
+        self.access_token = access_token
+
+
+class _DailyJournal:
+    """Journal writer shared by the hub's connections, one directory per day.
+
+    Every connection appends through this one object, so when the date
+    changes all of them move to the new day's directory together.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.day = None
+        self.writer = None
+
+    def append(self, raw, recv_ts_ns=None, stream_id=0):
+        day = date.today().isoformat()
+        if day != self.day:
+            self.close()
+            self.writer = TickJournalWriter(self.root / day)
+            self.day = day
+        self.writer.append(raw, recv_ts_ns=recv_ts_ns, stream_id=stream_id)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+
+class UpstoxFeedHub:
+    """One set of upstream Upstox sockets shared by every downstream client.
+
+    Instrument keys are reference-counted across subscribers; sub/unsub
+    frames only go upstream when the union of demanded keys changes.
+    Subscriber callbacks are called synchronously from the receive loop
+    and must not block.
+    """
+
+    def __init__(
+        self,
+        max_connections=MAX_CONNECTIONS,
+        keys_per_connection=KEYS_PER_CONNECTION,
+        decode_mode=UPSTOX_FEED_DECODE_MODE,
+        journal_dir=TICK_JOURNAL_DIR,
+        decode_worker=UPSTOX_FEED_DECODE_WORKER,
+    ):
+        self.max_connections = max_connections
+        self.keys_per_connection = keys_per_connection
+        self.decode_mode = decode_mode
+        self.decode_worker = decode_worker
+        self.subscribers = {}
+        self.listeners = []  # see every message, e.g. the bar aggregator
+        self.refcounts = {}
+        self.connections = []
+        self.assigned = {}  # instrument key -> upstream client
+        self.chunk_of = {}  # instrument key -> chunk of the published key set
+        self.access_token = None
+        self.journal_dir = journal_dir
+        self.recorder = _DailyJournal(journal_dir) if journal_dir else None
+        self._next_stream_id = 0
+        self._lock = asyncio.Lock()
+
+    async def subscribe(
+        self, subscriber_id, instrument_keys, callback, access_token, on_auth_error=None, chunks=None
+    ):
+        """Stream ``instrument_keys`` to ``callback``.
+
+        ``chunks`` is the published key set's connection-sized grouping
+        (``InstrumentKeySet.chunks()``); keys of one chunk are placed on
+        one upstream connection together.
+        """
+        async with self._lock:
+            await self._remove(subscriber_id)
+            self._use_chunks(chunks)
+
+            ordered = list(dict.fromkeys(instrument_keys))
+            keys = set(ordered)
+            self.subscribers[subscriber_id] = _Subscriber(
+                subscriber_id, keys, callback, on_auth_error, access_token
+            )
+            self.access_token = access_token
+            for client in self.connections:
+                client.access_token = access_token
+
+            added = []
+            for key in ordered:
+                count = self.refcounts.get(key, 0)
+                self.refcounts[key] = count + 1
+                if count == 0:
+                    added.append(key)
+
+            # Keys whose upstream socket stopped (market close, retries
+            # exhausted) are re-assigned along with the new ones.
+            pending = [k for k in self.refcounts if k not in self.assigned]
+            await self._assign(pending)
+
+            logger.info(
+                f"📡 Hub subscriber {subscriber_id}: {len(keys)} keys, "
+                f"{len(added)} new upstream, {len(self.refcounts)} total"
+            )
+
+    def add_listener(self, callback):
+        """Receive every upstream message without demanding any keys."""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    async def unsubscribe(self, subscriber_id):
+        async with self._lock:
+            await self._remove(subscriber_id)
+
+    async def set_keys(self, subscriber_id, instrument_keys, chunks=None):
+        """Change a subscriber's keys in place (e.g. after an instrument refresh).
+
+        Only the difference goes upstream: keys nobody else holds are
+        unsubscribed, keys new to the hub are assigned (by ``chunks``,
+        as in ``subscribe``).
+        """
+        async with self._lock:
+            subscriber = self.subscribers.get(subscriber_id)
+            if not subscriber:
+                return
+            self._use_chunks(chunks)
+
+            ordered = list(dict.fromkeys(instrument_keys))
+            keys = set(ordered)
+            dropped = subscriber.keys - keys
+            added = [k for k in ordered if k not in subscriber.keys]
+            subscriber.keys = keys
+            for key in added:
+                self.refcounts[key] = self.refcounts.get(key, 0) + 1
+
+            await self._release(subscriber_id, dropped)
+            await self._assign([k for k in self.refcounts if k not in self.assigned])
+
+            if dropped or added:
+                logger.info(
+                    f"🔁 Hub subscriber {subscriber_id}: +{len(added)} -{len(dropped)} keys"
+                )
+
+    async def _remove(self, subscriber_id):
+        subscriber = self.subscribers.pop(subscriber_id, None)
+        if subscriber:
+            await self._release(subscriber_id, subscriber.keys)
+
+    async def _release(self, subscriber_id, keys):
+        released = {}
+        for key in keys:
+            count = self.refcounts.get(key, 0) - 1
+            if count > 0:
+                self.refcounts[key] = count
+                continue
+            self.refcounts.pop(key, None)
+            client = self.assigned.pop(key, None)
+            if client:
+                released.setdefault(client, []).append(key)
+
+        for client, client_keys in released.items():
+            if len(client_keys) == len(client.instrument_keys):
+                self._stop_connection(client)
+            else:
+                await client.unsubscribe(client_keys)
+
+        if released:
+            logger.info(
+                f"📴 Hub released {sum(len(k) for k in released.values())} keys "
+                f"for {subscriber_id}"
+            )
+
+    def _use_chunks(self, chunks):
+        if chunks is not None:
+            self.chunk_of = {key: i for i, chunk in enumerate(chunks) for key in chunk}
+
+    async def _assign(self, keys):
+        if not keys:
+            return
+
+        # Keys of one published chunk go onto one connection together;
+        # what does not fit anywhere whole (and unchunked keys) fills in.
+        grouped, loose = {}, []
+        for key in keys:
+            chunk = self.chunk_of.get(key)
+            if chunk is None:
+                loose.append(key)
+            else:
+                grouped.setdefault(chunk, []).append(key)
+        spill = []
+        for group in grouped.values():
+            if not await self._place(group):
+                spill.extend(group)
+        await self._fill(spill + loose)
+
+    async def _place(self, group):
+        if len(group) > self.keys_per_connection:
+            return False
+        for client in self.connections:
+            if self.keys_per_connection - len(client.instrument_keys) >= len(group):
+                await client.subscribe(group)
+                for key in group:
+                    self.assigned[key] = client
+                return True
+        if len(self.connections) < self.max_connections:
+            self._start_connection(group)
+            return True
+        return False
+
+    async def _fill(self, keys):
+        if not keys:
+            return
+
+        for client in self.connections:
+            free = self.keys_per_connection - len(client.instrument_keys)
+            if free <= 0:
+                continue
+            batch, keys = keys[:free], keys[free:]
+            await client.subscribe(batch)
+            for key in batch:
+                self.assigned[key] = client
+            if not keys:
+                return
+
+        while keys and len(self.connections) < self.max_connections:
+            batch, keys = (
+                keys[: self.keys_per_connection],
+                keys[self.keys_per_connection :],
+            )
+            self._start_connection(batch)
+
+        if keys:
+            logger.warning(
+                f"⚠️ Hub capacity reached, {len(keys)} instrument keys not streamed"
+            )
+
+    def _start_connection(self, keys):
+        client = UpstoxWebSocketClient(
+            access_token=self.access_token,
+            instrument_keys=list(keys),
+            callback=self._dispatch,
+            decode_mode=self.decode_mode,
+            decode_worker=self.decode_worker,
+            recorder=self.recorder,
+            stream_id=self._next_stream_id,
+        )
+        self._next_stream_id += 1
+        client.stop_callback = lambda: self._on_connection_stopped(client)
+        client.on_auth_error = lambda: self._on_auth_error(client)
+        self.connections.append(client)
+        for key in keys:
+            self.assigned[key] = client
+        asyncio.create_task(client.connect_and_stream())
+        logger.info(f"🔌 Hub opened upstream connection with {len(keys)} keys")
+
+    def _stop_connection(self, client):
+        client.stop()
+        self._forget(client)
+
+    def _forget(self, client):
+        if client in self.connections:
+            self.connections.remove(client)
+        for key in client.instrument_keys:
+            if self.assigned.get(key) is client:
+                del self.assigned[key]
+
+    def _on_connection_stopped(self, client):
+        logger.info("🛑 Hub upstream connection stopped.")
+        self._forget(client)
+        # A rotated token means the remaining subscribers can still be
+        # served; otherwise keys are picked up again on the next subscribe.
+        if self.subscribers and self.access_token != client.access_token:
+            asyncio.create_task(self._reassign())
+
+    async def _reassign(self):
+        async with self._lock:
+            await self._assign([k for k in self.refcounts if k not in self.assigned])
+
+    async def _on_auth_error(self, client):
+        token = client.access_token
+        logger.warning("🔐 Hub upstream auth failed")
+        for subscriber in list(self.subscribers.values()):
+            if subscriber.access_token == token:
+                if subscriber.on_auth_error:
+                    subscriber.on_auth_error()
+            else:
+                self.access_token = subscriber.access_token
+
+    async def _dispatch(self, message):
+        for listener in self.listeners:
+            listener(message)
+
+        if message.get("type") != "live_feed":
+            for subscriber in list(self.subscribers.values()):
+                subscriber.callback(message)
+            return
+
+        feeds = message["data"]
+        for subscriber in list(self.subscribers.values()):
+            wanted = subscriber.keys
+            picked = {k: v for k, v in feeds.items() if k in wanted}
+            if not picked:
+                continue
+            if len(picked) == len(feeds):
+                subscriber.callback(message)
+            else:
+                subscriber.callback({"type": "live_feed", "data": picked})
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "instrument_keys": len(self.refcounts),
+            "connections": [len(c.instrument_keys) for c in self.connections],
+        }
+
+
+# Singleton instance
+feed_hub = UpstoxFeedHub()
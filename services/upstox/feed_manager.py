@@ -9,6 +9,7 @@ import requests
 
 from google.protobuf.json_format import MessageToDict
 from services.upstox.MarketDataFeed_pb2 import FeedResponse
+from core.config import UPSTOX_FEED_AUTHORIZE_URL
 
 logger = logging.getLogger(__name__)
 
@@ -87,7 +88,7 @@ class UpstoxFeedManager:
         return MessageToDict(feed)
 
     def _get_authorized_ws_url(self):
-        url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
+        url = UPSTOX_FEED_AUTHORIZE_URL
         headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Accept": "application/json",
@@ -0,0 +1,292 @@
+"""Local stand-in for the Upstox V3 market data feed.
+
+Serves the ``/v3/feed/market-data-feed/authorize`` handshake and a
+WebSocket that speaks the ``MarketDataFeed_pb2.FeedResponse`` protocol,
+with synthetic ticks (or a recorded tick journal) for whatever keys the
+client subscribes to.
+
+    python -m services.upstox.feed_simulator --port 8765 --tick-hz 2
+    UPSTOX_API_BASE_URL=http://127.0.0.1:8765 uvicorn app:sio_app
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import zlib
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.tick_journal import read_journal
+
+logger = logging.getLogger("feed_simulator")
+
+FEED_PATH = "/v3/feed/market-data-feed"
+AUTHORIZE_PATH = "/v3/feed/market-data-feed/authorize"
+
+PRE_OPEN_PHASES = ("PRE_OPEN_START", "PRE_OPEN_END")
+CLOSE_PHASES = ("NORMAL_CLOSE", "CLOSING_START", "CLOSING_END")
+CLOSE_PHASE_SECONDS = 1.0
+
+
+class FeedSimulator:
+    """Synthetic market shared by every simulated feed connection.
+
+    Prices follow a seeded random walk per instrument key. Each connection
+    walks through the market phases from the moment it connects:
+    pre-open (``pre_open_seconds``), NORMAL_OPEN (``session_seconds``,
+    0 = forever), then the closing statuses. Ticks are only sent while
+    the market is open.
+    """
+
+    def __init__(
+        self,
+        tick_hz=1.0,
+        batch_size=200,
+        session_seconds=0,
+        pre_open_seconds=0,
+        depth_levels=5,
+        journal_dir=None,
+        journal_speed=1.0,
+        expired_tokens=(),
+        seed=None,
+    ):
+        self.tick_hz = tick_hz
+        self.batch_size = batch_size
+        self.session_seconds = session_seconds
+        self.pre_open_seconds = pre_open_seconds
+        self.depth_levels = depth_levels
+        self.journal_dir = journal_dir
+        self.journal_speed = journal_speed
+        self.expired_tokens = set(expired_tokens)
+        self.rng = random.Random(seed)
+        self.prices = {}
+        self.closes = {}  # previous close per key, fixed when the key is seeded
+        self.volumes = {}
+        self.connections = 0
+        self.frames_sent = 0
+        self.ticks_sent = 0
+
+    def phase(self, elapsed):
+        if elapsed < self.pre_open_seconds:
+            half = self.pre_open_seconds / 2
+            return PRE_OPEN_PHASES[0] if elapsed < half else PRE_OPEN_PHASES[1]
+        elapsed -= self.pre_open_seconds
+        if not self.session_seconds or elapsed < self.session_seconds:
+            return "NORMAL_OPEN"
+        elapsed -= self.session_seconds
+        index = min(int(elapsed / CLOSE_PHASE_SECONDS), len(CLOSE_PHASES) - 1)
+        return CLOSE_PHASES[index]
+
+    def market_info_frame(self, status):
+        msg = pb.FeedResponse()
+        msg.type = pb.Type.Value("market_info")
+        msg.currentTs = int(time.time() * 1000)
+        value = pb.MarketStatus.Value(status)
+        for segment in ("NSE_EQ", "NSE_FO", "NSE_INDEX", "BSE_EQ", "MCX_FO"):
+            msg.marketInfo.segmentStatus[segment] = value
+        return msg.SerializeToString()
+
+    def tick_frames(self, keys, feed_type="live_feed"):
+        frames = []
+        for i in range(0, len(keys), self.batch_size):
+            frames.append(self._build_frame(keys[i : i + self.batch_size], feed_type))
+        return frames
+
+    def _build_frame(self, keys, feed_type):
+        now_ms = int(time.time() * 1000)
+        msg = pb.FeedResponse()
+        msg.type = pb.Type.Value(feed_type)
+        msg.currentTs = now_ms
+        gauss = self.rng.gauss
+
+        for key in keys:
+            price = self.prices.get(key)
+            if price is None:
+                price = self.closes[key] = 100.0 + zlib.crc32(key.encode("utf-8")) % 5000
+            price = round(max(price * (1 + gauss(0, 0.0005)), 0.05), 2)
+            self.prices[key] = price
+            volume = self.volumes.get(key, 0) + self.rng.randint(1, 500)
+            self.volumes[key] = volume
+
+            if key.startswith("NSE_INDEX") or key.startswith("BSE_INDEX"):
+                ltpc = msg.feeds[key].fullFeed.indexFF.ltpc
+            else:
+                market_ff = msg.feeds[key].fullFeed.marketFF
+                ltpc = market_ff.ltpc
+                for level in range(self.depth_levels):
+                    quote = market_ff.marketLevel.bidAskQuote.add()
+                    quote.bidQ = self.rng.randint(1, 2000)
+                    quote.bidP = round(price - 0.05 * (level + 1), 2)
+                    quote.askQ = self.rng.randint(1, 2000)
+                    quote.askP = round(price + 0.05 * (level + 1), 2)
+                market_ff.atp = price
+                market_ff.vtt = volume
+                market_ff.tbq = float(self.rng.randint(1000, 100000))
+                market_ff.tsq = float(self.rng.randint(1000, 100000))
+                if key.startswith("NSE_FO") or key.startswith("BSE_FO"):
+                    market_ff.oi = float(self.rng.randint(1000, 500000))
+
+            ltpc.ltp = price
+            ltpc.ltt = now_ms
+            ltpc.ltq = self.rng.randint(1, 100)
+            ltpc.cp = self.closes[key]
+
+        self.ticks_sent += len(keys)
+        return msg.SerializeToString()
+
+    async def serve(self, websocket: WebSocket):
+        await websocket.accept()
+        self.connections += 1
+        subscribed = {}  # dict keeps subscription order
+        reader = asyncio.create_task(self._read_requests(websocket, subscribed))
+        try:
+            if self.journal_dir:
+                await self._stream_journal(websocket, reader)
+            else:
+                await self._stream_synthetic(websocket, subscribed, reader)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            reader.cancel()
+            self.connections -= 1
+
+    async def _read_requests(self, websocket, subscribed):
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            raw = message.get("bytes") or message.get("text")
+            try:
+                request = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            keys = request.get("data", {}).get("instrumentKeys", [])
+            if request.get("method") == "sub":
+                for key in keys:
+                    subscribed[key] = True
+            elif request.get("method") == "unsub":
+                for key in keys:
+                    subscribed.pop(key, None)
+
+    async def _stream_synthetic(self, websocket, subscribed, reader):
+        started = time.monotonic()
+        interval = 1.0 / self.tick_hz
+        next_at = started
+        status = None
+        sent_snapshot = set()
+
+        while not reader.done():
+            current = self.phase(time.monotonic() - started)
+            if current != status:
+                status = current
+                await websocket.send_bytes(self.market_info_frame(status))
+
+            if status == "NORMAL_OPEN" and subscribed:
+                fresh = [k for k in subscribed if k not in sent_snapshot]
+                live = [k for k in subscribed if k in sent_snapshot]
+                frames = self.tick_frames(fresh, "initial_feed") + self.tick_frames(live)
+                sent_snapshot.update(fresh)
+                for frame in frames:
+                    await websocket.send_bytes(frame)
+                    self.frames_sent += 1
+
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay < -interval:
+                next_at = time.monotonic()  # fell behind; don't burst to catch up
+            await asyncio.sleep(max(delay, 0))
+
+    async def _stream_journal(self, websocket, reader):
+        started = time.monotonic()
+        first_ts = None
+        for ts_ns, _, payload in read_journal(self.journal_dir):
+            if reader.done():
+                return
+            if self.journal_speed:
+                first_ts = ts_ns if first_ts is None else first_ts
+                due = (ts_ns - first_ts) / 1e9 / self.journal_speed
+                delay = due - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.send_bytes(payload)
+            self.frames_sent += 1
+        await reader
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "frames_sent": self.frames_sent,
+            "ticks_sent": self.ticks_sent,
+            "instruments": len(self.prices),
+        }
+
+
+def create_app(simulator: FeedSimulator):
+    app = FastAPI(title="Upstox feed simulator")
+
+    @app.get(AUTHORIZE_PATH)
+    async def authorize(request: Request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not token or token in simulator.expired_tokens:
+            return JSONResponse(
+                status_code=401,
+                content={
+                    "status": "error",
+                    "errors": [{"errorCode": "UDAPI100050", "message": "Invalid token"}],
+                },
+            )
+        # A fresh code per call: the client rejects a reused redirect URI.
+        ws_url = f"ws://{request.url.netloc}{FEED_PATH}?code={uuid4().hex}"
+        return {
+            "status": "success",
+            "data": {"authorized_redirect_uri": ws_url, "authorizedRedirectUri": ws_url},
+        }
+
+    @app.websocket(FEED_PATH)
+    async def feed(websocket: WebSocket):
+        await simulator.serve(websocket)
+
+    @app.get("/stats")
+    async def stats():
+        return simulator.stats()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Upstox market feed simulator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick-hz", type=float, default=1.0, help="updates/s per key")
+    parser.add_argument("--batch-size", type=int, default=200, help="keys per frame")
+    parser.add_argument("--session-seconds", type=float, default=0)
+    parser.add_argument("--pre-open-seconds", type=float, default=0)
+    parser.add_argument("--journal", default=None, help="replay a tick journal")
+    parser.add_argument("--journal-speed", type=float, default=1.0)
+    parser.add_argument("--expired-token", action="append", default=[])
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = FeedSimulator(
+        tick_hz=args.tick_hz,
+        batch_size=args.batch_size,
+        session_seconds=args.session_seconds,
+        pre_open_seconds=args.pre_open_seconds,
+        journal_dir=args.journal,
+        journal_speed=args.journal_speed,
+        expired_tokens=args.expired_token,
+        seed=args.seed,
+    )
+    logger.info(f"🧪 Feed simulator on http://{args.host}:{args.port}")
+    uvicorn.run(create_app(simulator), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import logging
+from array import array
+
+import services.upstox.MarketDataFeed_pb2 as pb
+
+logger = logging.getLogger("tick_decoder")
+
+MARKET_INFO = pb.Type.Value("market_info")
+
+DECODE_MODE_DICT = "dict"
+DECODE_MODE_COMPACT = "compact"
+DECODE_MODES = (DECODE_MODE_DICT, DECODE_MODE_COMPACT)
+
+# Flattened depth layout: [bidQ, bidP, askQ, askP] per level
+DEPTH_STRIDE = 4
+GREEK_FIELDS = ("delta", "theta", "gamma", "vega", "rho")
+
+
+class CompactTick:
+    """One instrument's tick, read straight from the protobuf ``Feed``.
+
+    Depth and greeks are kept in flat ``array('d')`` buffers instead of
+    nested dicts; ``as_payload()`` renders the same shape that
+    ``parse_live_feed`` builds from ``MessageToDict`` output.
+    """
+
+    __slots__ = (
+        "instrument_key",
+        "ltp",
+        "ltt",
+        "ltq",
+        "cp",
+        "atp",
+        "vtt",
+        "oi",
+        "iv",
+        "tbq",
+        "tsq",
+        "depth",
+        "greeks",
+        "ohlc",
+    )
+
+    def __init__(self, instrument_key):
+        self.instrument_key = instrument_key
+        self.ltp = 0.0
+        self.ltt = 0
+        self.ltq = 0
+        self.cp = 0.0
+        self.atp = 0.0
+        self.vtt = 0
+        self.oi = 0.0
+        self.iv = 0.0
+        self.tbq = 0.0
+        self.tsq = 0.0
+        self.depth = None
+        self.greeks = None
+        self.ohlc = ()
+
+    def best_bid(self):
+        if self.depth:
+            return self.depth[1]
+        return None
+
+    def best_ask(self):
+        if self.depth:
+            return self.depth[3]
+        return None
+
+    def as_payload(self):
+        # Zero values and int64-as-string mirror MessageToDict, so the UI
+        # sees identical JSON whichever decode mode produced the tick.
+        return {
+            "ltp": self.ltp or None,
+            "ltq": _int_str(self.ltq),
+            "cp": self.cp or None,
+            "last_trade_time": _int_str(self.ltt),
+            "bid_ask": _depth_payload(self.depth),
+            "greeks": _greeks_payload(self.greeks),
+            "ohlc": [_ohlc_payload(candle) for candle in self.ohlc],
+            "atp": self.atp or None,
+            "oi": self.oi or None,
+            "iv": self.iv or None,
+            "tbq": self.tbq or None,
+            "tsq": self.tsq or None,
+        }
+
+    def __reduce__(self):
+        # Positional state unpickles faster than the default slot dict,
+        # which matters when ticks come back from a decode process pool.
+        return _restore_tick, (tuple(getattr(self, name) for name in self.__slots__),)
+
+    def __repr__(self):
+        return f"CompactTick({self.instrument_key!r}, ltp={self.ltp}, ltt={self.ltt})"
+
+
+def _restore_tick(state):
+    tick = CompactTick.__new__(CompactTick)
+    for name, value in zip(CompactTick.__slots__, state):
+        setattr(tick, name, value)
+    return tick
+
+
+def decode_frame(raw):
+    msg = pb.FeedResponse()
+    msg.ParseFromString(raw)
+    return msg
+
+
+def decode_market_status(msg, segment="NSE_EQ"):
+    status = msg.marketInfo.segmentStatus.get(segment)
+    if status is None:
+        return ""
+    return pb.MarketStatus.Name(status)
+
+
+def decode_ticks(msg):
+    ticks = {}
+    for instrument_key, feed in msg.feeds.items():
+        ticks[instrument_key] = decode_feed(instrument_key, feed)
+    return ticks
+
+
+def decode_feed(instrument_key, feed):
+    tick = CompactTick(instrument_key)
+    kind = feed.WhichOneof("FeedUnion")
+
+    if kind == "fullFeed":
+        full = feed.fullFeed
+        if full.WhichOneof("FullFeedUnion") == "indexFF":
+            index_ff = full.indexFF
+            _read_ltpc(tick, index_ff.ltpc)
+            tick.ohlc = _read_ohlc(index_ff.marketOHLC.ohlc)
+        else:
+            market_ff = full.marketFF
+            _read_ltpc(tick, market_ff.ltpc)
+            tick.atp = market_ff.atp
+            tick.vtt = market_ff.vtt
+            tick.oi = market_ff.oi
+            tick.iv = market_ff.iv
+            tick.tbq = market_ff.tbq
+            tick.tsq = market_ff.tsq
+            depth = array("d")
+            for quote in market_ff.marketLevel.bidAskQuote:
+                depth.extend((quote.bidQ, quote.bidP, quote.askQ, quote.askP))
+            tick.depth = depth
+            if market_ff.HasField("optionGreeks"):
+                tick.greeks = _read_greeks(market_ff.optionGreeks)
+            tick.ohlc = _read_ohlc(market_ff.marketOHLC.ohlc)
+
+    elif kind == "firstLevelWithGreeks":
+        first = feed.firstLevelWithGreeks
+        _read_ltpc(tick, first.ltpc)
+        quote = first.firstDepth
+        tick.depth = array("d", (quote.bidQ, quote.bidP, quote.askQ, quote.askP))
+        tick.greeks = _read_greeks(first.optionGreeks)
+        tick.vtt = first.vtt
+        tick.oi = first.oi
+        tick.iv = first.iv
+
+    elif kind == "ltpc":
+        _read_ltpc(tick, feed.ltpc)
+
+    return tick
+
+
+def parse_feed_dict(details: dict):
+    """Pick the live-feed fields out of one ``MessageToDict`` feed entry."""
+    feed = details.get("fullFeed", {}).get("marketFF", {})
+    ltpc = feed.get("ltpc", {})
+    return {
+        "ltp": ltpc.get("ltp"),
+        "ltq": ltpc.get("ltq"),
+        "cp": ltpc.get("cp"),
+        "last_trade_time": ltpc.get("ltt"),
+        "bid_ask": feed.get("marketLevel", {}).get("bidAskQuote", []),
+        "greeks": feed.get("optionGreeks", {}),
+        "ohlc": feed.get("marketOHLC", {}).get("ohlc", []),
+        "atp": feed.get("atp"),
+        "oi": feed.get("oi"),
+        "iv": feed.get("iv"),
+        "tbq": feed.get("tbq"),
+        "tsq": feed.get("tsq"),
+    }
+
+
+def _read_ltpc(tick, ltpc):
+    tick.ltp = ltpc.ltp
+    tick.ltt = ltpc.ltt
+    tick.ltq = ltpc.ltq
+    tick.cp = ltpc.cp
+
+
+def _read_greeks(greeks):
+    return array(
+        "d", (greeks.delta, greeks.theta, greeks.gamma, greeks.vega, greeks.rho)
+    )
+
+
+def _read_ohlc(candles):
+    return tuple(
+        (c.interval, c.open, c.high, c.low, c.close, c.vol, c.ts) for c in candles
+    )
+
+
+def _int_str(value):
+    return str(int(value)) if value else None
+
+
+def _depth_payload(depth):
+    if not depth:
+        return []
+    levels = []
+    for i in range(0, len(depth), DEPTH_STRIDE):
+        bid_q, bid_p, ask_q, ask_p = depth[i : i + DEPTH_STRIDE]
+        level = {}
+        if bid_q:
+            level["bidQ"] = str(int(bid_q))
+        if bid_p:
+            level["bidP"] = bid_p
+        if ask_q:
+            level["askQ"] = str(int(ask_q))
+        if ask_p:
+            level["askP"] = ask_p
+        levels.append(level)
+    return levels
+
+
+def _greeks_payload(greeks):
+    if greeks is None:
+        return {}
+    return {name: value for name, value in zip(GREEK_FIELDS, greeks) if value}
+
+
+def _ohlc_payload(candle):
+    interval, open_, high, low, close, vol, ts = candle
+    payload = {}
+    if interval:
+        payload["interval"] = interval
+    if open_:
+        payload["open"] = open_
+    if high:
+        payload["high"] = high
+    if low:
+        payload["low"] = low
+    if close:
+        payload["close"] = close
+    if vol:
+        payload["vol"] = str(vol)
+    if ts:
+        payload["ts"] = str(ts)
+    return payload
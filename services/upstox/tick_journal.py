@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+from services.upstox.tick_decoder import DECODE_MODE_COMPACT
+from services.upstox.ws_client import UpstoxWebSocketClient
+
+logger = logging.getLogger("tick_journal")
+
+SEGMENT_MAGIC = b"UPTJ0001"
+SEGMENT_SUFFIX = ".tj"
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Record header: receive time (ns since epoch), stream id, payload length.
+# A zeroed header marks the end of the written part of a segment.
+RECORD_HEADER = struct.Struct("<QII")
+
+
+def segment_paths(directory):
+    return sorted(Path(directory).glob(f"segment-*{SEGMENT_SUFFIX}"))
+
+
+class TickJournalWriter:
+    """Append-only journal of raw feed frames in memory-mapped segments.
+
+    Each segment is preallocated to ``segment_size`` bytes and mapped;
+    records are copied in with their receive timestamp. A full segment is
+    truncated to its used length and the next one is opened. Appends are
+    expected from a single thread (the event loop).
+    """
+
+    def __init__(self, directory, segment_size=DEFAULT_SEGMENT_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        existing = segment_paths(self.directory)
+        self._next_index = int(existing[-1].stem.split("-")[1]) + 1 if existing else 1
+        self._file = None
+        self._map = None
+        self._pos = 0
+        self._size = 0
+        self.records = 0
+        self.bytes_written = 0
+
+    def append(self, raw: bytes, recv_ts_ns=None, stream_id=0):
+        needed = RECORD_HEADER.size + len(raw)
+        if self._map is None or self._pos + needed > self._size:
+            self._open_segment(needed)
+
+        if recv_ts_ns is None:
+            recv_ts_ns = time.time_ns()
+        RECORD_HEADER.pack_into(self._map, self._pos, recv_ts_ns, stream_id, len(raw))
+        start = self._pos + RECORD_HEADER.size
+        self._map[start : start + len(raw)] = raw
+        self._pos = start + len(raw)
+        self.records += 1
+        self.bytes_written += needed
+
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self._pos)
+        self._file.close()
+        self._map = None
+        self._file = None
+
+    def _open_segment(self, needed):
+        self.close()
+        size = max(self.segment_size, len(SEGMENT_MAGIC) + needed)
+        path = self.directory / f"segment-{self._next_index:06d}{SEGMENT_SUFFIX}"
+        self._next_index += 1
+
+        self._file = open(path, "w+b")
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._map[: len(SEGMENT_MAGIC)] = SEGMENT_MAGIC
+        self._pos = len(SEGMENT_MAGIC)
+        self._size = size
+        logger.info(f"📼 Tick journal segment opened: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_journal(directory):
+    """Yield ``(recv_ts_ns, stream_id, payload)`` for every record, in order."""
+    for path in segment_paths(directory):
+        if os.path.getsize(path) <= len(SEGMENT_MAGIC):
+            continue
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            if mm[: len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                logger.warning(f"⚠️ Skipping {path}: not a tick journal segment")
+                continue
+            pos = len(SEGMENT_MAGIC)
+            end = len(mm)
+            while pos + RECORD_HEADER.size <= end:
+                ts_ns, stream_id, length = RECORD_HEADER.unpack_from(mm, pos)
+                if length == 0:
+                    break  # preallocated tail of a segment that was not closed
+                pos += RECORD_HEADER.size
+                if pos + length > end:
+                    logger.warning(f"⚠️ Truncated record at end of {path}")
+                    break
+                yield ts_ns, stream_id, mm[pos : pos + length]
+                pos += length
+
+
+class JournalReplayer:
+    """Feed a journal back through ``UpstoxWebSocketClient.handle_frame``.
+
+    ``speed`` is a multiple of real time (1.0 = as recorded); 0 or None
+    replays as fast as the callback allows. One client per recorded
+    stream keeps the per-connection state the live path would have.
+    """
+
+    def __init__(self, directory, callback, speed=1.0, decode_mode=None):
+        self.directory = directory
+        self.callback = callback
+        self.speed = speed
+        self.decode_mode = decode_mode
+        self.frames = 0
+        self.elapsed = 0.0
+        self._clients = {}
+
+    def _client(self, stream_id):
+        client = self._clients.get(stream_id)
+        if client is None:
+            client = UpstoxWebSocketClient(
+                access_token=None,
+                instrument_keys=[],
+                callback=self.callback,
+                decode_mode=self.decode_mode or DECODE_MODE_COMPACT,
+                stream_id=stream_id,
+            )
+            self._clients[stream_id] = client
+        return client
+
+    async def run(self):
+        started = time.monotonic()
+        first_ts = None
+        for ts_ns, stream_id, payload in read_journal(self.directory):
+            if self.speed:
+                if first_ts is None:
+                    first_ts = ts_ns
+                due = (ts_ns - first_ts) / 1e9 / self.speed
+                delay = due - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif self.frames % 100 == 0:
+                await asyncio.sleep(0)
+
+            await self._client(stream_id).handle_frame(payload)
+            self.frames += 1
+
+        self.elapsed = time.monotonic() - started
+        logger.info(
+            f"▶️ Replayed {self.frames} frames from {self.directory} "
+            f"in {self.elapsed:.2f}s"
+        )
+        return self.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded tick journal.")
+    parser.add_argument("directory")
+    parser.add_argument(
+        "--speed", type=float, default=0, help="1 = real time, 0 = max speed"
+    )
+    parser.add_argument("--decode-mode", default=None)
+    args = parser.parse_args()
+
+    ticks = 0
+
+    async def count(message):
+        nonlocal ticks
+        if message.get("type") == "live_feed":
+            ticks += len(message["data"])
+
+    replayer = JournalReplayer(args.directory, count, args.speed, args.decode_mode)
+    asyncio.run(replayer.run())
+    rate = ticks / replayer.elapsed if replayer.elapsed else 0
+    print(
+        f"{replayer.frames} frames, {ticks} ticks in {replayer.elapsed:.2f}s "
+        f"({rate:,.0f} ticks/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
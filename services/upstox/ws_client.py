@@ -1,18 +1,37 @@
-import asyncio, json, ssl, logging, functools, inspect, requests, websockets
+import asyncio, json, ssl, logging, inspect, websockets
 from websockets.exceptions import InvalidStatus
 from google.protobuf.json_format import MessageToDict
 import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.decode_worker import (
+    DECODED_FEEDS,
+    DECODED_STATUS,
+    WORKER_INLINE,
+    WORKER_MODES,
+    OrderedDecoder,
+    decode_compact,
+)
+from services.upstox.feed_auth import feed_authorizer
+from services.upstox.tick_decoder import (
+    DECODE_MODE_COMPACT,
+    DECODE_MODE_DICT,
+    DECODE_MODES,
+)
 
 logger = logging.getLogger("ws_client")
 
 received_ltp = False  # ✅ Flag to track if LTP was received
 
+KEYS_PER_CONNECTION = 1500  # Upstox full-mode limit per socket
 
-def sync_fetch_feed_url(access_token: str):
-    url = "https://api.upstox.com/v3/feed/market-data-feed/authorize"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
-    return response.json()
+
+def feed_ssl_context(ws_url: str):
+    # Plain ws:// (local feed simulator) must not be given an SSL context.
+    if not ws_url.startswith("wss://"):
+        return None
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return ssl_context
 
 
 class UpstoxWebSocketClient:
@@ -24,7 +43,15 @@ class UpstoxWebSocketClient:
         stop_callback=None,
         on_auth_error=None,
         max_retries=5,
+        decode_mode=DECODE_MODE_DICT,
+        recorder=None,
+        stream_id=0,
+        decode_worker=WORKER_INLINE,
     ):
+        if decode_mode not in DECODE_MODES:
+            raise ValueError(f"Unknown decode mode: {decode_mode}")
+        if decode_worker not in WORKER_MODES:
+            raise ValueError(f"Unknown decode worker mode: {decode_worker}")
         self.access_token = access_token
         self.instrument_keys = instrument_keys
         self.callback = callback
@@ -34,24 +61,24 @@ class UpstoxWebSocketClient:
         self.should_run = True
         self.retry_count = 0
         self.max_retries = max_retries
+        self.decode_mode = decode_mode
+        self.decode_worker = decode_worker  # inline / thread / process (compact only)
+        self.recorder = recorder  # optional TickJournalWriter for raw frames
+        self.stream_id = stream_id
         self.auth_error_sent = False
         self.last_ws_url = None
         self.market_closed = False  # ✅ Flag if market is closed
         self.received_ltp = False  # ✅ Flag if LTP was received
 
     async def get_feed_authorized_url(self):
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, functools.partial(sync_fetch_feed_url, self.access_token)
-        )
-        logger.info(f"🔐 Feed Auth Response: {result}")
-        if result.get("status") != "success":
+        try:
+            new_url = await feed_authorizer.get_feed_url(self.access_token)
+        except PermissionError:
             if self.on_auth_error and not self.auth_error_sent:
                 await self.on_auth_error()
                 self.auth_error_sent = True
-            raise PermissionError("Access token expired")
+            raise
 
-        new_url = result["data"]["authorized_redirect_uri"]
         if new_url == self.last_ws_url:
             logger.warning("⚠️ Reused WebSocket URL detected, skipping.")
             raise InvalidStatus(403)
@@ -62,11 +89,10 @@ class UpstoxWebSocketClient:
         while self.should_run and self.retry_count <= self.max_retries:
             try:
                 ws_url = await self.get_feed_authorized_url()
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
 
-                async with websockets.connect(ws_url, ssl=ssl_context) as conn:
+                async with websockets.connect(
+                    ws_url, ssl=feed_ssl_context(ws_url)
+                ) as conn:
                     self.websocket = conn
                     self.retry_count = 0
                     self.auth_error_sent = False
@@ -76,72 +102,24 @@ class UpstoxWebSocketClient:
                     logger.info("✅ WebSocket connected.")
                     await self._send_subscription()
 
-                    while self.should_run:
-                        raw = await conn.recv()
-                        msg = pb.FeedResponse()
-                        msg.ParseFromString(raw)
-                        parsed = MessageToDict(msg)
-
-                        msg_type = parsed.get("type")
-                        logger.debug(f"📥 Tick Received: {parsed}")
-
-                        if msg_type == "market_info":
-                            status = (
-                                parsed.get("marketInfo", {})
-                                .get("segmentStatus", {})
-                                .get("NSE_EQ", "")
-                            )
-                            logger.info(f"📊 Market status: {status}")
-                            await self.callback(
-                                {"type": "market_info", "status": status}
-                            )
-                            if (
-                                status in ["NORMAL_CLOSE", "CLOSING_END"]
-                                and self.received_ltp
-                            ):
-                                logger.info(
-                                    "📴 Market is closed and LTP received. Stopping."
-                                )
-                                self.market_closed = True
-
-                        elif msg_type == "ltpc":
-                            symbol = parsed.get("symbol") or parsed.get("ltpc", {}).get(
-                                "symbol"
-                            )
-                            if not symbol:
-                                logger.warning("⚠️ Missing symbol in tick")
-                                continue
-
-                            self.received_ltp = True
-                            logger.info(f"✅ Calling callback for symbol {symbol}")
-                            await self.callback(
-                                {"type": "live_feed", "data": {symbol: parsed}}
-                            )
-
-                            if self.market_closed:
-                                logger.info(
-                                    "📴 Market is closed & LTP received. Stopping."
-                                )
-                                self.should_run = False
-                        elif "feeds" in parsed:
-                            feeds = parsed.get("feeds", {})
-                            if not feeds:
-                                logger.warning(
-                                    "⚠️ Received 'feeds' payload but it's empty."
-                                )
-                                continue
-                            self.received_ltp = True
-                            logger.info(
-                                f"✅ Calling callback for {len(feeds)} batched LTPs."
-                            )
-                            await self.callback({"type": "live_feed", "data": feeds})
-                            if self.market_closed:
-                                logger.info(
-                                    "📴 Market is closed & batched LTP received. Stopping."
-                                )
-                                self.should_run = False
-                        else:
-                            logger.warning(f"⚠️ Unknown message type: {msg_type}")
+                    # Keep a spare redirect URI warm so a reconnect skips
+                    # the authorize round trip.
+                    held_token = self.access_token
+                    feed_authorizer.hold(held_token)
+                    decoder = self._frame_decoder()
+                    try:
+                        while self.should_run:
+                            raw = await conn.recv()
+                            if self.recorder:
+                                self.recorder.append(raw, stream_id=self.stream_id)
+                            if decoder:
+                                await decoder.submit(raw)
+                            else:
+                                await self.handle_frame(raw)
+                    finally:
+                        feed_authorizer.release(held_token)
+                        if decoder:
+                            await decoder.aclose()
 
             except PermissionError:
                 await self.callback({"type": "error", "reason": "token_expired"})
@@ -163,20 +141,115 @@ class UpstoxWebSocketClient:
 
         await self._trigger_stop_callback()
 
+    def _frame_decoder(self):
+        # Decoding off the loop only applies to compact ticks; the dict
+        # path stays inline.
+        if self.decode_mode != DECODE_MODE_COMPACT or self.decode_worker == WORKER_INLINE:
+            return None
+        return OrderedDecoder(self.decode_worker, self._apply_decoded)
+
+    async def handle_frame(self, raw):
+        if self.decode_mode == DECODE_MODE_COMPACT:
+            await self._handle_compact_frame(raw)
+        else:
+            await self._handle_dict_frame(raw)
+
+    async def _handle_dict_frame(self, raw):
+        msg = pb.FeedResponse()
+        msg.ParseFromString(raw)
+        parsed = MessageToDict(msg)
+
+        msg_type = parsed.get("type")
+        logger.debug(f"📥 Tick Received: {parsed}")
+
+        if msg_type == "market_info":
+            status = (
+                parsed.get("marketInfo", {}).get("segmentStatus", {}).get("NSE_EQ", "")
+            )
+            await self._on_market_status(status)
+
+        elif msg_type == "ltpc":
+            symbol = parsed.get("symbol") or parsed.get("ltpc", {}).get("symbol")
+            if not symbol:
+                logger.warning("⚠️ Missing symbol in tick")
+                return
+
+            self.received_ltp = True
+            logger.info(f"✅ Calling callback for symbol {symbol}")
+            await self.callback({"type": "live_feed", "data": {symbol: parsed}})
+
+            if self.market_closed:
+                logger.info("📴 Market is closed & LTP received. Stopping.")
+                self.should_run = False
+        elif "feeds" in parsed:
+            await self._on_feeds(parsed.get("feeds", {}))
+        else:
+            logger.warning(f"⚠️ Unknown message type: {msg_type}")
+
+    async def _handle_compact_frame(self, raw):
+        # Reads the needed fields straight off the protobuf objects; no
+        # MessageToDict pass and no per-frame debug formatting.
+        await self._apply_decoded(decode_compact(raw))
+
+    async def _apply_decoded(self, decoded):
+        kind, value = decoded
+        if kind == DECODED_STATUS:
+            await self._on_market_status(value)
+        elif kind == DECODED_FEEDS:
+            await self._on_feeds(value)
+        else:
+            logger.warning(f"⚠️ Unknown message type: {value}")
+
+    async def _on_market_status(self, status):
+        logger.info(f"📊 Market status: {status}")
+        await self.callback({"type": "market_info", "status": status})
+        if status in ["NORMAL_CLOSE", "CLOSING_END"] and self.received_ltp:
+            logger.info("📴 Market is closed and LTP received. Stopping.")
+            self.market_closed = True
+
+    async def _on_feeds(self, feeds):
+        if not feeds:
+            logger.warning("⚠️ Received 'feeds' payload but it's empty.")
+            return
+        self.received_ltp = True
+        logger.debug(f"✅ Calling callback for {len(feeds)} batched LTPs.")
+        await self.callback({"type": "live_feed", "data": feeds})
+        if self.market_closed:
+            logger.info("📴 Market is closed & batched LTP received. Stopping.")
+            self.should_run = False
+
     async def _send_subscription(self):
         if not self.websocket:
             return
-        payload = {
-            "guid": "algo-dashboard",
-            "method": "sub",
-            "data": {
-                "mode": "full",
-                "instrumentKeys": self.instrument_keys[:1500],
-            },
-        }
-        await self.websocket.send(json.dumps(payload).encode("utf-8"))
+        await self._send_frame("sub", self.instrument_keys[:KEYS_PER_CONNECTION])
         logger.info("📩 Subscription payload sent.")
 
+    async def subscribe(self, keys):
+        new_keys = [k for k in keys if k not in self.instrument_keys]
+        if not new_keys:
+            return
+        self.instrument_keys = self.instrument_keys + new_keys
+        await self._send_frame("sub", new_keys)
+
+    async def unsubscribe(self, keys):
+        dropped = set(keys)
+        self.instrument_keys = [k for k in self.instrument_keys if k not in dropped]
+        await self._send_frame("unsub", list(dropped))
+
+    async def _send_frame(self, method, keys):
+        # Frames sent before the socket is up are covered by the full
+        # subscription that goes out on (re)connect.
+        if not self.websocket or not keys:
+            return
+        data = {"instrumentKeys": keys}
+        if method == "sub":
+            data["mode"] = "full"
+        payload = {"guid": "algo-dashboard", "method": method, "data": data}
+        try:
+            await self.websocket.send(json.dumps(payload).encode("utf-8"))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to send {method} frame: {e}")
+
     async def _trigger_stop_callback(self):
         if self.stop_callback:
             if inspect.iscoroutinefunction(self.stop_callback):
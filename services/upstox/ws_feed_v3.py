@@ -1,54 +1,36 @@
 import asyncio
 import json
-import ssl
-import requests
 import websockets
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Optional
 
 from google.protobuf.json_format import MessageToDict
 from services.upstox import MarketDataFeed_pb2 as pb
 from services.upstox.ws_manager import UpstoxWebSocketManager
-from database.connection import get_db
-from database.models import User
-from router.upstox_router import refresh_upstox_token
+from services.upstox.ws_client import feed_ssl_context
+from services.upstox.feed_auth import feed_authorizer
 
 logger = logging.getLogger(__name__)
 
 
 class UpstoxWebSocketClient:
-    def __init__(self, ws_manager: UpstoxWebSocketManager):
+    def __init__(self, ws_manager: UpstoxWebSocketManager, recorder=None):
         self.ws_manager = ws_manager
+        self.recorder = recorder  # optional TickJournalWriter for raw frames
         self.access_token: Optional[str] = None
         self.instrument_keys: List[str] = []
         self.user_email: Optional[str] = None
         self.websocket = None
         self.is_connected = False
 
-    def get_access_token(self, user_email: str) -> str:
-        db = next(get_db())
-        user: User = db.query(User).filter(User.email == user_email).first()
-        if not user:
-            raise Exception("User not found")
-
-        broker = next(
-            (b for b in user.broker_configs if b.broker_name.lower() == "upstox"), None
-        )
-        if not broker or not broker.access_token:
+    async def get_access_token(self, user_email: str) -> str:
+        # Upstox tokens cannot be refreshed in place; an expired token
+        # raises PermissionError and the user has to re-link.
+        access_token = await feed_authorizer.get_access_token(email=user_email)
+        if not access_token:
             raise Exception("Upstox not linked or access token missing")
-
-        if broker.access_token_expiry and broker.access_token_expiry < datetime.now():
-            logger.info("🔁 Refreshing Upstox access token...")
-            token_data = refresh_upstox_token(broker.refresh_token)
-            broker.access_token = token_data["access_token"]
-            broker.refresh_token = token_data.get("refresh_token", broker.refresh_token)
-            broker.access_token_expiry = datetime.now() + timedelta(
-                seconds=token_data.get("expires_in", 86400)
-            )
-            db.commit()
-
-        return broker.access_token
+        return access_token
 
     def decode_protobuf(self, buffer):
         feed_response = pb.FeedResponse()
@@ -59,22 +41,15 @@ class UpstoxWebSocketClient:
         self.stop_flag = False
         self.user_email = user_email
         self.instrument_keys = instrument_keys
-        self.access_token = self.get_access_token(user_email)
+        self.access_token = await self.get_access_token(user_email)
 
         try:
-            response = requests.get(
-                url="https://api.upstox.com/v3/feed/market-data-feed/authorize",
-                headers={"Authorization": f"Bearer {self.access_token}"},
-            )
-            response.raise_for_status()
-            ws_url = response.json()["data"]["authorized_redirect_uri"]
+            ws_url = await feed_authorizer.get_feed_url(self.access_token)
             logger.info(f"🔗 Authorized WebSocket URL: {ws_url}")
 
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            async with websockets.connect(ws_url, ssl=ssl_context) as websocket:
+            async with websockets.connect(
+                ws_url, ssl=feed_ssl_context(ws_url)
+            ) as websocket:
                 logger.info("✅ Upstox WebSocket connected")
                 self.websocket = websocket
 
@@ -83,6 +58,8 @@ class UpstoxWebSocketClient:
                 while not self.stop_flag:
                     try:
                         raw_msg = await asyncio.wait_for(websocket.recv(), timeout=30)
+                        if self.recorder:
+                            self.recorder.append(raw_msg)
                         decoded_msg = self.decode_protobuf(raw_msg)
                         parsed = MessageToDict(decoded_msg)
 
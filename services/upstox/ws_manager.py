@@ -4,6 +4,7 @@ import ssl
 import websockets
 from google.protobuf.json_format import MessageToDict
 import proto.market_data_pb2 as pb
+from services.upstox.feed_auth import feed_authorizer
 import logging
 
 logger = logging.getLogger("stock_logger")
@@ -19,14 +20,8 @@ class UpstoxWebSocketClient:
     def set_token(self, token: str):
         self.access_token = token
 
-    def get_feed_url(self):
-        import requests
-
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        res = requests.get(
-            "https://api.upstox.com/v3/feed/market-data-feed/authorize", headers=headers
-        )
-        return res.json()["data"]["authorized_redirect_uri"]
+    async def get_feed_url(self):
+        return await feed_authorizer.get_feed_url(self.access_token)
 
     async def start_feed(self, instrument_keys):
         if self.running:
@@ -35,7 +30,7 @@ class UpstoxWebSocketClient:
         self.instrument_keys = instrument_keys
 
         try:
-            url = self.get_feed_url()
+            url = await self.get_feed_url()
             ssl_context = ssl.create_default_context()
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
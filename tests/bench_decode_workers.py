@@ -0,0 +1,82 @@
+"""Feed decode throughput and event-loop stall per decode worker mode.
+
+Two simulated upstream connections push full-mode frames through an
+OrderedDecoder. Reported per mode: wall-clock throughput, CPU spent on
+the event-loop thread per 1k ticks (what is left for HTTP routes and
+browser sockets) and how late a 1ms heartbeat task gets woken.
+
+Usage: python -m tests.bench_decode_workers [instruments] [rounds]
+"""
+
+import asyncio
+import sys
+import time
+
+from services.upstox.decode_worker import WORKER_MODES, OrderedDecoder, shutdown_executors
+from tests.test_tick_decoder import make_full_feed_frame
+
+HEARTBEAT = 0.001
+
+
+async def heartbeat(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(time.perf_counter() - start - HEARTBEAT)
+
+
+async def connection(mode, frames, rounds, counter):
+    async def handle(decoded):
+        counter[0] += len(decoded[1])
+
+    decoder = OrderedDecoder(mode, handle)
+    for _ in range(rounds):
+        for raw in frames:
+            await decoder.submit(raw)
+            await asyncio.sleep(0)  # recv() yields between frames
+    await decoder.aclose()
+
+
+async def run(mode, chunks, rounds):
+    counter = [0]
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    await asyncio.gather(*(connection(mode, frames, rounds, counter) for frames in chunks))
+    elapsed = time.perf_counter() - start
+    loop_cpu = time.thread_time() - cpu_start
+    stop.set()
+    await beat
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    return counter[0], elapsed, loop_cpu, p99, lags[-1] if lags else 0.0
+
+
+def main():
+    instruments = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    batch = 100
+    per_connection = instruments // 2
+
+    chunks = []
+    for c in range(2):
+        keys = [f"NSE_FO|{40000 + c * per_connection + i}" for i in range(per_connection)]
+        chunks.append(
+            [make_full_feed_frame(keys[i : i + batch]) for i in range(0, len(keys), batch)]
+        )
+
+    print(f"2 connections x {per_connection} instruments x {rounds} rounds, {batch} per frame")
+    for mode in WORKER_MODES:
+        ticks, elapsed, loop_cpu, p99, worst = asyncio.run(run(mode, chunks, rounds))
+        print(
+            f"{mode:8s} {elapsed:7.3f}s {ticks / elapsed:10,.0f} ticks/s  "
+            f"loop cpu {loop_cpu * 1e6 / ticks:7.1f}ms/1k ticks  "
+            f"heartbeat lag p99 {p99 * 1000:6.2f}ms max {worst * 1000:6.2f}ms"
+        )
+        shutdown_executors()
+
+
+if __name__ == "__main__":
+    main()
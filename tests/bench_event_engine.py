@@ -0,0 +1,31 @@
+"""Event engine: one session of 1-second bars for a 200-symbol universe.
+
+Usage: python -m tests.bench_event_engine [symbols] [bars_per_symbol]
+"""
+
+import sys
+import time
+
+from services.backtest_engine.event_engine import SESSION_SECONDS, EventEngine, FillModel
+from tests.test_event_engine import EmaCross, EmaCrossBlocks, random_feeds
+
+
+def main():
+    symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bars = int(sys.argv[2]) if len(sys.argv) > 2 else SESSION_SECONDS
+    feeds = random_feeds(symbols, bars)
+
+    started = time.perf_counter()
+    engine = EventEngine(feeds, fill_model=FillModel(latency_ms=250, slippage_bps=1))
+    print(f"{symbols} symbols x {bars} bars = {symbols * bars} bars, setup {time.perf_counter() - started:.2f}s")
+    for name, strategy in (("on_bars", EmaCrossBlocks()), ("on_bar", EmaCross())):
+        report = engine.run(strategy)
+        elapsed = report["elapsed_s"]
+        print(
+            f"{name:>8}: {elapsed:6.2f}s ({symbols * bars / elapsed / 1e6:.2f}M bars/s), "
+            f"{report['fills']} fills"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare the MessageToDict feed path with the compact tick decoder.
+
+Usage: python -m tests.bench_feed_decode [instruments] [frames]
+"""
+
+import sys
+import time
+
+from google.protobuf.json_format import MessageToDict
+
+from services.upstox.tick_decoder import (
+    decode_frame,
+    decode_ticks,
+    parse_feed_dict,
+)
+from tests.test_tick_decoder import make_full_feed_frame
+
+
+def dict_path(raw):
+    parsed = MessageToDict(decode_frame(raw))
+    return {key: parse_feed_dict(feed) for key, feed in parsed["feeds"].items()}
+
+
+def compact_path(raw):
+    return decode_ticks(decode_frame(raw))
+
+
+def compact_payload_path(raw):
+    return {key: tick.as_payload() for key, tick in compact_path(raw).items()}
+
+
+def run(fn, frames, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for raw in frames:
+            fn(raw)
+    return time.perf_counter() - start
+
+
+def main():
+    instruments = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    batch = 100
+
+    keys = [f"NSE_FO|{40000 + i}" for i in range(instruments)]
+    frames = [
+        make_full_feed_frame(keys[i : i + batch]) for i in range(0, instruments, batch)
+    ]
+    ticks = instruments * repeat
+
+    print(f"{instruments} instruments x {repeat} rounds, {batch} per frame")
+    for name, fn in (
+        ("MessageToDict + parse_live_feed", dict_path),
+        ("compact ticks", compact_path),
+        ("compact ticks + as_payload", compact_payload_path),
+    ):
+        elapsed = run(fn, frames, repeat)
+        print(f"{name:34s} {elapsed:8.3f}s  {ticks / elapsed:12,.0f} ticks/s")
+
+
+if __name__ == "__main__":
+    main()
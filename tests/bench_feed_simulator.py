@@ -0,0 +1,112 @@
+"""Load-test the upstream feed client against the local feed simulator.
+
+Starts services.upstox.feed_simulator in a subprocess, connects
+UpstoxWebSocketClient instances to it through UPSTOX_API_BASE_URL and
+reports received ticks/s and tick latency (receive time - ltt).
+
+Usage: python -m tests.bench_feed_simulator --instruments 3000 --tick-hz 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instruments", type=int, default=3000)
+    parser.add_argument("--tick-hz", type=float, default=1.0)
+    parser.add_argument("--connections", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--decode-mode", default="compact")
+    parser.add_argument("--port", type=int, default=8765)
+    return parser.parse_args()
+
+
+async def run(args):
+    from services.upstox.tick_decoder import CompactTick, parse_feed_dict
+    from services.upstox.ws_client import UpstoxWebSocketClient
+
+    ticks = 0
+    latencies = []
+
+    async def on_message(message):
+        nonlocal ticks
+        if message.get("type") != "live_feed":
+            return
+        now_ms = time.time() * 1000
+        for details in message["data"].values():
+            if isinstance(details, CompactTick):
+                ltt = details.ltt
+            else:
+                ltt = int(parse_feed_dict(details)["last_trade_time"] or 0)
+            if ltt:
+                latencies.append(now_ms - ltt)
+        ticks += len(message["data"])
+
+    keys = [f"NSE_FO|{50000 + i}" for i in range(args.instruments)]
+    per_connection = -(-len(keys) // args.connections)
+    clients = [
+        UpstoxWebSocketClient(
+            access_token="bench",
+            instrument_keys=keys[i : i + per_connection],
+            callback=on_message,
+            decode_mode=args.decode_mode,
+        )
+        for i in range(0, len(keys), per_connection)
+    ]
+    tasks = [asyncio.create_task(c.connect_and_stream()) for c in clients]
+
+    await asyncio.sleep(1)  # let the sockets connect and subscribe
+    ticks, latencies[:] = 0, []
+    started = time.perf_counter()
+    await asyncio.sleep(args.seconds)
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        client.stop()
+    for task in tasks:
+        task.cancel()
+
+    print(
+        f"{args.instruments} keys @ {args.tick_hz} Hz over {len(clients)} "
+        f"connections, decode={args.decode_mode}"
+    )
+    print(f"received {ticks / elapsed:,.0f} ticks/s")
+    if latencies:
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            f"latency ms: median {statistics.median(latencies):.1f}  "
+            f"p99 {p99:.1f}  max {latencies[-1]:.1f}"
+        )
+
+
+def main():
+    args = parse_args()
+    os.environ["UPSTOX_API_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "services.upstox.feed_simulator",
+            "--port",
+            str(args.port),
+            "--tick-hz",
+            str(args.tick_hz),
+        ]
+    )
+    try:
+        time.sleep(2)
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
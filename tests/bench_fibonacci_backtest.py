@@ -0,0 +1,48 @@
+"""Fibonacci backtest: the row-loop script vs the vectorized engine.
+
+Usage: python -m tests.bench_fibonacci_backtest [script_bars] [engine_bars]
+"""
+
+import sys
+import time
+import warnings
+
+
+from services.backtest_engine.fibonacci import backtest_fibonacci
+from tests.test_fibonacci_backtest import load_script, random_walk
+
+
+def minute_series(n):
+    return random_walk(n=n, volatility=0.002, freq="min")
+
+
+def main():
+    script_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    engine_bars = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+    script = load_script()
+
+    prices = minute_series(script_bars)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        script["backtest"](script["fibonacci_strategy"](prices))
+    script_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backtest_fibonacci(prices, legacy=True)
+    engine_small_s = time.perf_counter() - start
+
+    prices = minute_series(engine_bars)
+    start = time.perf_counter()
+    _, _, report = backtest_fibonacci(prices)
+    engine_s = time.perf_counter() - start
+
+    print(f"script  {script_bars:>9,} bars {script_s * 1000:10.1f} ms "
+          f"(~{script_s / script_bars * engine_bars:.0f} s for {engine_bars:,})")
+    print(f"engine  {script_bars:>9,} bars {engine_small_s * 1000:10.1f} ms")
+    print(f"engine  {engine_bars:>9,} bars {engine_s * 1000:10.1f} ms, "
+          f"{report['total_trades']} trades")
+
+
+if __name__ == "__main__":
+    main()
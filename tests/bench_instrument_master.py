@@ -0,0 +1,86 @@
+"""Per-request instrument lookup: json.load + index rebuild vs the compiled master.
+
+Usage: python -m tests.bench_instrument_master [underlyings]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from services.instrument_master import InstrumentMaster, compile_instruments
+from tests.test_instrument_master import make_instruments
+
+
+def build_dump(underlyings):
+    rows = []
+    for u in range(underlyings):
+        for row in make_instruments(strikes=range(1000, 3001, 50)):
+            row = dict(row)
+            for field in ("trading_symbol", "underlying_symbol", "asset_symbol"):
+                if row.get(field):
+                    row[field] = row[field].replace("NIFTY", f"SYM{u}").replace("RELIANCE", f"EQ{u}")
+            row["instrument_key"] = f"{row['instrument_key']}-{u}"
+            rows.append(row)
+    return rows
+
+
+def json_lookup(path, exchange, symbol):
+    with open(path, "r", encoding="utf-8") as f:
+        instruments = json.load(f)
+    now_ms = time.time() * 1000
+    index = defaultdict(list)
+    for instr in instruments:
+        expiry = instr.get("expiry")
+        if expiry and expiry < now_ms:
+            continue
+        for field in ("trading_symbol", "asset_symbol", "underlying_symbol"):
+            sym = (instr.get(field) or "").upper()
+            if sym:
+                index[(instr.get("exchange", "").upper(), sym)].append(instr)
+    return index.get((exchange, symbol), [])
+
+
+def main():
+    underlyings = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "instruments.json"
+        rows = build_dump(underlyings)
+        source.write_text(json.dumps(rows))
+        size_mb = source.stat().st_size / 1e6
+
+        start = time.perf_counter()
+        compile_instruments(source, Path(tmp) / "master")
+        compile_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        master = InstrumentMaster(Path(tmp) / "master")
+        open_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = json_lookup(source, "NSE", "SYM7")
+        json_s = time.perf_counter() - start
+
+        runs = 2000
+        start = time.perf_counter()
+        for _ in range(runs):
+            ids = master.active(master.by_symbol("NSE", "SYM7"))
+        lookup_s = (time.perf_counter() - start) / runs
+        assert len(ids) == len({r["instrument_key"] for r in expected})
+
+        start = time.perf_counter()
+        master.rows(ids)
+        rows_s = time.perf_counter() - start
+
+    print(f"{len(rows):,} instruments ({size_mb:.1f} MB JSON), {len(ids)} rows per lookup")
+    print(f"compile once           {compile_s * 1000:10.1f} ms")
+    print(f"open compiled master   {open_s * 1000:10.1f} ms")
+    print(f"json.load + index      {json_s * 1000:10.1f} ms per request")
+    print(f"master lookup          {lookup_s * 1e6:10.1f} us per request")
+    print(f"materialize rows       {rows_s * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Autocomplete: pandas ``str.contains`` over every row vs the search index.
+
+Usage: python -m tests.bench_instrument_search [underlyings]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from services.instrument_master import InstrumentMaster, compile_instruments
+from services.instrument_search import InstrumentSearchIndex
+from tests.bench_instrument_master import build_dump
+
+QUERIES = ("S", "SYM1", "SYM12", "EQ7", "SYM3 1500", "FUT", "CONSULTANCY", "ZZZ")
+
+
+def pandas_search(df, q):
+    results = df[df["trading_symbol"].str.contains(q.upper(), na=False)]
+    return results.head(30)
+
+
+def main():
+    underlyings = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "instruments.json"
+        rows = build_dump(underlyings)
+        source.write_text(json.dumps(rows))
+        compile_instruments(source, Path(tmp) / "master")
+        master = InstrumentMaster(Path(tmp) / "master")
+        df = master.dataframe()
+
+        start = time.perf_counter()
+        index = InstrumentSearchIndex(master)
+        build_s = time.perf_counter() - start
+
+        print(f"{len(rows):,} instruments, index built in {build_s * 1000:.0f} ms")
+        print(f"{'query':<14}{'pandas ms':>12}{'index us':>12}{'hits':>8}")
+        runs = 200
+        for q in QUERIES:
+            start = time.perf_counter()
+            pandas_search(df, q)
+            pandas_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                hits = index.search(q)
+            index_s = (time.perf_counter() - start) / runs
+            print(f"{q:<14}{pandas_s * 1000:>12.1f}{index_s * 1e6:>12.1f}{len(hits):>8}")
+
+
+if __name__ == "__main__":
+    main()
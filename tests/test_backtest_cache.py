@@ -0,0 +1,176 @@
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# database.connection needs a URL at import; the tests bind their own SQLite engine
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/tradingbot-tests.db")
+
+from database.models import Backtest
+from services import backtest_cache as backtest_cache_module
+from services.backtest_cache import BacktestCache
+from services.backtest_engine.fibonacci import (
+    backtest_fibonacci,
+    fibonacci_signals,
+    resume_bar,
+    run_backtest,
+)
+from services.backtest_engine.result_cache import (
+    cache_key,
+    data_version,
+    pack_result,
+    params_key,
+    unpack_result,
+)
+from tests.test_fibonacci_backtest import random_walk
+
+
+class TestResultKeys(unittest.TestCase):
+    def test_data_version_covers_values_and_dates(self):
+        prices = random_walk(n=100)
+        self.assertEqual(data_version(prices), data_version(prices.copy()))
+        changed = prices.copy()
+        changed.iloc[50] += 0.01
+        self.assertNotEqual(data_version(changed), data_version(prices))
+        shifted = prices.copy()
+        shifted.index = shifted.index + pd.Timedelta(days=1)
+        self.assertNotEqual(data_version(shifted), data_version(prices))
+
+    def test_params_key_ignores_int_float_spelling(self):
+        self.assertEqual(
+            params_key("fibonacci", {"lookback": 20, "initial_capital": 100000}),
+            params_key("fibonacci", {"initial_capital": 100000.0, "lookback": 20.0}),
+        )
+        self.assertNotEqual(
+            params_key("fibonacci", {"legacy": True}), params_key("fibonacci", {"legacy": 1.0})
+        )
+        self.assertNotEqual(cache_key("fibonacci", {}, "a"), cache_key("fibonacci", {}, "b"))
+        self.assertNotEqual(cache_key("fibonacci", {}, "a"), cache_key("ema", {}, "a"))
+
+    def test_pack_round_trip(self):
+        prices = random_walk(n=300, seed=3, volatility=0.03)
+        signals, portfolio, report = backtest_fibonacci(prices)
+        equity = pd.Series(portfolio["total"], index=prices.index)
+        blob = pack_result(report, equity, signals["signal"], resume_bar(signals["signal"]))
+
+        payload = unpack_result(blob)
+        pd.testing.assert_series_equal(payload["equity"], equity, check_names=False, check_freq=False)
+        np.testing.assert_array_equal(payload["signal"], signals["signal"])
+        self.assertEqual(payload["report"]["total_trades"], report["total_trades"])
+        self.assertEqual(len(payload["report"]["trades"]), len(report["trades"]))
+        self.assertEqual(payload["report"]["trades"][0]["entry_date"], str(report["trades"][0]["entry_date"]))
+        if math.isinf(report["profit_factor"]):
+            self.assertTrue(math.isinf(payload["report"]["profit_factor"]))
+
+
+class TestResume(unittest.TestCase):
+    def assert_resume_matches(self, prices, cut):
+        full_signals, full_portfolio, full_report = backtest_fibonacci(prices)
+
+        earlier, _, _ = backtest_fibonacci(prices.iloc[:cut])
+        payload = unpack_result(
+            pack_result({}, pd.Series(dtype=float), earlier["signal"], resume_bar(earlier["signal"]))
+        )
+        signals = fibonacci_signals(prices, resume=(payload["resume"], payload["signal"]))
+        portfolio, report = run_backtest(signals, prices.index)
+
+        for column in ("signal", "stop_loss", "target", "positions"):
+            np.testing.assert_array_equal(signals[column], full_signals[column])
+        np.testing.assert_array_equal(portfolio["total"], full_portfolio["total"])
+        self.assertEqual(report["trades"], full_report["trades"])
+
+    def test_extending_the_range_matches_a_full_run(self):
+        for seed in range(10):
+            prices = random_walk(n=500, seed=seed, volatility=0.03)
+            for cut in (10, 60, 250, 499):
+                with self.subTest(seed=seed, cut=cut):
+                    self.assert_resume_matches(prices, cut)
+
+    def test_resume_bar(self):
+        self.assertEqual(resume_bar(np.zeros(30, dtype=np.int64)), 20)
+        self.assertEqual(resume_bar(np.array([0, 0, 1, 1, -1, 0, 0])), 6)
+        self.assertEqual(resume_bar(np.array([0, 1, -1, 0, 1, 1])), 4)  # open trade replays
+
+    def test_legacy_cannot_resume(self):
+        prices = random_walk(n=100)
+        with self.assertRaises(ValueError):
+            fibonacci_signals(prices, legacy=True, resume=(20, np.zeros(50, dtype=np.int64)))
+
+
+class TestBacktestCacheTable(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        Backtest.__table__.create(engine)
+        self.addCleanup(engine.dispose)
+        self.db = sessionmaker(bind=engine)()
+        self.addCleanup(self.db.close)
+        self.cache = BacktestCache()
+        self.prices = random_walk(n=500, seed=4, volatility=0.03)
+        signals = mock.patch.object(
+            backtest_cache_module, "fibonacci_signals", wraps=backtest_cache_module.fibonacci_signals
+        )
+        self.signals = signals.start()
+        self.addCleanup(signals.stop)
+
+    def test_repeat_is_a_cache_hit(self):
+        first = self.cache.fibonacci(self.db, self.prices, {"lookback": 20}, user_id=7)
+        second = self.cache.fibonacci(self.db, self.prices, {"lookback": 20.0})
+        self.assertEqual(self.signals.call_count, 1)
+        self.assertEqual(second["total_trades"], first["total_trades"])
+        self.assertEqual(len(second["trades"]), len(first["trades"]))
+        row = self.db.query(Backtest).one()
+        self.assertEqual(row.user_id, 7)
+        self.assertEqual(row.strategy_name, "fibonacci")
+        self.assertEqual(row.metrics["total_trades"], first["total_trades"])
+
+    def test_extended_data_resumes_the_cached_prefix(self):
+        self.cache.fibonacci(self.db, self.prices.iloc[:300])
+        defaults = backtest_cache_module.FIBONACCI_DEFAULTS
+        prefix = self.cache.longest_prefix(self.db, "fibonacci", defaults, self.prices)
+        self.assertIsNotNone(prefix)
+        self.assertEqual(len(prefix["signal"]), 300)
+
+        report = self.cache.fibonacci(self.db, self.prices)
+        self.assertIsNotNone(self.signals.call_args.kwargs["resume"])
+        _, _, expected = backtest_fibonacci(self.prices)
+        self.assertEqual(report["trades"], expected["trades"])
+        self.assertEqual(self.db.query(Backtest).count(), 2)
+
+        # A different history over the same dates is not a prefix
+        changed = self.prices.copy()
+        changed.iloc[100] += 1
+        self.assertIsNone(self.cache.longest_prefix(self.db, "fibonacci", defaults, changed))
+
+    def test_duplicate_store_is_ignored(self):
+        params = dict(backtest_cache_module.FIBONACCI_DEFAULTS)
+        signals, portfolio, report = backtest_fibonacci(self.prices)
+        equity = pd.Series(portfolio["total"], index=self.prices.index)
+        args = (self.db, "fibonacci", params, self.prices, report, equity, signals["signal"], 20)
+        self.cache.store(*args)
+
+        duplicate = Backtest(
+            start_date=self.prices.index[0].to_pydatetime(),
+            end_date=self.prices.index[-1].to_pydatetime(),
+            total_pnl=0.0,
+            cache_key=cache_key("fibonacci", params, data_version(self.prices)),
+        )
+        self.db.add(duplicate)
+        with self.assertRaises(IntegrityError):
+            self.db.commit()
+        self.db.rollback()
+
+        self.cache.store(*args)  # a concurrent identical run: rolled back, not raised
+        self.assertEqual(self.db.query(Backtest).count(), 1)
+        self.assertIsNotNone(self.cache.lookup(self.db, "fibonacci", params, self.prices))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# database.connection needs a URL at import; the tests bind their own SQLite engine
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/tradingbot-tests.db")
+
+from database.models import Backtest
+from services import backtest_cache as backtest_cache_module
+from services import backtest_jobs as backtest_jobs_module
+from services.backtest_engine import sweep as sweep_module
+from services.backtest_jobs import CANCELLED, DONE, FAILED, BacktestJobs, JobLimitError
+from services.ohlcv_store import ohlcv_store
+
+
+def wait_for(job, timeout=30):
+    job.future.result(timeout=timeout)
+    return job
+
+
+def streaming(job, params):
+    for i in range(params["steps"]):
+        job.update(progress=(i + 1) / params["steps"], trades=[{"n": i}], equity=[[i, i * 10.0]])
+    return {"steps": params["steps"]}
+
+
+def blocking(job, params):
+    params["started"].set()
+    while not params["release"].wait(0.01):
+        job.check()
+    return "released"
+
+
+class TestBacktestJobs(unittest.TestCase):
+    def setUp(self):
+        self.jobs = BacktestJobs(workers=2, per_user=2, kept=10)
+        self.addCleanup(self.jobs.shutdown)
+
+    def test_streams_reach_a_late_subscriber(self):
+        job = wait_for(self.jobs.submit(1, "custom", {"steps": 3}, run=streaming))
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(job.result, {"steps": 3})
+
+        async def subscribe():
+            return job.subscribe().get_nowait()
+
+        snapshot = asyncio.run(subscribe())
+        self.assertEqual(snapshot["type"], "snapshot")
+        self.assertEqual(snapshot["status"], DONE)
+        self.assertEqual(snapshot["streams"]["trades"], [{"n": 0}, {"n": 1}, {"n": 2}])
+        self.assertEqual(len(snapshot["streams"]["equity"]), 3)
+
+    def test_live_events_in_order(self):
+        release = threading.Event()
+
+        def stepped(job, params):
+            release.wait(5)
+            return streaming(job, params)
+
+        async def follow():
+            job = self.jobs.submit(1, "custom", {"steps": 2}, run=stepped)
+            queue = job.subscribe()
+            release.set()
+            events = []
+            while True:
+                event = await asyncio.wait_for(queue.get(), 10)
+                events.append(event)
+                if event["type"] == "status" and event["status"] == DONE:
+                    return events
+
+        events = asyncio.run(follow())
+        types = [e["type"] for e in events]
+        self.assertEqual(types[0], "snapshot")
+        self.assertEqual(types[-1], "status")
+        self.assertEqual([e["progress"] for e in events if e["type"] == "progress"], [0.5, 1.0])
+        self.assertEqual([e["trades"] for e in events if e["type"] == "trades"], [[{"n": 0}], [{"n": 1}]])
+
+    def test_per_user_cap(self):
+        params = {"started": threading.Event(), "release": threading.Event()}
+        first = self.jobs.submit(1, "custom", params, run=blocking)
+        self.jobs.submit(1, "custom", params, run=blocking)
+        with self.assertRaises(JobLimitError):
+            self.jobs.submit(1, "custom", params, run=blocking)
+        self.jobs.submit(2, "custom", {"steps": 1}, run=streaming)  # other users unaffected
+
+        params["release"].set()
+        wait_for(first)
+        self.assertEqual(first.result, "released")
+        self.assertEqual({j.user_id for j in self.jobs.jobs_for(1)}, {1})
+        self.assertIsNone(self.jobs.get(first.id, user_id=2))
+
+    def test_cancel_running_and_queued(self):
+        jobs = BacktestJobs(workers=1, per_user=5)
+        self.addCleanup(jobs.shutdown)
+        params = {"started": threading.Event(), "release": threading.Event()}
+        running = jobs.submit(1, "custom", params, run=blocking)
+        queued = jobs.submit(1, "custom", {"steps": 1}, run=streaming)
+        self.assertTrue(params["started"].wait(5))
+
+        jobs.cancel(queued.id, 1)
+        self.assertEqual(queued.status, CANCELLED)
+        jobs.cancel(running.id, 1)
+        wait_for(running)
+        self.assertEqual(running.status, CANCELLED)
+
+    def test_failures_are_reported(self):
+        def broken(job, params):
+            raise ValueError("bad input")
+
+        job = wait_for(self.jobs.submit(1, "custom", run=broken))
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, "bad input")
+        with self.assertRaises(ValueError):
+            self.jobs.submit(1, "nope")
+
+    def test_finished_jobs_are_pruned(self):
+        jobs = BacktestJobs(workers=1, per_user=1, kept=2)
+        self.addCleanup(jobs.shutdown)
+        submitted = [wait_for(jobs.submit(1, "custom", {"steps": 1}, run=streaming)) for _ in range(4)]
+        jobs.submit(1, "custom", {"steps": 1}, run=streaming)
+        self.assertIsNone(jobs.get(submitted[0].id))
+        self.assertIsNotNone(jobs.get(submitted[-1].id))
+
+
+class TestJobKinds(unittest.TestCase):
+    def setUp(self):
+        self.jobs = BacktestJobs(workers=1, per_user=1)
+        self.addCleanup(self.jobs.shutdown)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        patcher = mock.patch.object(ohlcv_store, "root", self.tmp / "ohlcv")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Fibonacci jobs go through the results cache; give it a SQLite backtests table
+        engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        Backtest.__table__.create(engine)
+        self.addCleanup(engine.dispose)
+        self.Session = sessionmaker(bind=engine)
+        patcher = mock.patch.object(backtest_jobs_module, "SessionLocal", self.Session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fibonacci_job(self):
+        job = wait_for(self.jobs.submit(1, "fibonacci", {"symbol": "TCS.NS", "sector": "NIFTY IT"}))
+        self.assertEqual(job.status, DONE, job.error)
+        self.assertEqual(job.result["total_trades"], len(job.streams.get("trades", [])))
+        self.assertGreater(len(job.streams["equity"]), 1000)
+
+    def test_repeated_fibonacci_job_is_a_cache_hit(self):
+        params = {"symbol": "TCS.NS", "sector": "NIFTY IT", "lookback": 30}
+        with mock.patch.object(
+            backtest_cache_module, "fibonacci_signals", wraps=backtest_cache_module.fibonacci_signals
+        ) as signals:
+            first = wait_for(self.jobs.submit(1, "fibonacci", params))
+            second = wait_for(self.jobs.submit(1, "fibonacci", params))
+        self.assertEqual(second.status, DONE, second.error)
+        self.assertEqual(signals.call_count, 1)
+        self.assertEqual(second.result["total_trades"], first.result["total_trades"])
+        np.testing.assert_array_equal(
+            [v for _, v in second.streams["equity"]], [v for _, v in first.streams["equity"]]
+        )
+        db = self.Session()
+        self.addCleanup(db.close)
+        row = db.query(Backtest).one()
+        self.assertEqual((row.user_id, row.params["lookback"]), (1, 30))
+
+    def test_fib_ai_job_trades_approved_signals(self):
+        class EveryOtherBar:
+            def predict(self, X):
+                return np.arange(len(X)) % 2
+
+        # The strategy module loads the trained model on import; stand in a stub for it
+        with mock.patch("joblib.load", return_value=EveryOtherBar()):
+            from services.stratigy import fibonacci_strategy
+        patcher = mock.patch.object(fibonacci_strategy, "model", EveryOtherBar())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        job = wait_for(self.jobs.submit(1, "fib_ai", {"symbol": "TCS.NS", "sector": "NIFTY IT"}), timeout=60)
+        self.assertEqual(job.status, DONE, job.error)
+        trades = job.streams["trades"]
+        self.assertGreater(len(trades), 10)
+        self.assertEqual(trades[0]["action"], "BUY")
+        sells = [t for t in trades if t["action"] == "SELL"]
+        self.assertEqual(len(job.streams["equity"]), len(sells))
+        self.assertAlmostEqual(job.result["pnl"], sum(t["pnl"] for t in sells))
+        self.assertEqual(job.result["trades"], len(trades))
+
+    def test_sweep_job_streams_results(self):
+        with mock.patch.object(sweep_module, "BACKTEST_DATA_DIR", str(self.tmp)):
+            job = wait_for(self.jobs.submit(1, "sweep", {
+                "symbol": "TCS.NS",
+                "strategy": "fibonacci",
+                "grid": {"lookback": [10, 20], "target_pct": [0.03, 0.05]},
+            }), timeout=120)
+        self.assertEqual(job.status, DONE, job.error)
+        self.assertEqual(job.result["evaluated"], 4)
+        self.assertEqual(len(job.streams["results"]), 4)
+        self.assertEqual(job.progress, 1.0)
+
+    def test_sweep_job_uses_its_own_pool_size(self):
+        pools = []
+
+        def run(sweep, combinations, **kwargs):
+            pools.append(sweep.workers)
+            return sweep.ranked()
+
+        with mock.patch.object(sweep_module, "BACKTEST_DATA_DIR", str(self.tmp)), mock.patch.object(
+            backtest_jobs_module, "BACKTEST_JOB_SWEEP_WORKERS", 1
+        ), mock.patch.object(sweep_module.ParameterSweep, "run", run):
+            job = wait_for(self.jobs.submit(1, "sweep", {
+                "symbol": "TCS.NS", "strategy": "fibonacci", "grid": {"lookback": [10]},
+            }))
+        self.assertEqual(job.status, DONE, job.error)
+        self.assertEqual(pools, [1])
+
+    def test_oversized_sweeps_are_rejected(self):
+        with mock.patch.object(backtest_jobs_module, "BACKTEST_JOB_SWEEP_MAX_COMBINATIONS", 10):
+            with self.assertRaises(ValueError):
+                self.jobs.submit(1, "sweep", {"symbol": "TCS.NS", "strategy": "fibonacci",
+                                              "grid": {"lookback": list(range(4)), "target_pct": [0.1, 0.2, 0.3]}})
+            with self.assertRaises(ValueError):
+                self.jobs.submit(1, "sweep", {"symbol": "TCS.NS", "strategy": "fibonacci",
+                                              "method": "random", "space": {"lookback": [5, 50]}, "samples": 11})
+            with self.assertRaises(ValueError):
+                self.jobs.submit(1, "sweep", {"symbol": "TCS.NS", "strategy": "fibonacci", "grid": {"lookback": 10}})
+        self.assertEqual(self.jobs.jobs_for(1), [])
+
+    def test_unknown_symbol_fails(self):
+        job = wait_for(self.jobs.submit(1, "fibonacci", {"symbol": "NOPE"}))
+        self.assertEqual(job.status, FAILED)
+        self.assertIn("NOPE", job.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
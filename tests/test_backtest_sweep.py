@@ -0,0 +1,114 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from services.backtest_engine.ema import backtest_ema
+from services.backtest_engine.sweep import (
+    ParameterSweep,
+    evaluate,
+    grid_combinations,
+    latin_hypercube,
+    random_combinations,
+)
+from strategies.strategy import run_ema_strategy
+from tests.test_fibonacci_backtest import random_walk
+
+
+class TestEmaEngine(unittest.TestCase):
+    def test_matches_run_ema_strategy(self):
+        for seed in (1, 2, 3):
+            prices = random_walk(800, seed=seed)
+            df = pd.DataFrame({"close": prices.to_numpy(), "timestamp": prices.index})
+            trades, summary = run_ema_strategy(df, 5, 20)
+            _, _, report = backtest_ema(prices, 5, 20, shares_per_trade=1, broker_fee=0)
+
+            buys = [t["timestamp"] for t in trades if t["type"] == "BUY"]
+            sells = [t for t in trades if t["type"] == "SELL"]
+            self.assertEqual([t["entry_date"] for t in report["trades"]], buys[: len(sells)])
+            self.assertEqual([t["exit_date"] for t in report["trades"]], [t["timestamp"] for t in sells])
+            self.assertAlmostEqual(sum(t["profit"] for t in report["trades"]), summary["total_pnl"])
+
+
+class TestParameterSpaces(unittest.TestCase):
+    def test_grid(self):
+        combos = grid_combinations({"a": [1, 2, 3], "b": [0.1, 0.2]})
+        self.assertEqual(len(combos), 6)
+        self.assertIn({"a": 3, "b": 0.2}, combos)
+
+    def test_random_bounds_and_types(self):
+        combos = random_combinations({"n": (5, 10), "x": (0.01, 0.05), "c": ["a", "b"]}, 200, seed=1)
+        self.assertTrue(all(5 <= c["n"] <= 10 and isinstance(c["n"], int) for c in combos))
+        self.assertTrue(all(0.01 <= c["x"] <= 0.05 for c in combos))
+        self.assertEqual({c["c"] for c in combos}, {"a", "b"})
+        self.assertEqual(combos, random_combinations({"n": (5, 10), "x": (0.01, 0.05), "c": ["a", "b"]}, 200, seed=1))
+
+    def test_latin_hypercube_covers_every_stratum(self):
+        combos = latin_hypercube({"n": (0, 9), "x": (0.0, 1.0)}, 10, seed=3)
+        self.assertEqual(sorted(c["n"] for c in combos), list(range(10)))
+        strata = sorted(int(c["x"] * 10) for c in combos)
+        self.assertEqual(strata, list(range(10)))
+
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "sweep.jsonl"
+        self.prices = random_walk(1500, seed=11)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_results_match_serial_and_resume(self):
+        combos = grid_combinations({"lookback": [10, 20, 30], "target_pct": [0.03, 0.05]})
+        sweep = ParameterSweep("fibonacci", self.prices, self.path, workers=2)
+        table = sweep.run(combos + combos[:2], chunk_size=2)
+        self.assertEqual(len(table), 6)
+        self.assertEqual(len(self.path.read_text().splitlines()), 6)
+
+        price = self.prices.to_numpy()
+        for row in table.itertuples():
+            expected = evaluate("fibonacci", price, {"lookback": row.lookback, "target_pct": row.target_pct})
+            self.assertAlmostEqual(row.sharpe_ratio, expected["sharpe_ratio"])
+        sharpe = table["sharpe_ratio"].to_numpy()
+        self.assertTrue(np.all(sharpe[:-1] >= sharpe[1:]))
+
+        # A new sweep on the same file only evaluates what is missing
+        resumed = ParameterSweep("fibonacci", self.prices, self.path, workers=2)
+        self.assertEqual(len(resumed.pending(combos)), 0)
+        more = combos + [{"lookback": 40, "target_pct": 0.05}]
+        self.assertEqual(len(resumed.run(more)), 7)
+        self.assertEqual(len(self.path.read_text().splitlines()), 7)
+
+    def test_other_dataset_is_not_reused(self):
+        combos = [{"short_period": 5, "long_period": 20}]
+        ParameterSweep("ema", self.prices, self.path, workers=1).run(combos)
+        other = ParameterSweep("ema", random_walk(1500, seed=12), self.path, workers=1)
+        self.assertEqual(len(other.pending(combos)), 1)
+
+    def test_cancel_keeps_finished_chunks(self):
+        combos = grid_combinations({"lookback": list(range(10, 40))})
+        cancel = threading.Event()
+        cancel.set()
+        sweep = ParameterSweep("fibonacci", self.prices, self.path, workers=1)
+        sweep.run(combos, chunk_size=1, cancel=cancel)
+        self.assertLess(len(sweep.results), len(combos))
+        self.assertEqual(len(self.path.read_text().splitlines()), len(sweep.results))
+        self.assertEqual(len(sweep.run(combos, chunk_size=5)), len(combos))
+
+    def test_truncated_line_is_skipped(self):
+        combos = [{"short_period": 5, "long_period": 20}]
+        ParameterSweep("ema", self.prices, self.path, workers=1).run(combos)
+        with open(self.path, "a") as f:
+            f.write('{"key": "cut sh')
+        resumed = ParameterSweep("ema", self.prices, self.path, workers=1)
+        self.assertEqual(len(resumed.results), 1)
+        resumed.run(combos + [{"short_period": 8, "long_period": 30}])
+        self.assertEqual(len(ParameterSweep("ema", self.prices, self.path).results), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
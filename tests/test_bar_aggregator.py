@@ -0,0 +1,132 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from services.bar_aggregator import BarAggregator, BarRing
+from services.upstox.tick_decoder import CompactTick
+from tests.test_instrument_master import InstrumentFixture
+
+
+def tick(key, ltp, ltt_ms, vtt=0):
+    t = CompactTick(key)
+    t.ltp = ltp
+    t.ltt = ltt_ms
+    t.vtt = vtt
+    return t
+
+
+class TestBarRing(unittest.TestCase):
+    def test_ohlc_and_close_on_new_bucket(self):
+        ring = BarRing(60, 10)
+        self.assertIsNone(ring.update(120, 10.0, 1))
+        ring.update(130, 12.0, 2)
+        ring.update(140, 9.0, 3)
+        ring.update(179, 11.0, 4)
+
+        closed = ring.update(180, 11.5, 5)
+        self.assertEqual(closed, [120, 10.0, 12.0, 9.0, 11.0, 10])
+        self.assertEqual(ring.count, 1)
+        self.assertEqual(ring.bar, [180, 11.5, 11.5, 11.5, 11.5, 5])
+
+    def test_late_tick_is_rejected(self):
+        ring = BarRing(60, 10)
+        ring.update(180, 10.0, 0)
+        self.assertIs(ring.update(170, 99.0, 0), False)
+        self.assertEqual(ring.bar[2], 10.0)
+
+    def test_ring_grows_then_wraps(self):
+        ring = BarRing(1, 50)
+        for ts in range(120):
+            ring.update(ts, float(ts), 0)
+        self.assertEqual(len(ring.data), 50)
+        self.assertEqual(ring.count, 50)
+
+        rows = ring.last(5)
+        np.testing.assert_array_equal(rows[:, 0], [114, 115, 116, 117, 118])
+        rows = ring.last(50, include_partial=True)
+        self.assertEqual(len(rows), 51)
+        self.assertEqual(rows[0, 0], 69)
+        self.assertEqual(rows[-1, 0], 119)
+
+
+class TestBarAggregator(unittest.TestCase):
+    def setUp(self):
+        self.agg = BarAggregator(timeframes={"1s": 1, "1m": 60}, capacity={"1s": 100, "1m": 10})
+        self.closed = []
+        self.agg.on_bar_close(lambda key, tf, bar: self.closed.append((key, tf, list(bar))))
+
+    def feed(self, *ticks):
+        self.agg.on_message({"type": "live_feed", "data": {t.instrument_key: t for t in ticks}})
+
+    def test_volume_from_cumulative_day_volume(self):
+        self.feed(tick("K", 100.0, 60_000, vtt=1000))
+        self.feed(tick("K", 101.0, 60_500, vtt=1200))
+        self.feed(tick("K", 102.0, 61_000, vtt=1250))
+
+        self.assertEqual(self.closed, [("K", "1s", [60, 100.0, 101.0, 100.0, 101.0, 200])])
+        bars = self.agg.last("K", "1m", 5, include_partial=True)
+        self.assertEqual(bars["volume"].tolist(), [250])
+        self.assertEqual(bars["high"].tolist(), [102.0])
+
+    def test_dict_ticks_are_accepted(self):
+        self.agg.on_message(
+            {
+                "type": "live_feed",
+                "data": {
+                    "K": {"fullFeed": {"marketFF": {"ltpc": {"ltp": 5.0, "ltt": "120000"}, "vtt": "10"}}}
+                },
+            }
+        )
+        self.assertTrue(self.agg.has("K"))
+        self.assertEqual(self.agg.last("K", "1m", 1, include_partial=True)["ts"].tolist(), [120])
+
+    def test_clock_closes_quiet_instruments(self):
+        self.feed(tick("K", 100.0, 60_000))
+        self.agg.close_due(now=200)
+        self.assertEqual([tf for _, tf, _ in self.closed], ["1s", "1m"])
+        self.assertIsNone(self.agg.series["K"][0].bar)
+
+    def test_tick_after_clock_close_is_late(self):
+        self.agg.update("K", 600, 100.0)
+        self.agg.update("K", 601, 101.0)
+        self.agg.close_due(now=905)
+        self.agg.update("K", 650, 102.0)
+        self.agg.close_due(now=2000)
+
+        self.assertEqual(self.agg.last("K", "1m", 10)["ts"].tolist(), [600])
+        self.assertEqual(self.agg.last("K", "1s", 10)["ts"].tolist(), [600, 601, 650])
+        self.assertEqual(self.agg.late_ticks, 1)
+
+    def test_frame_matches_yfinance_layout(self):
+        for i in range(3):
+            self.feed(tick("K", 100.0 + i, (60 + 60 * i) * 1000))
+        frame = self.agg.frame("K", "1m", 10)
+        self.assertEqual(list(frame.columns), ["Open", "High", "Low", "Close", "Volume"])
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(str(frame.index.tz), "Asia/Kolkata")
+
+    def test_unknown_instrument_reads_empty(self):
+        self.assertEqual(len(self.agg.last("X", "1m", 5)["close"]), 0)
+        with self.assertRaises(ValueError):
+            self.agg.last("X", "1h", 5)
+
+
+class TestTickerSymbols(InstrumentFixture, unittest.TestCase):
+    def test_yfinance_ticker_reads_live_bars(self):
+        agg = BarAggregator(timeframes={"5m": 300}, capacity={"5m": 10})
+        for i in range(3):
+            agg.update("NSE_EQ|INE002A01018", 300 * (i + 1), 2900.0 + i)
+
+        with mock.patch("services.bar_aggregator.get_instrument_master", return_value=self.master):
+            key = agg.resolve("RELIANCE.NS")
+            self.assertEqual(key, "NSE_EQ|INE002A01018")
+            self.assertTrue(agg.has(key))
+            self.assertEqual(agg.frame(key, "5m", 10)["Close"].tolist(), [2900.0, 2901.0, 2902.0])
+            self.assertEqual(agg.resolve("NSE_EQ|INE467B01029"), "NSE_EQ|INE467B01029")
+            self.assertIsNone(agg.resolve("NIFTY.NS"))  # an index, not an EQ listing
+            self.assertIsNone(agg.resolve("AAPL"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.decode_worker import (
+    DECODED_FEEDS,
+    DECODED_STATUS,
+    WORKER_MODES,
+    OrderedDecoder,
+    decode_compact,
+    shutdown_executors,
+)
+from tests.test_tick_decoder import make_full_feed_frame
+
+
+def status_frame(status):
+    msg = pb.FeedResponse()
+    msg.type = pb.Type.Value("market_info")
+    msg.marketInfo.segmentStatus["NSE_EQ"] = pb.MarketStatus.Value(status)
+    return msg.SerializeToString()
+
+
+class TestDecodeCompact(unittest.TestCase):
+    def test_kinds(self):
+        self.assertEqual(decode_compact(status_frame("NORMAL_OPEN")), (DECODED_STATUS, "NORMAL_OPEN"))
+        kind, ticks = decode_compact(make_full_feed_frame(["NSE_EQ|A"]))
+        self.assertEqual(kind, DECODED_FEEDS)
+        self.assertEqual(ticks["NSE_EQ|A"].ltp, 100.5)
+
+
+class TestOrderedDecoder(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_executors()
+
+    async def check_order(self, mode):
+        frames = [make_full_feed_frame([f"NSE_FO|{i}"]) for i in range(200)]
+        seen = []
+
+        async def handle(decoded):
+            kind, ticks = decoded
+            seen.extend(ticks)
+
+        decoder = OrderedDecoder(mode, handle, max_pending=8)
+        for raw in frames:
+            await decoder.submit(raw)
+        await decoder.aclose()
+        self.assertEqual(seen, [f"NSE_FO|{i}" for i in range(200)])
+
+    async def test_order_preserved_in_every_mode(self):
+        for mode in WORKER_MODES:
+            with self.subTest(mode=mode):
+                await self.check_order(mode)
+
+    async def test_bad_frame_is_skipped(self):
+        seen = []
+
+        async def handle(decoded):
+            seen.append(decoded[0])
+
+        decoder = OrderedDecoder("thread", handle)
+        await decoder.submit(b"\xff\xff\xff")
+        await decoder.submit(status_frame("NORMAL_CLOSE"))
+        await decoder.aclose()
+        self.assertEqual(seen, [DECODED_STATUS])
+        self.assertEqual(decoder.errors, 1)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            OrderedDecoder("gpu", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,307 @@
+import unittest
+
+import numpy as np
+
+from services.backtest_engine.event_engine import (
+    AutoTraderStrategy,
+    EventEngine,
+    FillModel,
+    PaperBroker,
+    attach_live,
+    BUY,
+    SELL,
+)
+from services.bar_aggregator import CLOSE, BarAggregator
+from services.quote_board import QuoteBoard
+
+START = 1_700_000_000
+
+
+def make_feed(closes, start=START, interval=1):
+    closes = np.asarray(closes, dtype=np.float64)
+    ts = start + interval * np.arange(len(closes))
+    return {
+        "ts": ts,
+        "open": closes,
+        "high": closes,
+        "low": closes,
+        "close": closes,
+        "volume": np.full(len(closes), 100.0),
+    }
+
+
+class Scripted:
+    """Buys/sells on given bar numbers of one instrument, records every bar it sees."""
+
+    def __init__(self, orders):
+        self.orders = orders  # (instrument key, bar ts) -> ("buy" | "sell", qty)
+        self.seen = []
+        self.fills = []
+
+    def on_start(self, broker, instrument_keys):
+        self.broker = broker
+
+    def on_bar(self, instrument_key, timeframe, bar):
+        self.seen.append((bar[0], instrument_key))
+        order = self.orders.get((instrument_key, bar[0]))
+        if order:
+            getattr(self.broker, order[0])(instrument_key, order[1])
+
+    def on_fill(self, fill):
+        self.fills.append(fill)
+
+
+class EmaCross:
+    """Incremental EMA crossover, bar by bar: buy on a cross up, exit on a cross down."""
+
+    def __init__(self, fast=20, slow=60, qty=10):
+        self.a_fast, self.a_slow = 2 / (fast + 1), 2 / (slow + 1)
+        self.qty = qty
+
+    def on_start(self, broker, instrument_keys):
+        self.broker = broker
+        self.state = {key: None for key in instrument_keys}
+
+    def on_bar(self, instrument_key, timeframe, bar):
+        price = bar[CLOSE]
+        state = self.state[instrument_key]
+        if state is None:
+            self.state[instrument_key] = [price, price, False]
+            return
+        fast = state[0] = state[0] + self.a_fast * (price - state[0])
+        slow = state[1] = state[1] + self.a_slow * (price - state[1])
+        above = fast > slow
+        if above != state[2]:
+            state[2] = above
+            if above:
+                self.broker.buy(instrument_key, self.qty)
+            elif self.broker.position(instrument_key):
+                self.broker.sell(instrument_key)
+
+
+class EmaCrossBlocks(EmaCross):
+    """The same rules over a timestamp's block of bars at once."""
+
+    def on_start(self, broker, instrument_keys):
+        self.broker = broker
+        self.keys = instrument_keys
+        self.fast = np.full(len(instrument_keys), np.nan)
+        self.slow = np.full(len(instrument_keys), np.nan)
+        self.above = np.zeros(len(instrument_keys), dtype=bool)
+
+    def on_bars(self, timeframe, slots, bars):
+        price = bars[:, CLOSE]
+        fast, slow = self.fast[slots], self.slow[slots]
+        new = np.isnan(fast)
+        fast = np.where(new, price, fast + self.a_fast * (price - fast))
+        slow = np.where(new, price, slow + self.a_slow * (price - slow))
+        self.fast[slots], self.slow[slots] = fast, slow
+        above = fast > slow
+        crossed = (above != self.above[slots]) & ~new
+        self.above[slots] = above
+        for j, up in zip(slots[crossed].tolist(), above[crossed].tolist()):
+            key = self.keys[j]
+            if up:
+                self.broker.buy(key, self.qty)
+            elif self.broker.position(key):
+                self.broker.sell(key)
+
+
+def random_feeds(symbols, bars, seed=0, interval=1):
+    rng = np.random.default_rng(seed)
+    return {
+        f"NSE_EQ|SYM{s}": make_feed(100 * np.exp(np.cumsum(rng.normal(0, 0.0005, bars))), interval=interval)
+        for s in range(symbols)
+    }
+
+
+NO_COSTS = dict(spread_bps=0.0, brokerage_flat=0.0, brokerage_pct=0.0)
+
+
+class TestFillModel(unittest.TestCase):
+    def test_walks_depth(self):
+        model = FillModel(brokerage_pct=0)
+        levels = [(100.0, 10), (101.0, 10)]
+        self.assertAlmostEqual(model.fill(BUY, 15, levels), (1000 + 505) / 15)
+        # Beyond the visible depth at the worst level
+        self.assertAlmostEqual(model.fill(BUY, 30, levels), (1000 + 1010 + 1010) / 30)
+
+    def test_slippage_and_brokerage(self):
+        model = FillModel(slippage_bps=10, brokerage_flat=20, brokerage_pct=0.0005)
+        self.assertAlmostEqual(model.fill(SELL, 1, [(100.0, 5)]), 99.9)
+        self.assertAlmostEqual(model.fee(10_000), 5.0)
+        self.assertAlmostEqual(model.fee(1_000_000), 20.0)
+
+    def test_synthetic_book(self):
+        model = FillModel(spread_bps=10, depth_levels=3, depth_qty=7)
+        asks = model.synthetic_book(BUY, 100.0)
+        bids = model.synthetic_book(SELL, 100.0)
+        self.assertEqual([q for _, q in asks], [7, 7, 7])
+        self.assertAlmostEqual(asks[0][0], 100.05)
+        self.assertAlmostEqual(bids[1][0], 99.85)
+
+
+class TestEventEngine(unittest.TestCase):
+    def test_replays_in_time_order(self):
+        feeds = {"A": make_feed([1, 2, 3, 4]), "B": make_feed([5, 6, 7], start=START + 1)}
+        strategy = Scripted({})
+        EventEngine(feeds).run(strategy)
+        self.assertEqual(
+            strategy.seen,
+            sorted(strategy.seen),
+        )
+        self.assertEqual(len(strategy.seen), 7)
+
+    def test_latency_fills_on_a_later_bar(self):
+        feeds = {"A": make_feed([100, 101, 102, 103, 104, 105])}
+        strategy = Scripted({("A", START + 1): ("buy", 10), ("A", START + 3): ("sell", 10)})
+        report = EventEngine(feeds, fill_model=FillModel(latency_ms=1500, **NO_COSTS)).run(strategy)
+        # Ordered at the close of bar 1 (t+2), due t+3.5: bar 3 (closes t+4) is the first to qualify
+        self.assertEqual([f["price"] for f in strategy.fills], [103.0, 105.0])
+        self.assertAlmostEqual(report["final_equity"], 1_000_000 + 20)
+
+    def test_same_bar_fill_and_equity(self):
+        feeds = {"A": make_feed([100, 110, 120, 90]), "B": make_feed([50, 50, 55, 60])}
+        strategy = Scripted({
+            ("A", START): ("buy", 10),
+            ("B", START + 1): ("buy", 20),
+            ("A", START + 2): ("sell", 10),
+        })
+        report = EventEngine(feeds, fill_model=FillModel(**NO_COSTS)).run(strategy)
+        equity = report["equity"].to_numpy()
+        # A: +200 realized at bar 2; B: 20 shares bought at 50, marked at 55 then 60
+        np.testing.assert_allclose(equity - 1_000_000, [0, 100, 300, 400])
+        self.assertEqual(report["open_positions"], {"B": 20})
+
+    def test_recorded_depth_and_costs(self):
+        feed = make_feed([100, 100, 100])
+        feed["ask"] = np.array([[100.5, 101.0]] * 3)
+        feed["ask_qty"] = np.array([[5, 100]] * 3)
+        feed["bid"] = np.array([[99.5, 99.0]] * 3)
+        feed["bid_qty"] = np.array([[100, 100]] * 3)
+        strategy = Scripted({("A", START): ("buy", 10), ("A", START + 1): ("sell", 10)})
+        report = EventEngine({"A": feed}, fill_model=FillModel(brokerage_flat=20, brokerage_pct=0)).run(strategy)
+        buy, sell = strategy.fills
+        self.assertAlmostEqual(buy["price"], 100.75)
+        self.assertAlmostEqual(sell["price"], 99.5)
+        self.assertAlmostEqual(sell["pnl"], (99.5 - 100.75) * 10 - 40)
+        self.assertAlmostEqual(report["final_equity"], 1_000_000 + sell["pnl"])
+
+    def test_block_and_bar_replay_agree(self):
+        feeds = random_feeds(12, 2000)
+        model = FillModel(latency_ms=1500, slippage_bps=2)
+        by_bar = EventEngine(feeds, fill_model=model).run(EmaCross())
+        by_block = EventEngine(feeds, fill_model=model).run(EmaCrossBlocks())
+        self.assertGreater(by_bar["fills"], 0)
+        self.assertEqual(by_bar["fill_log"], by_block["fill_log"])
+        self.assertEqual(by_bar["final_equity"], by_block["final_equity"])
+
+    def test_rejects_what_cash_cannot_cover(self):
+        strategy = Scripted({("A", START): ("buy", 1000)})
+        report = EventEngine({"A": make_feed([100, 101])}, initial_capital=50_000).run(strategy)
+        self.assertEqual(report["fills"], 0)
+        self.assertEqual(report["rejected"], 1)
+
+
+def momentum(instrument_key, closes):
+    """Toy analysis: BUY after two rising closes, SELL after two falling ones."""
+    if len(closes) < 3:
+        return {"signal": "HOLD", "confidence": 0.0}
+    if closes[-1] > closes[-2] > closes[-3]:
+        return {"signal": "BUY", "confidence": 0.9}
+    if closes[-1] < closes[-2] < closes[-3]:
+        return {"signal": "SELL", "confidence": 0.9}
+    return {"signal": "HOLD", "confidence": 0.5}
+
+
+class TestAutoTraderStrategy(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.closes = {
+            key: 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300))) for key in ("NSE_EQ|A", "NSE_EQ|B")
+        }
+
+    def test_rules(self):
+        strategy = AutoTraderStrategy(momentum, timeframe="1m", max_positions=1, position_size=10_000)
+        feeds = {key: make_feed(c, interval=60) for key, c in self.closes.items()}
+        report = EventEngine(feeds, timeframe="1m", fill_model=FillModel(**NO_COSTS)).run(strategy)
+        self.assertGreater(report["fills"], 0)
+        # Never more than one position open at a time
+        held = 0
+        for fill in report["fill_log"]:
+            held += 1 if fill["side"] == "BUY" else -1
+            self.assertIn(held, (0, 1))
+
+    def assert_tracks_broker(self, strategy, engine):
+        broker = engine.broker
+        held = {key for key, qty in broker.positions.items() if qty}
+        self.assertEqual(set(strategy.open), held)
+        # Orders still queued when the replay ends stay in flight
+        queued = {key for key, heap in zip(engine.keys, engine.pending) if heap}
+        self.assertEqual(set(strategy.entering) | strategy.exiting, queued)
+        sides = {}
+        for fill in broker.fills:
+            # Entries and exits alternate per instrument; no exit is lost to a pending entry
+            self.assertNotEqual(sides.get(fill["instrument_key"]), fill["side"])
+            sides[fill["instrument_key"]] = fill["side"]
+
+    def test_positions_follow_fills_under_latency(self):
+        strategy = AutoTraderStrategy(momentum, timeframe="1m", position_size=10_000)
+        feeds = {key: make_feed(c, interval=60) for key, c in self.closes.items()}
+        model = FillModel(latency_ms=90_000, **NO_COSTS)
+        engine = EventEngine(feeds, timeframe="1m", fill_model=model)
+        report = engine.run(strategy)
+        self.assertGreater(report["fills"], 4)
+        self.assert_tracks_broker(strategy, engine)
+
+    def test_rejected_entries_are_not_tracked(self):
+        strategy = AutoTraderStrategy(momentum, timeframe="1m", position_size=10_000)
+        feeds = {key: make_feed(c, interval=60) for key, c in self.closes.items()}
+        model = FillModel(latency_ms=90_000, **NO_COSTS)
+        engine = EventEngine(feeds, timeframe="1m", fill_model=model, initial_capital=5_000)
+        report = engine.run(strategy)
+        self.assertGreater(report["rejected"], 0)
+        self.assertEqual(report["fills"], 0)
+        self.assertEqual(strategy.open, {})
+        self.assert_tracks_broker(strategy, engine)
+
+    def test_live_and_backtest_trade_alike(self):
+        model = dict(**NO_COSTS)
+        backtest = AutoTraderStrategy(momentum, timeframe="1m", position_size=10_000)
+        feeds = {key: make_feed(c, interval=60) for key, c in self.closes.items()}
+        report = EventEngine(feeds, timeframe="1m", fill_model=FillModel(**model)).run(backtest)
+
+        # Live: ticks go to the quote board and the bar aggregator, which closes a
+        # bar when the next one's first tick arrives.
+        board, aggregator = QuoteBoard(), BarAggregator(timeframes={"1m": 60})
+        live = AutoTraderStrategy(momentum, timeframe="1m", position_size=10_000)
+        broker = attach_live(live, PaperBroker(FillModel(**model), board=board), aggregator)
+        last = {}
+        for i in range(300):
+            for key, closes in self.closes.items():
+                # The previous bar closes first, at its own price
+                if key in last:
+                    board.update(key, last[key])
+                aggregator.update(key, START + 60 * i, closes[i])
+                last[key] = closes[i]
+
+        live_fills = [(f["instrument_key"], f["side"], f["qty"]) for f in broker.fills]
+        backtest_fills = [(f["instrument_key"], f["side"], f["qty"]) for f in report["fill_log"]]
+        # The live run has not closed its last bar yet
+        self.assertEqual(live_fills, backtest_fills[: len(live_fills)])
+        self.assertGreaterEqual(len(live_fills), len(backtest_fills) - 2)
+
+    def test_block_strategy_runs_live(self):
+        board, aggregator = QuoteBoard(), BarAggregator(timeframes={"1s": 1})
+        keys = list(self.closes)
+        strategy = EmaCrossBlocks(fast=3, slow=8)
+        broker = attach_live(strategy, PaperBroker(board=board), aggregator, keys)
+        for i in range(300):
+            for key in keys:
+                board.update(key, self.closes[key][i])
+                aggregator.update(key, START + i, self.closes[key][i])
+        self.assertGreater(len(broker.fills), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import unittest
+from datetime import datetime, timedelta
+
+import httpx
+
+from services.upstox.feed_auth import UpstoxFeedAuthorizer
+
+AUTHORIZE_URL = "http://feed.test/v3/feed/market-data-feed/authorize"
+
+
+class TestFeedAuthorizer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = 0
+        self.expired = set()
+        self.loads = 0
+        self.tokens = {1: ("tok", None)}
+
+    async def asyncTearDown(self):
+        await self.auth.aclose()
+
+    def make(self, url_ttl=30):
+        async def handler(request):
+            self.requests += 1
+            await asyncio.sleep(0.01)
+            token = request.headers["Authorization"].removeprefix("Bearer ")
+            if token in self.expired:
+                return httpx.Response(401, json={"status": "error"})
+            url = f"ws://feed.test/feed?code={self.requests}"
+            return httpx.Response(
+                200,
+                json={"status": "success", "data": {"authorized_redirect_uri": url}},
+            )
+
+        def loader(user_id, email):
+            self.loads += 1
+            time.sleep(0.01)
+            return self.tokens.get(user_id, (None, None))
+
+        self.auth = UpstoxFeedAuthorizer(
+            authorize_url=AUTHORIZE_URL,
+            url_ttl=url_ttl,
+            token_loader=loader,
+            transport=httpx.MockTransport(handler),
+        )
+        return self.auth
+
+    async def test_prefetched_url_serves_next_connect(self):
+        auth = self.make()
+        first = await auth.get_feed_url("tok")
+        await asyncio.sleep(0.05)  # background prefetch lands
+        self.assertEqual(self.requests, 2)
+
+        second = await auth.get_feed_url("tok")
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.requests, 2)  # served from the spare URL
+
+    async def test_concurrent_connects_get_distinct_urls(self):
+        auth = self.make()
+        urls = await asyncio.gather(*(auth.get_feed_url("tok") for _ in range(4)))
+        self.assertEqual(len(set(urls)), 4)
+
+    async def test_stale_url_is_fetched_again(self):
+        auth = self.make(url_ttl=0.02)
+        await auth.get_feed_url("tok")
+        await asyncio.sleep(0.05)
+        calls = self.requests
+        await auth.get_feed_url("tok")
+        self.assertEqual(self.requests, calls + 1)
+
+    async def test_rejected_token_raises_permission_error(self):
+        auth = self.make()
+        self.expired.add("tok")
+        with self.assertRaises(PermissionError):
+            await auth.get_feed_url("tok")
+
+    async def test_access_token_loaded_once_for_concurrent_callers(self):
+        auth = self.make()
+        tokens = await asyncio.gather(*(auth.get_access_token(user_id=1) for _ in range(5)))
+        self.assertEqual(tokens, ["tok"] * 5)
+        self.assertEqual(self.loads, 1)
+
+        await auth.get_access_token(user_id=1)
+        self.assertEqual(self.loads, 1)
+
+    async def test_expired_access_token_raises(self):
+        auth = self.make()
+        self.tokens[2] = ("old", datetime.now() - timedelta(minutes=1))
+        with self.assertRaises(PermissionError):
+            await auth.get_access_token(user_id=2)
+
+    async def test_unlinked_user_returns_none(self):
+        auth = self.make()
+        self.assertIsNone(await auth.get_access_token(user_id=99))
+
+    async def test_forget_token_forces_reload(self):
+        auth = self.make()
+        await auth.get_access_token(user_id=1)
+        auth.forget_token("tok")
+        await auth.get_access_token(user_id=1)
+        self.assertEqual(self.loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+from services.upstox import feed_hub as feed_hub_module
+from services.upstox.feed_hub import UpstoxFeedHub
+from services.upstox.tick_journal import read_journal
+
+
+class FakeClient:
+    def __init__(self, access_token, instrument_keys, callback, **options):
+        self.access_token = access_token
+        self.instrument_keys = instrument_keys
+        self.callback = callback
+        self.recorder = options.get("recorder")
+        self.frames = []
+        self.stopped = False
+
+    async def connect_and_stream(self):
+        pass
+
+    async def subscribe(self, keys):
+        self.instrument_keys = self.instrument_keys + list(keys)
+        self.frames.append(("sub", sorted(keys)))
+
+    async def unsubscribe(self, keys):
+        self.instrument_keys = [k for k in self.instrument_keys if k not in keys]
+        self.frames.append(("unsub", sorted(keys)))
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestFeedHub(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(feed_hub_module, "UpstoxWebSocketClient", FakeClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.hub = UpstoxFeedHub(max_connections=2, keys_per_connection=3)
+
+    async def test_shared_keys_open_one_connection(self):
+        await self.hub.subscribe("a", ["K1", "K2"], lambda m: None, "tok")
+        await self.hub.subscribe("b", ["K1", "K2"], lambda m: None, "tok")
+
+        self.assertEqual(len(self.hub.connections), 1)
+        self.assertEqual(self.hub.connections[0].frames, [])
+        self.assertEqual(self.hub.refcounts, {"K1": 2, "K2": 2})
+
+    async def test_unsub_only_when_last_reference_goes(self):
+        await self.hub.subscribe("a", ["K1", "K2"], lambda m: None, "tok")
+        await self.hub.subscribe("b", ["K2", "K3"], lambda m: None, "tok")
+        client = self.hub.connections[0]
+        self.assertEqual(client.frames, [("sub", ["K3"])])
+
+        await self.hub.unsubscribe("a")
+        self.assertEqual(client.frames[-1], ("unsub", ["K1"]))
+
+        await self.hub.unsubscribe("b")
+        self.assertTrue(client.stopped)
+        self.assertEqual(self.hub.connections, [])
+
+    async def test_overflow_opens_second_connection(self):
+        await self.hub.subscribe("a", ["K1", "K2", "K3", "K4"], lambda m: None, "tok")
+        self.assertEqual(
+            sorted(len(c.instrument_keys) for c in self.hub.connections), [1, 3]
+        )
+
+    async def test_keys_fill_connections_in_given_order(self):
+        keys = ["K5", "K1", "K4", "K2", "K3"]
+        await self.hub.subscribe("a", keys, lambda m: None, "tok")
+        self.assertEqual(
+            [c.instrument_keys for c in self.hub.connections], [keys[:3], keys[3:]]
+        )
+
+    async def test_published_chunks_stay_on_one_connection(self):
+        await self.hub.subscribe("b", ["X1"], lambda m: None, "tok")
+        chunks = [["K1", "K2", "K3"], ["K4"]]
+        await self.hub.subscribe("a", ["K1", "K2", "K3", "K4"], lambda m: None, "tok", chunks=chunks)
+        self.assertEqual(
+            [c.instrument_keys for c in self.hub.connections], [["X1", "K4"], ["K1", "K2", "K3"]]
+        )
+
+    async def test_dispatch_filters_per_subscriber(self):
+        got_a, got_b = [], []
+        await self.hub.subscribe("a", ["K1"], got_a.append, "tok")
+        await self.hub.subscribe("b", ["K1", "K2"], got_b.append, "tok")
+
+        message = {"type": "live_feed", "data": {"K1": 1, "K2": 2}}
+        await self.hub._dispatch(message)
+
+        self.assertEqual(got_a, [{"type": "live_feed", "data": {"K1": 1}}])
+        self.assertIs(got_b[0], message)
+
+    async def test_listeners_see_every_message(self):
+        seen = []
+        self.hub.add_listener(seen.append)
+        await self.hub.subscribe("a", ["K1"], lambda m: None, "tok")
+
+        message = {"type": "live_feed", "data": {"K2": 2}}
+        await self.hub._dispatch(message)
+        self.assertEqual(seen, [message])
+
+    async def test_set_keys_sends_only_the_difference(self):
+        await self.hub.subscribe("a", ["K1", "K2"], lambda m: None, "tok")
+        await self.hub.subscribe("b", ["K2"], lambda m: None, "tok")
+        client = self.hub.connections[0]
+
+        await self.hub.set_keys("a", ["K2", "K3"])
+        self.assertEqual(client.frames, [("unsub", ["K1"]), ("sub", ["K3"])])
+        self.assertEqual(self.hub.refcounts, {"K2": 2, "K3": 1})
+        self.assertEqual(self.hub.subscribers["a"].keys, {"K2", "K3"})
+
+    async def test_journal_rolls_over_for_open_connections(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        hub = UpstoxFeedHub(max_connections=2, keys_per_connection=1, journal_dir=tmp.name)
+        await hub.subscribe("a", ["K1", "K2"], lambda m: None, "tok")
+        first, second = hub.connections
+
+        with mock.patch.object(feed_hub_module, "date") as today:
+            today.today.return_value = date(2024, 1, 1)
+            first.recorder.append(b"a", stream_id=0)
+            today.today.return_value = date(2024, 1, 2)
+            # Both connections were opened the day before
+            second.recorder.append(b"b", stream_id=1)
+            first.recorder.append(b"c", stream_id=0)
+        hub.recorder.close()
+
+        def frames(day):
+            return [bytes(payload) for _, _, payload in read_journal(Path(tmp.name) / day)]
+
+        self.assertEqual(frames("2024-01-01"), [b"a"])
+        self.assertEqual(frames("2024-01-02"), [b"b", b"c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
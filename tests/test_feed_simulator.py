@@ -0,0 +1,70 @@
+import json
+import unittest
+from urllib.parse import urlparse
+
+from fastapi.testclient import TestClient
+
+from services.upstox.feed_simulator import FeedSimulator, create_app
+from services.upstox.tick_decoder import decode_frame, decode_market_status, decode_ticks
+
+
+class TestFeedSimulator(unittest.TestCase):
+    def setUp(self):
+        self.simulator = FeedSimulator(tick_hz=50, seed=1, expired_tokens=["old"])
+        self.client = TestClient(create_app(self.simulator))
+
+    def authorize(self, token):
+        return self.client.get(
+            "/v3/feed/market-data-feed/authorize",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    def test_authorize_returns_fresh_ws_url(self):
+        first = self.authorize("tok").json()["data"]["authorized_redirect_uri"]
+        second = self.authorize("tok").json()["data"]["authorized_redirect_uri"]
+        self.assertTrue(first.startswith("ws://"))
+        self.assertNotEqual(first, second)
+
+        rejected = self.authorize("old")
+        self.assertEqual(rejected.status_code, 401)
+        self.assertEqual(rejected.json()["status"], "error")
+
+    def test_feed_streams_subscribed_keys(self):
+        url = urlparse(self.authorize("tok").json()["data"]["authorized_redirect_uri"])
+        keys = ["NSE_EQ|A", "NSE_INDEX|Nifty 50"]
+
+        with self.client.websocket_connect(f"{url.path}?{url.query}") as ws:
+            status = decode_market_status(decode_frame(ws.receive_bytes()))
+            self.assertEqual(status, "NORMAL_OPEN")
+
+            ws.send_bytes(
+                json.dumps(
+                    {"guid": "t", "method": "sub", "data": {"mode": "full", "instrumentKeys": keys}}
+                ).encode("utf-8")
+            )
+            ticks = decode_ticks(decode_frame(ws.receive_bytes()))
+
+        self.assertEqual(sorted(ticks), sorted(keys))
+        self.assertGreater(ticks["NSE_INDEX|Nifty 50"].ltp, 0)
+        self.assertEqual(len(ticks["NSE_EQ|A"].depth), 5 * 4)
+
+    def test_previous_close_stays_fixed(self):
+        keys = ["NSE_EQ|A", "NSE_INDEX|Nifty 50"]
+        frames = [decode_ticks(decode_frame(self.simulator.tick_frames(keys)[0])) for _ in range(20)]
+        for key in keys:
+            closes = {ticks[key].cp for ticks in frames}
+            self.assertEqual(len(closes), 1)
+            # Later frames carry a real change from that close
+            self.assertTrue(any(ticks[key].ltp != ticks[key].cp for ticks in frames[1:]))
+
+    def test_market_phases(self):
+        simulator = FeedSimulator(pre_open_seconds=2, session_seconds=10)
+        self.assertEqual(simulator.phase(0.5), "PRE_OPEN_START")
+        self.assertEqual(simulator.phase(1.5), "PRE_OPEN_END")
+        self.assertEqual(simulator.phase(5), "NORMAL_OPEN")
+        self.assertEqual(simulator.phase(12.5), "NORMAL_CLOSE")
+        self.assertEqual(simulator.phase(60), "CLOSING_END")
+
+
+if __name__ == "__main__":
+    unittest.main()
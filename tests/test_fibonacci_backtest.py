@@ -0,0 +1,124 @@
+import math
+import re
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from services.backtest_engine.data import find_price_csv, load_price_csv
+from services.backtest_engine.fibonacci import (
+    backtest_fibonacci,
+    fibonacci_signals,
+    signals_frame,
+)
+from services.ohlcv_store import OHLCVStore
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_CSV = ROOT / "data" / "processed" / "NIFTY IT" / "TCS.NS_historical.csv"
+
+
+def load_script():
+    """``tests/backtest2.py`` as a namespace (its hard-coded Windows path, log file and
+    matplotlib import stripped so it runs headless)."""
+    source = (ROOT / "tests" / "backtest2.py").read_text(encoding="utf-8")
+    source = re.sub(r'"csv_path": "[^"]*"', '"csv_path": ""', source)
+    source = source.replace("import matplotlib.pyplot as plt\n", "")
+    source = re.sub(r"logging\.basicConfig\([^)]*\)", "", source)
+    namespace = {}
+    exec(compile(source, "backtest2.py", "exec"), namespace)
+    return namespace
+
+
+def random_walk(n=600, seed=7, volatility=0.03, freq="D"):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2021-01-01", periods=n, freq=freq)
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, volatility, n))), index=index)
+
+
+def reference_signals(prices, lookback=20, stop_loss_pct=0.02, target_pct=0.05):
+    """The script's row loop with the stop/target held until one is hit."""
+    price = prices.to_numpy()
+    fib_50 = fibonacci_signals(prices, lookback)["fib_50"]
+    signal = np.zeros(len(price), dtype=int)
+    stop = target = math.nan
+    for i in range(lookback, len(price)):
+        if price[i] > fib_50[i - 1] and signal[i - 1] == 0:
+            signal[i] = 1
+            stop, target = price[i] * (1 - stop_loss_pct), price[i] * (1 + target_pct)
+        elif signal[i - 1] == 1:
+            signal[i] = -1 if price[i] <= stop or price[i] >= target else 1
+    return signal
+
+
+class TestFibonacciParity(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.script = load_script()
+
+    def assert_matches_script(self, prices):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            expected_signals = self.script["fibonacci_strategy"](prices)
+            expected_portfolio, expected = self.script["backtest"](expected_signals)
+
+        signals, portfolio, report = backtest_fibonacci(prices, legacy=True)
+        pd.testing.assert_frame_equal(
+            signals_frame(signals, prices.index), expected_signals, check_dtype=False,
+            check_names=False,
+        )
+        for column in ("holdings", "cash", "total", "returns"):
+            np.testing.assert_allclose(portfolio[column], expected_portfolio[column], rtol=1e-12)
+        for key, value in expected.items():
+            if key == "trades":
+                self.assertEqual(len(report["trades"]), len(value))
+            elif isinstance(value, str):
+                self.assertEqual(report[key], value)
+            else:
+                np.testing.assert_allclose(report[key], value, rtol=1e-12, err_msg=key)
+
+    def test_legacy_matches_script_on_sample_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assert_matches_script(load_price_csv(SAMPLE_CSV, OHLCVStore(tmp)))
+
+    def test_legacy_matches_script_on_volatile_series(self):
+        for seed in range(5):
+            self.assert_matches_script(random_walk(seed=seed, volatility=0.05))
+
+
+class TestFibonacciEngine(unittest.TestCase):
+    def test_held_levels_match_reference_loop(self):
+        for seed in range(5):
+            prices = random_walk(seed=seed)
+            signals = fibonacci_signals(prices)
+            np.testing.assert_array_equal(signals["signal"], reference_signals(prices))
+
+    def test_trades_and_long_only_book(self):
+        prices = random_walk(seed=3)
+        signals, portfolio, report = backtest_fibonacci(prices, broker_fee=0)
+        self.assertGreater(report["total_trades"], 5)
+        self.assertTrue(np.all(portfolio["holdings"] >= 0))
+
+        for trade in report["trades"]:
+            self.assertLess(trade["entry_date"], trade["exit_date"])
+            self.assertIn(trade["outcome"], ("Target Hit", "Stop-Loss Hit"))
+            self.assertAlmostEqual(
+                trade["profit"], (trade["exit_price"] - trade["entry_price"]) * 100
+            )
+        self.assertEqual(report["wins"] + report["losses"], report["total_trades"])
+
+    def test_stored_csv_lookup(self):
+        self.assertEqual(find_price_csv("tcs.ns", "NIFTY IT"), SAMPLE_CSV.relative_to(ROOT))
+        self.assertIsNone(find_price_csv("TCS.NS", "../NIFTY IT"))
+        self.assertIsNone(find_price_csv("../../etc/passwd"))
+
+    def test_short_series(self):
+        prices = random_walk(n=10)
+        _, _, report = backtest_fibonacci(prices)
+        self.assertEqual(report["total_trades"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+import msgpack
+
+from core.frame_encoding import DeltaFrameEncoder
+
+
+class TestDeltaFrameEncoder(unittest.TestCase):
+    def test_only_changed_fields_after_first_frame(self):
+        encoder = DeltaFrameEncoder()
+        first = {"K1": {"ltp": 100.0, "atp": 99.5, "oi": None, "bid_ask": [{"bidP": 99.9}]}}
+        self.assertEqual(
+            encoder.diff(first),
+            {"K1": {"ltp": 100.0, "atp": 99.5, "bid_ask": [{"bidP": 99.9}]}},
+        )
+
+        second = {"K1": {"ltp": 100.5, "atp": 99.5, "oi": None, "bid_ask": [{"bidP": 99.9}]}}
+        self.assertEqual(encoder.diff(second), {"K1": {"ltp": 100.5}})
+
+        self.assertEqual(encoder.diff(second), {})
+
+        cleared = {"K1": {"ltp": 100.5, "atp": None, "oi": None, "bid_ask": []}}
+        self.assertEqual(encoder.diff(cleared), {"K1": {"atp": None, "bid_ask": []}})
+
+    def test_frame_round_trips_through_msgpack(self):
+        encoder = DeltaFrameEncoder()
+        frame = encoder.frame(encoder.diff({"K1": {"ltp": 1.5}}), market_open=True)
+        packed = encoder.pack(frame)
+
+        decoded = msgpack.unpackb(packed, raw=False)
+        self.assertEqual(decoded["type"], "live_feed_delta")
+        self.assertEqual(decoded["seq"], 1)
+        self.assertEqual(decoded["data"], {"K1": {"ltp": 1.5}})
+        self.assertEqual(encoder.bytes_sent, len(packed))
+
+
+if __name__ == "__main__":
+    unittest.main()
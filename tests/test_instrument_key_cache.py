@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+from utils import instrument_key_cache as cache
+
+
+class TestInstrumentKeyCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "keys.bin"
+        patcher = mock.patch.object(cache, "KEY_PATH", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, cache, "_current", None)
+
+    def test_round_trip_in_segment_chunks(self):
+        keys = ["NSE_FO|2", "NSE_EQ|B", "NSE_FO|1", "NSE_EQ|A", "NSE_INDEX|Nifty 50", "NSE_EQ|A"]
+        cache.save_instrument_keys(keys, chunk_size=2)
+
+        key_set = cache.current_key_set()
+        self.assertEqual(
+            key_set.keys,
+            ["NSE_EQ|A", "NSE_EQ|B", "NSE_FO|1", "NSE_FO|2", "NSE_INDEX|Nifty 50"],
+        )
+        self.assertEqual(
+            key_set.chunks(),
+            [["NSE_EQ|A", "NSE_EQ|B"], ["NSE_FO|1", "NSE_FO|2"], ["NSE_INDEX|Nifty 50"]],
+        )
+        self.assertTrue(key_set.is_today())
+        self.assertEqual(cache.get_cached_instrument_keys(), key_set.keys)
+        self.assertEqual(cache.get_cached_instrument_chunks(), key_set.chunks())
+
+    def test_readers_pick_up_a_new_publish(self):
+        cache.save_instrument_keys(["NSE_EQ|A"])
+        first = cache.current_key_set()
+        self.assertIs(cache.current_key_set(), first)  # unchanged file, no re-read
+
+        cache.save_instrument_keys(["NSE_EQ|B"])
+        second = cache.current_key_set()
+        self.assertGreater(second.version, first.version)
+        self.assertEqual(second.keys, ["NSE_EQ|B"])
+        self.assertEqual(first.keys, ["NSE_EQ|A"])  # old mapping stays readable
+
+    def test_stale_day_reads_empty(self):
+        cache.save_instrument_keys(["NSE_EQ|A"], trading_date=date.today() - timedelta(days=1))
+        self.assertEqual(cache.get_cached_instrument_keys(), [])
+        self.assertEqual(cache.get_cached_instrument_chunks(), [])
+
+    def test_missing_file(self):
+        self.assertIsNone(cache.current_key_set())
+        self.assertEqual(cache.get_cached_instrument_keys(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
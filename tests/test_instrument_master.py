@@ -0,0 +1,122 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from services.instrument_master import InstrumentMaster, compile_instruments
+
+DAY_MS = 86_400_000
+
+
+def make_instruments(now_ms=None, strikes=range(24000, 24201, 50)):
+    """A small Upstox-style instrument dump: equities, an index, futures, options."""
+    now_ms = now_ms or int(time.time() * 1000)
+    near, far, expired = now_ms + 3 * DAY_MS, now_ms + 10 * DAY_MS, now_ms - DAY_MS
+    rows = [
+        {"segment": "NSE_EQ", "name": "RELIANCE INDUSTRIES LTD", "exchange": "NSE",
+         "isin": "INE002A01018", "instrument_type": "EQ",
+         "instrument_key": "NSE_EQ|INE002A01018", "lot_size": 1, "tick_size": 0.05,
+         "trading_symbol": "RELIANCE", "short_name": "Reliance", "last_price": 2900.5},
+        {"segment": "NSE_EQ", "name": "TATA CONSULTANCY SERV LT", "exchange": "NSE",
+         "isin": "INE467B01029", "instrument_type": "EQ",
+         "instrument_key": "NSE_EQ|INE467B01029", "lot_size": 1, "tick_size": 0.05,
+         "trading_symbol": "TCS"},
+        {"segment": "NSE_INDEX", "name": "Nifty 50", "exchange": "NSE",
+         "instrument_type": "INDEX", "instrument_key": "NSE_INDEX|Nifty 50",
+         "trading_symbol": "NIFTY", "close_price": 24100.0},
+        {"segment": "NSE_FO", "name": "NIFTY", "exchange": "NSE", "instrument_type": "FUT",
+         "instrument_key": "NSE_FO|50001", "expiry": near, "lot_size": 75,
+         "trading_symbol": "NIFTY FUT", "underlying_symbol": "NIFTY", "asset_symbol": "NIFTY",
+         "underlying_key": "NSE_INDEX|Nifty 50", "weekly": False},
+        {"segment": "NSE_FO", "name": "NIFTY", "exchange": "NSE", "instrument_type": "FUT",
+         "instrument_key": "NSE_FO|40001", "expiry": expired, "lot_size": 75,
+         "trading_symbol": "NIFTY OLD FUT", "underlying_symbol": "NIFTY", "asset_symbol": "NIFTY"},
+    ]
+    token = 60000
+    for expiry in (near, far):
+        for strike in strikes:
+            for option in ("CE", "PE"):
+                token += 1
+                rows.append(
+                    {"segment": "NSE_FO", "name": "NIFTY", "exchange": "NSE",
+                     "instrument_type": option, "instrument_key": f"NSE_FO|{token}",
+                     "expiry": expiry, "strike_price": float(strike), "lot_size": 75,
+                     "trading_symbol": f"NIFTY {strike} {option} {expiry}",
+                     "underlying_symbol": "NIFTY", "asset_symbol": "NIFTY",
+                     "underlying_key": "NSE_INDEX|Nifty 50", "weekly": expiry == near}
+                )
+    return rows
+
+
+class InstrumentFixture:
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = Path(self.tmp.name) / "instruments.json"
+        self.records = make_instruments()
+        self.source.write_text(json.dumps(self.records))
+        self.out = Path(self.tmp.name) / "master"
+        compile_instruments(self.source, self.out)
+        self.master = InstrumentMaster(self.out)
+
+
+class TestInstrumentMaster(InstrumentFixture, unittest.TestCase):
+    def test_rows_round_trip(self):
+        self.assertEqual(len(self.master), len(self.records))
+        for i in (0, 2, 3, 10):
+            self.assertEqual(self.master.row(i), self.records[i])
+
+    def test_symbol_index_covers_symbol_fields(self):
+        ids = self.master.by_symbol("nse", "nifty")
+        types = set(self.master.values("instrument_type", ids))
+        self.assertEqual(types, {"INDEX", "FUT", "CE", "PE"})
+        self.assertTrue(np.all(np.diff(ids) > 0))  # file order, no duplicates
+
+    def test_active_drops_expired(self):
+        futures = self.master.active(self.master.by_type("FUT"))
+        self.assertEqual(self.master.values("instrument_key", futures), ["NSE_FO|50001"])
+
+    def test_find_key_and_get(self):
+        self.assertEqual(self.master.get("NSE_EQ|INE467B01029")["trading_symbol"], "TCS")
+        self.assertIsNone(self.master.find_key("NSE_EQ|missing"))
+
+    def test_expiry_and_strike_ranges(self):
+        expiries = sorted(int(e) for e in self.master.index_keys("expiry"))
+        near = self.master.by_expiry(expiries[1])
+        self.assertEqual(len(self.master.by_type("CE")), 10)
+        self.assertEqual(len(near), 11)  # 5 strikes x CE/PE + the future
+
+        ids = self.master.strikes_between(24050, 24100)
+        self.assertEqual(
+            sorted(set(self.master.values("strike_price", ids))), [24050.0, 24100.0]
+        )
+        ids = self.master.expiring_between(expiries[1], expiries[2])
+        self.assertEqual(len(ids), 11)
+
+    def test_dataframe_has_all_columns(self):
+        df = self.master.dataframe()
+        self.assertEqual(len(df), len(self.records))
+        self.assertIn("strike_price", df.columns)
+        self.assertEqual(df.loc[0, "trading_symbol"], "RELIANCE")
+
+    def test_recompile_publishes_new_build(self):
+        old_build = self.master.directory
+        self.source.write_text(json.dumps(self.records[:3]))
+        compile_instruments(self.source, self.out)
+
+        fresh = InstrumentMaster(self.out)
+        self.assertEqual(len(fresh), 3)
+        self.assertNotEqual(fresh.version, self.master.version)
+        # The snapshot already open keeps working off its own build.
+        self.assertTrue(old_build.exists())
+        self.assertEqual(self.master.get("NSE_EQ|INE467B01029")["trading_symbol"], "TCS")
+
+        compile_instruments(self.source, self.out)
+        self.assertFalse(old_build.exists())
+        self.assertEqual(len(list(self.out.glob("build-*"))), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from services import instrument_master as master_module
+from services.instrument_master import InstrumentMaster, compile_instruments
+from services.instrument_refresh import InstrumentRefresher, diff_instruments
+from tests.test_instrument_master import InstrumentFixture
+
+
+class TestInstrumentRefresh(InstrumentFixture, unittest.TestCase):
+    def rebuild(self, records):
+        self.source.write_text(json.dumps(records))
+        compile_instruments(self.source, self.out)
+        return InstrumentMaster(self.out)
+
+    def test_diff_reports_added_expired_changed(self):
+        records = [r for r in self.records if r["instrument_key"] != "NSE_FO|60001"]
+        records[0] = dict(records[0], lot_size=5)
+        records.append(dict(self.records[-1], instrument_key="NSE_FO|99999"))
+        new = self.rebuild(records)
+
+        diff = diff_instruments(self.master, new)
+        self.assertEqual(diff["added"], ["NSE_FO|99999"])
+        # Dropped from the dump, plus the future that was already past expiry
+        self.assertEqual(diff["expired"], ["NSE_FO|40001", "NSE_FO|60001"])
+        self.assertEqual(diff["changed"], ["NSE_EQ|INE002A01018"])
+        self.assertEqual(diff["from_version"], self.master.version)
+        self.assertEqual(diff["to_version"], new.version)
+
+    def test_unchanged_dump_diffs_empty_apart_from_expired(self):
+        diff = diff_instruments(self.master, self.rebuild(self.records))
+        self.assertEqual(diff["added"], [])
+        self.assertEqual(diff["changed"], [])
+        self.assertEqual(diff["expired"], ["NSE_FO|40001"])
+
+    def test_refresh_swaps_master_and_notifies(self):
+        refresher = InstrumentRefresher(url=None, source=self.source, directory=self.out)
+        seen = []
+        refresher.on_refresh(seen.append)
+        self.source.write_text(json.dumps(self.records[:3]))
+
+        with mock.patch.object(master_module, "_master", self.master):
+            diff = asyncio.run(refresher.refresh())
+            current = master_module.get_instrument_master()
+
+        self.assertIsNot(current, self.master)
+        self.assertEqual(len(current), 3)
+        self.assertEqual(seen, [diff])
+        self.assertEqual(len(diff["expired"]), len(self.records) - 3)
+        # The snapshot readers already hold stays usable after the swap
+        self.assertEqual(self.master.row(10), self.records[10])
+
+
+if __name__ == "__main__":
+    unittest.main()
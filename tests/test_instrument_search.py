@@ -0,0 +1,51 @@
+import unittest
+
+from services.instrument_search import (
+    TIER_EXACT,
+    TIER_PREFIX,
+    TIER_SUBSTRING,
+    InstrumentSearchIndex,
+)
+from tests.test_instrument_master import InstrumentFixture
+
+
+class TestInstrumentSearch(InstrumentFixture, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = InstrumentSearchIndex(self.master)
+
+    def symbols(self, hits):
+        return self.master.values("trading_symbol", [row for row, _ in hits])
+
+    def test_exact_match_comes_first(self):
+        hits = self.index.search("nifty")
+        self.assertEqual(hits[0], (self.master.find_key("NSE_INDEX|Nifty 50"), TIER_EXACT))
+        # Then prefix matches: futures ahead of options
+        self.assertEqual(self.symbols(hits[1:2]), ["NIFTY FUT"])
+        self.assertTrue(all(tier == TIER_PREFIX for _, tier in hits[1:]))
+
+    def test_prefix_and_name_matches(self):
+        self.assertEqual(self.symbols(self.index.search("relia")), ["RELIANCE"])
+        self.assertEqual(self.symbols(self.index.search("tata consult")), ["TCS"])
+
+    def test_substring_is_verified(self):
+        hits = self.index.search("ONSULTANCY")
+        self.assertEqual([(self.symbols(hits), hits[0][1])], [(["TCS"], TIER_SUBSTRING)])
+        self.assertEqual(self.index.search("XYZ"), [])
+        # "ATA" and "TAT" both occur in "TATA ...", "ATAT" does not
+        self.assertEqual(self.index.search("ATAT"), [])
+
+    def test_filters_and_limit(self):
+        hits = self.index.search("NIFTY", limit=5)
+        self.assertEqual(len(hits), 5)
+        self.assertEqual(self.index.search("RELIANCE", exchange="BSE"), [])
+        spot = self.index.search("N", types=("EQ", "INDEX"))
+        self.assertEqual(self.symbols(spot), ["NIFTY"])
+
+    def test_records_shape(self):
+        records = self.index.records("tcs")
+        self.assertEqual(records[0]["instrument_key"], "NSE_EQ|INE467B01029")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from services.backtest_engine.data import load_price_csv
+from services.ohlcv_store import OHLCVStore, csv_partition, read_yfinance_csv
+
+ROOT = Path(__file__).resolve().parents[1]
+SAMPLE_CSV = ROOT / "data" / "processed" / "NIFTY IT" / "TCS.NS_historical.csv"
+
+YFINANCE_CSV = """Price,Close,High,Low,Open,Volume
+Ticker,ABC.NS,ABC.NS,ABC.NS,ABC.NS,ABC.NS
+Date,,,,,
+2024-01-01,101.5,102.0,100.0,100.5,1000
+2024-01-02,102.25,103.0,101.0,101.5,2000
+2024-01-03,100.75,102.5,100.5,102.0,1500
+2024-01-04,103.0,103.5,100.5,100.75,3000
+"""
+
+
+def bars_frame(start, n):
+    index = pd.date_range(start, periods=n, freq="D", name="Date")
+    close = np.linspace(100, 100 + n, n)
+    return pd.DataFrame(
+        {"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close, "Volume": np.arange(n) * 10},
+        index=index,
+    )
+
+
+class TestOHLCVStore(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.store = OHLCVStore(self.tmp / "store")
+
+    def test_reads_three_row_header(self):
+        frame = read_yfinance_csv(io.StringIO(YFINANCE_CSV))
+        self.assertEqual(list(frame.columns), ["Open", "High", "Low", "Close", "Volume"])
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(frame.index[0], pd.Timestamp("2024-01-01"))
+        self.assertEqual(frame["Close"].tolist(), [101.5, 102.25, 100.75, 103.0])
+
+    def test_round_trip_is_memory_mapped(self):
+        frame = bars_frame("2024-01-01", 50)
+        self.store.write("ABC.NS", "1d", frame)
+
+        bars = self.store.load("ABC.NS")
+        self.assertEqual(len(bars), 50)
+        self.assertEqual(bars["close"].dtype, np.float64)
+        self.assertEqual(bars["volume"].dtype, np.int64)
+        self.assertIsInstance(bars["close"].base, np.memmap)
+        pd.testing.assert_frame_equal(
+            bars.frame(), frame.astype({"Volume": np.int64}), check_freq=False
+        )
+        self.assertIs(self.store.load("ABC.NS"), bars)  # unchanged partition, same mapping
+
+    def test_date_range_slices_views(self):
+        self.store.write("ABC.NS", "1d", bars_frame("2024-01-01", 50))
+        window = self.store.load("ABC.NS", start="2024-01-10", end="2024-01-19")
+        self.assertEqual(len(window), 10)
+        self.assertEqual(window.index[0], pd.Timestamp("2024-01-10"))
+        self.assertEqual(window.index[-1], pd.Timestamp("2024-01-19"))
+        self.assertTrue(np.shares_memory(window["close"], self.store.load("ABC.NS")["close"]))
+        self.assertEqual(len(self.store.load("ABC.NS", start="2025-01-01")), 0)
+
+    def test_append_adds_only_newer_bars(self):
+        self.store.write("ABC.NS", "1d", bars_frame("2024-01-01", 10))
+        old = self.store.load("ABC.NS")
+
+        added = self.store.append("ABC.NS", "1d", bars_frame("2024-01-06", 10))
+        self.assertEqual(added, 5)
+        bars = self.store.load("ABC.NS")
+        self.assertEqual(len(bars), 15)
+        self.assertTrue(np.all(np.diff(bars["ts"]) > 0))
+        self.assertEqual(len(old), 10)  # earlier views keep their rows
+        self.assertEqual(self.store.append("ABC.NS", "1d", bars_frame("2024-01-01", 3)), 0)
+
+    def test_append_discards_an_unfinished_append(self):
+        self.store.write("ABC.NS", "1d", bars_frame("2024-01-01", 10))
+        with open(self.store.root / "1d" / "ABC.NS" / "close.bin", "ab") as f:
+            f.write(b"\0" * 12)  # bytes written without a meta update
+        self.store.append("ABC.NS", "1d", bars_frame("2024-01-11", 2))
+        bars = self.store.load("ABC.NS")
+        self.assertEqual(len(bars), 12)
+        self.assertEqual(bars["close"][-1], bars_frame("2024-01-11", 2)["Close"].iloc[-1])
+
+    def test_partition_name_is_the_default_symbol(self):
+        self.store.write("ABC.NS", "1d", bars_frame("2024-01-01", 5))
+        self.store.append("XYZ.NS", "1d", bars_frame("2024-01-01", 5))
+        self.assertEqual(self.store.meta("ABC.NS")["symbol"], "ABC.NS")
+        self.assertEqual(self.store.load("XYZ.NS").symbol, "XYZ.NS")
+        self.assertEqual(self.store.symbols(), ["ABC.NS", "XYZ.NS"])
+        self.assertEqual(sorted(p.name for p in (self.store.root / "1d").iterdir()), ["ABC.NS", "XYZ.NS"])
+
+    def test_csv_is_converted_once_and_again_when_changed(self):
+        path = self.tmp / "ABC.NS_historical.csv"
+        path.write_text(YFINANCE_CSV)
+        self.assertEqual(self.store.import_csv(path), 4)
+        self.assertEqual(self.store.import_csv(path), 0)
+        self.assertEqual(self.store.symbols(), ["ABC.NS"])
+
+        path.write_text(YFINANCE_CSV + "2024-01-05,104.0,104.5,102.5,103.0,500\n")
+        os.utime(path, ns=(0, 1))
+        bars = self.store.load_csv(path)
+        self.assertEqual(len(bars), 5)
+        self.assertEqual(float(bars["close"][-1]), 104.0)
+
+    def test_import_data_dir_records_sector(self):
+        data_dir = self.tmp / "data"
+        sector = data_dir / "processed" / "NIFTY IT"
+        sector.mkdir(parents=True)
+        shutil.copy(SAMPLE_CSV, sector / SAMPLE_CSV.name)
+        (data_dir / "ABC.NS_historical.csv").write_text(YFINANCE_CSV)
+
+        self.assertEqual(self.store.import_data_dir(data_dir), 2)
+        self.assertEqual(self.store.symbols(), ["ABC.NS", "TCS.NS"])
+        partition = csv_partition(sector / SAMPLE_CSV.name)
+        self.assertEqual(self.store.meta(partition)["sector"], "NIFTY IT")
+        expected = read_yfinance_csv(SAMPLE_CSV)["Close"]
+        pd.testing.assert_series_equal(self.store.load(partition).close(), expected)
+
+    def test_same_symbol_from_two_sources(self):
+        paths = []
+        for sector, extra in (("NIFTY Bank", ""), ("NIFTY Private Bank", "2024-01-05,99.5,100,99,99.5,10\n")):
+            folder = self.tmp / "processed" / sector
+            folder.mkdir(parents=True)
+            paths.append(folder / "ABC.NS_historical.csv")
+            paths[-1].write_text(YFINANCE_CSV + extra)
+
+        self.assertEqual(len(self.store.load_csv(paths[0])), 4)
+        self.assertEqual(len(self.store.load_csv(paths[1])), 5)
+        # Each source keeps its own partition, so alternating loads convert nothing
+        self.assertFalse(self.store.is_stale(paths[0]))
+        self.assertEqual(self.store.import_csv(paths[1]), 0)
+        self.assertEqual(len(self.store.load_csv(paths[0])), 4)
+        self.assertEqual(len(self.store.partitions()), 2)
+        self.assertEqual(self.store.symbols(), ["ABC.NS"])
+        self.assertEqual(
+            [self.store.meta(csv_partition(p))["sector"] for p in paths], ["NIFTY Bank", "NIFTY Private Bank"]
+        )
+
+    def test_price_csv_read_directly_while_partition_is_swapped(self):
+        path = self.tmp / "ABC.NS_historical.csv"
+        path.write_text(YFINANCE_CSV)
+        with mock.patch.object(self.store, "load", return_value=None):
+            close = load_price_csv(path, self.store)
+        self.assertEqual(close.tolist(), [101.5, 102.25, 100.75, 103.0])
+
+    def test_rejects_path_like_names(self):
+        with self.assertRaises(ValueError):
+            self.store.load("../ABC.NS")
+
+
+if __name__ == "__main__":
+    unittest.main()
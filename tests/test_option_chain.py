@@ -0,0 +1,64 @@
+import time
+import unittest
+
+import numpy as np
+
+from services.option_chain import OptionChainIndex
+from tests.test_instrument_master import InstrumentFixture
+
+
+class TestOptionChain(InstrumentFixture, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = OptionChainIndex(self.master)
+
+    def test_ladders_align_calls_and_puts(self):
+        expiries = self.index.expiries("nifty")
+        self.assertEqual(len(expiries), 2)
+        ladder = self.index.ladder("NIFTY")
+        self.assertEqual(ladder.expiry, expiries[0])
+        self.assertEqual(ladder.strikes.tolist(), [24000, 24050, 24100, 24150, 24200])
+        self.assertEqual(ladder.step, 50.0)
+
+        for strike, ce, pe in zip(ladder.strikes, ladder.ce, ladder.pe):
+            call, put = self.master.row(int(ce)), self.master.row(int(pe))
+            self.assertEqual((call["instrument_type"], call["strike_price"]), ("CE", strike))
+            self.assertEqual((put["instrument_type"], put["strike_price"]), ("PE", strike))
+            self.assertEqual(call["expiry"], ladder.expiry)
+
+    def test_atm_window(self):
+        ladder = self.index.ladder("NIFTY")
+        self.assertEqual(ladder.atm(24074), 1)
+        self.assertEqual(ladder.atm(24076), 2)
+        self.assertEqual(ladder.atm(1), 0)
+        self.assertEqual(ladder.atm(99999), 4)
+        self.assertEqual(ladder.window(24120, n=1), slice(1, 4))
+        self.assertEqual(ladder.window(24000, n=2), slice(0, 3))
+        self.assertEqual(ladder.window(24110, width=50), slice(1, 4))
+
+    def test_chain_rows(self):
+        ladder = self.index.ladder("NIFTY")
+        chain = self.index.chain(ladder, 24100, n=1)
+        self.assertEqual([row["strike_price"] for row in chain], [24050, 24100, 24150])
+        self.assertEqual(chain[1]["ce"]["instrument_type"], "CE")
+        self.assertEqual(chain[1]["pe"]["strike_price"], 24100)
+
+    def test_near_the_money_covers_live_expiries(self):
+        calls, puts = self.index.near_the_money("NIFTY", 24100, n=1)
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(set(self.master.values("instrument_type", puts)), {"PE"})
+        strikes = self.master.column("strike_price")[calls]
+        self.assertTrue(np.all((strikes >= 24050) & (strikes <= 24150)))
+
+        later = time.time() + 5 * 86400
+        calls, _ = self.index.near_the_money("NIFTY", 24100, n=1, now=later)
+        self.assertEqual(len(calls), 3)
+
+    def test_unknown_underlying(self):
+        self.assertIsNone(self.index.ladder("TCS"))
+        calls, puts = self.index.near_the_money("TCS")
+        self.assertEqual((len(calls), len(puts)), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
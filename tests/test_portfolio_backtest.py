@@ -0,0 +1,128 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from services.backtest_engine.portfolio import run_portfolio_backtest, trade_bars
+from services.ohlcv_store import ohlcv_store
+from tests.test_fibonacci_backtest import random_walk
+
+SECTORS = {"NIFTY A": ["AAA.NS", "BBB.NS", "CCC.NS"], "NIFTY B": ["DDD.NS", "EEE.NS"]}
+
+
+def write_sector_data(root):
+    seed = 0
+    for sector, symbols in SECTORS.items():
+        folder = Path(root) / "processed" / sector
+        folder.mkdir(parents=True)
+        for symbol in symbols:
+            seed += 1
+            # Staggered histories so the union calendar has gaps per symbol
+            prices = random_walk(400 + 50 * seed, seed=seed).iloc[seed * 10 :]
+            frame = pd.DataFrame({"Date": prices.index.strftime("%Y-%m-%d"), "Close": prices.to_numpy()})
+            frame.to_csv(folder / f"{symbol}_historical.csv", index=False)
+
+
+def open_counts(trades, key=None):
+    """Most positions open at once, overall or per ``key``."""
+    events = []
+    for t in trades:
+        events.append((t["entry_date"], 1, t[key] if key else None))
+        if t["exit_date"] is not None:
+            events.append((t["exit_date"], 0, t[key] if key else None))
+    counts, most = {}, 0
+    for _, kind, group in sorted(events, key=lambda e: (e[0], e[1])):
+        counts[group] = counts.get(group, 0) + (1 if kind else -1)
+        most = max(most, counts[group])
+    return most
+
+
+class TestTradeBars(unittest.TestCase):
+    def test_entries_and_exits(self):
+        signal = np.array([0, 1, 1, -1, 1, -1, 0, 1, 1])
+        entries, exits = trade_bars(signal)
+        self.assertEqual(entries.tolist(), [1, 4, 7])
+        self.assertEqual(exits.tolist(), [3, 5, -1])
+
+
+class TestPortfolioBacktest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        write_sector_data(self.tmp.name)
+        # Converted CSVs go to the temp dir, not the repo's data/ohlcv (pool workers fork with it)
+        patcher = mock.patch.object(ohlcv_store, "root", Path(self.tmp.name) / "ohlcv")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_backtest(self, **kwargs):
+        return run_portfolio_backtest("fibonacci", data_dir=self.tmp.name, **kwargs)
+
+    def test_equity_matches_trade_profits(self):
+        report = self.run_backtest(max_positions=50, max_per_sector=50, position_size=0.05, workers=1)
+        aggregate = report["aggregate"]
+        self.assertEqual(aggregate["symbols"], 5)
+        self.assertEqual(aggregate["skipped"], 0)
+        profit = sum(t["profit"] for t in report["trades"])
+        self.assertAlmostEqual(aggregate["final_equity"], aggregate["initial_capital"] + profit, places=4)
+
+        sector_pnl = sum(s["pnl"] for s in report["sectors"].values())
+        symbol_pnl = sum(s["pnl"] for s in report["symbols"].values())
+        self.assertAlmostEqual(sector_pnl, profit, places=4)
+        self.assertAlmostEqual(symbol_pnl, profit, places=4)
+        self.assertEqual(set(report["sectors"]), set(SECTORS))
+
+    def test_position_limits(self):
+        report = self.run_backtest(max_positions=2, max_per_sector=1, workers=1)
+        self.assertGreater(report["aggregate"]["skipped"], 0)
+        self.assertLessEqual(open_counts(report["trades"]), 2)
+        self.assertLessEqual(open_counts(report["trades"], "sector"), 1)
+
+    def test_cash_never_negative(self):
+        report = self.run_backtest(initial_capital=2_000, position_size=1.0, max_positions=50, workers=1)
+        self.assertGreater(report["aggregate"]["skipped"], 0)
+        events = []
+        for t in report["trades"]:
+            events.append((t["entry_date"], 1, -(t["entry_price"] * t["shares"] + 20)))
+            if t["exit_date"] is not None:
+                events.append((t["exit_date"], 0, t["exit_price"] * t["shares"] - 20))
+        cash = 2_000
+        for _, _, amount in sorted(events, key=lambda e: (e[0], e[1])):
+            cash += amount
+            self.assertGreaterEqual(cash, -1e-6)
+
+    def test_parallel_matches_serial(self):
+        serial = self.run_backtest(workers=1)
+        parallel = self.run_backtest(workers=3)
+        self.assertEqual(serial["aggregate"], parallel["aggregate"])
+        self.assertEqual(serial["symbols"], parallel["symbols"])
+        pd.testing.assert_series_equal(serial["equity"], parallel["equity"])
+
+    def test_sector_selection(self):
+        report = self.run_backtest(sector_names=["NIFTY B"], workers=1)
+        self.assertEqual(set(report["symbols"]), set(SECTORS["NIFTY B"]))
+        with self.assertRaises(ValueError):
+            self.run_backtest(sector_names=["../NIFTY B"], workers=1)
+
+    def test_symbol_in_two_sectors_is_held_once(self):
+        shared = Path(self.tmp.name) / "processed" / "NIFTY C"
+        shared.mkdir()
+        source = Path(self.tmp.name) / "processed" / "NIFTY A" / "AAA.NS_historical.csv"
+        (shared / source.name).write_bytes(source.read_bytes())
+
+        report = self.run_backtest(
+            sector_names=["NIFTY C", "NIFTY A"], max_positions=50, max_per_sector=50, workers=1
+        )
+        self.assertEqual(report["aggregate"]["symbols"], 3)
+        self.assertEqual(set(report["symbols"]), set(SECTORS["NIFTY A"]))
+        self.assertEqual(report["symbols"]["AAA.NS"]["sector"], "NIFTY C")
+        self.assertLessEqual(open_counts(report["trades"], "symbol"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
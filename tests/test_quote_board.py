@@ -0,0 +1,93 @@
+import time
+import unittest
+from array import array
+
+from services.quote_board import QuoteBoard
+from services.upstox.tick_decoder import CompactTick
+
+
+def tick(key, ltp, bid=0.0, ask=0.0):
+    t = CompactTick(key)
+    t.ltp = ltp
+    t.atp = ltp - 1
+    t.vtt = 500
+    if bid:
+        t.depth = array("d", [10, bid, 20, ask])
+    return t
+
+
+class TestQuoteBoard(unittest.TestCase):
+    def setUp(self):
+        self.board = QuoteBoard(capacity=2)
+
+    def test_feed_updates_slots(self):
+        self.board.on_message(
+            {"type": "live_feed", "data": {"NSE_EQ|A": tick("NSE_EQ|A", 100.0, 99.9, 100.1)}}
+        )
+        quote = self.board.get("NSE_EQ|A")
+        self.assertEqual(quote["ltp"], 100.0)
+        self.assertEqual(quote["bid"], 99.9)
+        self.assertEqual(quote["ask"], 100.1)
+        self.assertEqual(quote["volume"], 500)
+
+    def test_slots_grow(self):
+        for i in range(5):
+            self.board.update(f"K{i}", float(i + 1))
+        self.assertEqual(self.board.slots["K4"], 4)
+        self.assertEqual(self.board.get("K4")["ltp"], 5.0)
+        self.assertGreaterEqual(len(self.board.ltp), 5)
+
+    def test_alias_resolves_broker_symbol(self):
+        self.board.alias("reliance", "NSE_EQ|INE002A01018")
+        self.board.update("NSE_EQ|INE002A01018", 2900.0)
+        self.assertEqual(self.board.latest_price("RELIANCE", fallback=lambda: 1 / 0), 2900.0)
+
+    def test_fallback_only_when_stale(self):
+        calls = []
+
+        def rest():
+            calls.append(1)
+            return 42.0
+
+        self.board.update("K", 40.0, ts=time.time() - 60)
+        self.assertEqual(self.board.latest_price("K", fallback=rest, max_age=5), 42.0)
+        self.assertEqual(self.board.latest_price("K", fallback=rest, max_age=5), 42.0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.board.fallbacks, 1)
+
+    def test_fallback_for_unstreamed_symbol_is_reused(self):
+        calls = []
+
+        def rest():
+            calls.append(1)
+            return 2900.0
+
+        self.assertEqual(self.board.latest_price("RELIANCE", fallback=rest), 2900.0)
+        self.assertEqual(self.board.latest_price("reliance", fallback=rest), 2900.0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(self.board.keys), 1)
+
+    def test_fallback_keeps_streamed_fields(self):
+        self.board.on_message(
+            {"type": "live_feed", "data": {"NSE_EQ|A": tick("NSE_EQ|A", 100.0, 99.9, 100.1)}}
+        )
+        self.board.ts[self.board.slots["NSE_EQ|A"]] -= 60
+        self.assertEqual(self.board.latest_price("NSE_EQ|A", fallback=lambda: 101.0, max_age=5), 101.0)
+        quote = self.board.get("NSE_EQ|A")
+        self.assertEqual(quote["ltp"], 101.0)
+        self.assertEqual(quote["atp"], 99.0)
+        self.assertEqual(quote["bid"], 99.9)
+        self.assertEqual(quote["volume"], 500)
+
+    def test_unknown_symbol_without_fallback(self):
+        self.assertIsNone(self.board.latest_price("NOPE"))
+
+    def test_snapshot_gathers_many(self):
+        self.board.update("A", 1.0)
+        self.board.update("B", 2.0)
+        snap = self.board.snapshot(["B", "X", "A"])
+        self.assertEqual(snap["ltp"].tolist(), [2.0, 0.0, 1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
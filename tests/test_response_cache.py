@@ -0,0 +1,84 @@
+import gzip
+import json
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.response_cache import CachedBody, ResponseCache
+from router import stock_router
+from tests.test_instrument_master import InstrumentFixture
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_rebuilds_only_on_new_version(self):
+        cache, calls = ResponseCache(), []
+
+        def build():
+            calls.append(1)
+            return {"n": len(calls)}
+
+        first = cache.get("top", 1, build)
+        self.assertIs(cache.get("top", 1, build), first)
+        second = cache.get("top", 2, build)
+        self.assertEqual(len(calls), 2)
+        self.assertNotEqual(first.etag, second.etag)
+        # Same content under a new version keeps the ETag
+        self.assertEqual(CachedBody({"n": 2}).etag, second.etag)
+
+
+class TestTopStocksEndpoint(InstrumentFixture, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        top = Path(self.tmp.name) / "top_stocks.json"
+        top.write_text(json.dumps({"securities": [
+            {"symbol": "NIFTY", "exchange": "NSE", "name": "Nifty 50"},
+            {"symbol": "TCS", "exchange": "NSE", "name": "TCS"},
+        ]}))
+        self.saved = []
+        for patcher in (
+            mock.patch.object(stock_router, "TOP_STOCKS_PATH", top),
+            mock.patch.object(stock_router, "get_instrument_master", lambda: self.master),
+            mock.patch.object(stock_router, "response_cache", ResponseCache()),
+            mock.patch.object(stock_router, "save_instrument_keys", self.saved.append),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        app = FastAPI()
+        app.include_router(stock_router.router)
+        self.client = TestClient(app)
+
+    def test_payload_is_cached_compressed_and_validated(self):
+        first = self.client.get("/api/stocks/top", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["content-encoding"], "gzip")
+        data = first.json()["data"]
+        self.assertEqual(set(data), {"NIFTY", "TCS"})
+        self.assertEqual(len(self.saved), 1)  # key file written once, after the response
+
+        etag = first.headers["etag"]
+        again = self.client.get("/api/stocks/top", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(len(self.saved), 1)
+
+        plain = self.client.get("/api/stocks/top", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(plain.json()["data"], data)
+        cached = stock_router.response_cache.entries[stock_router.TOP_STOCKS_CACHE][1]
+        self.assertEqual(gzip.decompress(cached.encoded["gzip"]), plain.content)
+
+    def test_changed_top_stocks_invalidates(self):
+        self.client.get("/api/stocks/top")
+        stock_router.TOP_STOCKS_PATH.write_text(json.dumps({"securities": [
+            {"symbol": "TCS", "exchange": "NSE", "name": "TCS"},
+        ]}))
+        response = self.client.get("/api/stocks/top")
+        self.assertEqual(set(response.json()["data"]), {"TCS"})
+        self.assertEqual(len(self.saved), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
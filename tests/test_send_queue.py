@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+
+from core.send_queue import ConflatingSendQueue
+
+
+class TestConflatingSendQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_client_gets_latest_value_per_key(self):
+        sent = []
+        gate = asyncio.Event()
+
+        async def send(message):
+            await gate.wait()
+            sent.append(message)
+
+        queue = ConflatingSendQueue(send=send, render=dict)
+        queue.start()
+
+        queue.put_ticks({"K1": 1})
+        await asyncio.sleep(0)  # writer picks up K1 and blocks in send
+        queue.put_ticks({"K1": 2, "K2": 1})
+        queue.put_ticks({"K1": 3})
+        self.assertEqual(queue.depth(), 2)
+
+        gate.set()
+        await queue.aclose()
+
+        self.assertEqual(sent, [{"K1": 1}, {"K1": 3, "K2": 1}])
+        stats = queue.stats()
+        self.assertEqual(stats["conflated"], 1)
+        self.assertEqual(stats["sent_ticks"], 3)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    async def test_overflow_and_control_ordering(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        queue = ConflatingSendQueue(send=send, render=dict, max_keys=2)
+        queue.put_ticks({"K1": 1, "K2": 1, "K3": 1})
+        queue.put_control({"type": "market_info"})
+        queue.start()
+        await queue.aclose()
+
+        self.assertEqual(sent, [{"type": "market_info"}, {"K1": 1, "K2": 1}])
+        self.assertEqual(queue.dropped, 1)
+
+    async def test_failed_send_stops_writer(self):
+        async def send(message):
+            raise RuntimeError("socket closed")
+
+        queue = ConflatingSendQueue(send=send, render=dict)
+        queue.start()
+        queue.put_ticks({"K1": 1})
+        await queue.aclose()
+
+        self.assertTrue(queue.closed)
+        queue.put_ticks({"K1": 2})
+        self.assertEqual(queue.enqueued, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
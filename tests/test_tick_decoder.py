@@ -0,0 +1,82 @@
+import unittest
+
+from google.protobuf.json_format import MessageToDict
+
+import services.upstox.MarketDataFeed_pb2 as pb
+from services.upstox.tick_decoder import (
+    CompactTick,
+    decode_frame,
+    decode_market_status,
+    decode_ticks,
+    parse_feed_dict,
+)
+
+
+def make_full_feed_frame(instrument_keys):
+    msg = pb.FeedResponse()
+    msg.type = pb.Type.Value("live_feed")
+    msg.currentTs = 1718000000000
+    for i, key in enumerate(instrument_keys):
+        market_ff = msg.feeds[key].fullFeed.marketFF
+        market_ff.ltpc.ltp = 100.5 + i
+        market_ff.ltpc.ltt = 1718000000000 + i
+        market_ff.ltpc.ltq = 10 + i
+        market_ff.ltpc.cp = 99.0
+        for level in range(5):
+            quote = market_ff.marketLevel.bidAskQuote.add()
+            quote.bidQ = 100 * (level + 1)
+            quote.bidP = 100.0 - level * 0.05
+            quote.askQ = 0 if level == 4 else 90 * (level + 1)
+            quote.askP = 100.1 + level * 0.05
+        market_ff.optionGreeks.delta = 0.5
+        market_ff.optionGreeks.vega = 1.25
+        candle = market_ff.marketOHLC.ohlc.add()
+        candle.interval = "1d"
+        candle.open = 98.0
+        candle.high = 102.0
+        candle.low = 97.5
+        candle.close = 100.5
+        candle.vol = 123456
+        candle.ts = 1717977600000
+        market_ff.atp = 100.2
+        market_ff.vtt = 500000
+        market_ff.oi = 0.0
+        market_ff.tbq = 1200.0
+        market_ff.tsq = 800.0
+    return msg.SerializeToString()
+
+
+class TestTickDecoder(unittest.TestCase):
+    def test_compact_payload_matches_message_to_dict(self):
+        keys = ["NSE_EQ|INE002A01018", "NSE_FO|43210"]
+        raw = make_full_feed_frame(keys)
+
+        msg = decode_frame(raw)
+        legacy = MessageToDict(msg)["feeds"]
+        ticks = decode_ticks(msg)
+
+        for key in keys:
+            self.assertIsInstance(ticks[key], CompactTick)
+            self.assertEqual(ticks[key].as_payload(), parse_feed_dict(legacy[key]))
+
+    def test_index_feed_carries_ltp(self):
+        msg = pb.FeedResponse()
+        msg.type = pb.Type.Value("live_feed")
+        msg.feeds["NSE_INDEX|Nifty 50"].fullFeed.indexFF.ltpc.ltp = 22500.25
+
+        tick = decode_ticks(decode_frame(msg.SerializeToString()))["NSE_INDEX|Nifty 50"]
+        self.assertEqual(tick.ltp, 22500.25)
+        self.assertIsNone(tick.best_bid())
+
+    def test_market_status(self):
+        msg = pb.FeedResponse()
+        msg.type = pb.Type.Value("market_info")
+        msg.marketInfo.segmentStatus["NSE_EQ"] = pb.MarketStatus.Value("NORMAL_CLOSE")
+
+        decoded = decode_frame(msg.SerializeToString())
+        self.assertEqual(decode_market_status(decoded), "NORMAL_CLOSE")
+        self.assertEqual(decode_market_status(decoded, "MCX_FO"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from models.walk_forward import WalkForward, fold_metrics, walk_forward_folds
+
+
+class ThresholdModel:
+    """Predicts 1 when the first feature is above ``threshold``; records what it saw."""
+
+    def __init__(self, threshold=0.0):
+        self.threshold = threshold
+
+    def fit(self, X, y):
+        self.seen = len(X)
+        return self
+
+    def predict(self, X):
+        return (X[:, 0] > self.threshold).astype(int)
+
+
+def dataset(n_bars=120, symbols=3, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.repeat(pd.date_range("2024-01-01", periods=n_bars, freq="D").to_numpy(), symbols)
+    X = rng.normal(size=(len(times), 2))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=len(times)) > 0).astype(int)
+    return X, y, times, X[:, 0] * 0.01
+
+
+class TestFolds(unittest.TestCase):
+    def setUp(self):
+        self.times = np.repeat(np.arange(60), 2)  # two symbols per bar
+
+    def test_expanding_never_trains_on_the_future(self):
+        folds = walk_forward_folds(self.times, n_folds=5, purge=2)
+        self.assertEqual(len(folds), 5)
+        for k, (train, test) in enumerate(folds):
+            test_bars = self.times[test]
+            self.assertEqual(len(set(test_bars)), 10)
+            self.assertEqual(self.times[train].max(), test_bars.min() - 3)  # 2 bars purged
+            self.assertEqual(self.times[train].min(), 0)
+        self.assertEqual(self.times[folds[-1][1]].max(), 59)
+
+    def test_rolling_window_has_fixed_length(self):
+        folds = walk_forward_folds(self.times, n_folds=4, mode="rolling", train_size=15, test_size=5, purge=1)
+        for train, test in folds:
+            self.assertEqual(len(set(self.times[train])), 15)
+            self.assertEqual(self.times[train].max(), self.times[test].min() - 2)
+
+    def test_purged_kfold_embargoes_after_the_test_block(self):
+        folds = walk_forward_folds(self.times, n_folds=3, mode="purged", purge=1, embargo=4)
+        self.assertEqual(len(folds), 3)
+        train, test = folds[1]
+        bars = set(self.times[train])
+        self.assertEqual(sorted(set(self.times[test])), list(range(20, 40)))
+        self.assertNotIn(19, bars)
+        self.assertFalse(bars & set(range(40, 44)))
+        self.assertIn(44, bars)
+        self.assertIn(0, set(self.times[folds[0][1]]))  # first block trains only after itself
+
+    def test_invalid_splits(self):
+        with self.assertRaises(ValueError):
+            walk_forward_folds(self.times, mode="rolling")
+        with self.assertRaises(ValueError):
+            walk_forward_folds(self.times, n_folds=100)
+        with self.assertRaises(ValueError):
+            walk_forward_folds(self.times, mode="shuffled")
+
+    def test_fold_metrics(self):
+        metrics = fold_metrics([1, 0, 1, 1], [1, 1, 0, 1], np.array([0.02, -0.01, 0.03, 0.01]))
+        self.assertAlmostEqual(metrics["accuracy"], 0.5)
+        self.assertAlmostEqual(metrics["precision"], 2 / 3)
+        self.assertAlmostEqual(metrics["recall"], 2 / 3)
+        self.assertAlmostEqual(metrics["long_return"], 0.02)
+
+
+class TestWalkForward(unittest.TestCase):
+    def test_evaluate_matches_a_serial_run(self):
+        X, y, times, returns = dataset()
+        harness = WalkForward(ThresholdModel, X, y, times, returns, workers=2)
+        table, predictions = harness.evaluate(n_folds=4, purge=1)
+
+        self.assertEqual(list(table["fold"]), [0, 1, 2, 3])
+        for (train, test), row in zip(harness.folds(n_folds=4, purge=1), table.itertuples()):
+            expected = fold_metrics(y[test], ThresholdModel().predict(X[test]), returns[test])
+            self.assertAlmostEqual(row.accuracy, expected["accuracy"])
+            self.assertAlmostEqual(row.long_return, expected["long_return"])
+            self.assertEqual(row.n_train, len(train))
+            np.testing.assert_array_equal(predictions[test], ThresholdModel().predict(X[test]))
+        self.assertTrue(predictions[: len(y) // 5].isna().all())  # never tested
+
+    def test_optimize_selects_from_earlier_folds(self):
+        X, y, times, returns = dataset()
+        harness = WalkForward(ThresholdModel, X, y, times, returns, workers=2)
+        summary, selected = harness.optimize({"threshold": [-1.0, 0.0, 1.0]}, n_folds=4)
+
+        self.assertEqual(len(summary), 3)
+        self.assertEqual(summary["threshold"].iloc[0], 0.0)  # the labels are built around 0
+        self.assertEqual(list(selected["fold"]), [1, 2, 3])
+        self.assertTrue((selected["threshold"] == 0.0).all())
+
+    def test_rows_must_line_up(self):
+        X, y, times, _ = dataset()
+        with self.assertRaises(ValueError):
+            WalkForward(ThresholdModel, X, y[:-1], times)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+
+from services.backtest_engine.windows import predict_windows, sliding_windows, window_trades
+from tests.test_fibonacci_backtest import random_walk
+
+
+class MinMaxScaler:
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+
+    def transform(self, values):
+        return (values - self.low) / (self.high - self.low)
+
+    def inverse_transform(self, values):
+        return values * (self.high - self.low) + self.low
+
+
+class MomentumModel:
+    """Predicts ``last + (last - mean)`` of each scaled window; counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, x):
+        self.calls += 1
+        last = x[:, -1, 0]
+        return (2 * last - x[:, :, 0].mean(axis=1)).reshape(-1, 1)
+
+
+def predict_one(model, scaler, recent_data):
+    # The per-window loop this replaces
+    scaled = scaler.transform(recent_data).reshape(1, len(recent_data), 1)
+    return scaler.inverse_transform(model.predict(scaled).reshape(-1, 1))[0, 0]
+
+
+class TestWindowInference(unittest.TestCase):
+    def setUp(self):
+        self.close = random_walk(n=700, seed=4).to_numpy()
+        self.scaler = MinMaxScaler(self.close.min(), self.close.max())
+
+    def test_windows_are_a_view(self):
+        windows = sliding_windows(self.close, 60)
+        self.assertEqual(windows.shape, (640, 60))
+        self.assertTrue(np.shares_memory(windows, self.close))
+        np.testing.assert_array_equal(windows[0], self.close[:60])
+        np.testing.assert_array_equal(windows[-1], self.close[-61:-1])
+        self.assertEqual(sliding_windows(self.close[:60], 60).shape, (0, 60))
+
+    def test_batches_match_the_per_window_loop(self):
+        model = MomentumModel()
+        predicted = predict_windows(model, self.scaler, sliding_windows(self.close, 60), batch_size=256)
+        self.assertEqual(model.calls, 3)
+
+        loop_model = MomentumModel()
+        expected_trades = []
+        for i in range(60, len(self.close)):
+            recent_data = self.close[i - 60 : i].reshape(-1, 1)
+            expected = predict_one(loop_model, self.scaler, recent_data)
+            self.assertAlmostEqual(predicted[i - 60], expected, places=9)
+
+            is_buy = expected > recent_data[-1][0]
+            actual = self.close[i]
+            pnl = actual - recent_data[-1][0] if is_buy else recent_data[-1][0] - actual
+            expected_trades.append((is_buy, pnl))
+
+        is_buy, entry, exit_price, profit_loss = window_trades(self.close, predicted, 60)
+        self.assertEqual(is_buy.tolist(), [t[0] for t in expected_trades])
+        np.testing.assert_allclose(profit_loss, [t[1] for t in expected_trades])
+        np.testing.assert_array_equal(entry, self.close[59:-1])
+        np.testing.assert_array_equal(exit_price, self.close[60:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,47 +1,183 @@
-import json
+"""Today's instrument-key set, published once and mapped by every worker.
+
+The set lives in one small binary file in the temp dir, replaced
+atomically on publish:
+
+    magic "IKS1" | version u64 | trading date u32 (YYYYMMDD) | count u32 |
+    chunk size u32 | chunks u32 | chunk starts u32[chunks + 1] |
+    key offsets u32[count + 1] | utf-8 keys
+
+Keys are ordered by segment and split into upstream-connection sized
+chunks when published, so subscribers fill connections chunk by chunk.
+Readers ``mmap`` the file (the page cache is shared between uvicorn
+workers) and only re-read it when its inode or mtime changes.
+"""
+
 import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import date
 from pathlib import Path
 from tempfile import gettempdir
-from functools import lru_cache
-from datetime import datetime
+
+import numpy as np
+
+from services.upstox.ws_client import KEYS_PER_CONNECTION
 
 # 🔐 Runtime-safe file path (will not trigger reloads)
-KEY_PATH = Path(gettempdir()) / "today_instrument_keys.json"
+KEY_PATH = Path(gettempdir()) / "today_instrument_keys.bin"
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.info("Keys will be saved to: %s", KEY_PATH)
 
+MAGIC = b"IKS1"
+HEADER = struct.Struct("<4sQIIII")
+
+
+def _date_stamp(day):
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _segment_order(keys):
+    return sorted(set(keys), key=lambda k: (k.partition("|")[0], k))
+
+
+class InstrumentKeySet:
+    """Read-only view of one published key set."""
+
+    def __init__(self, buffer, stamp=None):
+        magic, version, trading_date, count, chunk_size, chunks = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an instrument key set")
+        self.version = version
+        self.trading_date = trading_date
+        self.chunk_size = chunk_size
+        self.stamp = stamp  # (inode, mtime) of the file it was read from
+        at = HEADER.size
+        self._chunk_starts = np.frombuffer(buffer, dtype="<u4", count=chunks + 1, offset=at)
+        at += 4 * (chunks + 1)
+        self._offsets = np.frombuffer(buffer, dtype="<u4", count=count + 1, offset=at)
+        at += 4 * (count + 1)
+        self._blob = memoryview(buffer)[at:]
+        self._keys = None
 
-def save_instrument_keys(keys: list[str]) -> None:
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def is_today(self, today=None):
+        return self.trading_date == _date_stamp(today or date.today())
+
+    @property
+    def keys(self):
+        """All keys, in chunk order (decoded once per version)."""
+        if self._keys is None:
+            offsets = self._offsets.tolist()
+            blob = self._blob
+            self._keys = [
+                str(blob[start:end], "utf-8") for start, end in zip(offsets, offsets[1:])
+            ]
+        return self._keys
+
+    def chunks(self):
+        """Keys split into the upstream-connection chunks fixed at publish time."""
+        keys = self.keys
+        starts = self._chunk_starts.tolist()
+        return [keys[start:end] for start, end in zip(starts, starts[1:])]
+
+
+def save_instrument_keys(keys, trading_date=None, chunk_size=KEYS_PER_CONNECTION, path=None):
+    """Publish ``keys`` as the set for ``trading_date`` (today by default)."""
+    path = Path(path or KEY_PATH)
+    ordered = _segment_order(keys)
+    encoded = [k.encode("utf-8") for k in ordered]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(k) for k in encoded], out=offsets[1:])
+    chunk_starts = np.append(np.arange(0, len(encoded), chunk_size), len(encoded)).astype("<u4")
+
+    header = HEADER.pack(
+        MAGIC,
+        time.time_ns(),
+        _date_stamp(trading_date or date.today()),
+        len(encoded),
+        chunk_size,
+        len(chunk_starts) - 1,
+    )
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
     try:
-        with open(KEY_PATH, "w", encoding="utf-8") as f:
-            json.dump(sorted(keys), f, indent=2)
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write(chunk_starts.tobytes())
+            f.write(offsets.tobytes())
+            f.write(b"".join(encoded))
+        os.replace(tmp, path)
     except Exception as e:
         logger.error(f"⚠️ Error saving instrument keys: {e}")
+        tmp.unlink(missing_ok=True)
 
 
-def load_instrument_keys() -> list[str]:
+def load_instrument_keys(path=None):
+    """Map the published set; None if there is none."""
+    path = Path(path or KEY_PATH)
     try:
-        if KEY_PATH.exists():
-            with open(KEY_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if not stat.st_size:
+                return None
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return InstrumentKeySet(buffer, (stat.st_ino, stat.st_mtime_ns))
+    except FileNotFoundError:
+        return None
     except Exception as e:
         logger.error(f"⚠️ Error loading instrument keys: {e}")
-    return []
+        return None
 
 
 def instrument_keys_exist() -> bool:
     return KEY_PATH.exists()
 
 
-@lru_cache(maxsize=1)
+_current = None
+_current_lock = threading.Lock()
+
+
+def current_key_set(path=None):
+    """Latest published set; a ``stat`` per call, re-mapped only after a publish."""
+    global _current
+    path = Path(path or KEY_PATH)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    stamp = (stat.st_ino, stat.st_mtime_ns)
+    current = _current
+    if current is not None and current.stamp == stamp:
+        return current
+    with _current_lock:
+        if _current is None or _current.stamp != stamp:
+            _current = load_instrument_keys(path)
+        return _current
+
+
+def _today_set():
+    key_set = current_key_set()
+    if key_set is None:
+        return None
+    if not key_set.is_today():
+        logger.warning(f"⚠️ Instrument key set is from {key_set.trading_date}, not today")
+        return None
+    return key_set
+
+
 def get_cached_instrument_keys() -> list[str]:
-    return load_instrument_keys()
+    """Today's keys in chunk order, or [] when no set was published today."""
+    key_set = _today_set()
+    return key_set.keys if key_set is not None else []
 
 
-def get_or_generate_instrument_keys(generate_fn) -> list[str]:
-    if instrument_keys_exist():
-        return get_cached_instrument_keys()
-    keys = generate_fn()
-    save_instrument_keys(keys)
-    return keys
+def get_cached_instrument_chunks() -> list[list[str]]:
+    """Today's keys in their upstream-connection chunks, or [] when none was published today."""
+    key_set = _today_set()
+    return key_set.chunks() if key_set is not None else []
@@ -1,21 +1,31 @@
-import json
 import pandas as pd
 
+from services.instrument_master import get_instrument_master
 
-def load_instruments_df():
-    with open("data/upstox_instruments.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    df = pd.DataFrame(data)
+# Cleaned frame for the current snapshot; rebuilt after a refresh swaps it.
+_cached = (None, None)
+
+
+def load_instruments_df():
+    global _cached
+    master = get_instrument_master()
+    if master is None:
+        return pd.DataFrame()
+    if _cached[0] is master:
+        return _cached[1]
+    df = master.dataframe().copy()
 
     # Convert expiry from Unix timestamp if it's numeric
-    if df["expiry"].dtype in ["int64", "float64"]:
-        df["expiry"] = pd.to_datetime(df["expiry"], unit="ms", errors="coerce")
-    else:
-        df["expiry"] = pd.to_datetime(df["expiry"], errors="coerce")
+    if "expiry" in df.columns:
+        if str(df["expiry"].dtype) in ["int64", "Int64", "float64"]:
+            df["expiry"] = pd.to_datetime(df["expiry"], unit="ms", errors="coerce")
+        else:
+            df["expiry"] = pd.to_datetime(df["expiry"], errors="coerce")
 
     # Clean up invalid values for JSON compatibility
     df = df.replace([float("inf"), float("-inf")], pd.NA)
     df = df.fillna(value={"strike_price": 0})  # Prevent NaN in key fields
 
+    _cached = (master, df)
     return df